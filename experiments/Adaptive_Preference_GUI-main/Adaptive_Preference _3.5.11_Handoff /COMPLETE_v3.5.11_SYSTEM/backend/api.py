@@ -5,15 +5,16 @@ Database: PostgreSQL with proper SQL integration
 Framework: Flask with SQLAlchemy ORM
 """
 
-from flask import Flask, request, jsonify, send_file, Response, send_from_directory
+from flask import Flask, request, jsonify, send_file, Response, g, has_app_context, has_request_context
 import io
 import csv
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import text
-from sqlalchemy.dialects.postgresql import UUID, INET, JSONB, BYTEA
+from flask_sqlalchemy.session import Session as FlaskSQLAlchemySession
+from sqlalchemy import Boolean, cast, column, text, tuple_, values
+from sqlalchemy.dialects.postgresql import ARRAY, UUID, INET, JSONB, BYTEA, insert as pg_insert
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import generate_password_hash, check_password_hash, safe_join
 from werkzeug.utils import secure_filename
 import uuid
 import os
@@ -25,6 +26,14 @@ from functools import wraps
 import hashlib
 import base64
 import re
+import threading
+import time
+import mimetypes
+import posixpath
+import shutil
+import zipfile
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
 
 # Import auth functions - consolidated import
 try:
@@ -32,6 +41,78 @@ try:
 except ImportError:
     from auth import require_auth, require_roles, jwt_issue_pair_token, jwt_decode_pair_token, jwt_encode
 
+try:
+    from backend.replay import compute_state_checksum, replay_groups
+except ImportError:
+    from replay import compute_state_checksum, replay_groups
+
+try:
+    from backend.simulation import (expand_grid, recommend_max_trials, run_power_grid,
+                                    simulate_selection_budgets, simulate_stopping_rules,
+                                    simulate_warm_start_savings)
+except ImportError:
+    from simulation import (expand_grid, recommend_max_trials, run_power_grid,
+                            simulate_selection_budgets, simulate_stopping_rules,
+                            simulate_warm_start_savings)
+
+try:
+    from backend.bayesian_adaptive import (BayesianPreferenceState, selector_from_config,
+                                           validate_stopping_config)
+except ImportError:
+    from bayesian_adaptive import BayesianPreferenceState, selector_from_config, validate_stopping_config
+
+try:
+    from backend.gp_preference import GPAdaptiveSelector, GPPreferenceState, build_feature_matrix, gp_config
+except ImportError:
+    from gp_preference import GPAdaptiveSelector, GPPreferenceState, build_feature_matrix, gp_config
+
+try:
+    from backend.population import PopulationPosterior, warm_start_config, warm_start_prior
+except ImportError:
+    from population import PopulationPosterior, warm_start_config, warm_start_prior
+
+try:
+    from backend.pooled_ranking import MODELS as RANKING_MODELS, PooledRanking, RankingCache
+except ImportError:
+    from pooled_ranking import MODELS as RANKING_MODELS, PooledRanking, RankingCache
+
+try:
+    from backend.ingest import discard, read_image_dimensions
+    from backend.blob_store import BlobStore, is_sha256
+    from backend.bulk_import import MAX_IMPORT_FILES, archive_sources, discard_staged, stage_sources
+    from backend.derivatives import (THUMBNAIL_VARIANT, VARIANTS as DERIVATIVE_VARIANTS, DerivativePool,
+                                     available as derivatives_available, srcset as derivative_srcset, with_urls)
+except ImportError:
+    from ingest import discard, read_image_dimensions
+    from blob_store import BlobStore, is_sha256
+    from bulk_import import MAX_IMPORT_FILES, archive_sources, discard_staged, stage_sources
+    from derivatives import (THUMBNAIL_VARIANT, VARIANTS as DERIVATIVE_VARIANTS, DerivativePool,
+                             available as derivatives_available, srcset as derivative_srcset, with_urls)
+
+try:
+    from backend.image_stats import (ANALYZER_VERSION, analyze_file, analyze_files,
+                                     available as image_stats_available, describe as describe_image_stats)
+except ImportError:
+    from image_stats import (ANALYZER_VERSION, analyze_file, analyze_files,
+                             available as image_stats_available, describe as describe_image_stats)
+
+try:
+    from backend.schedules import PairSchedule, generate_schedule, permuted_position, schedule_dtype, validate_schedule_config
+except ImportError:
+    from schedules import PairSchedule, generate_schedule, permuted_position, schedule_dtype, validate_schedule_config
+
+try:
+    from backend.bootstrap import run_bootstrap
+    from backend.job_queue import JobQueue, Worker as JobWorker, handler as job_handler, metadata as job_metadata
+except ImportError:
+    from bootstrap import run_bootstrap
+    from job_queue import JobQueue, Worker as JobWorker, handler as job_handler, metadata as job_metadata
+
+try:
+    from backend.bulkheads import Bulkhead, Bulkheads, LatencySLO, Rejected as BulkheadRejected
+except ImportError:
+    from bulkheads import Bulkhead, Bulkheads, LatencySLO, Rejected as BulkheadRejected
+
 
 # ============================================================================
 # CONFIGURATION
@@ -50,17 +131,127 @@ if not database_url:
 app.config['SQLALCHEMY_DATABASE_URI'] = database_url
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SQLALCHEMY_ECHO'] = (os.environ.get('FLASK_ENV') == 'development')  # Log SQL queries
-app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-    'pool_size': 10,
-    'pool_recycle': 3600,
-    'pool_pre_ping': True
-}
 
 # File upload configuration
-app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+app.config['UPLOAD_FOLDER'] = os.environ.get(
+    'UPLOAD_FOLDER', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads'))
 app.config['MAX_CONTENT_LENGTH'] = 5 * 1024 * 1024  # 5MB max file size
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
+# Stimulus library paging (GET /api/stimuli)
+STIMULUS_PAGE_SIZE = 100
+STIMULUS_PAGE_MAX = 500
+
+# Bulk stimulus import: request size limit (archive or all files together);
+# each file is still limited to MAX_CONTENT_LENGTH
+BULK_IMPORT_MAX_BYTES = int(os.environ.get('BULK_IMPORT_MAX_BYTES', 500 * 1024 * 1024))
+BULK_IMPORT_WORKERS = int(os.environ.get('BULK_IMPORT_WORKERS', min(16, (os.cpu_count() or 1) * 2)))
+
+# Background threads generating thumbnails and display sizes (derivatives.py)
+DERIVATIVE_WORKERS = int(os.environ.get('DERIVATIVE_WORKERS', 2))
+
+# Batch auto-tagging (image_stats.py): analysis processes, and stimuli
+# written per UPDATE/commit
+AUTO_TAG_WORKERS = int(os.environ.get('AUTO_TAG_WORKERS', os.cpu_count() or 1))
+AUTO_TAG_BATCH = 500
+
+# Durable background jobs (job_queue.py): result artifacts, optional Redis
+# dispatch, and worker threads run inside each API process (0: jobs are run
+# by scripts/job_worker.py only)
+JOB_ARTIFACT_DIR = os.environ.get(
+    'JOB_ARTIFACT_DIR', os.path.join(os.path.dirname(app.config['UPLOAD_FOLDER'].rstrip('/')), 'job_artifacts'))
+JOB_QUEUE_REDIS_URL = os.environ.get('JOB_QUEUE_REDIS_URL') or None
+JOB_EMBEDDED_WORKERS = int(os.environ.get('JOB_EMBEDDED_WORKERS', 0))
+
+# Route-class bulkheads (bulkheads.py): subject endpoints, researcher
+# endpoints and heavy analytics/export endpoints each get a concurrency
+# limit, a bounded wait queue and their own connection pool, per process.
+# Non-critical classes are shed (fast 503) while the subject latency SLO is
+# breached. Override with BULKHEAD_<CLASS>_{CONCURRENCY,MAX_QUEUE,
+# QUEUE_TIMEOUT,DB_POOL}.
+def _bulkhead_setting(route_class, name, default):
+    return type(default)(os.environ.get(f'BULKHEAD_{route_class.upper()}_{name}', default))
+
+
+BULKHEAD_DEFAULTS = {
+    # class: (concurrency, max_queue, queue_timeout seconds, db pool, sheddable)
+    'subject': (16, 16, 2.0, 10, False),
+    'admin': (4, 4, 2.0, 4, True),
+    'analytics': (2, 2, 1.0, 2, True),
+}
+BULKHEAD_CONFIG = {
+    route_class: {
+        'concurrency': _bulkhead_setting(route_class, 'CONCURRENCY', concurrency),
+        'max_queue': _bulkhead_setting(route_class, 'MAX_QUEUE', max_queue),
+        'queue_timeout': _bulkhead_setting(route_class, 'QUEUE_TIMEOUT', queue_timeout),
+        'db_pool': _bulkhead_setting(route_class, 'DB_POOL', db_pool),
+        'sheddable': sheddable,
+    }
+    for route_class, (concurrency, max_queue, queue_timeout, db_pool, sheddable) in BULKHEAD_DEFAULTS.items()
+}
+SUBJECT_LATENCY_SLO_MS = float(os.environ.get('SUBJECT_LATENCY_SLO_MS', 500))
+SUBJECT_LATENCY_SLO_PERCENTILE = float(os.environ.get('SUBJECT_LATENCY_SLO_PERCENTILE', 0.95))
+SUBJECT_LATENCY_SLO_WINDOW_SECONDS = float(os.environ.get('SUBJECT_LATENCY_SLO_WINDOW_SECONDS', 60))
+
+# Route class of each endpoint (default: admin). Subject latency is measured
+# on the endpoints in SUBJECT_SLO_ENDPOINTS; EXEMPT_ENDPOINTS bypass the
+# bulkheads so health checks and metrics answer under load.
+ROUTE_CLASS_ENDPOINTS = {
+    'subject': {
+        'get_subject_manifest', 'create_session', 'bootstrap_session', 'get_next_pair', 'record_choice',
+        'record_choice_batch', 'serve_upload', 'serve_blob', 'get_consent', 'get_debrief',
+    },
+    'analytics': {
+        'get_results', 'get_pooled_ranking', 'start_ranking_bootstrap', 'get_population_prior',
+        'rebuild_population_prior', 'export_choices_csv', 'export_clean_choices_csv', 'get_all_experiments',
+        'delete_experiment', 'archive_experiment', 'evaluate_experiment_quality', 'bulk_import_stimuli',
+        'replay_session_states', 'run_power_simulation', 'recommend_experiment_max_trials',
+        'run_selection_budget_simulation', 'run_warm_start_simulation', 'run_stopping_simulation',
+        'backfill_stimulus_dimensions', 'get_job_artifact',
+    },
+}
+SUBJECT_SLO_ENDPOINTS = {'create_session', 'bootstrap_session', 'get_next_pair', 'record_choice',
+                         'record_choice_batch'}
+EXEMPT_ENDPOINTS = {'health_check', 'get_bulkhead_metrics', 'static'}
+
+
+def _engine_options(route_class, extra_connections=0):
+    """Pool of a route class: db_pool connections, overflowing up to its concurrency."""
+    config = BULKHEAD_CONFIG[route_class]
+    connections = config['concurrency'] + extra_connections
+    return {
+        'pool_size': min(config['db_pool'], connections),
+        'max_overflow': max(0, connections - config['db_pool']),
+        'pool_recycle': 3600,
+        'pool_pre_ping': True
+    }
+
+
+# Subject requests use the default engine; the other classes are binds to
+# the same database with their own pools (see _RouteClassSession). Embedded
+# job worker threads share the analytics pool, derivative threads the admin pool.
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = _engine_options('subject')
+app.config['SQLALCHEMY_BINDS'] = {
+    'admin': dict(_engine_options('admin', DERIVATIVE_WORKERS), url=database_url),
+    'analytics': dict(_engine_options('analytics', JOB_EMBEDDED_WORKERS), url=database_url),
+}
+
+# Content-addressed stimulus store (see blob_store.py); blob URLs never change
+# content, so BLOB_URL_BASE may point at a CDN
+BLOB_STORE_DIR = os.environ.get('BLOB_STORE_DIR', os.path.join(app.config['UPLOAD_FOLDER'], 'blobs'))
+BLOB_URL_BASE = os.environ.get('BLOB_URL_BASE', 'http://localhost:5000/blobs').rstrip('/')
+blob_store = BlobStore(BLOB_STORE_DIR)
+
+# Stimulus file delivery. With STIMULUS_OFFLOAD='x-accel' (nginx) or
+# 'x-sendfile' (Apache/lighttpd) Flask only answers with headers and the
+# gateway sends the bytes (and byte ranges) from STIMULUS_ACCEL_PREFIX, an
+# internal location aliased to UPLOAD_FOLDER; empty streams from Flask.
+STIMULUS_OFFLOAD = os.environ.get('STIMULUS_OFFLOAD', '').lower()
+STIMULUS_ACCEL_PREFIX = os.environ.get('STIMULUS_ACCEL_PREFIX', '/_stimulus_files/').rstrip('/') + '/'
+BLOB_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Legacy /uploads URLs are name-based, so their content may change
+UPLOAD_CACHE_CONTROL = f"public, max-age={int(os.environ.get('UPLOAD_MAX_AGE_SECONDS', 3600))}"
+
 # Security
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
 
@@ -81,8 +272,20 @@ def _redact_headers(headers):
     return out
 
 
+class _RouteClassSession(FlaskSQLAlchemySession):
+    """Session that uses the connection pool of the request's route class (g.db_pool)."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            engine = self._db.engines.get(g.get('db_pool'))
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
 # Initialize SQLAlchemy
-db = SQLAlchemy(app)
+db = SQLAlchemy(app, session_options={'class_': _RouteClassSession})
+
 
 # --- Runtime Governance Sentinel (env-gated) ---
 if os.environ.get('APP_ENFORCE_GOVERNANCE') == '1':
@@ -125,6 +328,56 @@ NEXT_RATE = os.environ.get('NEXT_RATE','120 per minute')
 CHOICE_RATE = os.environ.get('CHOICE_RATE','240 per minute')
 
 
+# Route-class bulkheads: admission in before_request, release (and subject
+# latency samples) in teardown_request, which also runs after errors
+bulkheads = Bulkheads(
+    {route_class: Bulkhead(route_class, config['concurrency'], config['queue_timeout'], config['max_queue'],
+                           sheddable=config['sheddable'])
+     for route_class, config in BULKHEAD_CONFIG.items()},
+    LatencySLO(SUBJECT_LATENCY_SLO_MS / 1000.0, percentile=SUBJECT_LATENCY_SLO_PERCENTILE,
+               window_seconds=SUBJECT_LATENCY_SLO_WINDOW_SECONDS))
+_ENDPOINT_ROUTE_CLASS = {endpoint: route_class for route_class, endpoints in ROUTE_CLASS_ENDPOINTS.items()
+                         for endpoint in endpoints}
+
+
+def route_class_of(endpoint):
+    """Route class of an endpoint; None for exempt and unknown (404) endpoints."""
+    if endpoint is None or endpoint in EXEMPT_ENDPOINTS:
+        return None
+    return _ENDPOINT_ROUTE_CLASS.get(endpoint, 'admin')
+
+
+@app.before_request
+def _enter_bulkhead():
+    route_class = route_class_of(request.endpoint)
+    if route_class is None or request.method == 'OPTIONS':
+        return None
+    g.request_started = time.perf_counter()
+    try:
+        g.bulkhead = bulkheads.admit(route_class)
+    except BulkheadRejected as e:
+        logger.warning(f"Rejected {request.endpoint} ({e.route_class}): {e.reason}")
+        response = jsonify({'error': 'Server busy, retry later', 'route_class': e.route_class,
+                            'reason': e.reason})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response
+    # Pool of the route class for this request's queries (see _RouteClassSession)
+    if route_class != 'subject':
+        g.db_pool = route_class
+    return None
+
+
+@app.teardown_request
+def _leave_bulkhead(exc):
+    bulkhead = g.pop('bulkhead', None)
+    if bulkhead is None:
+        return
+    bulkhead.release()
+    if request.endpoint in SUBJECT_SLO_ENDPOINTS:
+        bulkheads.slo.record(time.perf_counter() - g.request_started)
+
+
 # ============================================================================
 # MODELS (SQLAlchemy ORM)
 # ============================================================================
@@ -257,21 +510,76 @@ class Experiment(db.Model):
 @require_auth
 @require_roles(['admin', 'researcher'])
 def list_stimuli():
-    """List stimuli for the Stimulus Library view.
-
-    Optional query param:
-      - experiment_id: if supplied, restrict to that experiment only.
+    """List stimuli for the Stimulus Library view, one page at a time.
+
+    Optional query params:
+      - experiment_id: restrict to that experiment only.
+      - tags: comma-separated tags; tags_mode=any (default) or all.
+      - meta.<key>=<value>: metadata equality, e.g. meta.room_type=kitchen.
+      - name_prefix: stimulus names starting with this text.
+      - fields: comma-separated subset of the stimulus fields to return.
+      - limit: page size (default 100, max 500).
+      - cursor: next_cursor of the previous page.
+
+    Pages are ordered by upload time (oldest first) and continue after the
+    cursor's (uploaded_at, stimulus_id), so paging stays stable while
+    stimuli are added. next_cursor is null on the last page.
     """
     try:
-        experiment_id = request.args.get('experiment_id')
         query = Stimulus.query
+        experiment_id = request.args.get('experiment_id')
         if experiment_id:
             query = query.filter_by(experiment_id=experiment_id)
 
-        # Order by upload time so newest are last
-        stimuli = query.order_by(Stimulus.uploaded_at.asc()).all()
+        tags = [t.strip() for t in request.args.get('tags', '').split(',') if t.strip()]
+        if tags:
+            tags_mode = request.args.get('tags_mode', 'any')
+            if tags_mode not in ('any', 'all'):
+                return jsonify({'error': "tags_mode must be 'any' or 'all'"}), 400
+            # && / @> on TEXT[], served by the GIN index on tags
+            query = query.filter(Stimulus.tags.overlap(tags) if tags_mode == 'any' else Stimulus.tags.contains(tags))
+
+        # @> on JSONB, served by the GIN index on metadata
+        meta = {key[len('meta.'):]: value for key, value in request.args.items() if key.startswith('meta.')}
+        if meta:
+            query = query.filter(Stimulus.stimulus_metadata.contains(meta))
+
+        name_prefix = request.args.get('name_prefix')
+        if name_prefix:
+            query = query.filter(Stimulus.stimulus_name.startswith(name_prefix, autoescape=True))
+
+        fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()] or None
+        if fields:
+            unknown = sorted(set(fields) - set(STIMULUS_FIELDS))
+            if unknown:
+                return jsonify({'error': f'Unknown fields: {unknown}', 'fields': list(STIMULUS_FIELDS)}), 400
+
+        limit = request.args.get('limit', STIMULUS_PAGE_SIZE, type=int)
+        if not 1 <= limit <= STIMULUS_PAGE_MAX:
+            return jsonify({'error': f'limit must be between 1 and {STIMULUS_PAGE_MAX}'}), 400
+
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                uploaded_at, stimulus_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+                after = (datetime.fromisoformat(uploaded_at), uuid.UUID(stimulus_id))
+            except (ValueError, TypeError):
+                return jsonify({'error': 'Invalid cursor'}), 400
+            query = query.filter(tuple_(Stimulus.uploaded_at, Stimulus.stimulus_id) > after)
+
+        rows = query.order_by(Stimulus.uploaded_at.asc(), Stimulus.stimulus_id.asc()).limit(limit + 1).all()
+        page = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit:
+            last = page[-1]
+            next_cursor = base64.urlsafe_b64encode(
+                json.dumps([last.uploaded_at.isoformat(), str(last.stimulus_id)]).encode()).decode()
 
-        return jsonify({'stimuli': [s.to_dict() for s in stimuli]})
+        return jsonify({
+            'stimuli': [s.to_dict(fields) for s in page],
+            'next_cursor': next_cursor,
+            'limit': limit
+        })
     except Exception as e:
         logger.error(f"Error listing stimuli: {e}")
         return jsonify({'error': 'Failed to list stimuli'}), 500
@@ -309,25 +617,20 @@ def upload_stimulus_library():
         if not allowed_file(file.filename):
             return jsonify({'error': 'Invalid file type'}), 400
 
-        filename = secure_filename(file.filename)
-        unique_filename = f"{uuid.uuid4()}_{filename}"
-
-        upload_folder = app.config['UPLOAD_FOLDER']
-        os.makedirs(upload_folder, exist_ok=True)
-        file_path = os.path.join(upload_folder, unique_filename)
-        file.save(file_path)
-
-        checksum = calculate_file_checksum(file_path)
-        file_size = os.path.getsize(file_path)
+        filename, ingested = _save_upload(file)
+        file_size = ingested['size_bytes']
 
         stimulus = Stimulus(
             experiment_id=experiment_id,
             stimulus_name=filename,
-            file_path=file_path,
-            url=f"http://localhost:5000/uploads/{unique_filename}",
+            file_path=ingested['path'],
+            url=ingested['url'],
             file_size_bytes=file_size,
             mime_type=file.content_type,
-            checksum_sha256=checksum,
+            width_px=ingested['width'],
+            height_px=ingested['height'],
+            checksum_sha256=ingested['sha256'],
+            blob_sha256=ingested['sha256'],
         )
 
         db.session.add(stimulus)
@@ -340,6 +643,7 @@ def upload_stimulus_library():
             {'stimulus_id': str(stimulus.stimulus_id), 'file_size': file_size},
             experiment_id=experiment_id
         )
+        _queue_derivatives([stimulus.blob_sha256])
 
         return jsonify({'stimulus': stimulus.to_dict()}), 201
 
@@ -362,23 +666,14 @@ def update_stimulus_metadata(stimulus_id):
         data = request.get_json() or {}
 
         # Update JSON metadata blob
-        meta = dict(stimulus.stimulus_metadata or {})
-        if 'room_type' in data:
-            meta['room_type'] = data['room_type'] or None
-        if 'curvature_level' in data:
-            meta['curvature_level'] = data['curvature_level'] or None
-        if 'brightness' in data:
-            meta['brightness'] = data['brightness'] or None
-        if 'hue' in data:
-            meta['hue'] = data['hue'] or None
-        stimulus.stimulus_metadata = meta
+        stimulus.stimulus_metadata = dict(stimulus.stimulus_metadata or {}, **_metadata_patch(data))
 
         # Update tags ARRAY column
         tags = data.get('tags')
         if tags is not None:
-            cleaned = [str(t).strip() for t in tags if str(t).strip()]
-            stimulus.tags = cleaned or None
+            stimulus.tags = _clean_tags(tags)
 
+        _invalidate_stimulus_features([stimulus.experiment_id])
         db.session.commit()
         return jsonify(stimulus.to_dict())
 
@@ -388,47 +683,382 @@ def update_stimulus_metadata(stimulus_id):
         return jsonify({'error': 'Failed to update stimulus'}), 500
 
 
+STIMULUS_METADATA_KEYS = ('room_type', 'curvature_level', 'brightness', 'hue')
+BATCH_MAX_STIMULUS_UPDATES = 1000
+
+
+def _metadata_patch(data):
+    """Library metadata fields present in data; empty values clear a field."""
+    return {key: data[key] or None for key in STIMULUS_METADATA_KEYS if key in data}
+
+
+def _clean_tags(tags):
+    cleaned = [str(t).strip() for t in tags if str(t).strip()]
+    return cleaned or None
+
+
+def _apply_stimulus_patches(rows):
+    """
+    Apply (stimulus_id, metadata_patch, set_tags, tags) rows with one
+    UPDATE ... FROM (VALUES ...): metadata is merged (JSONB ||), tags are
+    replaced where set_tags. Invalidates the feature matrices of the
+    affected experiments; the caller commits.
+
+    Returns:
+        stimulus_id -> experiment_id of the updated stimuli
+    """
+    if not rows:
+        return {}
+    patch = values(
+        column('stimulus_id', UUID(as_uuid=True)),
+        column('metadata', JSONB),
+        column('set_tags', Boolean),
+        column('tags', ARRAY(db.Text)),
+        name='patch'
+    ).data(rows)
+    stimuli = Stimulus.__table__
+    updated = dict(db.session.execute(
+        sa_update(stimuli)
+        .where(stimuli.c.stimulus_id == patch.c.stimulus_id)
+        .values({
+            stimuli.c.metadata: db.func.coalesce(stimuli.c.metadata, cast({}, JSONB)).op('||')(patch.c.metadata),
+            # cast: an all-NULL VALUES column would otherwise be typed text
+            stimuli.c.tags: db.case((patch.c.set_tags, cast(patch.c.tags, ARRAY(db.Text))), else_=stimuli.c.tags),
+        })
+        .returning(stimuli.c.stimulus_id, stimuli.c.experiment_id)
+    ).all())
+    # Once for all affected experiments
+    _invalidate_stimulus_features(updated.values())
+    return updated
+
+
+@app.route('/api/stimuli', methods=['PATCH'])
+@require_auth
+@require_roles(['admin', 'researcher'])
+def update_stimuli_metadata_batch():
+    """
+    Update metadata and tags of many stimuli at once.
+
+    Body: {"updates": [{"stimulus_id": ..., "metadata": {room_type, curvature_level,
+    brightness, hue}, "tags": [...]}, ...]}. Metadata is merged into the
+    existing metadata (JSONB ||); tags, when given, replace the stimulus's
+    tags. All valid rows are applied with one UPDATE ... FROM (VALUES ...).
+
+    Returns:
+        Per-row results in request order with status 'updated',
+        'not_found' or 'invalid' (with an error)
+    """
+    data = request.get_json(silent=True) or {}
+    updates = data.get('updates')
+    if not isinstance(updates, list) or not updates:
+        return jsonify({'error': 'updates must be a non-empty list'}), 400
+    if len(updates) > BATCH_MAX_STIMULUS_UPDATES:
+        return jsonify({'error': f'At most {BATCH_MAX_STIMULUS_UPDATES} updates per request'}), 400
+
+    results = []
+    rows = {}
+    for item in updates:
+        if not isinstance(item, dict):
+            results.append({'stimulus_id': None, 'status': 'invalid', 'error': 'update must be an object'})
+            continue
+        result = {'stimulus_id': item.get('stimulus_id')}
+        results.append(result)
+        metadata, tags = item.get('metadata') or {}, item.get('tags')
+        try:
+            stimulus_id = uuid.UUID(str(item.get('stimulus_id')))
+        except ValueError:
+            result.update(status='invalid', error='Invalid stimulus_id')
+            continue
+        if stimulus_id in rows:
+            result.update(status='invalid', error='Duplicate stimulus_id in batch')
+            continue
+        if not isinstance(metadata, dict) or set(metadata) - set(STIMULUS_METADATA_KEYS):
+            result.update(status='invalid', error=f'metadata may only contain {list(STIMULUS_METADATA_KEYS)}')
+            continue
+        if tags is not None and not isinstance(tags, list):
+            result.update(status='invalid', error='tags must be a list')
+            continue
+        rows[stimulus_id] = (stimulus_id, _metadata_patch(metadata), tags is not None,
+                             _clean_tags(tags) if tags is not None else None)
+
+    try:
+        updated = _apply_stimulus_patches(list(rows.values()))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error batch updating stimulus metadata: {e}")
+        return jsonify({'error': 'Failed to update stimuli'}), 500
+
+    for result in results:
+        if 'status' not in result:
+            found = uuid.UUID(str(result['stimulus_id'])) in updated
+            result['status'] = 'updated' if found else 'not_found'
+    return jsonify({
+        'updated': len(updated),
+        'results': results
+    }), 200
+
+
+AUTO_TAG_FIELDS = ('brightness', 'hue', 'curvature_level')
+
+
+def _auto_tag_source(stimulus_row):
+    """Key identifying a stimulus's image content (checksum, else file path) and its file."""
+    key = stimulus_row.checksum_sha256 or (f'path:{stimulus_row.file_path}' if stimulus_row.file_path else None)
+    return key, stimulus_row.file_path
+
+
+def _current_pixel_stats(metadata, key):
+    """Pixel statistics stored on a stimulus, if computed for this content by this analyzer version."""
+    stats = (metadata or {}).get('pixel_stats')
+    if isinstance(stats, dict) and stats.get('source') == key and stats.get('version') == ANALYZER_VERSION:
+        return stats
+    return None
+
+
+def _auto_tag_update(metadata, tags, stats, key, overwrite):
+    """
+    Metadata patch and tags for a stimulus from pixel statistics. Levels
+    fill empty fields only unless overwrite; detected tags are added to
+    the existing ones.
+    """
+    described = describe_image_stats(stats)
+    metadata = metadata or {}
+    patch = {'pixel_stats': dict(stats, source=key)}
+    for field in AUTO_TAG_FIELDS:
+        if overwrite or not metadata.get(field):
+            patch[field] = described[field]
+    return patch, sorted(set(tags or []) | set(described['tags']))
+
+
 @app.route('/api/stimuli/<stimulus_id>/auto_tag', methods=['POST'])
 @require_auth
 @require_roles(['admin', 'researcher'])
 def auto_tag_stimulus(stimulus_id):
-    """Auto-generate tags for a stimulus.
+    """Auto-tag one stimulus from its pixel statistics (see image_stats.py).
 
-    For now this is a stub that inspects the filename/metadata.
-    Later you can replace this with a call into your image tagger / BN.
+    Body: {"overwrite": false} - replace brightness/hue/curvature_level
+    already set instead of filling empty fields only.
+
+    Without Pillow (or without the file) this falls back to filename and
+    metadata heuristics. Use POST /api/stimuli/auto_tag for many stimuli.
     """
     try:
         stimulus = Stimulus.query.filter_by(stimulus_id=stimulus_id).first()
         if not stimulus:
             return jsonify({'error': 'Stimulus not found'}), 404
 
-        existing_tags = set(stimulus.tags or [])
-        name = (stimulus.stimulus_name or '').lower()
+        overwrite = bool((request.get_json(silent=True) or {}).get('overwrite', False))
         meta = stimulus.stimulus_metadata or {}
+        key, path = _auto_tag_source(stimulus)
+
+        if image_stats_available() and path and os.path.isfile(path):
+            stats = _current_pixel_stats(meta, key) or analyze_file(path)
+            patch, tags = _auto_tag_update(meta, stimulus.tags, stats, key, overwrite)
+            stimulus.stimulus_metadata = dict(meta, **patch)
+            stimulus.tags = tags
+        else:
+            existing_tags = set(stimulus.tags or [])
+            name = (stimulus.stimulus_name or '').lower()
+
+            # Naive heuristic rules
+            if 'curve' in name or 'arched' in name:
+                existing_tags.add('curved')
+            if 'blue' in name or meta.get('hue') == 'cool':
+                existing_tags.add('blue')
+            if meta.get('brightness') == 'bright':
+                existing_tags.add('bright')
+            if meta.get('brightness') == 'dark':
+                existing_tags.add('dark')
 
-        # Naive heuristic rules – placeholder
-        if 'curve' in name or 'arched' in name:
-            existing_tags.add('curved')
-        if 'blue' in name or meta.get('hue') == 'cool':
-            existing_tags.add('blue')
-        if meta.get('brightness') == 'bright':
-            existing_tags.add('bright')
-        if meta.get('brightness') == 'dark':
-            existing_tags.add('dark')
+            if not existing_tags:
+                existing_tags.add('candidate')
 
-        if not existing_tags:
-            existing_tags.add('candidate')
+            stimulus.tags = sorted(existing_tags)
 
-        stimulus.tags = sorted(existing_tags)
+        _invalidate_stimulus_features([stimulus.experiment_id])
         db.session.commit()
 
-        return jsonify({'tags': stimulus.tags})
+        meta = stimulus.stimulus_metadata or {}
+        return jsonify(dict({field: meta.get(field) for field in AUTO_TAG_FIELDS}, tags=stimulus.tags))
 
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error auto-tagging stimulus: {e}")
         return jsonify({'error': 'Failed to auto-tag stimulus'}), 500
-    
+
+
+def _plan_auto_tag(experiment_id, force):
+    """
+    Sort the stimuli of an experiment (or the library) into those already
+    analyzed, those whose content was analyzed for another stimulus (stats
+    are copied) and the distinct files still to analyze.
+
+    Returns:
+        (targets [(stimulus_id, key)], known {key: stats},
+        pending {key: path}, skipped count, missing stimulus ids)
+    """
+    query = db.session.query(Stimulus.stimulus_id, Stimulus.checksum_sha256, Stimulus.file_path,
+                             Stimulus.stimulus_metadata)
+    if experiment_id:
+        query = query.filter(Stimulus.experiment_id == experiment_id)
+
+    targets, pending, missing = [], {}, []
+    skipped = 0
+    for row in query.all():
+        key, path = _auto_tag_source(row)
+        if not force and _current_pixel_stats(row.stimulus_metadata, key):
+            skipped += 1
+        elif not path or not os.path.isfile(path):
+            missing.append(str(row.stimulus_id))
+        else:
+            targets.append((row.stimulus_id, key))
+            pending.setdefault(key, path)
+
+    known = {}
+    checksums = [key for key in pending if not key.startswith('path:')]
+    if checksums and not force:
+        for checksum, metadata in db.session.query(Stimulus.checksum_sha256, Stimulus.stimulus_metadata).filter(
+                Stimulus.checksum_sha256.in_(checksums)):
+            stats = _current_pixel_stats(metadata, checksum)
+            if stats:
+                known[checksum] = stats
+        for key in known:
+            del pending[key]
+    return targets, known, pending, skipped, missing
+
+
+def _write_auto_tags(results, overwrite):
+    """Apply {stimulus_id: (key, stats)} with one UPDATE, from the stimuli's current metadata and tags."""
+    current = db.session.query(Stimulus.stimulus_id, Stimulus.stimulus_metadata, Stimulus.tags).filter(
+        Stimulus.stimulus_id.in_(list(results))).all()
+    rows = []
+    for stimulus_id, metadata, tags in current:
+        key, stats = results[stimulus_id]
+        patch, new_tags = _auto_tag_update(metadata, tags, stats, key, overwrite)
+        rows.append((stimulus_id, patch, True, new_tags))
+    updated = _apply_stimulus_patches(rows)
+    db.session.commit()
+    return len(updated)
+
+
+def _run_auto_tag(ctx, targets, known, pending, overwrite):
+    """
+    Analyze pending files on the process pool and write results in batches.
+    On cancellation the batches already written are kept.
+    """
+    by_key = {}
+    for stimulus_id, key in targets:
+        by_key.setdefault(key, []).append(stimulus_id)
+
+    start = time.perf_counter()
+    batch, failed = {}, []
+    counts = {'analyzed': 0, 'updated': 0}
+
+    def flush():
+        if batch:
+            try:
+                counts['updated'] += _write_auto_tags(batch, overwrite)
+            except SQLAlchemyError:
+                db.session.rollback()
+                raise
+            batch.clear()
+
+    def add(key, stats):
+        for stimulus_id in by_key.get(key, ()):
+            batch[stimulus_id] = (key, stats)
+        if len(batch) >= AUTO_TAG_BATCH:
+            flush()
+
+    for key, stats in known.items():
+        add(key, stats)
+
+    def on_result(key, stats, error):
+        counts['analyzed'] += 1
+        if error is not None:
+            failed.append({'source': key, 'error': error})
+        else:
+            add(key, stats)
+        ctx.set_progress(counts['analyzed'], len(pending),
+                         {'updated': counts['updated'], 'failed': len(failed)})
+        ctx.check_cancelled()
+
+    ctx.set_progress(0, len(pending))
+    analyze_files(list(pending.items()), workers=AUTO_TAG_WORKERS, on_result=on_result)
+    flush()
+
+    return {
+        'files_analyzed': counts['analyzed'] - len(failed),
+        'stats_reused': len(known),
+        'updated': counts['updated'],
+        'failed': failed,
+        'seconds': round(time.perf_counter() - start, 2),
+    }
+
+
+@app.route('/api/stimuli/auto_tag', methods=['POST'])
+@require_auth
+@require_roles(['admin', 'researcher'])
+def start_auto_tag_job():
+    """Auto-tag the stimuli of an experiment or the whole library as a background job.
+
+    Body:
+      - experiment_id: limit to one experiment (default: all stimuli)
+      - overwrite: replace brightness/hue/curvature_level already set
+        (default false: fill empty fields only); tags are always added
+      - force: analyze again stimuli whose content was already analyzed
+
+    Stimuli are skipped when their checksum_sha256 was already analyzed by
+    the current analyzer; content analyzed for another stimulus is copied,
+    and each distinct file is decoded once. Returns 202 with the job (an
+    identical queued or running job is reused); progress and the summary
+    are served by GET /api/jobs/<job_id>.
+    """
+    try:
+        if not image_stats_available():
+            return jsonify({'error': 'Auto-tagging needs Pillow, which is not installed'}), 503
+
+        data = request.get_json(silent=True) or {}
+        experiment_id = data.get('experiment_id')
+        if experiment_id:
+            experiment = Experiment.query.filter_by(experiment_id=experiment_id).first()
+            if not experiment:
+                return jsonify({'error': 'Experiment not found'}), 404
+            experiment_id = experiment.experiment_id
+
+        params = {'experiment_id': str(experiment_id) if experiment_id else None,
+                  'overwrite': bool(data.get('overwrite', False)),
+                  'force': bool(data.get('force', False))}
+        job_id, created = _enqueue_unique_job('auto_tag', params, experiment_id=experiment_id)
+        if not created:
+            return _job_accepted(job_id)
+        log_audit(
+            'stimuli_auto_tag_started',
+            'stimulus',
+            'Started auto-tagging ' + (f'experiment {experiment_id}' if experiment_id else 'the stimulus library'),
+            dict(params, job_id=job_id),
+            experiment_id=experiment_id
+        )
+        return _job_accepted(job_id)
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error starting auto-tag job: {e}")
+        return jsonify({'error': 'Failed to start auto-tagging'}), 500
+
+
+@job_handler('auto_tag')
+def _auto_tag_job(ctx):
+    """Job: auto-tag an experiment's stimuli or the library."""
+    params = ctx.params
+    targets, known, pending, skipped, missing = _plan_auto_tag(params['experiment_id'], params['force'])
+    summary = {'stimuli': len(targets), 'skipped': skipped, 'missing_files': missing,
+               'files': len(pending), 'stats_reused': len(known)}
+    if targets:
+        summary.update(_run_auto_tag(ctx, targets, known, pending, params['overwrite']))
+    return summary
+
+
 @app.route('/api/stimuli/<stimulus_id>/assign_experiment', methods=['PATCH'])
 @require_auth
 @require_roles(['admin', 'researcher'])
@@ -485,94 +1115,131 @@ def archive_experiment(experiment_id):
         logger.error(f"Error archiving experiment: {e}")
         return jsonify({'error': 'Failed to archive experiment'}), 500
     
-from sqlalchemy import delete as sa_delete
+from sqlalchemy import delete as sa_delete, insert as sa_insert, update as sa_update
 
-@app.route('/api/experiments/<experiment_id>', methods=['DELETE'])
-@require_auth
-@require_roles(['admin', 'researcher'])
-def delete_experiment(experiment_id):
+def _delete_experiment(experiment_id, delete_data):
     """
-    Delete an experiment.
-
-    Query param:
-      - delete_data=1 → delete experiment AND all sessions / choices / stimuli / algorithm_state / audit logs.
-      - delete_data=0 or omitted → only delete experiment row IF there are no sessions; otherwise 400.
+    Delete an experiment row, and with delete_data its sessions, choices,
+    stimuli, algorithm state and audit logs, with FK-safe bulk deletes in
+    one transaction. Commits.
+
+    Raises:
+        LookupError: no such experiment
+        ValueError: it has sessions and delete_data is not set
+    Returns:
+        The deleted experiment's name
     """
-    delete_data_flag = request.args.get('delete_data', '0')
-    delete_data = delete_data_flag in ('1', 'true', 'True', 'yes')
-
-    try:
-        # Load experiment once via ORM so we can verify it exists
-        exp = Experiment.query.filter_by(experiment_id=experiment_id).first()
-        if not exp:
-            return jsonify({'error': 'Experiment not found'}), 404
-
-        # Grab needed info *before* we delete anything
-        exp_name = exp.name
-        session_ids = [s.session_id for s in exp.sessions]
-
-        # If caller didn't explicitly allow data deletion but there are sessions, block it
-        if not delete_data and session_ids:
-            return jsonify({
-                'error': (
-                    'Experiment has existing sessions; delete_data=1 is required to delete it. '
-                    'Use /api/experiments/<id>/archive to hide it instead.'
-                )
-            }), 400
-
-        # ---- Perform FK-safe bulk deletes using Core ----
-
-        if delete_data and session_ids:
-            # 1) Audit log rows tied to those sessions (FK depends on sessions)
-            db.session.execute(
-                sa_delete(AuditLog).where(AuditLog.session_id.in_(session_ids))
-            )
-
-            # 2) Choices linked to sessions
-            db.session.execute(
-                sa_delete(Choice).where(Choice.session_id.in_(session_ids))
-            )
+    # Load experiment once via ORM so we can verify it exists
+    exp = Experiment.query.filter_by(experiment_id=experiment_id).first()
+    if not exp:
+        raise LookupError('Experiment not found')
+
+    # Grab needed info *before* we delete anything
+    exp_name = exp.name
+    session_ids = [s.session_id for s in exp.sessions]
+    blob_refs = [s.blob_sha256 for s in exp.stimuli if s.blob_sha256]
+
+    # If caller didn't explicitly allow data deletion but there are sessions, block it
+    if not delete_data and session_ids:
+        raise ValueError(
+            'Experiment has existing sessions; delete_data=1 is required to delete it. '
+            'Use /api/experiments/<id>/archive to hide it instead.'
+        )
 
-            # 3) AlgorithmState linked to sessions
-            db.session.execute(
-                sa_delete(AlgorithmState).where(AlgorithmState.session_id.in_(session_ids))
-            )
+    # ---- Perform FK-safe bulk deletes using Core ----
 
-            # 4) Sessions themselves
-            db.session.execute(
-                sa_delete(Session).where(Session.session_id.in_(session_ids))
-            )
+    if delete_data and session_ids:
+        # 1) Audit log rows tied to those sessions (FK depends on sessions)
+        db.session.execute(
+            sa_delete(AuditLog).where(AuditLog.session_id.in_(session_ids))
+        )
 
-            # 4b) Choices linked directly to stimuli of this experiment (not tied to a session)
-            db.session.execute(
-                sa_delete(Choice).where(Choice.stimulus_a_id.in_(
-                    db.session.query(Stimulus.stimulus_id).filter(Stimulus.experiment_id == experiment_id)
-                ))
-            )
-            db.session.execute(
-                sa_delete(Choice).where(Choice.stimulus_b_id.in_(
-                    db.session.query(Stimulus.stimulus_id).filter(Stimulus.experiment_id == experiment_id)
-                ))
-            )
+        # 2) Choices linked to sessions
+        db.session.execute(
+            sa_delete(Choice).where(Choice.session_id.in_(session_ids))
+        )
 
-        # 5) Stimuli belonging to this experiment
+        # 3) AlgorithmState linked to sessions
         db.session.execute(
-            sa_delete(Stimulus).where(Stimulus.experiment_id == experiment_id)
+            sa_delete(AlgorithmState).where(AlgorithmState.session_id.in_(session_ids))
         )
 
-        # 6) Any remaining audit log rows tied directly to this experiment
+        # 4) Sessions themselves
         db.session.execute(
-            sa_delete(AuditLog).where(AuditLog.experiment_id == experiment_id)
+            sa_delete(Session).where(Session.session_id.in_(session_ids))
         )
 
-        # 7) Finally, delete the experiment record itself
+        # 4b) Choices linked directly to stimuli of this experiment (not tied to a session)
+        db.session.execute(
+            sa_delete(Choice).where(Choice.stimulus_a_id.in_(
+                db.session.query(Stimulus.stimulus_id).filter(Stimulus.experiment_id == experiment_id)
+            ))
+        )
         db.session.execute(
-            sa_delete(Experiment).where(Experiment.experiment_id == experiment_id)
+            sa_delete(Choice).where(Choice.stimulus_b_id.in_(
+                db.session.query(Stimulus.stimulus_id).filter(Stimulus.experiment_id == experiment_id)
+            ))
         )
 
-        db.session.commit()
+    # 5) Stimuli belonging to this experiment, and their blob references
+    db.session.execute(
+        sa_delete(Stimulus).where(Stimulus.experiment_id == experiment_id)
+    )
+    released_blobs = _release_blobs(blob_refs)
+
+    # 6) Any remaining audit log rows tied directly to this experiment
+    db.session.execute(
+        sa_delete(AuditLog).where(AuditLog.experiment_id == experiment_id)
+    )
+
+    # 7) Finally, delete the experiment record itself
+    db.session.execute(
+        sa_delete(Experiment).where(Experiment.experiment_id == experiment_id)
+    )
+
+    db.session.commit()
+
+    # Blob files no other stimulus references (after the commit, so a
+    # failed delete never loses files still in use)
+    _remove_blob_files(released_blobs)
+
+    # IMPORTANT: do NOT touch `exp` here; it refers to a row that no longer exists.
+    return exp_name
+
+
+@app.route('/api/experiments/<experiment_id>', methods=['DELETE'])
+@require_auth
+@require_roles(['admin', 'researcher'])
+def delete_experiment(experiment_id):
+    """
+    Delete an experiment.
+
+    Query param:
+      - delete_data=1 → delete experiment AND all sessions / choices / stimuli / algorithm_state / audit logs.
+      - delete_data=0 or omitted → only delete experiment row IF there are no sessions; otherwise 400.
+      - async=1 → check the above, then delete in a background job (202 with the job id).
+    """
+    delete_data_flag = request.args.get('delete_data', '0')
+    delete_data = delete_data_flag in ('1', 'true', 'True', 'yes')
+
+    try:
+        if _wants_async():
+            exp = Experiment.query.filter_by(experiment_id=experiment_id).first()
+            if not exp:
+                return jsonify({'error': 'Experiment not found'}), 404
+            if not delete_data and exp.sessions:
+                return jsonify({
+                    'error': (
+                        'Experiment has existing sessions; delete_data=1 is required to delete it. '
+                        'Use /api/experiments/<id>/archive to hide it instead.'
+                    )
+                }), 400
+            return _job_accepted(_enqueue_job(
+                'delete_experiment', {'experiment_id': str(exp.experiment_id), 'delete_data': delete_data},
+                experiment_id=exp.experiment_id))
+
+        exp_name = _delete_experiment(experiment_id, delete_data)
 
-        # IMPORTANT: do NOT touch `exp` here; it refers to a row that no longer exists.
         # If you want to return its name, use exp_name which we captured before deleting.
         return jsonify({
             'success': True,
@@ -581,11 +1248,27 @@ def delete_experiment(experiment_id):
             'experiment_name': exp_name,
         })
 
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         app.logger.exception('Failed to delete experiment')
         return jsonify({'error': f'Failed to delete experiment: {str(e)}'}), 500
 
+
+@job_handler('delete_experiment')
+def _delete_experiment_job(ctx):
+    """Job: delete an experiment (and its data)."""
+    try:
+        exp_name = _delete_experiment(ctx.params['experiment_id'], ctx.params['delete_data'])
+    except Exception:
+        db.session.rollback()
+        raise
+    return {'experiment_id': ctx.params['experiment_id'], 'experiment_name': exp_name,
+            'delete_data': ctx.params['delete_data']}
+
 class Stimulus(db.Model):
     __tablename__ = 'stimuli'
     
@@ -601,16 +1284,19 @@ class Stimulus(db.Model):
     width_px = db.Column(db.Integer)
     height_px = db.Column(db.Integer)
     checksum_sha256 = db.Column(db.String(64))
+    blob_sha256 = db.Column(db.String(64), db.ForeignKey('stimulus_blobs.sha256'))  # NULL for legacy uploads
+    derivatives = db.Column(JSONB)  # variant -> {url, width, height, bytes}; NULL until generated
     stimulus_metadata = db.Column('metadata', JSONB, default={})
-    tags = db.Column(db.ARRAY(db.String))
+    tags = db.Column(ARRAY(db.Text))  # TEXT[], so && and @> filters can use the GIN index
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
     experiment = db.relationship('Experiment', back_populates='stimuli')
     
-    def to_dict(self):
+    def to_dict(self, fields=None):
+        """Serialized stimulus; fields (a subset of STIMULUS_FIELDS) selects sparse output."""
         meta = self.stimulus_metadata or {}
-        return {
+        data = {
             'stimulus_id': str(self.stimulus_id),
             'stimulus_name': self.stimulus_name,
             # alias for GUI code that expects `filename`
@@ -620,6 +1306,10 @@ class Stimulus(db.Model):
             'mime_type': self.mime_type,
             'width_px': self.width_px,
             'height_px': self.height_px,
+            # Downscaled copies; clients fall back to url while they are missing
+            'derivatives': self.derivatives or {},
+            'thumbnail_url': (self.derivatives or {}).get(THUMBNAIL_VARIANT, {}).get('url') or self.url,
+            'srcset': derivative_srcset(self.derivatives, self.url, self.width_px),
             # Flattened metadata fields for the Stimulus Library UI
             'room_type': meta.get('room_type'),
             'curvature_level': meta.get('curvature_level'),
@@ -629,8 +1319,31 @@ class Stimulus(db.Model):
             'tags': self.tags or [],
             'experiment_id': str(self.experiment_id) if self.experiment_id else None,
         }
+        return data if fields is None else {field: data[field] for field in fields}
+
+
+STIMULUS_FIELDS = (
+    'stimulus_id', 'stimulus_name', 'filename', 'url', 'file_size_bytes', 'mime_type', 'width_px',
+    'height_px', 'derivatives', 'thumbnail_url', 'srcset', 'room_type', 'curvature_level', 'brightness',
+    'hue', 'tags', 'experiment_id',
+)
 
 
+class StimulusBlob(db.Model):
+    """A stored stimulus file, shared by every stimulus with the same content."""
+    __tablename__ = 'stimulus_blobs'
+    
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size_bytes = db.Column(db.BigInteger, nullable=False)
+    mime_type = db.Column(db.String(100))
+    width_px = db.Column(db.Integer)
+    height_px = db.Column(db.Integer)
+    
+    # Number of stimuli referencing the blob; removed when it drops to 0
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 
 class Session(db.Model):
     __tablename__ = 'sessions'
@@ -650,6 +1363,11 @@ class Session(db.Model):
     started_at = db.Column(db.DateTime)
     completed_at = db.Column(db.DateTime)
     last_activity_at = db.Column(db.DateTime, default=datetime.utcnow)
+    stop_reason = db.Column(db.String(30))  # max_trials, converged, top_k_stable, ranking_stable, schedule_complete
+    
+    # Schedule-mode sessions: assigned sequence and trial-order permutation seed
+    schedule_sequence = db.Column(db.Integer)
+    schedule_seed = db.Column(db.BigInteger)
     
     total_time_seconds = db.Column(db.Integer, default=0)
     
@@ -679,6 +1397,8 @@ class Session(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'started_at': self.started_at.isoformat() if self.started_at else None,
             'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'stop_reason': self.stop_reason,
+            'schedule_sequence': self.schedule_sequence,
             'total_time_seconds': self.total_time_seconds,
             'attention_check_passed': self.attention_check_passed,
         }
@@ -701,6 +1421,13 @@ class AlgorithmState(db.Model):
     
     state_checksum = db.Column(db.String(64), nullable=False)
     
+    # Initial state of warm-started sessions (NULL = cold prior)
+    prior_mu = db.Column(BYTEA)
+    prior_sigma = db.Column(BYTEA)
+    
+    # Inducing points of GP-model sessions (mu/sigma then hold the inducing-point posterior)
+    inducing_points = db.Column(BYTEA)
+    
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -730,6 +1457,37 @@ class Choice(db.Model):
     
     # Relationships
     session = db.relationship('Session', back_populates='choices')
+    
+    __table_args__ = (
+        db.UniqueConstraint('session_id', 'trial_number', name='unique_trial_per_session'),
+    )
+
+
+class PendingTrial(db.Model):
+    """
+    The pair last served to a session by /next. Repeated /next calls for the
+    same trial return it unchanged; once answered it holds the /choice
+    response, which duplicate submissions of the same pair get back.
+    """
+    __tablename__ = 'pending_trials'
+    
+    session_id = db.Column(UUID(as_uuid=True), db.ForeignKey('sessions.session_id', ondelete='CASCADE'), primary_key=True)
+    
+    trial_number = db.Column(db.Integer, nullable=False)
+    stimulus_a_id = db.Column(UUID(as_uuid=True), db.ForeignKey('stimuli.stimulus_id'), nullable=False)
+    stimulus_b_id = db.Column(UUID(as_uuid=True), db.ForeignKey('stimuli.stimulus_id'), nullable=False)
+    presentation_order = db.Column(db.String(10))
+    pair_token = db.Column(db.Text, nullable=False)
+    
+    issued_at = db.Column(db.DateTime, default=datetime.utcnow)
+    answered_at = db.Column(db.DateTime)
+    result = db.Column(JSONB)  # /choice response once answered
+    
+    def matches(self, pt):
+        """Whether decoded pair_token claims refer to this served pair."""
+        return (self.trial_number == pt.get('trial_number')
+                and str(self.stimulus_a_id) == pt.get('stimulus_a_id')
+                and str(self.stimulus_b_id) == pt.get('stimulus_b_id'))
 
 
 class AuditLog(db.Model):
@@ -753,15 +1511,262 @@ class AuditLog(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 
-# ============================================================================
-# HELPER FUNCTIONS
-# ============================================================================
-
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+class SimulationResult(db.Model):
+    """Cached Monte Carlo curve for one (n_items, epsilon, exploration_weight, noise) cell."""
+    __tablename__ = 'simulation_results'
+    
+    cache_key = db.Column(db.String(200), primary_key=True)
+    
+    n_items = db.Column(db.Integer, nullable=False)
+    epsilon = db.Column(db.Float, nullable=False)
+    exploration_weight = db.Column(db.Float, nullable=False)
+    noise = db.Column(db.Float, nullable=False)
+    max_trials = db.Column(db.Integer, nullable=False)
+    n_subjects = db.Column(db.Integer, nullable=False)
+    
+    summary = db.Column(JSONB, nullable=False)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'params': {
+                'n_items': self.n_items,
+                'epsilon': self.epsilon,
+                'exploration_weight': self.exploration_weight,
+                'noise': self.noise,
+            },
+            'max_trials': self.max_trials,
+            'n_subjects': self.n_subjects,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            **(self.summary or {}),
+        }
 
 
-def calculate_file_checksum(file_path):
+class PopulationPrior(db.Model):
+    """Running population posterior of an experiment's completed sessions (warm-start priors)."""
+    __tablename__ = 'population_priors'
+    
+    experiment_id = db.Column(UUID(as_uuid=True), db.ForeignKey('experiments.experiment_id', ondelete='CASCADE'), primary_key=True)
+    
+    n_items = db.Column(db.Integer, nullable=False)
+    session_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    mean = db.Column(BYTEA, nullable=False)
+    m2 = db.Column(BYTEA, nullable=False)
+    mean_sigma = db.Column(BYTEA, nullable=False)
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_population(self):
+        n = self.n_items
+        return PopulationPosterior.from_arrays(
+            n, self.session_count,
+            deserialize_numpy(self.mean, (n,)),
+            deserialize_numpy(self.m2, (n, n)),
+            deserialize_numpy(self.mean_sigma, (n, n))
+        )
+    
+    def store(self, population):
+        self.n_items = population.n_items
+        self.session_count = population.count
+        self.mean = serialize_numpy(population.mean)
+        self.m2 = serialize_numpy(population.m2)
+        self.mean_sigma = serialize_numpy(population.mean_sigma)
+        self.updated_at = datetime.utcnow()
+
+
+class BootstrapResult(db.Model):
+    """Cached session-bootstrap intervals of an experiment's pooled ranking."""
+    __tablename__ = 'bootstrap_results'
+    
+    cache_key = db.Column(db.String(200), primary_key=True)
+    experiment_id = db.Column(UUID(as_uuid=True), db.ForeignKey('experiments.experiment_id', ondelete='CASCADE'), nullable=False)
+    
+    model = db.Column(db.String(30), nullable=False)
+    n_replicates = db.Column(db.Integer, nullable=False)
+    confidence = db.Column(db.Float, nullable=False)
+    seed = db.Column(db.Integer, nullable=False)
+    n_choices = db.Column(db.Integer, nullable=False)
+    
+    summary = db.Column(JSONB, nullable=False)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ExperimentSchedule(db.Model):
+    """Precomputed pair schedule of a schedule-mode experiment (see schedules.py)."""
+    __tablename__ = 'experiment_schedules'
+    
+    experiment_id = db.Column(UUID(as_uuid=True), db.ForeignKey('experiments.experiment_id', ondelete='CASCADE'), primary_key=True)
+    
+    design = db.Column(db.String(30), nullable=False)
+    n_sequences = db.Column(db.Integer, nullable=False)
+    trials_per_sequence = db.Column(db.Integer, nullable=False)
+    shuffle = db.Column(db.Boolean, default=True)
+    
+    # (n_rounds, n_items // 2, 2) round-robin rounds of stimulus indices
+    rounds = db.Column(BYTEA, nullable=False)
+    index_dtype = db.Column(db.String(10), nullable=False)
+    # (n_sequences, rounds per sequence) int32 round order of each sequence
+    round_orders = db.Column(BYTEA, nullable=False)
+    # Stimulus id of each index, frozen at publish time
+    stimulus_ids = db.Column(JSONB, nullable=False)
+    
+    # Sequence of the next session (taken modulo n_sequences)
+    next_sequence = db.Column(db.Integer, default=0)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_schedule(self):
+        rounds = np.frombuffer(self.rounds, dtype=self.index_dtype)
+        return PairSchedule(rounds.reshape(-1, len(self.stimulus_ids) // 2, 2),
+                            np.frombuffer(self.round_orders, dtype=np.int32).reshape(self.n_sequences, -1),
+                            self.trials_per_sequence)
+
+
+# ============================================================================
+# HELPER FUNCTIONS
+# ============================================================================
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def _lock_blob(sha256):
+    """Transaction-scoped advisory lock serializing reference changes and file removal of a blob."""
+    db.session.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': int(sha256[:15], 16)})
+
+
+def blob_url(sha256, filename=''):
+    """Permanent URL of a blob; the extension only sets the served Content-Type."""
+    return f"{BLOB_URL_BASE}/{sha256}{os.path.splitext(filename)[1].lower()}"
+
+
+def _save_upload(file):
+    """
+    Store an uploaded file in the blob store and take a reference on its
+    blob. The reference commits with the caller's transaction.
+
+    Returns:
+        (secure filename, ingest result with path, url, size_bytes, sha256,
+        width and height)
+    """
+    filename = secure_filename(file.filename)
+    tmp_path, ingested = blob_store.stage(file.stream)
+    try:
+        sha256 = ingested['sha256']
+        _lock_blob(sha256)
+        db.session.execute(
+            pg_insert(StimulusBlob.__table__).values(
+                sha256=sha256,
+                size_bytes=ingested['size_bytes'],
+                mime_type=file.content_type,
+                width_px=ingested['width'],
+                height_px=ingested['height'],
+                ref_count=1,
+                created_at=datetime.utcnow()
+            ).on_conflict_do_update(
+                index_elements=['sha256'],
+                set_={'ref_count': StimulusBlob.__table__.c.ref_count + 1}
+            )
+        )
+        ingested['path'] = blob_store.commit(tmp_path, sha256)
+    except BaseException:
+        discard(tmp_path)
+        raise
+    ingested['url'] = blob_url(sha256, filename)
+    return filename, ingested
+
+
+def _release_blobs(sha256s):
+    """
+    Drop one blob reference per entry (a stimulus being deleted) and delete
+    the rows of blobs left unreferenced. Commits with the caller's
+    transaction; pass the result to _remove_blob_files after the commit.
+
+    Returns:
+        Digests of the deleted blob rows
+    """
+    counts = Counter(sha for sha in sha256s if sha)
+    if not counts:
+        return []
+    by_count = {}
+    for sha, n in counts.items():
+        by_count.setdefault(n, []).append(sha)
+    for n, group in by_count.items():
+        db.session.execute(
+            sa_update(StimulusBlob).where(StimulusBlob.sha256.in_(group))
+            .values(ref_count=StimulusBlob.ref_count - n)
+            .execution_options(synchronize_session=False)
+        )
+    return db.session.execute(
+        sa_delete(StimulusBlob).where(StimulusBlob.sha256.in_(list(counts)), StimulusBlob.ref_count <= 0)
+        .returning(StimulusBlob.sha256)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+
+
+def _remove_blob_files(sha256s):
+    """Remove files of released blobs, unless an upload re-referenced them meanwhile."""
+    removed = 0
+    for sha in sha256s:
+        _lock_blob(sha)
+        if db.session.get(StimulusBlob, sha) is None and blob_store.delete(sha):
+            removed += 1
+    db.session.commit()
+    return removed
+
+
+def _store_blob_derivatives(sha256, derivatives, error):
+    """DerivativePool callback: record a blob's derivatives on every stimulus using it (admin pool)."""
+    if error is not None:
+        logger.error(f"Generating derivatives of blob {sha256} failed: {error}")
+        return
+    with app.app_context():
+        g.db_pool = 'admin'
+        db.session.execute(
+            sa_update(Stimulus).where(Stimulus.blob_sha256 == sha256)
+            .values(derivatives=with_urls(derivatives, blob_url(sha256)))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+
+derivative_pool = DerivativePool(DERIVATIVE_WORKERS, _store_blob_derivatives)
+
+
+def _queue_derivatives(sha256s):
+    """
+    Provide derivatives for newly committed stimuli of the given blobs:
+    copied from another stimulus of the same blob if it has them already,
+    generated in the background otherwise. Failures are logged only; the
+    stimuli are served as originals meanwhile.
+    """
+    sha256s = set(filter(None, sha256s))
+    if not sha256s or not derivatives_available():
+        return
+    try:
+        known = dict(
+            db.session.query(Stimulus.blob_sha256, Stimulus.derivatives)
+            .filter(Stimulus.blob_sha256.in_(sha256s), Stimulus.derivatives.isnot(None))
+            .distinct(Stimulus.blob_sha256).all()
+        )
+        for sha256, derivatives in known.items():
+            db.session.execute(
+                sa_update(Stimulus).where(Stimulus.blob_sha256 == sha256, Stimulus.derivatives.is_(None))
+                .values(derivatives=derivatives)
+                .execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+        for sha256 in sha256s - known.keys():
+            derivative_pool.submit(sha256, blob_store.path_for(sha256))
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to queue stimulus derivatives: {e}")
+
+
+def calculate_file_checksum(file_path):
     """Calculate SHA256 checksum of file."""
     sha256_hash = hashlib.sha256()
     with open(file_path, "rb") as f:
@@ -771,8 +1776,8 @@ def calculate_file_checksum(file_path):
 
 
 def log_audit(event_type, event_category, description, details=None, user_id=None, 
-              experiment_id=None, session_id=None, severity='info'):
-    """Log audit event to database."""
+              experiment_id=None, session_id=None, severity='info', commit=True):
+    """Log audit event to database. With commit=False the event is only added to the caller's transaction."""
     try:
         audit = AuditLog(
             user_id=user_id,
@@ -782,12 +1787,13 @@ def log_audit(event_type, event_category, description, details=None, user_id=Non
             event_category=event_category,
             description=description,
             details=details or {},
-            ip_address=request.remote_addr,
-            user_agent=request.headers.get('User-Agent'),
+            ip_address=request.remote_addr if has_request_context() else None,
+            user_agent=request.headers.get('User-Agent') if has_request_context() else None,
             severity=severity
         )
         db.session.add(audit)
-        db.session.commit()
+        if commit:
+            db.session.commit()
     except Exception as e:
         logger.error(f"Failed to log audit: {e}")
 
@@ -823,45 +1829,567 @@ def _is_attention_stimulus(stimulus):
 
 
 def _evaluate_session_quality(session, experiment):
-    """Evaluate session quality based on attention checks and trial count."""
-    try:
-        excl = (experiment.experiment_metadata or {}).get('exclusion', {})
-        attention_min_rate = float(excl.get('attention_min_rate', 0.75))
-        min_trials = int(excl.get('min_trials', experiment.min_trials or 0))
-        choices = Choice.query.filter_by(session_id=session.session_id).all() or []
-        att_total = 0
-        att_correct = 0
-        
-        for c in choices:
-            a = Stimulus.query.filter_by(stimulus_id=c.stimulus_a_id).first()
-            b = Stimulus.query.filter_by(stimulus_id=c.stimulus_b_id).first()
-            a_mark = _is_attention_stimulus(a)
-            b_mark = _is_attention_stimulus(b)
-            
-            if a_mark or b_mark:
-                att_total += 1
-                correct_id = a.stimulus_id if a_mark else b.stimulus_id
-                if str(c.chosen_stimulus_id) == str(correct_id):
-                    att_correct += 1
-        
-        att_rate = (att_correct/att_total) if att_total else 1.0
-        session.attention_check_passed = (att_rate >= attention_min_rate)
-        
-        reasons = []
-        if session.trials_completed < min_trials:
-            reasons.append(f'low_trials:{session.trials_completed}<{min_trials}')
-        if att_total and not session.attention_check_passed:
-            reasons.append(f'low_attention:{att_rate:.2f}<{attention_min_rate:.2f}')
-        
-        if reasons:
-            log_audit('session_exclusion', 'quality', 'Session flagged for exclusion',
-                      {'reasons': reasons, 'attention_rate': att_rate},
-                      session_id=session.session_id, experiment_id=session.experiment_id, 
-                      severity='warning')
+    """Evaluate session quality based on attention checks and trial count.
+
+    Only adds to the caller's transaction; the caller commits or rolls back.
+    """
+    excl = (experiment.experiment_metadata or {}).get('exclusion', {})
+    attention_min_rate = float(excl.get('attention_min_rate', 0.75))
+    min_trials = int(excl.get('min_trials', experiment.min_trials or 0))
+    choices = Choice.query.filter_by(session_id=session.session_id).all() or []
+    att_total = 0
+    att_correct = 0
+    
+    for c in choices:
+        a = Stimulus.query.filter_by(stimulus_id=c.stimulus_a_id).first()
+        b = Stimulus.query.filter_by(stimulus_id=c.stimulus_b_id).first()
+        a_mark = _is_attention_stimulus(a)
+        b_mark = _is_attention_stimulus(b)
         
+        if a_mark or b_mark:
+            att_total += 1
+            correct_id = a.stimulus_id if a_mark else b.stimulus_id
+            if str(c.chosen_stimulus_id) == str(correct_id):
+                att_correct += 1
+    
+    att_rate = (att_correct/att_total) if att_total else 1.0
+    session.attention_check_passed = (att_rate >= attention_min_rate)
+    
+    reasons = []
+    if session.trials_completed < min_trials:
+        reasons.append(f'low_trials:{session.trials_completed}<{min_trials}')
+    if att_total and not session.attention_check_passed:
+        reasons.append(f'low_attention:{att_rate:.2f}<{attention_min_rate:.2f}')
+    
+    if reasons:
+        log_audit('session_exclusion', 'quality', 'Session flagged for exclusion',
+                  {'reasons': reasons, 'attention_rate': att_rate},
+                  session_id=session.session_id, experiment_id=session.experiment_id, 
+                  severity='warning', commit=False)
+
+
+def _evaluate_experiment_quality(experiment, on_session=None):
+    """Re-evaluate the quality of every completed session of an experiment."""
+    sessions = Session.query.filter_by(experiment_id=experiment.experiment_id, status='complete') \
+                            .order_by(Session.created_at.asc()).all()
+    for n, session in enumerate(sessions, start=1):
+        _evaluate_session_quality(session, experiment)
         db.session.commit()
+        if on_session:
+            on_session(n, len(sessions))
+    passed = sum(1 for session in sessions if session.attention_check_passed)
+    return {'sessions': len(sessions), 'attention_passed': passed, 'attention_failed': len(sessions) - passed}
+
+
+@app.route('/api/experiments/<experiment_id>/evaluate_quality', methods=['POST'])
+@require_auth
+@require_roles(['admin', 'researcher'])
+def evaluate_experiment_quality(experiment_id):
+    """Re-run attention-check and trial-count evaluation of all completed sessions
+    (e.g. after changing the exclusion settings). ?async=1 runs it as a background job."""
+    try:
+        experiment = Experiment.query.filter_by(experiment_id=experiment_id).first()
+        if not experiment:
+            return jsonify({'error': 'Experiment not found'}), 404
+        if _wants_async():
+            return _job_accepted(_enqueue_job(
+                'evaluate_quality', {'experiment_id': str(experiment.experiment_id)},
+                experiment_id=experiment.experiment_id))
+        return jsonify(dict(_evaluate_experiment_quality(experiment), success=True))
     except Exception as e:
-        logger.error(f"Quality evaluation error: {e}")
+        db.session.rollback()
+        logger.error(f"Error evaluating session quality: {e}")
+        return jsonify({'error': 'Failed to evaluate session quality'}), 500
+
+
+@job_handler('evaluate_quality')
+def _evaluate_quality_job(ctx):
+    """Job: re-evaluate session quality of an experiment."""
+    experiment = Experiment.query.filter_by(experiment_id=ctx.params['experiment_id']).first()
+    if not experiment:
+        raise LookupError('Experiment not found')
+
+    def on_session(n, total):
+        ctx.set_progress(n, total)
+        ctx.check_cancelled()
+
+    return _evaluate_experiment_quality(experiment, on_session)
+
+
+def _build_selector(experiment, session=None):
+    """Pair selector for an experiment.
+
+    experiment_metadata['selection'] picks the strategy and its parameters,
+    e.g. {'strategy': 'eig', 'time_budget_ms': 50} for anytime EIG,
+    {'threads': 4} for chunked multi-threaded scoring or
+    {'strategy': 'thompson', 'top_k': 3}. The default scores every pair.
+    Experiments with experiment_metadata['model'] = {'type': 'gp', ...} use
+    the GP model's own selector. A configured Thompson seed is mixed with
+    the session and its next trial, so selections stay reproducible without
+    repeating the same posterior sample on every trial.
+    """
+    gp = gp_config(experiment.experiment_metadata)
+    if gp is not None:
+        return GPAdaptiveSelector(epsilon=experiment.epsilon,
+                                  exploration_weight=experiment.exploration_weight,
+                                  n_candidates=int(gp['n_candidates']))
+    selection = (experiment.experiment_metadata or {}).get('selection') or {}
+    seed_entropy = (session.session_id.int, session.current_trial + 1) if session is not None else None
+    return selector_from_config(selection, epsilon=experiment.epsilon,
+                                exploration_weight=experiment.exploration_weight,
+                                seed_entropy=seed_entropy)
+
+
+# GP feature matrices per experiment, valid for the stimulus ids (in index
+# order) and the experiment's updated_at they were built for. Metadata
+# edits bump updated_at, which invalidates entries in every API process.
+_feature_cache = OrderedDict()
+_feature_cache_lock = threading.Lock()
+FEATURE_CACHE_SIZE = int(os.environ.get('FEATURE_CACHE_SIZE', 64))
+
+
+def _stimulus_features(experiment, stimuli_list):
+    """GP feature matrix of stimuli (flattened metadata plus tags), in index order."""
+    experiment_id = experiment.experiment_id
+    key = (tuple(s.stimulus_id for s in stimuli_list), experiment.updated_at)
+    with _feature_cache_lock:
+        entry = _feature_cache.get(experiment_id)
+        if entry is not None and entry[0] == key:
+            _feature_cache.move_to_end(experiment_id)
+            return entry[1]
+    X, _ = build_feature_matrix([dict(s.stimulus_metadata or {}, tags=s.tags or [])
+                                 for s in stimuli_list])
+    X.setflags(write=False)  # shared between requests
+    with _feature_cache_lock:
+        _feature_cache[experiment_id] = (key, X)
+        _feature_cache.move_to_end(experiment_id)
+        while len(_feature_cache) > FEATURE_CACHE_SIZE:
+            _feature_cache.popitem(last=False)
+    return X
+
+
+def _invalidate_stimulus_features(experiment_ids):
+    """
+    Invalidate cached feature matrices of experiments whose stimulus
+    metadata changed, by bumping their updated_at in the caller's
+    transaction (seen by every API process) and dropping local entries.
+    """
+    experiment_ids = [e for e in set(experiment_ids) if e is not None]
+    if not experiment_ids:
+        return
+    db.session.execute(
+        sa_update(Experiment).where(Experiment.experiment_id.in_(experiment_ids))
+        .values(updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    with _feature_cache_lock:
+        for experiment_id in experiment_ids:
+            _feature_cache.pop(experiment_id, None)
+
+
+def _new_gp_state(experiment, stimuli_list, config):
+    return GPPreferenceState(_stimulus_features(experiment, stimuli_list),
+                             n_inducing=int(config['n_inducing']),
+                             lengthscale=float(config['lengthscale']),
+                             prior_variance=experiment.prior_variance)
+
+
+def _load_gp_state(session, experiment, stimuli_list, record, config, selector):
+    """GP state of a session.
+
+    If the feature encoding changed shape since the session started (e.g. a
+    new room_type or tag was added to the library), the stored inducing
+    points no longer fit; the state is then rebuilt from the session's
+    recorded choices.
+    """
+    features = _stimulus_features(experiment, stimuli_list)
+    m, d = len(record.mu) // 8, features.shape[1]
+
+    if record.inducing_points is not None and len(record.inducing_points) == 8 * m * d:
+        state = GPPreferenceState(features, lengthscale=float(config['lengthscale']),
+                                  prior_variance=experiment.prior_variance,
+                                  inducing_points=deserialize_numpy(record.inducing_points, (m, d)))
+        state.mu = deserialize_numpy(record.mu, (m,))
+        state.Sigma = deserialize_numpy(record.sigma, (m, m))
+        state.load_comparisons(deserialize_numpy(record.comparison_matrix, (-1, 3)))
+        return state
+
+    logger.warning(f"Stimulus features of session {session.session_id} changed; "
+                   f"rebuilding GP state from recorded choices")
+    state = _new_gp_state(experiment, stimuli_list, config)
+    index = {s.stimulus_id: i for i, s in enumerate(stimuli_list)}
+    for c in Choice.query.filter_by(session_id=session.session_id).order_by(Choice.trial_number):
+        a, b, winner = index.get(c.stimulus_a_id), index.get(c.stimulus_b_id), index.get(c.chosen_stimulus_id)
+        if a is not None and b is not None and winner is not None:
+            selector.update_beliefs(state, a, b, winner)
+    return state
+
+
+def _load_session_state(session, experiment, stimuli_list, record, selector):
+    """Deserialize a session's algorithm state for the experiment's model."""
+    config = gp_config(experiment.experiment_metadata)
+    if config is not None:
+        return _load_gp_state(session, experiment, stimuli_list, record, config, selector)
+
+    n_items = len(stimuli_list)
+    state = BayesianPreferenceState(n_items)
+    state.mu = deserialize_numpy(record.mu, (n_items,))
+    state.Sigma = deserialize_numpy(record.sigma, (n_items, n_items))
+    state.comparison_matrix = deserialize_numpy(record.comparison_matrix, (n_items, n_items))
+    
+    # A cached factor is downdated along with Sigma
+    state.cholesky_factor = _get_cached_cholesky(session.session_id, record.state_checksum)
+    return state
+
+
+def _store_session_state(session, record, state):
+    """Serialize a session's algorithm state into its algorithm_state row."""
+    record.mu = serialize_numpy(state.mu)
+    record.sigma = serialize_numpy(state.Sigma)
+    if isinstance(state, GPPreferenceState):
+        record.comparison_matrix = serialize_numpy(state.comparisons_array())
+        record.inducing_points = serialize_numpy(state.inducing_points)
+    else:
+        record.comparison_matrix = serialize_numpy(state.comparison_matrix)
+    record.state_checksum = compute_state_checksum(state.mu, state.Sigma)
+    _cache_cholesky(session.session_id, record.state_checksum, getattr(state, 'cholesky_factor', None))
+
+
+def _warm_start_prior(experiment, n_items):
+    """(mu0, Sigma0) from the population posterior, or None for a cold start.
+
+    Enabled per experiment with experiment_metadata['warm_start'] =
+    {'enabled': true, 'shrinkage': 0.5, 'inflation': 1.5, 'min_sessions': 20}.
+    """
+    config = warm_start_config(experiment.experiment_metadata)
+    if not config.get('enabled'):
+        return None
+    record = db.session.get(PopulationPrior, experiment.experiment_id)
+    if record is None or record.n_items != n_items:
+        return None
+    return warm_start_prior(record.to_population(), config, experiment.prior_variance)
+
+
+def _add_to_population_prior(session, experiment, mu, Sigma):
+    """Fold a completed session into the experiment's population posterior.
+
+    Only done while warm start is enabled, and not for sessions that failed
+    attention checks. The row is locked so concurrent completions serialize.
+    Commits with the caller's transaction.
+    """
+    if not warm_start_config(experiment.experiment_metadata).get('enabled'):
+        return
+    if session.attention_check_passed is False or gp_config(experiment.experiment_metadata) is not None:
+        return
+
+    n_items = len(mu)
+    record = PopulationPrior.query.filter_by(experiment_id=experiment.experiment_id) \
+        .with_for_update().first()
+    if record is None or record.n_items != n_items:
+        if record is None:
+            record = PopulationPrior(experiment_id=experiment.experiment_id)
+            db.session.add(record)
+        population = PopulationPosterior(n_items)
+    else:
+        population = record.to_population()
+
+    population.update(np.asarray(mu, dtype=float), np.asarray(Sigma, dtype=float))
+    record.store(population)
+
+
+def _selection_config_error(metadata):
+    """Return an error message if experiment_metadata['selection'], ['stopping'], ['model'] or ['schedule'] is unusable, else None."""
+    try:
+        selector_from_config((metadata or {}).get('selection'))
+    except (ValueError, TypeError) as e:
+        return f'Invalid experiment_metadata.selection: {e}'
+    try:
+        validate_stopping_config((metadata or {}).get('stopping'))
+    except (ValueError, TypeError) as e:
+        return f'Invalid experiment_metadata.stopping: {e}'
+    try:
+        gp = gp_config(metadata)
+    except (ValueError, TypeError) as e:
+        return f'Invalid experiment_metadata.model: {e}'
+    try:
+        validate_schedule_config((metadata or {}).get('schedule'))
+    except (ValueError, TypeError) as e:
+        return f'Invalid experiment_metadata.schedule: {e}'
+    if gp is not None and (metadata or {}).get('schedule'):
+        return 'experiment_metadata.schedule cannot be combined with a GP model'
+    return None
+
+
+def _complete_session(session, experiment, bayesian_state, reason):
+    """Mark a session complete with its stop reason. Commits with the caller's transaction.
+
+    The session is flushed, not committed, so the final choice, the completion,
+    its quality flags and the population prior update are saved together. On
+    failure the transaction is rolled back and the error re-raised.
+    """
+    try:
+        session.status = 'complete'
+        session.completed_at = datetime.utcnow()
+        session.stop_reason = reason
+        _evaluate_session_quality(session, experiment)
+        if bayesian_state is not None:
+            _add_to_population_prior(session, experiment, bayesian_state.mu, bayesian_state.Sigma)
+        db.session.flush()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+# Per-process LRU of Cholesky factors for sampling selectors:
+# session_id -> (state_checksum, factor). A factor is only reused when the
+# stored state still has the checksum it was computed for.
+CHOLESKY_CACHE_BYTES = int(os.environ.get('CHOLESKY_CACHE_BYTES', 256 * 1024 * 1024))
+_cholesky_cache = OrderedDict()
+_cholesky_cache_lock = threading.Lock()
+
+
+def _get_cached_cholesky(session_id, checksum):
+    with _cholesky_cache_lock:
+        entry = _cholesky_cache.get(session_id)
+        if entry is None or entry[0] != checksum:
+            return None
+        _cholesky_cache.move_to_end(session_id)
+        return entry[1].copy()
+
+
+def _cache_cholesky(session_id, checksum, factor):
+    if factor is None or factor.nbytes > CHOLESKY_CACHE_BYTES:
+        return
+    with _cholesky_cache_lock:
+        _cholesky_cache[session_id] = (checksum, factor)
+        _cholesky_cache.move_to_end(session_id)
+        total = sum(f.nbytes for _, f in _cholesky_cache.values())
+        while total > CHOLESKY_CACHE_BYTES:
+            _, (_, evicted) = _cholesky_cache.popitem(last=False)
+            total -= evicted.nbytes
+
+
+# Per-process cache of published schedules: experiment_id -> (PairSchedule, stimulus ids).
+# A schedule is never regenerated once published, so entries do not go stale.
+SCHEDULE_CACHE_SIZE = int(os.environ.get('SCHEDULE_CACHE_SIZE', 32))
+_schedule_cache = OrderedDict()
+_schedule_cache_lock = threading.Lock()
+
+
+def _get_schedule(experiment_id):
+    with _schedule_cache_lock:
+        entry = _schedule_cache.get(experiment_id)
+        if entry is not None:
+            _schedule_cache.move_to_end(experiment_id)
+            return entry
+    record = ExperimentSchedule.query.filter_by(experiment_id=experiment_id).first()
+    if record is None:
+        return None
+    entry = (record.to_schedule(), record.stimulus_ids)
+    with _schedule_cache_lock:
+        _schedule_cache[experiment_id] = entry
+        while len(_schedule_cache) > SCHEDULE_CACHE_SIZE:
+            _schedule_cache.popitem(last=False)
+    return entry
+
+
+def _scheduled_pair(session, trial=None):
+    """
+    Stimulus ids of a trial of the session (0-based, default: the current
+    one), in presentation order, and the presentation order relative to the
+    stimulus index order.
+
+    Raises:
+        LookupError: if the experiment has no stored schedule
+    """
+    schedule = _get_schedule(session.experiment_id)
+    if schedule is None:
+        raise LookupError('Experiment schedule not found')
+    pairs, stimulus_ids = schedule
+    trial = session.current_trial if trial is None else trial
+    position = permuted_position(trial, pairs.trials_per_sequence, session.schedule_seed)
+    a, b = pairs.pair(session.schedule_sequence, position)
+    return stimulus_ids[a], stimulus_ids[b], 'AB' if a < b else 'BA'
+
+
+# Per-process cache of pooled rankings: (experiment_id, model) ->
+# (PooledRanking, watermark, stimulus ids). The watermark is the
+# (choice count, newest choice timestamp) the ranking covers.
+_ranking_cache = RankingCache(int(os.environ.get('RANKING_CACHE_SIZE', 64)))
+
+
+def _experiment_choice_query(experiment_id, *columns):
+    return db.session.query(*columns) \
+        .join(Session, Choice.session_id == Session.session_id) \
+        .filter(Session.experiment_id == experiment_id)
+
+
+def _load_pooled_choices(experiment_id, index, since=None):
+    """Winner/loser stimulus indices of an experiment's choices (newer than `since` if given).
+
+    Returns:
+        (winners, losers, rows, newest): rows counts every choice read,
+        including ones whose stimuli are no longer in the experiment
+    """
+    query = _experiment_choice_query(experiment_id, Choice.stimulus_a_id, Choice.stimulus_b_id,
+                                     Choice.chosen_stimulus_id, Choice.timestamp)
+    if since is not None:
+        query = query.filter(Choice.timestamp > since)
+
+    winners, losers = [], []
+    rows, newest = 0, since
+    for a_id, b_id, chosen_id, ts in query.yield_per(10000):
+        rows += 1
+        if ts is not None and (newest is None or ts > newest):
+            newest = ts
+        a, b = index.get(a_id), index.get(b_id)
+        if a is None or b is None:
+            continue
+        winners.append(a if chosen_id == a_id else b)
+        losers.append(b if chosen_id == a_id else a)
+    return np.array(winners, dtype=np.int64), np.array(losers, dtype=np.int64), rows, newest
+
+
+def _get_pooled_ranking(experiment, model):
+    """Pooled ranking for an experiment, refreshed from the choices recorded since its watermark.
+
+    Returns:
+        (ranking, stimuli_list, cached): cached is True when no new choices
+        arrived since the last fit
+    """
+    stimuli_list = sorted(experiment.stimuli, key=lambda s: s.display_order or 0)
+    item_ids = tuple(s.stimulus_id for s in stimuli_list)
+    index = {stimulus_id: i for i, stimulus_id in enumerate(item_ids)}
+    key = (experiment.experiment_id, model)
+
+    # Refreshes of one experiment and model are serialized; the cached
+    # ranking is never modified, so readers need no lock
+    with _ranking_cache.refresh_lock(key):
+        count, newest = _experiment_choice_query(
+            experiment.experiment_id, db.func.count(Choice.choice_id), db.func.max(Choice.timestamp)).one()
+
+        entry = _ranking_cache.get(key)
+        if entry is not None and entry[2] == item_ids and entry[1] == (count, newest):
+            return entry[0], stimuli_list, True
+
+        ranking = None
+        if entry is not None and entry[2] == item_ids and entry[1][1] is not None \
+                and count > entry[1][0]:
+            cached, (cached_count, cached_newest), _ = entry
+            winners, losers, rows, loaded_newest = _load_pooled_choices(
+                experiment.experiment_id, index, since=cached_newest)
+            # Choices committed late with an older timestamp are not picked up
+            # incrementally; fall back to a full rebuild when the counts disagree
+            if cached_count + rows >= count:
+                ranking = cached.copy()
+                ranking.add_choices(winners, losers)
+                watermark = (cached_count + rows, loaded_newest)
+
+        if ranking is None:
+            ranking = PooledRanking(len(item_ids), model)
+            winners, losers, rows, loaded_newest = _load_pooled_choices(experiment.experiment_id, index)
+            ranking.add_choices(winners, losers)
+            watermark = (rows, loaded_newest)
+
+        ranking.refit()
+        _ranking_cache.put(key, ranking, watermark, item_ids)
+        return ranking, stimuli_list, False
+
+
+def _job_queue_engine():
+    """
+    The database engine, also on threads without an app context: worker
+    threads claim and heartbeat jobs outside the handlers' app context.
+    Inside requests and job handlers, the engine of their route class.
+    """
+    if not has_app_context():
+        with app.app_context():
+            return db.engine
+    return db.engines.get(g.get('db_pool'), db.engine)
+
+
+# Heavy admin operations run as durable jobs on the job worker pool
+job_queue = JobQueue(_job_queue_engine, JOB_ARTIFACT_DIR, redis_url=JOB_QUEUE_REDIS_URL)
+
+
+@contextmanager
+def job_app_context():
+    """App context for job handlers: queries use the analytics connection pool."""
+    with app.app_context():
+        g.db_pool = 'analytics'
+        yield
+
+
+def _wants_async():
+    return request.args.get('async', '').lower() in ('1', 'true', 'yes')
+
+
+def _enqueue_job(kind, params, experiment_id=None, job_id=None):
+    """Queue a job for the request's user. Returns its id."""
+    user = getattr(request, 'user', None) or {}
+    return job_queue.enqueue(kind, params, job_id=job_id, created_by=user.get('sub'),
+                             experiment_id=experiment_id)
+
+
+def _job_accepted(job_id, **extra):
+    """202 response pointing at a job's status."""
+    return jsonify(dict({
+        'success': True,
+        'job_id': job_id,
+        'status_url': f'/api/jobs/{job_id}'
+    }, **extra)), 202
+
+
+def _enqueue_unique_job(kind, params, experiment_id=None):
+    """
+    Queue a job for the request's user unless an identical one (same kind
+    and params) is queued or running. Returns (job_id, created).
+    """
+    user = getattr(request, 'user', None) or {}
+    return job_queue.enqueue_unique(kind, params, created_by=user.get('sub'), experiment_id=experiment_id)
+
+
+BOOTSTRAP_WORKERS = int(os.environ.get('BOOTSTRAP_WORKERS', os.cpu_count() or 1))
+
+
+def _load_session_choices(experiment_id, index):
+    """Session number, winner and loser stimulus indices of an experiment's choices."""
+    query = _experiment_choice_query(experiment_id, Choice.session_id, Choice.stimulus_a_id,
+                                     Choice.stimulus_b_id, Choice.chosen_stimulus_id)
+    session_numbers = {}
+    sessions, winners, losers = [], [], []
+    for session_id, a_id, b_id, chosen_id in query.yield_per(10000):
+        a, b = index.get(a_id), index.get(b_id)
+        if a is None or b is None:
+            continue
+        sessions.append(session_numbers.setdefault(session_id, len(session_numbers)))
+        winners.append(a if chosen_id == a_id else b)
+        losers.append(b if chosen_id == a_id else a)
+    return (np.array(sessions, dtype=np.int64), np.array(winners, dtype=np.int64),
+            np.array(losers, dtype=np.int64))
+
+
+def _bootstrap_payload(summary, stimuli):
+    """JSON form of a bootstrap summary; stimuli is [(stimulus_id, stimulus_name)] in index order."""
+    payload = {k: summary[k] for k in ('replicates', 'confidence', 'n_sessions', 'n_choices', 'elapsed_s')
+               if k in summary}
+    if not summary.get('replicates'):
+        payload['items'] = []
+        return payload
+
+    center = summary['scores'] if 'scores' in summary else summary['median']
+    order = np.argsort(-center, kind='stable')
+    payload['items'] = [{
+        'rank': rank + 1,
+        'stimulus_id': stimuli[i][0],
+        'stimulus_name': stimuli[i][1],
+        'score': float(center[i]),
+        'lower': float(summary['lower'][i]),
+        'median': float(summary['median'][i]),
+        'upper': float(summary['upper'][i]),
+        'rank_probabilities': [round(float(p), 6) for p in summary['rank_probabilities'][i]],
+    } for rank, i in enumerate(order)]
+    return payload
 
 
 # ============================================================================
@@ -899,6 +2427,28 @@ def health_check():
     })
 
 
+@app.route('/api/metrics/bulkheads', methods=['GET'])
+@require_auth
+@require_roles(['admin'])
+def get_bulkhead_metrics():
+    """
+    Current allocation of this API process: per route class the concurrency
+    limit, active and waiting requests, admission/rejection counters and its
+    connection pool; plus the subject latency SLO and whether non-critical
+    classes are being shed.
+    """
+    payload = bulkheads.snapshot()
+    for route_class, metrics in payload['classes'].items():
+        pool = db.engines[None if route_class == 'subject' else route_class].pool
+        metrics['db_pool'] = {
+            'size': pool.size() if hasattr(pool, 'size') else None,
+            'checked_out': pool.checkedout() if hasattr(pool, 'checkedout') else None,
+            'overflow': pool.overflow() if hasattr(pool, 'overflow') else None,
+        }
+    payload['pid'] = os.getpid()
+    return jsonify(payload)
+
+
 @app.route('/api/experiments', methods=['POST'])
 @require_auth
 @require_roles(['admin', 'researcher'])
@@ -915,6 +2465,10 @@ def create_experiment():
             if field not in data:
                 return jsonify({'error': f'Missing required field: {field}'}), 400
 
+        selection_error = _selection_config_error(data.get('experiment_metadata'))
+        if selection_error:
+            return jsonify({'error': selection_error}), 400
+
         # --- NEW: get or create a dev user based on the JWT ---
         payload = getattr(request, "user", {}) or {}
         sub = payload.get("sub", "dev-user")
@@ -1003,6 +2557,16 @@ def update_experiment(experiment_id):
     if not exp:
         return jsonify({'error': 'Experiment not found'}), 404
 
+    # If you’re storing extra config in metadata:
+    meta = exp.experiment_metadata or {}
+    new_meta = data.get('experiment_metadata') or {}
+    selection_error = _selection_config_error(dict(meta, **new_meta))
+    if selection_error:
+        return jsonify({'error': selection_error}), 400
+    # The schedule is generated on publish; sessions rely on it from then on
+    if exp.status != 'draft' and 'schedule' in new_meta and new_meta['schedule'] != meta.get('schedule'):
+        return jsonify({'error': 'experiment_metadata.schedule cannot be changed after publishing'}), 400
+
     # Update only the fields you actually use in the GUI
     exp.name = data.get('name', exp.name)
     exp.description = data.get('description', exp.description)
@@ -1013,9 +2577,6 @@ def update_experiment(experiment_id):
     exp.instructions = data.get('instructions', exp.instructions)
     exp.completion_message = data.get('completion_message', exp.completion_message)
 
-    # If you’re storing extra config in metadata:
-    meta = exp.experiment_metadata or {}
-    new_meta = data.get('experiment_metadata') or {}
     meta.update(new_meta)
     exp.experiment_metadata = meta
 
@@ -1045,29 +2606,22 @@ def upload_stimulus(experiment_id):
         if not allowed_file(file.filename):
             return jsonify({'error': 'Invalid file type'}), 400
         
-        # Save file
-        filename = secure_filename(file.filename)
-        unique_filename = f"{uuid.uuid4()}_{filename}"
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-        
-        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-        file.save(file_path)
-        
-        # Calculate checksum
-        checksum = calculate_file_checksum(file_path)
-        
-        # Get file size
-        file_size = os.path.getsize(file_path)
+        # Save file (checksum, size and dimensions in the same pass)
+        filename, ingested = _save_upload(file)
+        file_size = ingested['size_bytes']
         
         # Create stimulus record
         stimulus = Stimulus(
             experiment_id=experiment_id,
             stimulus_name=filename,
-            file_path=file_path,
-            url=f'http://localhost:5000/uploads/{unique_filename}',
+            file_path=ingested['path'],
+            url=ingested['url'],
             file_size_bytes=file_size,
             mime_type=file.content_type,
-            checksum_sha256=checksum
+            width_px=ingested['width'],
+            height_px=ingested['height'],
+            checksum_sha256=ingested['sha256'],
+            blob_sha256=ingested['sha256']
         )
         
         db.session.add(stimulus)
@@ -1080,6 +2634,7 @@ def upload_stimulus(experiment_id):
             {'stimulus_id': str(stimulus.stimulus_id), 'file_size': file_size},
             experiment_id=experiment_id
         )
+        _queue_derivatives([stimulus.blob_sha256])
         
         return jsonify({
             'success': True,
@@ -1091,11 +2646,352 @@ def upload_stimulus(experiment_id):
         logger.error(f"Error uploading stimulus: {e}")
         return jsonify({'error': str(e)}), 500
 
+
+def _import_stimuli(experiment, sources, rejected, source, on_staged=None):
+    """
+    Stage sources in the blob store and insert their stimuli: one
+    multi-row INSERT in a single transaction, numbered densely after the
+    experiment's existing display_order, and one summary audit event.
+    Commits; staged files are discarded on failure.
+
+    Returns:
+        (payload, HTTP status): per-file results, status 'imported' with the
+        stimulus fields or 'rejected' with an error
+    """
+    max_file_bytes = app.config['MAX_CONTENT_LENGTH']
+    staged = []
+    try:
+        staged = stage_sources(blob_store, sources, max_file_bytes, workers=BULK_IMPORT_WORKERS,
+                               on_staged=on_staged)
+        rejected = [item for item in staged if 'error' in item] + rejected
+        imported = [item for item in staged if 'error' not in item]
+        results = [dict(item, status='rejected') for item in rejected]
+        if not imported:
+            return {'error': 'No files could be imported', 'imported': 0,
+                    'rejected': len(results), 'results': results}, 400
+
+        # Lock the experiment so concurrent imports get disjoint display orders
+        db.session.query(Experiment.experiment_id).filter_by(
+            experiment_id=experiment.experiment_id).with_for_update().one()
+        last_order = db.session.query(db.func.coalesce(db.func.max(Stimulus.display_order), 0)).filter(
+            Stimulus.experiment_id == experiment.experiment_id).scalar()
+        # Stimulus names are unique per experiment; archives may repeat a
+        # file name in different folders
+        taken = {name for (name,) in db.session.query(Stimulus.stimulus_name).filter(
+            Stimulus.experiment_id == experiment.experiment_id)}
+
+        # One reference per stimulus; blobs are locked in digest order so
+        # concurrent imports cannot deadlock
+        now = datetime.utcnow()
+        refs = Counter(item['sha256'] for item in imported)
+        firsts = {}
+        for item in imported:
+            item['mime_type'] = mimetypes.guess_type(item['filename'])[0]
+            firsts.setdefault(item['sha256'], item)
+        for sha256 in sorted(refs):
+            _lock_blob(sha256)
+        blob_insert = pg_insert(StimulusBlob.__table__).values([
+            {
+                'sha256': sha256,
+                'size_bytes': item['size_bytes'],
+                'mime_type': item['mime_type'],
+                'width_px': item['width'],
+                'height_px': item['height'],
+                'ref_count': refs[sha256],
+                'created_at': now,
+            }
+            for sha256, item in firsts.items()
+        ])
+        db.session.execute(blob_insert.on_conflict_do_update(
+            index_elements=['sha256'],
+            set_={'ref_count': StimulusBlob.__table__.c.ref_count + blob_insert.excluded.ref_count}
+        ))
+
+        rows = []
+        for order, item in enumerate(imported, start=last_order + 1):
+            sha256 = item['sha256']
+            path = blob_store.commit(item.pop('tmp_path'), sha256)
+            name = secure_filename(posixpath.basename(item['filename'])) or f"stimulus_{sha256[:12]}"
+            stem, ext = os.path.splitext(name)
+            copy = 1
+            while name in taken:
+                copy += 1
+                name = f'{stem}_{copy}{ext}'
+            taken.add(name)
+            rows.append({
+                'stimulus_id': uuid.uuid4(),
+                'experiment_id': experiment.experiment_id,
+                'stimulus_name': name,
+                'display_order': order,
+                'file_path': path,
+                'url': blob_url(sha256, item['filename']),
+                'file_size_bytes': item['size_bytes'],
+                'mime_type': item['mime_type'],
+                'width_px': item['width'],
+                'height_px': item['height'],
+                'checksum_sha256': sha256,
+                'blob_sha256': sha256,
+                'uploaded_at': now,
+            })
+        db.session.execute(sa_insert(Stimulus.__table__).values(rows))
+        db.session.commit()
+
+        total_bytes = sum(row['file_size_bytes'] for row in rows)
+        log_audit(
+            'stimuli_bulk_imported',
+            'data',
+            f'Bulk imported {len(rows)} stimuli ({len(results)} rejected)',
+            {
+                'source': source,
+                'imported': len(rows),
+                'rejected': len(results),
+                'unique_blobs': len(refs),
+                'total_bytes': total_bytes,
+                'display_order_range': [rows[0]['display_order'], rows[-1]['display_order']],
+            },
+            experiment_id=experiment.experiment_id
+        )
+        _queue_derivatives(refs)
+
+        results = [{
+            'filename': item['filename'],
+            'status': 'imported',
+            'stimulus_id': str(row['stimulus_id']),
+            'stimulus_name': row['stimulus_name'],
+            'display_order': row['display_order'],
+            'url': row['url'],
+            'file_size_bytes': row['file_size_bytes'],
+            'width_px': row['width_px'],
+            'height_px': row['height_px'],
+            'sha256': row['blob_sha256'],
+        } for item, row in zip(imported, rows)] + results
+
+        return {
+            'success': True,
+            'imported': len(rows),
+            'rejected': len(rejected),
+            'total_bytes': total_bytes,
+            'results': results
+        }, 201
+
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        discard_staged(staged)
+
+
+@app.route('/api/experiments/<experiment_id>/stimuli/bulk', methods=['POST'])
+@require_auth
+@require_roles(['admin', 'researcher'])
+def bulk_import_stimuli(experiment_id):
+    """
+    Import many stimuli in one request, from a zip archive (form field
+    'archive') or several files (form field 'files').
+
+    Files are hashed and probed in parallel into the blob store; all
+    stimuli are inserted in a single transaction (see _import_stimuli).
+    Files that cannot be imported are reported without failing the others.
+    With ?async=1 the upload is spooled to disk and imported by a
+    background job (202 with the job id; its result is this response).
+
+    Returns:
+        Per-file results: status 'imported' with the stimulus fields, or
+        'rejected' with an error
+    """
+    request.max_content_length = BULK_IMPORT_MAX_BYTES
+    request.max_form_parts = MAX_IMPORT_FILES + 10
+    max_file_bytes = app.config['MAX_CONTENT_LENGTH']
+    try:
+        experiment = Experiment.query.filter_by(experiment_id=experiment_id).first()
+        if not experiment:
+            return jsonify({'error': 'Experiment not found'}), 404
+
+        archive_file = request.files.get('archive')
+        files = [f for f in request.files.getlist('files') if f.filename]
+        if archive_file is None and not files:
+            return jsonify({'error': "Provide a zip archive ('archive') or files ('files')"}), 400
+        if len(files) > MAX_IMPORT_FILES:
+            return jsonify({'error': f'At most {MAX_IMPORT_FILES} files per import'}), 400
+
+        if _wants_async():
+            return _enqueue_bulk_import(experiment, archive_file, files)
+
+        if archive_file is not None:
+            try:
+                archive = zipfile.ZipFile(archive_file.stream)
+            except zipfile.BadZipFile:
+                return jsonify({'error': 'archive is not a valid zip file'}), 400
+            sources, rejected = archive_sources(archive, ALLOWED_EXTENSIONS, max_file_bytes)
+        else:
+            sources, rejected = [], []
+            for f in files:
+                if allowed_file(f.filename):
+                    sources.append((f.filename, lambda f=f: f.stream))
+                else:
+                    rejected.append({'filename': f.filename, 'error': 'Invalid file type'})
+
+        if len(sources) + len(rejected) > MAX_IMPORT_FILES:
+            return jsonify({'error': f'At most {MAX_IMPORT_FILES} files per import'}), 400
+
+        payload, status = _import_stimuli(experiment, sources, rejected,
+                                          'archive' if archive_file is not None else 'files')
+        return jsonify(payload), status
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error bulk importing stimuli: {e}")
+        return jsonify({'error': 'Failed to import stimuli'}), 500
+
+
+def _enqueue_bulk_import(experiment, archive_file, files):
+    """Spool an import's upload into its job directory and queue the job."""
+    job_id = str(uuid.uuid4())
+    spool = os.path.join(job_queue.artifact_dir(job_id), 'upload')
+    os.makedirs(spool, exist_ok=True)
+    try:
+        if archive_file is not None:
+            archive_path = os.path.join(spool, 'archive.zip')
+            archive_file.save(archive_path)
+            if not zipfile.is_zipfile(archive_path):
+                shutil.rmtree(os.path.dirname(spool), ignore_errors=True)
+                return jsonify({'error': 'archive is not a valid zip file'}), 400
+            params = {'archive': archive_path}
+        else:
+            params = {'files': []}
+            for n, f in enumerate(files):
+                path = os.path.join(spool, str(n))
+                f.save(path)
+                params['files'].append([f.filename, path])
+        params['experiment_id'] = str(experiment.experiment_id)
+        return _job_accepted(_enqueue_job('bulk_import', params, experiment_id=experiment.experiment_id,
+                                          job_id=job_id))
+    except Exception:
+        shutil.rmtree(os.path.dirname(spool), ignore_errors=True)
+        raise
+
+
+@job_handler('bulk_import', retry=False)
+def _bulk_import_job(ctx):
+    """Job: import a spooled archive or files (removed with the job directory afterwards)."""
+    experiment = Experiment.query.filter_by(experiment_id=ctx.params['experiment_id']).first()
+    if not experiment:
+        raise LookupError('Experiment not found')
+    max_file_bytes = app.config['MAX_CONTENT_LENGTH']
+
+    def on_staged(done, total):
+        ctx.set_progress(done, total)
+        ctx.check_cancelled()
+
+    if ctx.params.get('archive'):
+        with zipfile.ZipFile(ctx.params['archive']) as archive:
+            sources, rejected = archive_sources(archive, ALLOWED_EXTENSIONS, max_file_bytes)
+            if len(sources) + len(rejected) > MAX_IMPORT_FILES:
+                raise ValueError(f'At most {MAX_IMPORT_FILES} files per import')
+            payload, _ = _import_stimuli(experiment, sources, rejected, 'archive', on_staged)
+    else:
+        sources, rejected = [], []
+        for filename, path in ctx.params['files']:
+            if allowed_file(filename):
+                sources.append((filename, lambda path=path: open(path, 'rb')))
+            else:
+                rejected.append({'filename': filename, 'error': 'Invalid file type'})
+        payload, _ = _import_stimuli(experiment, sources, rejected, 'files', on_staged)
+    return payload
+
+
+# Legacy upload path -> checksum_sha256, keyed by (path, mtime, size) so a
+# replaced file gets a fresh lookup
+_upload_etag_cache = OrderedDict()
+_upload_etag_lock = threading.Lock()
+UPLOAD_ETAG_CACHE_SIZE = 4096
+
+
+def _upload_etag(path, stat):
+    """Strong ETag of a legacy upload: its recorded checksum, else a digest of mtime and size."""
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _upload_etag_lock:
+        if key in _upload_etag_cache:
+            _upload_etag_cache.move_to_end(key)
+            return _upload_etag_cache[key]
+    checksum = db.session.query(Stimulus.checksum_sha256).filter(
+        Stimulus.file_path == path, Stimulus.checksum_sha256.isnot(None)).limit(1).scalar()
+    if not checksum or not is_sha256(checksum):
+        checksum = hashlib.sha256(f'{stat.st_mtime_ns}-{stat.st_size}'.encode()).hexdigest()
+    with _upload_etag_lock:
+        _upload_etag_cache[key] = checksum
+        while len(_upload_etag_cache) > UPLOAD_ETAG_CACHE_SIZE:
+            _upload_etag_cache.popitem(last=False)
+    return checksum
+
+
+def _send_stimulus_file(path, mimetype, etag, cache_control, stat=None):
+    """
+    Send a stimulus file with validators (strong ETag, Last-Modified) and
+    caching headers.
+
+    Conditional requests are answered with 304 before any file I/O. With
+    STIMULUS_OFFLOAD the response only carries headers and the gateway
+    sends the file, including Range requests; otherwise werkzeug streams it
+    and handles Range itself.
+    """
+    stat = stat or os.stat(path)
+    accel_path = None
+    if STIMULUS_OFFLOAD in ('x-accel', 'x-sendfile'):
+        relative = os.path.relpath(os.path.realpath(path), os.path.realpath(app.config['UPLOAD_FOLDER']))
+        if not relative.startswith('..'):
+            accel_path = STIMULUS_ACCEL_PREFIX + relative.replace(os.sep, '/')
+
+    if accel_path is None:
+        response = send_file(path, mimetype=mimetype, etag=etag, last_modified=stat.st_mtime,
+                             conditional=True, max_age=None)
+    else:
+        response = Response(mimetype=mimetype)
+        response.set_etag(etag)
+        response.last_modified = stat.st_mtime
+        response = response.make_conditional(request)
+        if response.status_code != 304:
+            if STIMULUS_OFFLOAD == 'x-accel':
+                response.headers['X-Accel-Redirect'] = accel_path
+            else:
+                response.headers['X-Sendfile'] = path
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+
 @app.route('/uploads/<path:filename>')
 def serve_upload(filename):
-    """Serve uploaded stimulus files."""
-    upload_folder = app.config['UPLOAD_FOLDER']
-    return send_from_directory(upload_folder, filename)
+    """Serve legacy (name-addressed) stimulus uploads; revalidated via the checksum ETag."""
+    path = safe_join(app.config['UPLOAD_FOLDER'], filename)
+    if path is None or not os.path.isfile(path):
+        return jsonify({'error': 'File not found'}), 404
+    stat = os.stat(path)
+    return _send_stimulus_file(path, mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                               _upload_etag(path, stat), UPLOAD_CACHE_CONTROL, stat)
+
+
+@app.route('/blobs/<name>')
+def serve_blob(name):
+    """
+    Serve a stimulus blob by digest, optionally with a file extension
+    (<sha256>.png) or as a derivative (<sha256>.<variant>.<ext>); cacheable
+    forever.
+    """
+    sha256, suffix = name[:64], name[64:]
+    if not is_sha256(sha256):
+        return jsonify({'error': 'Blob not found'}), 404
+    path = blob_store.path_for(sha256)
+    etag = sha256
+    derivative = re.fullmatch(r'\.(\w+)\.(webp|jpg|png)', suffix)
+    if derivative and derivative.group(1) in DERIVATIVE_VARIANTS:
+        path += suffix
+        etag = f'{sha256}.{derivative.group(1)}'
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return jsonify({'error': 'Blob not found'}), 404
+    return _send_stimulus_file(path, mimetypes.guess_type(name)[0] or 'application/octet-stream',
+                               etag, BLOB_CACHE_CONTROL, stat)
 
 
 @app.route('/api/experiments/<experiment_id>/publish', methods=['POST'])
@@ -1116,6 +3012,28 @@ def publish_experiment(experiment_id):
         if experiment.status == 'active':
             return jsonify({'error': 'Experiment already published'}), 400
         
+        # Schedule mode: generate the pair schedule once; a republished
+        # experiment keeps its schedule so existing sessions stay valid
+        schedule_config = (experiment.experiment_metadata or {}).get('schedule')
+        if schedule_config and not ExperimentSchedule.query.filter_by(experiment_id=experiment.experiment_id).first():
+            stimuli_list = sorted(experiment.stimuli, key=lambda s: s.display_order or 0)
+            try:
+                pairs = generate_schedule(len(stimuli_list), schedule_config)
+            except ValueError as e:
+                return jsonify({'error': f'Invalid experiment_metadata.schedule: {e}'}), 400
+            dtype = schedule_dtype(len(stimuli_list))
+            db.session.add(ExperimentSchedule(
+                experiment_id=experiment.experiment_id,
+                design=schedule_config['design'],
+                n_sequences=pairs.n_sequences,
+                trials_per_sequence=pairs.trials_per_sequence,
+                shuffle=bool(schedule_config.get('shuffle', schedule_config['design'] != 'latin_square')),
+                rounds=serialize_numpy(pairs.rounds.astype(dtype)),
+                index_dtype=np.dtype(dtype).name,
+                round_orders=serialize_numpy(pairs.round_orders.astype(np.int32)),
+                stimulus_ids=[str(s.stimulus_id) for s in stimuli_list]
+            ))
+        
         # Publish
         experiment.status = 'active'
         experiment.published_at = datetime.utcnow()
@@ -1141,6 +3059,99 @@ def publish_experiment(experiment_id):
         return jsonify({'error': str(e)}), 500
 
 
+def _create_session(experiment, data):
+    """
+    Create a session (and its algorithm state) for an active experiment.
+
+    Args:
+        experiment: Experiment record
+        data: Request body (subject_id, subject_metadata, browser_info)
+
+    Returns:
+        The committed Session
+
+    Raises:
+        LookupError: if a schedule-mode experiment has no stored schedule
+    """
+    # Schedule mode: assign sequences round-robin (row lock keeps them balanced)
+    schedule = None
+    if (experiment.experiment_metadata or {}).get('schedule'):
+        schedule = ExperimentSchedule.query.filter_by(experiment_id=experiment.experiment_id) \
+            .with_for_update().first()
+        if not schedule:
+            raise LookupError('Experiment schedule not found')
+    
+    # Create session
+    session = Session(
+        experiment_id=experiment.experiment_id,
+        session_token=generate_session_token(),
+        trials_total=schedule.trials_per_sequence if schedule else experiment.max_trials,
+        subject_id=data.get('subject_id'),
+        subject_metadata=data.get('subject_metadata', {}),
+        browser_info=data.get('browser_info', {}),
+        ip_address=request.remote_addr
+    )
+    
+    if schedule:
+        session.schedule_sequence = schedule.next_sequence % schedule.n_sequences
+        session.schedule_seed = int.from_bytes(os.urandom(4), 'big') if schedule.shuffle else None
+        schedule.next_sequence += 1
+    
+    db.session.add(session)
+    db.session.flush()  # Get session_id
+    
+    # Schedule-mode sessions have no algorithm state
+    if schedule is None:
+        # Initialize algorithm state
+        gp = gp_config(experiment.experiment_metadata)
+        warm_start = None
+        inducing_points = None
+        if gp is not None:
+            stimuli_list = sorted(experiment.stimuli, key=lambda s: s.display_order or 0)
+            gp_state = _new_gp_state(experiment, stimuli_list, gp)
+            mu, sigma = gp_state.mu, gp_state.Sigma
+            comparison_matrix = gp_state.comparisons_array()
+            inducing_points = serialize_numpy(gp_state.inducing_points)
+        else:
+            n_stimuli = experiment.num_stimuli
+            mu = np.zeros(n_stimuli)
+            sigma = np.eye(n_stimuli) * experiment.prior_variance
+            comparison_matrix = np.zeros((n_stimuli, n_stimuli))
+        
+            # Optional warm start from the experiment's population posterior
+            warm_start = _warm_start_prior(experiment, n_stimuli)
+            if warm_start is not None:
+                mu, sigma = warm_start
+        
+        state = AlgorithmState(
+            session_id=session.session_id,
+            mu=serialize_numpy(mu),
+            sigma=serialize_numpy(sigma),
+            comparison_matrix=serialize_numpy(comparison_matrix),
+            trials_completed=0,
+            total_trials=experiment.max_trials,
+            state_checksum=compute_state_checksum(mu, sigma),
+            prior_mu=serialize_numpy(mu) if warm_start is not None else None,
+            prior_sigma=serialize_numpy(sigma) if warm_start is not None else None,
+            inducing_points=inducing_points
+        )
+        
+        db.session.add(state)
+    
+    db.session.commit()
+    
+    log_audit(
+        'session_created',
+        'session',
+        f'Created session for experiment: {experiment.name}',
+        {'session_id': str(session.session_id)},
+        session_id=session.session_id,
+        experiment_id=experiment.experiment_id
+    )
+    
+    return session
+
+
 @app.route('/api/sessions', methods=['POST'])
 @limiter.limit(SESSIONS_RATE)
 def create_session():
@@ -1160,47 +3171,7 @@ def create_session():
         if experiment.status != 'active':
             return jsonify({'error': 'Experiment not active'}), 400
         
-        # Create session
-        session = Session(
-            experiment_id=experiment_id,
-            session_token=generate_session_token(),
-            trials_total=experiment.max_trials,
-            subject_id=data.get('subject_id'),
-            subject_metadata=data.get('subject_metadata', {}),
-            browser_info=data.get('browser_info', {}),
-            ip_address=request.remote_addr
-        )
-        
-        db.session.add(session)
-        db.session.flush()  # Get session_id
-        
-        # Initialize algorithm state
-        n_stimuli = experiment.num_stimuli
-        mu = np.zeros(n_stimuli)
-        sigma = np.eye(n_stimuli) * experiment.prior_variance
-        comparison_matrix = np.zeros((n_stimuli, n_stimuli))
-        
-        state = AlgorithmState(
-            session_id=session.session_id,
-            mu=serialize_numpy(mu),
-            sigma=serialize_numpy(sigma),
-            comparison_matrix=serialize_numpy(comparison_matrix),
-            trials_completed=0,
-            total_trials=experiment.max_trials,
-            state_checksum=hashlib.sha256(mu.tobytes() + sigma.tobytes()).hexdigest()
-        )
-        
-        db.session.add(state)
-        db.session.commit()
-        
-        log_audit(
-            'session_created',
-            'session',
-            f'Created session for experiment: {experiment.name}',
-            {'session_id': str(session.session_id)},
-            session_id=session.session_id,
-            experiment_id=experiment_id
-        )
+        session = _create_session(experiment, data)
         
         return jsonify({
             'success': True,
@@ -1214,10 +3185,211 @@ def create_session():
         return jsonify({'error': str(e)}), 500
 
 
+# Pending pairs are served again with their original pair token until the
+# token gets this old (tokens expire after 6h); then the token is reissued
+PENDING_TOKEN_MAX_AGE = timedelta(hours=5)
+
+# Schedule-mode pairs after the served one sent along with it, so a client
+# can keep presenting trials while its queued choices are in flight
+PAIR_LOOKAHEAD = int(os.environ.get('PAIR_LOOKAHEAD', 5))
+
+
+def _pair_payload(session, experiment, pair, pres_order, pair_token):
+    """Response body presenting a pair of Stimulus records."""
+    return {
+        'success': True,
+        'trial_number': session.current_trial + 1,
+        'stimulus_a': pair[0].to_dict(),
+        'stimulus_b': pair[1].to_dict(),
+        'presentation_order': pres_order,
+        'pair_token': pair_token,
+        'show_progress': experiment.show_progress,
+        'progress_percentage': (session.trials_completed / session.trials_total * 100) if session.trials_total > 0 else 0
+    }
+
+
+def _issue_pair_token(session, stimulus_a_id, stimulus_b_id, pres_order, trial_number=None):
+    return jwt_issue_pair_token({
+        'session_id': str(session.session_id),
+        'trial_number': trial_number or session.current_trial + 1,
+        'stimulus_a_id': str(stimulus_a_id),
+        'stimulus_b_id': str(stimulus_b_id),
+        'presentation_order': pres_order
+    })
+
+
+def _serve_pending(session, pending):
+    """Payload for an already served, unanswered pair (token reissued if it is getting old)."""
+    pair = [Stimulus.query.filter_by(stimulus_id=pending.stimulus_a_id).first(),
+            Stimulus.query.filter_by(stimulus_id=pending.stimulus_b_id).first()]
+    if pair[0] is None or pair[1] is None:
+        return None
+    if pending.issued_at < datetime.utcnow() - PENDING_TOKEN_MAX_AGE:
+        pending.pair_token = _issue_pair_token(session, pending.stimulus_a_id, pending.stimulus_b_id,
+                                               pending.presentation_order)
+        pending.issued_at = datetime.utcnow()
+        db.session.commit()
+    return _pair_payload(session, session.experiment, pair, pending.presentation_order, pending.pair_token)
+
+
+def _serve_new_pair(session, experiment, pair, pres_order, pending):
+    """Persist a newly selected pair as the session's pending trial and present it."""
+    pair_token = _issue_pair_token(session, pair[0].stimulus_id, pair[1].stimulus_id, pres_order)
+    if pending is None:
+        pending = PendingTrial(session_id=session.session_id)
+        db.session.add(pending)
+    pending.trial_number = session.current_trial + 1
+    pending.stimulus_a_id = pair[0].stimulus_id
+    pending.stimulus_b_id = pair[1].stimulus_id
+    pending.presentation_order = pres_order
+    pending.pair_token = pair_token
+    pending.issued_at = datetime.utcnow()
+    pending.answered_at = None
+    pending.result = None
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent /next for this session stored its pair first; serve that one
+        db.session.rollback()
+        pending = PendingTrial.query.filter_by(session_id=session.session_id).first()
+        payload = _serve_pending(session, pending) if pending is not None else None
+        if payload is None:
+            raise
+        return payload
+    return _pair_payload(session, experiment, pair, pres_order, pair_token)
+
+
+def _lookahead_pairs(session):
+    """
+    Scheduled pairs of the PAIR_LOOKAHEAD trials after the session's next
+    one, each with its own pair_token. Answers to them are submitted in
+    trial order, normally as one /choices batch.
+    """
+    first = session.current_trial + 1
+    trials = range(first, min(first + PAIR_LOOKAHEAD, session.trials_total))
+    scheduled = [_scheduled_pair(session, trial) for trial in trials]
+    ids = {stimulus_id for a_id, b_id, _ in scheduled for stimulus_id in (a_id, b_id)}
+    stimuli = {str(s.stimulus_id): s for s in Stimulus.query.filter(Stimulus.stimulus_id.in_(ids))} if ids else {}
+    pairs = []
+    for trial, (a_id, b_id, pres_order) in zip(trials, scheduled):
+        if a_id not in stimuli or b_id not in stimuli:
+            break
+        pairs.append({
+            'trial_number': trial + 1,
+            'stimulus_a': stimuli[a_id].to_dict(),
+            'stimulus_b': stimuli[b_id].to_dict(),
+            'presentation_order': pres_order,
+            'pair_token': _issue_pair_token(session, a_id, b_id, pres_order, trial_number=trial + 1)
+        })
+    return pairs
+
+
+def _with_lookahead(session, payload):
+    """Add the lookahead pairs of a schedule-mode session to a served pair."""
+    if session.schedule_sequence is not None and PAIR_LOOKAHEAD > 0:
+        payload['lookahead'] = _lookahead_pairs(session)
+    return payload
+
+
+def _next_pair_payload(session):
+    """
+    Select (or re-serve) the session's next pair.
+
+    Returns:
+        (response body, HTTP status)
+    """
+    if session.status == 'complete':
+        return {'complete': True}, 200
+    
+    # Check if max trials reached
+    if session.trials_completed >= session.trials_total:
+        session.status = 'complete'
+        session.completed_at = datetime.utcnow()
+        session.stop_reason = 'max_trials'
+        db.session.commit()
+        return {'complete': True, 'stop_reason': 'max_trials'}, 200
+    
+    # A pair already served for this trial (refresh or retry) is returned unchanged
+    pending = PendingTrial.query.filter_by(session_id=session.session_id).first()
+    if pending is not None and pending.trial_number == session.current_trial + 1 and pending.result is None:
+        payload = _serve_pending(session, pending)
+        if payload is not None:
+            return _with_lookahead(session, payload), 200
+    
+    # Schedule mode: O(1) lookup in the precomputed schedule
+    if session.schedule_sequence is not None:
+        a_id, b_id, pres_order = _scheduled_pair(session)
+        pair = [Stimulus.query.filter_by(stimulus_id=a_id).first(),
+                Stimulus.query.filter_by(stimulus_id=b_id).first()]
+        if pair[0] is None or pair[1] is None:
+            return {'error': 'Scheduled stimulus not found'}, 500
+        return _with_lookahead(session, _serve_new_pair(session, session.experiment, pair, pres_order, pending)), 200
+    
+    experiment = session.experiment
+    stimuli = experiment.stimuli
+    
+    if len(stimuli) < 2:
+        return {'error': 'Not enough stimuli'}, 400
+    
+    # Load algorithm state
+    algo_state_record = AlgorithmState.query.filter_by(session_id=session.session_id).first()
+    
+    if not algo_state_record:
+        return {'error': 'Algorithm state not found'}, 500
+    
+    # Deserialize Bayesian state
+    stimuli_list = sorted(stimuli, key=lambda s: s.display_order or 0)
+    selector = _build_selector(experiment, session)
+    bayesian_state = _load_session_state(session, experiment, stimuli_list,
+                                         algo_state_record, selector)
+    
+    # Select next pair using the experiment's selection strategy
+    i, j = selector.select_next_pair(bayesian_state)
+    _cache_cholesky(session.session_id, algo_state_record.state_checksum,
+                    getattr(bayesian_state, 'cholesky_factor', None))
+    if selector.last_selection_info and selector.last_selection_info['stopped_by']:
+        logger.info(f"Anytime selection for session {session.session_id}: "
+                    f"{selector.last_selection_info['coverage']:.1%} of pairs scored "
+                    f"in {selector.last_selection_info['elapsed_ms']:.1f}ms")
+    
+    # Ranking-stability stopping rules (experiment_metadata['stopping'])
+    stop_reason = selector.check_stopping(bayesian_state,
+                                          (experiment.experiment_metadata or {}).get('stopping'),
+                                          session.trials_completed,
+                                          min_trials=experiment.min_trials or 0,
+                                          next_pair=(i, j))
+    if stop_reason:
+        _complete_session(session, experiment, bayesian_state, stop_reason)
+        db.session.commit()
+        log_audit(
+            'session_stopped_early',
+            'session',
+            f'Session stopped after {session.trials_completed} of {session.trials_total} trials',
+            {'stop_reason': stop_reason, 'trials_completed': session.trials_completed},
+            session_id=session.session_id,
+            experiment_id=experiment.experiment_id
+        )
+        return {'complete': True, 'stop_reason': stop_reason}, 200
+    
+    # Stimuli are indexed in display_order
+    pair = [stimuli_list[i], stimuli_list[j]]
+    
+    # Determine presentation order
+    pres_order = 'AB'
+    if experiment.enable_counterbalancing and np.random.rand() > 0.5:
+        pair = [pair[1], pair[0]]
+        pres_order = 'BA'
+    
+    return _serve_new_pair(session, experiment, pair, pres_order, pending), 200
+
+
 @app.route('/api/sessions/<session_token>/next', methods=['GET'])
 @limiter.limit(NEXT_RATE)
 def get_next_pair(session_token):
-    """Get next stimulus pair for session using Bayesian algorithm."""
+    """
+    Get next stimulus pair for session using Bayesian algorithm.
+    Schedule-mode responses also carry the following pairs as lookahead.
+    """
     try:
         # Validate session first
         session = Session.query.filter_by(session_token=session_token).first()
@@ -1225,80 +3397,162 @@ def get_next_pair(session_token):
         if not session:
             return jsonify({'error': 'Session not found'}), 404
         
-        if session.status == 'complete':
-            return jsonify({'complete': True})
-        
-        # Check if max trials reached
-        if session.trials_completed >= session.trials_total:
-            session.status = 'complete'
-            session.completed_at = datetime.utcnow()
-            db.session.commit()
-            return jsonify({'complete': True})
+        payload, status = _next_pair_payload(session)
+        return jsonify(payload), status
         
-        experiment = session.experiment
-        stimuli = experiment.stimuli
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error getting next pair: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+# Consent documents up to this size are inlined in the subject manifest
+CONSENT_INLINE_MAX_BYTES = 64 * 1024
+
+
+def _consent_metadata():
+    """Location, type, size and (small HTML only) content of the current consent document."""
+    path = _current_consent_path()
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    is_pdf = path.endswith('.pdf')
+    consent = {
+        'url': '/api/consent',
+        'mime_type': 'application/pdf' if is_pdf else 'text/html',
+        'size_bytes': stat.st_size,
+        'updated_at': datetime.utcfromtimestamp(stat.st_mtime).isoformat(),
+        'html': None,
+    }
+    if not is_pdf and stat.st_size <= CONSENT_INLINE_MAX_BYTES:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            consent['html'] = f.read()
+    return consent
+
+
+def _preload_manifest(experiment_id):
+    """
+    Stimulus URLs, srcsets and byte sizes in display order, as parallel
+    lists. With derivatives the size is that of the largest display
+    derivative, which is what subjects' browsers normally pick.
+    """
+    rows = db.session.query(Stimulus.url, Stimulus.file_size_bytes, Stimulus.width_px, Stimulus.derivatives) \
+        .filter(Stimulus.experiment_id == experiment_id) \
+        .order_by(Stimulus.display_order).all()
+    sizes = [
+        max((info['bytes'] for variant, info in (row.derivatives or {}).items() if variant != THUMBNAIL_VARIANT),
+            default=row.file_size_bytes or 0)
+        for row in rows
+    ]
+    return {
+        'urls': [row.url for row in rows],
+        'srcsets': [derivative_srcset(row.derivatives, row.url, row.width_px) for row in rows],
+        'bytes': sizes,
+        'total_bytes': sum(sizes),
+    }
+
+
+@app.route('/api/experiments/<experiment_id>/subject_manifest', methods=['GET'])
+def get_subject_manifest(experiment_id):
+    """
+    What the subject interface needs before consent, without creating a
+    session: the experiment fields it shows, consent metadata and a preload
+    manifest of stimulus URLs.
+    """
+    try:
+        experiment = Experiment.query.filter_by(experiment_id=experiment_id).first()
+        if not experiment:
+            return jsonify({'error': 'Experiment not found'}), 404
         
-        if len(stimuli) < 2:
-            return jsonify({'error': 'Not enough stimuli'}), 400
+        if experiment.status != 'active':
+            return jsonify({'error': 'Experiment not active'}), 400
         
-        # Load algorithm state
-        algo_state_record = AlgorithmState.query.filter_by(session_id=session.session_id).first()
+        return jsonify({
+            'success': True,
+            'experiment': {
+                'experiment_id': str(experiment.experiment_id),
+                'name': experiment.name,
+                'description': experiment.description,
+                'instructions': experiment.instructions,
+                'completion_message': experiment.completion_message,
+                'show_progress': experiment.show_progress,
+                'allow_breaks': experiment.allow_breaks,
+                'break_interval': experiment.break_interval,
+            },
+            'consent': _consent_metadata(),
+            'preload': _preload_manifest(experiment.experiment_id)
+        })
         
-        if not algo_state_record:
-            return jsonify({'error': 'Algorithm state not found'}), 500
+    except Exception as e:
+        logger.error(f"Error getting subject manifest: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/sessions/bootstrap', methods=['POST'])
+@limiter.limit(SESSIONS_RATE)
+def bootstrap_session():
+    """
+    Start a subject who has consented in one request: creates the session
+    and returns it with the first pair and its pair_token. The interface
+    gets everything shown before consent from the subject manifest.
+    """
+    try:
+        data = request.get_json() or {}
+        experiment_id = data.get('experiment_id')
         
-        # Deserialize Bayesian state
-        from bayesian_adaptive import BayesianPreferenceState, PureBayesianAdaptiveSelector
+        if not experiment_id:
+            return jsonify({'error': 'experiment_id required'}), 400
         
-        n_items = len(stimuli)
-        bayesian_state = BayesianPreferenceState(n_items)
-        bayesian_state.mu = deserialize_numpy(algo_state_record.mu, (n_items,))
-        bayesian_state.Sigma = deserialize_numpy(algo_state_record.sigma, (n_items, n_items))
-        bayesian_state.comparison_matrix = deserialize_numpy(algo_state_record.comparison_matrix, (n_items, n_items))
+        experiment = Experiment.query.filter_by(experiment_id=experiment_id).first()
+        if not experiment:
+            return jsonify({'error': 'Experiment not found'}), 404
         
-        # Select next pair using Bayesian algorithm
-        selector = PureBayesianAdaptiveSelector(
-            epsilon=experiment.epsilon,
-            exploration_weight=experiment.exploration_weight
-        )
+        if experiment.status != 'active':
+            return jsonify({'error': 'Experiment not active'}), 400
         
-        i, j = selector.select_next_pair(bayesian_state)
-        
-        # Get stimuli (sorted by display_order to ensure consistent indexing)
-        stimuli_list = sorted(stimuli, key=lambda s: s.display_order or 0)
-        pair = [stimuli_list[i], stimuli_list[j]]
-        
-        # Determine presentation order
-        pres_order = 'AB'
-        if experiment.enable_counterbalancing and np.random.rand() > 0.5:
-            pair = [pair[1], pair[0]]
-            pres_order = 'BA'
-        
-        # Generate pair token for validation
-        pair_token = jwt_issue_pair_token({
-            'session_id': str(session.session_id),
-            'trial_number': session.current_trial + 1,
-            'stimulus_a_id': str(pair[0].stimulus_id),
-            'stimulus_b_id': str(pair[1].stimulus_id),
-            'presentation_order': pres_order
-        })
+        session = _create_session(experiment, data)
+        first_pair, status = _next_pair_payload(session)
+        if status != 200:
+            logger.warning(f"Bootstrap of session {session.session_id} has no first pair: {first_pair}")
         
         return jsonify({
             'success': True,
-            'trial_number': session.current_trial + 1,
-            'stimulus_a': pair[0].to_dict(),
-            'stimulus_b': pair[1].to_dict(),
-            'presentation_order': pres_order,
-            'pair_token': pair_token,
-            'show_progress': experiment.show_progress,
-            'progress_percentage': (session.trials_completed / session.trials_total * 100) if session.trials_total > 0 else 0
-        })
+            'session_token': session.session_token,
+            'session': {
+                'trials_total': session.trials_total,
+                'trials_completed': session.trials_completed,
+            },
+            'first_pair': first_pair if status == 200 else None
+        }), 201
         
     except Exception as e:
-        logger.error(f"Error getting next pair: {e}")
+        db.session.rollback()
+        logger.error(f"Error bootstrapping session: {e}")
         return jsonify({'error': str(e)}), 500
 
 
+def _recorded_choice_result(session, pt):
+    """
+    The /choice response of an already recorded trial, rebuilt from its
+    Choice row, when decoded pair_token claims refer to that trial's pair;
+    else None. Only the session's final choice reports it complete.
+    """
+    trial_number = pt.get('trial_number')
+    if str(session.session_id) != pt.get('session_id') or not isinstance(trial_number, int) \
+            or not 0 < trial_number <= session.current_trial:
+        return None
+    choice = Choice.query.filter_by(session_id=session.session_id, trial_number=trial_number).first()
+    if choice is None or {str(choice.stimulus_a_id), str(choice.stimulus_b_id)} \
+            != {pt.get('stimulus_a_id'), pt.get('stimulus_b_id')}:
+        return None
+    final = session.status == 'complete' and trial_number == session.current_trial
+    return {
+        'success': True,
+        'complete': final,
+        'stop_reason': session.stop_reason if final else None
+    }
+
+
 @app.route('/api/sessions/<session_token>/choice', methods=['POST'])
 @limiter.limit(CHOICE_RATE)
 def record_choice(session_token):
@@ -1321,6 +3575,18 @@ def record_choice(session_token):
         except Exception as e:
             return jsonify({'error': f'Invalid pair_token: {e}'}), 400
         
+        # A retried submission of an answered pair gets the original response
+        pending = PendingTrial.query.filter_by(session_id=session.session_id).first()
+        if pending is not None and pending.result is not None and str(session.session_id) == pt.get('session_id') \
+                and pending.matches(pt):
+            logger.info(f"Duplicate choice for session {session.session_id}, trial {pending.trial_number}")
+            return jsonify(pending.result)
+        # An older trial (the pending row has moved on): rebuild its response
+        recorded = _recorded_choice_result(session, pt)
+        if recorded is not None:
+            logger.info(f"Duplicate choice for session {session.session_id}, trial {pt.get('trial_number')}")
+            return jsonify(recorded)
+        
         # Verify token matches session
         if str(session.session_id) != pt.get('session_id') or (session.current_trial + 1) != pt.get('trial_number'):
             return jsonify({'error': 'pair_token/session mismatch'}), 400
@@ -1331,58 +3597,54 @@ def record_choice(session_token):
             if field not in data:
                 return jsonify({'error': f'Missing field: {field}'}), 400
         
-        # Get stimuli to find their indices
-        experiment = session.experiment
-        stimuli_list = sorted(experiment.stimuli, key=lambda s: s.display_order or 0)
-        
-        # Find indices
-        stimulus_a_idx = next((i for i, s in enumerate(stimuli_list) 
-                              if str(s.stimulus_id) == data['stimulus_a_id']), None)
-        stimulus_b_idx = next((i for i, s in enumerate(stimuli_list) 
-                              if str(s.stimulus_id) == data['stimulus_b_id']), None)
-        winner_idx = next((i for i, s in enumerate(stimuli_list) 
-                          if str(s.stimulus_id) == data['chosen_stimulus_id']), None)
-        
-        if stimulus_a_idx is None or stimulus_b_idx is None or winner_idx is None:
-            return jsonify({'error': 'Invalid stimulus IDs'}), 400
-        
-        # Load algorithm state
-        algo_state_record = AlgorithmState.query.filter_by(session_id=session.session_id).first()
-        
-        if not algo_state_record:
-            return jsonify({'error': 'Algorithm state not found'}), 500
-        
-        # Deserialize and update Bayesian state
-        from bayesian_adaptive import BayesianPreferenceState, PureBayesianAdaptiveSelector
-        
-        n_items = len(stimuli_list)
-        bayesian_state = BayesianPreferenceState(n_items)
-        bayesian_state.mu = deserialize_numpy(algo_state_record.mu, (n_items,))
-        bayesian_state.Sigma = deserialize_numpy(algo_state_record.sigma, (n_items, n_items))
-        bayesian_state.comparison_matrix = deserialize_numpy(algo_state_record.comparison_matrix, (n_items, n_items))
-        
-        # Update beliefs based on choice
-        selector = PureBayesianAdaptiveSelector(
-            epsilon=experiment.epsilon,
-            exploration_weight=experiment.exploration_weight
-        )
+        error = _served_pair_error(pending, pt, data)
+        if error:
+            return jsonify({'error': error}), 400
         
-        bayesian_state = selector.update_beliefs(
-            bayesian_state, 
-            stimulus_a_idx, 
-            stimulus_b_idx, 
-            winner_idx
-        )
+        experiment = session.experiment
+        selector = bayesian_state = None
         
-        # Serialize updated state
-        algo_state_record.mu = serialize_numpy(bayesian_state.mu)
-        algo_state_record.sigma = serialize_numpy(bayesian_state.Sigma)
-        algo_state_record.comparison_matrix = serialize_numpy(bayesian_state.comparison_matrix)
-        algo_state_record.trials_completed += 1
-        algo_state_record.updated_at = datetime.utcnow()
-        algo_state_record.state_checksum = hashlib.sha256(
-            bayesian_state.mu.tobytes() + bayesian_state.Sigma.tobytes()
-        ).hexdigest()
+        if session.schedule_sequence is not None:
+            # Schedule mode: a plain append of the token's pair, no algorithm state
+            winner_idx = None
+        else:
+            # Get stimuli to find their indices
+            stimuli_list = sorted(experiment.stimuli, key=lambda s: s.display_order or 0)
+            
+            # Find indices
+            stimulus_a_idx = next((i for i, s in enumerate(stimuli_list) 
+                                  if str(s.stimulus_id) == data['stimulus_a_id']), None)
+            stimulus_b_idx = next((i for i, s in enumerate(stimuli_list) 
+                                  if str(s.stimulus_id) == data['stimulus_b_id']), None)
+            winner_idx = next((i for i, s in enumerate(stimuli_list) 
+                              if str(s.stimulus_id) == data['chosen_stimulus_id']), None)
+            
+            if stimulus_a_idx is None or stimulus_b_idx is None or winner_idx is None:
+                return jsonify({'error': 'Invalid stimulus IDs'}), 400
+            
+            # Load algorithm state
+            algo_state_record = AlgorithmState.query.filter_by(session_id=session.session_id).first()
+            
+            if not algo_state_record:
+                return jsonify({'error': 'Algorithm state not found'}), 500
+            
+            # Deserialize and update Bayesian state
+            selector = _build_selector(experiment)
+            bayesian_state = _load_session_state(session, experiment, stimuli_list,
+                                                 algo_state_record, selector)
+            
+            # Update beliefs based on choice
+            bayesian_state = selector.update_beliefs(
+                bayesian_state, 
+                stimulus_a_idx, 
+                stimulus_b_idx, 
+                winner_idx
+            )
+            
+            # Serialize updated state
+            _store_session_state(session, algo_state_record, bayesian_state)
+            algo_state_record.trials_completed += 1
+            algo_state_record.updated_at = datetime.utcnow()
         
         # Create choice record
         choice = Choice(
@@ -1404,34 +3666,265 @@ def record_choice(session_token):
         session.last_activity_at = datetime.utcnow()
         session.total_time_seconds = int((datetime.utcnow() - session.started_at).total_seconds()) if session.started_at else 0
         
-        # Check convergence
-        if selector.check_convergence(bayesian_state, experiment.convergence_threshold):
-            session.status = 'complete'
-            session.completed_at = datetime.utcnow()
-            _evaluate_session_quality(session, experiment)
-        elif session.trials_completed >= session.trials_total:
-            session.status = 'complete'
-            session.completed_at = datetime.utcnow()
-            _evaluate_session_quality(session, experiment)
-        
-        db.session.commit()
+        try:
+            # Check convergence (completing the session flushes the choice)
+            if selector is None:
+                if session.trials_completed >= session.trials_total:
+                    _complete_session(session, experiment, None, 'schedule_complete')
+            elif selector.check_convergence(bayesian_state, experiment.convergence_threshold):
+                _complete_session(session, experiment, bayesian_state, 'converged')
+            elif session.trials_completed >= session.trials_total:
+                _complete_session(session, experiment, bayesian_state, 'max_trials')
+            
+            result = {
+                'success': True,
+                'complete': session.status == 'complete',
+                'stop_reason': session.stop_reason
+            }
+            if pending is not None and pending.matches(pt):
+                pending.answered_at = datetime.utcnow()
+                pending.result = result
+            
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent submission of the same trial committed first
+            db.session.rollback()
+            pending = PendingTrial.query.filter_by(session_id=session.session_id).first()
+            if pending is not None and pending.result is not None and pending.matches(pt):
+                return jsonify(pending.result)
+            recorded = _recorded_choice_result(session, pt)
+            if recorded is not None:
+                return jsonify(recorded)
+            raise
         
         log_audit(
             'choice_recorded',
             'data',
             f'Choice recorded: trial {choice.trial_number}',
-            {'choice_id': str(choice.choice_id), 'winner': winner_idx},
+            {'choice_id': str(choice.choice_id), 'winner': winner_idx if winner_idx is not None else data['chosen_stimulus_id']},
             session_id=session.session_id
         )
         
+        return jsonify(result)
+        
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error recording choice: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+BATCH_MAX_CHOICES = int(os.environ.get('BATCH_MAX_CHOICES', 200))
+
+
+def _served_pair_error(pending, pt, data):
+    """Error message if a submitted choice is not for the pair its token was served with, else None.
+
+    The stimuli must be the token's pair, and when the session's pending row is
+    for the token's trial, the token must be the one stored for that trial.
+    """
+    shown = {pt.get('stimulus_a_id'), pt.get('stimulus_b_id')}
+    if {data['stimulus_a_id'], data['stimulus_b_id']} != shown or data['chosen_stimulus_id'] not in shown:
+        return 'Stimulus IDs do not match pair_token'
+    if pending is not None and pending.trial_number == pt.get('trial_number') and not pending.matches(pt):
+        return 'pair_token was not served for this trial'
+    return None
+
+
+def _decode_batch_choice(session, pending, item):
+    """Decode and check one batch entry against its pair_token. Returns (claims, error)."""
+    if not isinstance(item, dict):
+        return None, 'Choice must be an object'
+    try:
+        pt = jwt_decode_pair_token(item.get('pair_token') or '')
+    except Exception as e:
+        return None, f'Invalid pair_token: {e}'
+    if str(session.session_id) != pt.get('session_id'):
+        return pt, 'pair_token/session mismatch'
+    for field in ('stimulus_a_id', 'stimulus_b_id', 'chosen_stimulus_id', 'response_time_ms'):
+        if field not in item:
+            return pt, f'Missing field: {field}'
+    return pt, _served_pair_error(pending, pt, item)
+
+
+@app.route('/api/sessions/<session_token>/choices', methods=['POST'])
+@limiter.limit(CHOICE_RATE)
+def record_choice_batch(session_token):
+    """
+    Record an ordered batch of choices, e.g. trials a client queued while offline.
+    
+    Body: {'choices': [{pair_token, stimulus_a_id, stimulus_b_id,
+    chosen_stimulus_id, response_time_ms, break_before}, ...]} in trial order.
+    
+    The batch is validated and applied in order against a single load of the
+    algorithm state, inserted with one multi-row INSERT and committed in one
+    transaction. Per-choice status in the response:
+    - recorded: applied and stored
+    - duplicate: this trial is already recorded with the same pair (e.g. the
+      response to an earlier submission was lost); skipped, so a client can
+      resend its whole queue
+    - rejected: invalid (bad token, wrong trial, mismatched stimuli);
+      processing stops here
+    - not_processed: after a rejected choice or after the session completed
+    
+    Choices before the first rejected one are committed. A client should
+    drop recorded/duplicate entries from its queue and resubmit or discard
+    the rest. In schedule mode the queue can run ahead of the server on the
+    lookahead pairs of /next.
+    
+    Returns:
+        results, accepted count, complete, stop_reason and next_pair (the
+        /next response body for the following trial, None when complete)
+    """
+    try:
+        data = request.get_json() or {}
+        items = data.get('choices')
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'choices must be a non-empty list'}), 400
+        if len(items) > BATCH_MAX_CHOICES:
+            return jsonify({'error': f'At most {BATCH_MAX_CHOICES} choices per batch'}), 400
+        
+        # Row lock serializes batches of the same session
+        session = Session.query.filter_by(session_token=session_token).with_for_update().first()
+        if not session:
+            return jsonify({'error': 'Session not found'}), 404
+        
+        experiment = session.experiment
+        scheduled = session.schedule_sequence is not None
+        stimulus_index = None
+        if not scheduled:
+            stimuli_list = sorted(experiment.stimuli, key=lambda s: s.display_order or 0)
+            stimulus_index = {str(s.stimulus_id): i for i, s in enumerate(stimuli_list)}
+        
+        # Already recorded trials, for recognizing resent choices
+        recorded = {
+            c.trial_number: {str(c.stimulus_a_id), str(c.stimulus_b_id)}
+            for c in Choice.query.filter_by(session_id=session.session_id)
+                                 .filter(Choice.trial_number <= session.current_trial).all()
+        } if session.current_trial else {}
+        pending = PendingTrial.query.filter_by(session_id=session.session_id).first()
+        
+        algo_state_record = selector = bayesian_state = None
+        results, rows, answered = [], [], []
+        stop_reason = None
+        halted = False
+        now = datetime.utcnow()
+        
+        for index, item in enumerate(items):
+            if halted or stop_reason:
+                results.append({'index': index, 'status': 'not_processed'})
+                continue
+            
+            pt, error = _decode_batch_choice(session, pending, item)
+            trial_number = pt.get('trial_number') if pt else None
+            if error is None and trial_number is not None and trial_number <= session.current_trial:
+                if recorded.get(trial_number) == {pt.get('stimulus_a_id'), pt.get('stimulus_b_id')}:
+                    results.append({'index': index, 'trial_number': trial_number, 'status': 'duplicate'})
+                    continue
+                error = 'Trial already recorded with a different pair'
+            if error is None and session.status == 'complete':
+                results.append({'index': index, 'trial_number': trial_number, 'status': 'not_processed',
+                                'error': 'Session complete'})
+                continue
+            if error is None and trial_number != session.current_trial + 1:
+                error = 'pair_token/session mismatch'
+            if error is None and not scheduled:
+                idx = [stimulus_index.get(item[k]) for k in ('stimulus_a_id', 'stimulus_b_id', 'chosen_stimulus_id')]
+                if None in idx:
+                    error = 'Invalid stimulus IDs'
+            if error:
+                results.append({'index': index, 'trial_number': trial_number, 'status': 'rejected', 'error': error})
+                halted = True
+                continue
+            
+            if not scheduled:
+                if bayesian_state is None:
+                    algo_state_record = AlgorithmState.query.filter_by(session_id=session.session_id).first()
+                    if not algo_state_record:
+                        return jsonify({'error': 'Algorithm state not found'}), 500
+                    selector = _build_selector(experiment)
+                    bayesian_state = _load_session_state(session, experiment, stimuli_list,
+                                                         algo_state_record, selector)
+                bayesian_state = selector.update_beliefs(bayesian_state, *idx)
+            
+            rows.append({
+                'choice_id': uuid.uuid4(),
+                'session_id': session.session_id,
+                'trial_number': trial_number,
+                'stimulus_a_id': uuid.UUID(item['stimulus_a_id']),
+                'stimulus_b_id': uuid.UUID(item['stimulus_b_id']),
+                'chosen_stimulus_id': uuid.UUID(item['chosen_stimulus_id']),
+                'response_time_ms': item['response_time_ms'],
+                'timestamp': now,
+                'presentation_order': pt.get('presentation_order'),
+                'break_before': bool(item.get('break_before', False)),
+            })
+            answered.append(pt)
+            session.trials_completed += 1
+            session.current_trial += 1
+            results.append({'index': index, 'trial_number': trial_number, 'status': 'recorded'})
+            
+            # Same completion rules as /choice
+            if scheduled:
+                if session.trials_completed >= session.trials_total:
+                    stop_reason = 'schedule_complete'
+            elif selector.check_convergence(bayesian_state, experiment.convergence_threshold):
+                stop_reason = 'converged'
+            elif session.trials_completed >= session.trials_total:
+                stop_reason = 'max_trials'
+        
+        try:
+            if rows:
+                db.session.execute(sa_insert(Choice.__table__).values(rows))
+                if bayesian_state is not None:
+                    _store_session_state(session, algo_state_record, bayesian_state)
+                    algo_state_record.trials_completed += len(rows)
+                    algo_state_record.updated_at = now
+                session.last_activity_at = now
+                session.total_time_seconds = int((now - session.started_at).total_seconds()) if session.started_at else 0
+                if stop_reason:
+                    _complete_session(session, experiment, bayesian_state, stop_reason)
+                
+                # Let a retried single /choice of the last served pair see its result
+                if pending is not None and any(pending.matches(pt) for pt in answered):
+                    pending.answered_at = now
+                    pending.result = {
+                        'success': True,
+                        'complete': session.status == 'complete',
+                        'stop_reason': session.stop_reason
+                    }
+            
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent /choice recorded one of these trials first; resending is safe
+            db.session.rollback()
+            return jsonify({'error': 'Concurrent submission for this session; resend the batch'}), 409
+        
+        if rows:
+            log_audit(
+                'choices_batch_recorded',
+                'data',
+                f'Batch of {len(rows)} choices recorded: trials {rows[0]["trial_number"]}-{rows[-1]["trial_number"]}',
+                {'recorded': len(rows), 'submitted': len(items), 'halted': halted},
+                session_id=session.session_id
+            )
+        
+        next_pair = None
+        if session.status != 'complete':
+            payload, status = _next_pair_payload(session)
+            next_pair = payload if status == 200 else None
+        
         return jsonify({
-            'success': True,
-            'complete': session.status == 'complete'
+            'success': not halted,
+            'accepted': len(rows),
+            'results': results,
+            'complete': session.status == 'complete',
+            'stop_reason': session.stop_reason,
+            'next_pair': next_pair
         })
         
     except Exception as e:
         db.session.rollback()
-        logger.error(f"Error recording choice: {e}")
+        logger.error(f"Error recording choice batch: {e}")
         return jsonify({'error': str(e)}), 500
 
 
@@ -1473,6 +3966,879 @@ def get_results(experiment_id):
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/experiments/<experiment_id>/ranking', methods=['GET'])
+@require_auth
+@require_roles(['admin', 'researcher'])
+def get_pooled_ranking(experiment_id):
+    """Experiment-level ranking of stimuli pooled over all sessions' choices.
+
+    Query params:
+      - model: 'bradley_terry' (default) or 'thurstone'
+
+    Scores are on the model's latent scale (logit or probit units), centered
+    at zero; standard_error is the posterior standard deviation of each score.
+    """
+    try:
+        experiment = Experiment.query.filter_by(experiment_id=experiment_id).first()
+        if not experiment:
+            return jsonify({'error': 'Experiment not found'}), 404
+
+        model = request.args.get('model', 'bradley_terry')
+        if model not in RANKING_MODELS:
+            return jsonify({'error': f'model must be one of {list(RANKING_MODELS)}'}), 400
+        if len(experiment.stimuli) < 2:
+            return jsonify({'error': 'Not enough stimuli'}), 400
+
+        ranking, stimuli_list, cached = _get_pooled_ranking(experiment, model)
+
+        wins = ranking.wins.sum(axis=1)
+        comparisons = wins + ranking.wins.sum(axis=0)
+        order = np.argsort(-ranking.scores, kind='stable')
+        items = [{
+            'rank': rank + 1,
+            'stimulus_id': str(stimuli_list[i].stimulus_id),
+            'stimulus_name': stimuli_list[i].stimulus_name,
+            'url': stimuli_list[i].url,
+            'score': float(ranking.scores[i]),
+            'standard_error': float(ranking.standard_errors[i]),
+            'wins': int(wins[i]),
+            'comparisons': int(comparisons[i]),
+        } for rank, i in enumerate(order)]
+
+        return jsonify({
+            'success': True,
+            'experiment_id': str(experiment.experiment_id),
+            'model': model,
+            'n_choices': ranking.n_choices,
+            'cached': cached,
+            'iterations': ranking.iterations,
+            'fit_ms': round(ranking.fit_ms, 3),
+            'items': items,
+        })
+
+    except Exception as e:
+        logger.error(f"Error computing pooled ranking: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+def _load_replay_groups(experiments):
+    """Collect stored states and recorded choices of every session, grouped by experiment.
+
+    Uses one query for sessions/states and one for choices, regardless of
+    the number of sessions. Sessions whose choices reference stimuli that
+    are no longer part of the experiment cannot be replayed and are skipped,
+    as are experiments using the GP model (their state is not per-item).
+    """
+    experiments = [e for e in experiments if gp_config(e.experiment_metadata) is None]
+    experiment_ids = [e.experiment_id for e in experiments]
+    groups = {}
+    index_by_experiment = {}
+
+    for exp in experiments:
+        stimuli_list = sorted(exp.stimuli, key=lambda s: s.display_order or 0)
+        index_by_experiment[exp.experiment_id] = {s.stimulus_id: i for i, s in enumerate(stimuli_list)}
+        groups[exp.experiment_id] = {
+            'experiment_id': str(exp.experiment_id),
+            'n_items': len(stimuli_list),
+            'epsilon': exp.epsilon,
+            'prior_variance': exp.prior_variance,
+            'sessions': [],
+            'skipped': [],
+        }
+
+    state_rows = db.session.query(
+        Session.session_id, Session.experiment_id, AlgorithmState.state_id,
+        AlgorithmState.mu, AlgorithmState.sigma, AlgorithmState.state_checksum,
+        AlgorithmState.prior_mu, AlgorithmState.prior_sigma
+    ).join(AlgorithmState, AlgorithmState.session_id == Session.session_id) \
+     .filter(Session.experiment_id.in_(experiment_ids)).all()
+
+    records = {}
+    for row in state_rows:
+        records[row.session_id] = (row.experiment_id, {
+            'session_id': str(row.session_id),
+            'state_id': row.state_id,
+            'mu': bytes(row.mu) if row.mu is not None else None,
+            'sigma': bytes(row.sigma) if row.sigma is not None else None,
+            'state_checksum': row.state_checksum,
+            'prior_mu': bytes(row.prior_mu) if row.prior_mu is not None else None,
+            'prior_sigma': bytes(row.prior_sigma) if row.prior_sigma is not None else None,
+            'choices': [],
+        })
+
+    choice_rows = db.session.query(
+        Choice.session_id, Choice.stimulus_a_id, Choice.stimulus_b_id, Choice.chosen_stimulus_id
+    ).join(Session, Session.session_id == Choice.session_id) \
+     .filter(Session.experiment_id.in_(experiment_ids)) \
+     .order_by(Choice.session_id, Choice.trial_number).all()
+
+    unreplayable = set()
+    for c in choice_rows:
+        experiment_id, record = records.get(c.session_id, (None, None))
+        if record is None:
+            continue
+        index = index_by_experiment[experiment_id]
+        try:
+            record['choices'].append(
+                (index[c.stimulus_a_id], index[c.stimulus_b_id], index[c.chosen_stimulus_id])
+            )
+        except KeyError:
+            unreplayable.add(c.session_id)
+
+    for session_id, (experiment_id, record) in records.items():
+        if session_id in unreplayable:
+            groups[experiment_id]['skipped'].append(record['session_id'])
+        else:
+            groups[experiment_id]['sessions'].append(record)
+
+    return [g for g in groups.values() if g['n_items'] >= 2]
+
+
+@app.route('/api/admin/replay', methods=['POST'])
+@require_auth
+@require_roles(['admin', 'researcher'])
+def replay_session_states():
+    """Rebuild session posteriors from the choices table and audit stored algorithm_state.
+
+    Body (all optional):
+      - experiment_ids: experiments to replay (default: all)
+      - workers: worker processes used for the replay
+      - tolerance: max absolute difference reported as floating-point drift
+      - rewrite: overwrite stored algorithm_state with the replayed posterior
+        for every session that is not an exact checksum match
+      - include_matches: also list sessions whose checksum matched
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        experiment_ids = data.get('experiment_ids')
+        rewrite = bool(data.get('rewrite', False))
+        include_matches = bool(data.get('include_matches', False))
+        tolerance = float(data.get('tolerance', 1e-9))
+        workers = data.get('workers')
+
+        query = Experiment.query
+        if experiment_ids:
+            query = query.filter(Experiment.experiment_id.in_(experiment_ids))
+        experiments = query.all()
+        if not experiments:
+            return jsonify({'error': 'No experiments found'}), 404
+
+        groups = _load_replay_groups(experiments)
+        summaries = replay_groups(groups, workers=workers, tolerance=tolerance,
+                                  return_states=rewrite)
+
+        rewritten = 0
+        if rewrite:
+            state_ids = {rec['session_id']: rec['state_id'] for g in groups for rec in g['sessions']}
+            updates = []
+            for summary in summaries:
+                for r in summary['results']:
+                    if r['status'] == 'match':
+                        continue
+                    updates.append({
+                        'state_id': state_ids[r['session_id']],
+                        'mu': serialize_numpy(r['mu']),
+                        'sigma': serialize_numpy(r['Sigma']),
+                        'comparison_matrix': serialize_numpy(r['comparison_matrix']),
+                        'trials_completed': r['trials_replayed'],
+                        'state_checksum': r['replayed_checksum'],
+                        'updated_at': datetime.utcnow(),
+                    })
+            if updates:
+                db.session.execute(sa_update(AlgorithmState), updates)
+                db.session.commit()
+            rewritten = len(updates)
+
+        response = []
+        for group, summary in zip(groups, summaries):
+            sessions = [
+                {k: v for k, v in r.items() if k not in ('mu', 'Sigma', 'comparison_matrix')}
+                for r in summary['results']
+                if include_matches or r['status'] != 'match'
+            ]
+            response.append({
+                'experiment_id': summary['experiment_id'],
+                'sessions_replayed': summary['sessions_replayed'],
+                'trials_replayed': summary['trials_replayed'],
+                'counts': summary['counts'],
+                'skipped_sessions': group['skipped'],
+                'sessions': sessions,
+            })
+
+        log_audit(
+            'algorithm_state_replayed',
+            'system',
+            f'Replayed sessions of {len(groups)} experiments',
+            {'counts': [s['counts'] for s in summaries], 'rewritten': rewritten}
+        )
+
+        return jsonify({'success': True, 'experiments': response, 'rewritten': rewritten})
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error replaying sessions: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+def _simulation_cache_key(params, max_trials, n_subjects):
+    return (f"n{int(params['n_items'])}_e{float(params['epsilon']):g}"
+            f"_w{float(params['exploration_weight']):g}_z{float(params['noise']):g}"
+            f"_t{int(max_trials)}_s{int(n_subjects)}")
+
+
+# Power simulations run as 'power_simulation' jobs; requests are limited to
+# SIMULATION_MAX_CELLS grid cells of at most SIMULATION_MAX_ITEMS stimuli
+SIMULATION_MAX_CELLS = int(os.environ.get('SIMULATION_MAX_CELLS', 64))
+SIMULATION_MAX_ITEMS = int(os.environ.get('SIMULATION_MAX_ITEMS', 300))
+
+
+def _store_simulation_results(results):
+    """Upsert simulated cells into the simulation_results lookup table."""
+    for r in results:
+        key = _simulation_cache_key(r['params'], r['max_trials'], r['n_subjects'])
+        summary = {k: v for k, v in r.items() if k not in ('params', 'max_trials', 'n_subjects')}
+        db.session.merge(SimulationResult(
+            cache_key=key,
+            n_items=int(r['params']['n_items']),
+            epsilon=float(r['params']['epsilon']),
+            exploration_weight=float(r['params']['exploration_weight']),
+            noise=float(r['params']['noise']),
+            max_trials=int(r['max_trials']),
+            n_subjects=int(r['n_subjects']),
+            summary=summary,
+            created_at=datetime.utcnow(),
+        ))
+    db.session.commit()
+
+
+@app.route('/api/simulations/power', methods=['POST'])
+@require_auth
+@require_roles(['admin', 'researcher'])
+def run_power_simulation():
+    """Run a Monte Carlo power grid and cache the curves.
+
+    Body (all optional):
+      - grid: {n_items: [...], epsilon: [...], exploration_weight: [...], noise: [...]}
+        (at most SIMULATION_MAX_CELLS cells of at most SIMULATION_MAX_ITEMS items)
+      - n_subjects: synthetic subjects per cell (default 1000)
+      - max_trials: trials per subject (default 100)
+      - workers: worker processes
+      - refresh: recompute cells that are already cached
+
+    Answers 200 with the results when every cell is cached; otherwise the
+    missing cells are simulated by a background job (202 with the cached
+    results so far and the job; the job result lists the computed cells).
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        n_subjects = int(data.get('n_subjects', 1000))
+        max_trials = int(data.get('max_trials', 100))
+        refresh = bool(data.get('refresh', False))
+
+        if not 1 <= n_subjects <= 20000:
+            return jsonify({'error': 'n_subjects must be between 1 and 20000'}), 400
+        if not 1 <= max_trials <= 1000:
+            return jsonify({'error': 'max_trials must be between 1 and 1000'}), 400
+
+        cells = expand_grid(data.get('grid') or {})
+        if len(cells) > SIMULATION_MAX_CELLS:
+            return jsonify({'error': f'grid has {len(cells)} cells; at most {SIMULATION_MAX_CELLS} allowed'}), 400
+        if any(not 2 <= int(cell['n_items']) <= SIMULATION_MAX_ITEMS for cell in cells):
+            return jsonify({'error': f'n_items must be between 2 and {SIMULATION_MAX_ITEMS}'}), 400
+        cached, missing = [], []
+        for cell in cells:
+            hit = None if refresh else db.session.get(
+                SimulationResult, _simulation_cache_key(cell, max_trials, n_subjects))
+            if hit:
+                cached.append(hit.to_dict())
+            else:
+                missing.append(cell)
+
+        if missing:
+            job_id, _ = _enqueue_unique_job('power_simulation', {
+                'cells': missing, 'n_subjects': n_subjects, 'max_trials': max_trials,
+                'workers': data.get('workers')})
+            return _job_accepted(job_id, cached=len(cached), pending=len(missing), results=cached)
+
+        return jsonify({'success': True, 'cached': len(cached), 'computed': 0, 'results': cached})
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error running power simulation: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@job_handler('power_simulation')
+def _power_simulation_job(ctx):
+    """Job: simulate power grid cells and cache them, a few cells per step."""
+    params = ctx.params
+    cells = params['cells']
+    workers = min(int(params.get('workers') or os.cpu_count() or 1), os.cpu_count() or 1)
+    computed = []
+    ctx.set_progress(0, len(cells))
+    for start in range(0, len(cells), workers):
+        results = run_power_grid(cells[start:start + workers], n_subjects=params['n_subjects'],
+                                 max_trials=params['max_trials'], workers=workers, seed=start)
+        _store_simulation_results(results)
+        computed.extend(results)
+        ctx.set_progress(len(computed), len(cells))
+        ctx.check_cancelled()
+    return {'computed': len(computed), 'results': computed}
+
+
+@app.route('/api/experiments/recommend_max_trials', methods=['GET'])
+@require_auth
+@require_roles(['admin', 'researcher'])
+def recommend_experiment_max_trials():
+    """Recommend max_trials (and convergence_threshold) for a target ranking accuracy.
+
+    Query params:
+      - n_items (required)
+      - target_accuracy: target metric value (default 0.8)
+      - metric: 'spearman' or 'pairwise_accuracy' (default 'spearman')
+      - power: fraction of subjects that should reach the target (default 0.8)
+      - epsilon, exploration_weight: selector parameters (defaults as in create_experiment)
+      - noise: assumed choice noise of subjects (default 0.5)
+
+    Uses the closest cached cell with at least n_items stimuli; if none is
+    cached, answers 202 with a job simulating this cell (200 subjects); ask
+    again once the job is complete.
+    """
+    try:
+        n_items = request.args.get('n_items', type=int)
+        if not n_items or n_items < 2:
+            return jsonify({'error': 'n_items (>= 2) is required'}), 400
+        if n_items > SIMULATION_MAX_ITEMS:
+            return jsonify({'error': f'n_items must be at most {SIMULATION_MAX_ITEMS}'}), 400
+
+        target = request.args.get('target_accuracy', 0.8, type=float)
+        metric = request.args.get('metric', 'spearman')
+        power = request.args.get('power', 0.8, type=float)
+        epsilon = request.args.get('epsilon', 0.01, type=float)
+        exploration_weight = request.args.get('exploration_weight', 0.1, type=float)
+        noise = request.args.get('noise', 0.5, type=float)
+
+        if metric not in ('spearman', 'pairwise_accuracy'):
+            return jsonify({'error': 'metric must be spearman or pairwise_accuracy'}), 400
+
+        candidates = SimulationResult.query.filter(
+            SimulationResult.epsilon == epsilon,
+            SimulationResult.exploration_weight == exploration_weight,
+            SimulationResult.noise == noise,
+            SimulationResult.n_items >= n_items,
+        ).order_by(SimulationResult.n_items.asc(),
+                   SimulationResult.n_subjects.desc(),
+                   SimulationResult.max_trials.desc()).all()
+
+        if not candidates:
+            params = {'n_items': n_items, 'epsilon': epsilon,
+                      'exploration_weight': exploration_weight, 'noise': noise}
+            job_id, _ = _enqueue_unique_job('power_simulation', {
+                'cells': [params], 'n_subjects': 200, 'max_trials': max(100, 5 * n_items), 'workers': 1})
+            return _job_accepted(job_id, source='simulating')
+        cell = candidates[0].to_dict()
+
+        recommendation = recommend_max_trials(cell, target, metric=metric, power=power)
+
+        return jsonify({
+            'success': True,
+            'source': 'cache',
+            'simulated_cell': cell['params'],
+            'n_subjects': cell['n_subjects'],
+            'target_accuracy': target,
+            'metric': metric,
+            'recommendation': recommendation,
+            'curve': cell['curve'],
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error recommending max_trials: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/simulations/selection_budget', methods=['POST'])
+@require_auth
+@require_roles(['admin', 'researcher'])
+def run_selection_budget_simulation():
+    """Compare selection strategies and anytime budgets on simulated subjects.
+
+    Body:
+      - n_items (required)
+      - budgets: list of selection configs, e.g. {time_budget_ms, max_evaluations}
+        or {strategy: 'thompson', top_k}; exhaustive EIG selection is always
+        included as the reference
+      - n_subjects: simulated subjects per budget (default 30)
+      - n_trials: trials per subject (default 50)
+      - epsilon, exploration_weight, noise: as in /api/simulations/power
+
+    The result for a budget can be copied into an experiment's
+    experiment_metadata['selection']. Runs as a 'selection_budget_simulation'
+    job (202 with the job); the job result lists one entry per budget, the
+    exhaustive reference first.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        n_items = int(data.get('n_items', 0))
+        n_subjects = int(data.get('n_subjects', 30))
+        n_trials = int(data.get('n_trials', 50))
+        budgets = data.get('budgets') or []
+
+        if not 2 <= n_items <= SIMULATION_MAX_ITEMS:
+            return jsonify({'error': f'n_items must be between 2 and {SIMULATION_MAX_ITEMS}'}), 400
+        if not 1 <= n_subjects <= 500:
+            return jsonify({'error': 'n_subjects must be between 1 and 500'}), 400
+        if not 1 <= n_trials <= 1000:
+            return jsonify({'error': 'n_trials must be between 1 and 1000'}), 400
+        if not isinstance(budgets, list) or len(budgets) > 10:
+            return jsonify({'error': 'budgets must be a list of at most 10 entries'}), 400
+
+        job_id, _ = _enqueue_unique_job('selection_budget_simulation', {
+            'n_items': n_items,
+            'budgets': [None] + budgets,
+            'n_subjects': n_subjects,
+            'n_trials': n_trials,
+            'epsilon': float(data.get('epsilon', 0.01)),
+            'exploration_weight': float(data.get('exploration_weight', 0.1)),
+            'noise': float(data.get('noise', 0.5))
+        })
+        return _job_accepted(job_id)
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error running selection budget simulation: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@job_handler('selection_budget_simulation')
+def _selection_budget_simulation_job(ctx):
+    """Job: compare selection budgets on simulated subjects, one subject per step."""
+    params = ctx.params
+
+    def on_progress(done, total):
+        ctx.set_progress(done, total)
+        ctx.check_cancelled()
+
+    results = simulate_selection_budgets(on_progress=on_progress, **params)
+    return {'n_items': params['n_items'], 'n_subjects': params['n_subjects'],
+            'n_trials': params['n_trials'], 'results': results}
+
+
+@app.route('/api/experiments/<experiment_id>/population_prior', methods=['GET'])
+@require_auth
+@require_roles(['admin', 'researcher'])
+def get_population_prior(experiment_id):
+    """Warm-start settings and population posterior status of an experiment."""
+    try:
+        experiment = Experiment.query.filter_by(experiment_id=experiment_id).first()
+        if not experiment:
+            return jsonify({'error': 'Experiment not found'}), 404
+
+        config = warm_start_config(experiment.experiment_metadata)
+        record = db.session.get(PopulationPrior, experiment.experiment_id)
+        response = {
+            'success': True,
+            'warm_start': config,
+            'session_count': record.session_count if record else 0,
+            'active': bool(config.get('enabled') and record
+                           and record.session_count >= int(config.get('min_sessions', 0))),
+        }
+        if record:
+            population = record.to_population()
+            response['n_items'] = record.n_items
+            response['mean'] = population.mean.tolist()
+            response['sd'] = np.sqrt(np.diag(population.covariance())).tolist()
+            response['updated_at'] = record.updated_at.isoformat() if record.updated_at else None
+        return jsonify(response)
+
+    except Exception as e:
+        logger.error(f"Error getting population prior: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/experiments/<experiment_id>/population_prior/rebuild', methods=['POST'])
+@require_auth
+@require_roles(['admin', 'researcher'])
+def rebuild_population_prior(experiment_id):
+    """Recompute the population posterior from all completed sessions.
+
+    Used after enabling warm start on an experiment that already has data,
+    or after excluding sessions.
+    """
+    try:
+        experiment = Experiment.query.filter_by(experiment_id=experiment_id).first()
+        if not experiment:
+            return jsonify({'error': 'Experiment not found'}), 404
+
+        n_items = len(experiment.stimuli)
+        if n_items < 2:
+            return jsonify({'error': 'Not enough stimuli'}), 400
+        if gp_config(experiment.experiment_metadata) is not None:
+            return jsonify({'error': 'Population priors are not available for the GP model'}), 400
+
+        rows = db.session.query(AlgorithmState.mu, AlgorithmState.sigma) \
+            .join(Session, Session.session_id == AlgorithmState.session_id) \
+            .filter(Session.experiment_id == experiment.experiment_id,
+                    Session.status == 'complete',
+                    Session.attention_check_passed.isnot(False)).all()
+
+        population = PopulationPosterior(n_items)
+        skipped = 0
+        for row in rows:
+            if row.mu is None or row.sigma is None or len(row.mu) != 8 * n_items:
+                skipped += 1
+                continue
+            population.update(deserialize_numpy(row.mu, (n_items,)),
+                              deserialize_numpy(row.sigma, (n_items, n_items)))
+
+        record = PopulationPrior.query.filter_by(experiment_id=experiment.experiment_id) \
+            .with_for_update().first()
+        if record is None:
+            record = PopulationPrior(experiment_id=experiment.experiment_id)
+            db.session.add(record)
+        record.store(population)
+        db.session.commit()
+
+        log_audit(
+            'population_prior_rebuilt',
+            'experiment',
+            f'Rebuilt population prior for experiment: {experiment.name}',
+            {'sessions': population.count, 'skipped': skipped},
+            experiment_id=experiment.experiment_id
+        )
+
+        return jsonify({'success': True, 'session_count': population.count, 'skipped': skipped})
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error rebuilding population prior: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/simulations/warm_start', methods=['POST'])
+@require_auth
+@require_roles(['admin', 'researcher'])
+def run_warm_start_simulation():
+    """Estimate the trials saved by warm-start priors on simulated subjects.
+
+    Body:
+      - n_items (required)
+      - n_population: completed sessions behind the prior (default 200)
+      - n_subjects: new subjects per arm (default 200)
+      - max_trials, convergence_threshold: stopping rule (defaults 100, 0.05)
+      - heterogeneity: SD of individual deviations from the population (default 0.5)
+      - noise, epsilon, exploration_weight, prior_variance
+      - shrinkage, inflation: warm-start settings to evaluate
+      - target: mean Spearman correlation for trials-to-target (default 0.8)
+
+    Runs as a 'warm_start_simulation' job (202 with the job); the job result
+    has the cold/warm summaries and the savings.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        n_items = int(data.get('n_items', 0))
+        n_population = int(data.get('n_population', 200))
+        n_subjects = int(data.get('n_subjects', 200))
+        max_trials = int(data.get('max_trials', 100))
+
+        if not 2 <= n_items <= SIMULATION_MAX_ITEMS:
+            return jsonify({'error': f'n_items must be between 2 and {SIMULATION_MAX_ITEMS}'}), 400
+        if not 1 <= n_population <= 5000 or not 1 <= n_subjects <= 5000:
+            return jsonify({'error': 'n_population and n_subjects must be between 1 and 5000'}), 400
+        if not 1 <= max_trials <= 1000:
+            return jsonify({'error': 'max_trials must be between 1 and 1000'}), 400
+
+        optional = {k: float(data[k]) for k in ('convergence_threshold', 'heterogeneity', 'noise',
+                                                'epsilon', 'exploration_weight', 'prior_variance',
+                                                'shrinkage', 'inflation', 'target') if k in data}
+
+        job_id, _ = _enqueue_unique_job('warm_start_simulation', dict(
+            optional, n_items=n_items, n_population=n_population, n_subjects=n_subjects,
+            max_trials=max_trials))
+        return _job_accepted(job_id)
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error running warm start simulation: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@job_handler('warm_start_simulation')
+def _warm_start_simulation_job(ctx):
+    """Job: estimate warm-start savings, one subject chunk per step."""
+    def on_progress(done, total):
+        ctx.set_progress(done, total)
+        ctx.check_cancelled()
+
+    return simulate_warm_start_savings(on_progress=on_progress, **ctx.params)
+
+
+@app.route('/api/simulations/stopping', methods=['POST'])
+@require_auth
+@require_roles(['admin', 'researcher'])
+def run_stopping_simulation():
+    """Compare ranking-stability stopping rules on simulated subjects.
+
+    Body:
+      - n_items (required)
+      - configs: list of experiment_metadata['stopping'] configs to compare;
+        a baseline without early stopping is always included
+      - n_subjects (default 100), max_trials (default 100), min_trials (default 10)
+      - noise, epsilon, exploration_weight, convergence_threshold
+      - seed
+
+    Runs as a 'stopping_simulation' job (202 with the job); the job result
+    lists one entry per config, the baseline first.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        n_items = int(data.get('n_items', 0))
+        configs = data.get('configs') or []
+        n_subjects = int(data.get('n_subjects', 100))
+        max_trials = int(data.get('max_trials', 100))
+        min_trials = int(data.get('min_trials', 10))
+
+        if not 2 <= n_items <= SIMULATION_MAX_ITEMS:
+            return jsonify({'error': f'n_items must be between 2 and {SIMULATION_MAX_ITEMS}'}), 400
+        if not isinstance(configs, list) or len(configs) > 20:
+            return jsonify({'error': 'configs must be a list of at most 20 stopping configs'}), 400
+        if not 1 <= n_subjects <= 2000:
+            return jsonify({'error': 'n_subjects must be between 1 and 2000'}), 400
+        if not 1 <= max_trials <= 1000 or not 0 <= min_trials <= max_trials:
+            return jsonify({'error': 'need 0 <= min_trials <= max_trials <= 1000'}), 400
+        for config in configs:
+            try:
+                validate_stopping_config(config)
+            except (ValueError, TypeError) as e:
+                return jsonify({'error': f'Invalid stopping config {config}: {e}'}), 400
+
+        optional = {k: float(data[k]) for k in ('noise', 'epsilon', 'exploration_weight',
+                                                'convergence_threshold') if k in data}
+
+        job_id, _ = _enqueue_unique_job('stopping_simulation', dict(
+            optional, n_items=n_items, configs=configs, n_subjects=n_subjects, max_trials=max_trials,
+            min_trials=min_trials, seed=int(data.get('seed', 0))))
+        return _job_accepted(job_id)
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error running stopping simulation: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@job_handler('stopping_simulation')
+def _stopping_simulation_job(ctx):
+    """Job: compare stopping rules on simulated subjects, one subject per step."""
+    params = ctx.params
+
+    def on_progress(done, total):
+        ctx.set_progress(done, total)
+        ctx.check_cancelled()
+
+    results = simulate_stopping_rules(on_progress=on_progress, **params)
+    return {'n_items': params['n_items'], 'n_subjects': params['n_subjects'],
+            'max_trials': params['max_trials'], 'min_trials': params['min_trials'], 'results': results}
+
+
+@app.route('/api/experiments/<experiment_id>/ranking/bootstrap', methods=['POST'])
+@require_auth
+@require_roles(['admin', 'researcher'])
+def start_ranking_bootstrap(experiment_id):
+    """Session-bootstrap confidence intervals for the pooled ranking.
+
+    Body:
+      - model: 'bradley_terry' (default) or 'thurstone'
+      - n_replicates: default 1000 (10-10000)
+      - confidence: interval coverage, default 0.95
+      - seed: default 0
+
+    Returns the cached result (200) if this bootstrap was already computed
+    for the experiment's current choices; otherwise queues a ranking_bootstrap
+    job (202) whose progress, partial intervals and final result are served
+    by GET /api/jobs/<job_id>.
+    """
+    try:
+        experiment = Experiment.query.filter_by(experiment_id=experiment_id).first()
+        if not experiment:
+            return jsonify({'error': 'Experiment not found'}), 404
+
+        data = request.get_json(silent=True) or {}
+        model = data.get('model', 'bradley_terry')
+        n_replicates = int(data.get('n_replicates', 1000))
+        confidence = float(data.get('confidence', 0.95))
+        seed = int(data.get('seed', 0))
+
+        if model not in RANKING_MODELS:
+            return jsonify({'error': f'model must be one of {list(RANKING_MODELS)}'}), 400
+        if not 10 <= n_replicates <= 10000:
+            return jsonify({'error': 'n_replicates must be between 10 and 10000'}), 400
+        if not 0.5 <= confidence < 1:
+            return jsonify({'error': 'confidence must be in [0.5, 1)'}), 400
+
+        n_items = len(experiment.stimuli)
+        if n_items < 2:
+            return jsonify({'error': 'Not enough stimuli'}), 400
+
+        count, newest, n_sessions = _experiment_choice_query(
+            experiment.experiment_id, db.func.count(Choice.choice_id), db.func.max(Choice.timestamp),
+            db.func.count(db.distinct(Choice.session_id))).one()
+        cache_key = _bootstrap_cache_key(experiment.experiment_id, model, n_items, n_replicates,
+                                         confidence, seed, count, newest)
+
+        cached = db.session.get(BootstrapResult, cache_key)
+        if cached is not None:
+            return jsonify({'success': True, 'cached': True, 'result': cached.summary})
+        if n_sessions < 2:
+            return jsonify({'error': 'The bootstrap needs choices from at least 2 sessions'}), 400
+
+        params = {'experiment_id': str(experiment.experiment_id), 'model': model, 'n_replicates': n_replicates,
+                  'confidence': confidence, 'seed': seed, 'cache_key': cache_key}
+        job_id, created = _enqueue_unique_job('ranking_bootstrap', params, experiment_id=experiment.experiment_id)
+        if created:
+            log_audit(
+                'ranking_bootstrap_started',
+                'experiment',
+                f'Started {n_replicates}-replicate ranking bootstrap',
+                {'job_id': job_id, 'model': model, 'n_choices': int(count)},
+                experiment_id=experiment.experiment_id
+            )
+
+        return _job_accepted(job_id, cached=False)
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error starting ranking bootstrap: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+def _bootstrap_cache_key(experiment_id, model, n_items, n_replicates, confidence, seed, count, newest):
+    """BootstrapResult key of a bootstrap over the choices up to a (count, newest timestamp) watermark."""
+    return (f"{experiment_id}_{model}_n{n_items}_r{n_replicates}"
+            f"_c{confidence:g}_s{seed}_w{count}_{newest.timestamp() if newest else 0:.6f}")
+
+
+@job_handler('ranking_bootstrap')
+def _ranking_bootstrap_job(ctx):
+    """
+    Job: session bootstrap of an experiment's pooled ranking. Partial
+    intervals are published as the job's partial result while it runs; the
+    final result is also cached as a BootstrapResult.
+    """
+    params = ctx.params
+    experiment = Experiment.query.filter_by(experiment_id=params['experiment_id']).first()
+    if not experiment:
+        raise LookupError('Experiment not found')
+    model, n_replicates = params['model'], params['n_replicates']
+
+    stimuli_list = sorted(experiment.stimuli, key=lambda s: s.display_order or 0)
+    index = {s.stimulus_id: i for i, s in enumerate(stimuli_list)}
+    count, newest = _experiment_choice_query(
+        experiment.experiment_id, db.func.count(Choice.choice_id), db.func.max(Choice.timestamp)).one()
+    session_index, winners, losers = _load_session_choices(experiment.experiment_id, index)
+    db.session.rollback()  # end the read transaction before the long computation
+    stimuli = [(str(s.stimulus_id), s.stimulus_name) for s in stimuli_list]
+
+    last_update = [0.0]
+
+    def on_progress(accumulator):
+        # Partial intervals are recomputed at most twice a second
+        now = time.monotonic()
+        if accumulator.completed >= n_replicates or now - last_update[0] >= 0.5:
+            last_update[0] = now
+            ctx.set_progress(accumulator.completed, n_replicates,
+                             _bootstrap_payload(accumulator.summary(), stimuli))
+        ctx.check_cancelled()
+
+    ctx.set_progress(0, n_replicates)
+    summary = run_bootstrap(session_index, winners, losers, len(stimuli), model=model,
+                            n_replicates=n_replicates, confidence=params['confidence'], seed=params['seed'],
+                            workers=BOOTSTRAP_WORKERS, on_progress=on_progress)
+    payload = _bootstrap_payload(summary, stimuli)
+    payload['model'] = model
+
+    # Keyed by the choices actually loaded, which may be newer than at enqueue time
+    try:
+        db.session.merge(BootstrapResult(
+            cache_key=_bootstrap_cache_key(experiment.experiment_id, model, len(stimuli), n_replicates,
+                                           params['confidence'], params['seed'], count, newest),
+            experiment_id=experiment.experiment_id, model=model, n_replicates=n_replicates,
+            confidence=params['confidence'], seed=params['seed'], n_choices=int(len(winners)),
+            summary=payload))
+        db.session.commit()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Error caching bootstrap result: {e}")
+    return payload
+
+
+@app.route('/api/jobs', methods=['GET'])
+@require_auth
+@require_roles(['admin', 'researcher'])
+def list_jobs():
+    """Recent background jobs, newest first. Query: kind, status, experiment_id, limit (max 200)."""
+    try:
+        limit = min(int(request.args.get('limit', 50)), 200)
+        experiment_id = request.args.get('experiment_id')
+        if experiment_id:
+            uuid.UUID(experiment_id)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit or experiment_id'}), 400
+    try:
+        jobs = job_queue.list(kind=request.args.get('kind'), status=request.args.get('status'),
+                              experiment_id=experiment_id, limit=limit)
+        return jsonify({'success': True, 'jobs': jobs, 'queue': job_queue.backend})
+    except Exception as e:
+        logger.error(f"Error listing jobs: {e}")
+        return jsonify({'error': 'Failed to list jobs'}), 500
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@require_auth
+@require_roles(['admin', 'researcher'])
+def get_job(job_id):
+    """Status, progress and result of a background job; artifact_url once its file is ready."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job_queue.artifact_path(job):
+        job['artifact_url'] = f'/api/jobs/{job_id}/artifact'
+    return jsonify({'success': True, 'job': job})
+
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+@require_auth
+@require_roles(['admin', 'researcher'])
+def cancel_job(job_id):
+    """Cancel a queued job, or ask a running one to stop at its next check."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['status'] in ('complete', 'failed', 'cancelled'):
+        return jsonify({'error': f"Job already {job['status']}", 'job': job}), 409
+    try:
+        job = job_queue.cancel(job_id)
+    except Exception as e:
+        logger.error(f"Error cancelling job: {e}")
+        return jsonify({'error': 'Failed to cancel job'}), 500
+    log_audit('job_cancelled', 'admin', f"Cancelled {job['kind']} job",
+              {'job_id': job['job_id'], 'status': job['status']},
+              experiment_id=job['experiment_id'])
+    return jsonify({'success': True, 'job': job})
+
+
+@app.route('/api/jobs/<job_id>/artifact', methods=['GET'])
+@require_auth
+@require_roles(['admin', 'researcher'])
+def get_job_artifact(job_id):
+    """Download the result file of a completed job."""
+    job = job_queue.get(job_id)
+    path = job_queue.artifact_path(job) if job else None
+    if path is None:
+        return jsonify({'error': 'Artifact not found'}), 404
+    return send_file(path, mimetype=job['artifact_mime'] or 'application/octet-stream',
+                     as_attachment=True, download_name=job['artifact_name'])
+
+
 @app.route('/api/experiments/all', methods=['GET'])
 @require_auth
 @require_roles(['admin', 'researcher'])
@@ -1498,170 +4864,223 @@ def get_all_experiments():
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/experiments/<experiment_id>/export_choices_csv', methods=['GET'])
-@require_auth
-@require_roles(['admin', 'researcher'])
-def export_choices_csv(experiment_id):
-    """Export all choices for an experiment as a CSV file."""
-    try:
-        experiment = Experiment.query.filter_by(experiment_id=experiment_id).first()
-        if not experiment:
-            return jsonify({'error': 'Experiment not found'}), 404
+def _export_filename(experiment, suffix):
+    # Use experiment name as base for filename
+    base_name = experiment.name or f"experiment_{str(experiment.experiment_id)[:8]}"
+    # slugify: keep only letters, numbers, underscores, dashes
+    safe_name = re.sub(r'[^A-Za-z0-9_\-]+', '_', base_name).strip('_')
+    return f"{safe_name}_{suffix}.csv"
 
-        # Find all session IDs for this experiment
-        session_ids = [s.session_id for s in experiment.sessions]
-        if not session_ids:
-            return jsonify({'error': 'No sessions found for this experiment'}), 404
 
-        # Get all choices
-        choices = Choice.query.filter(
-            Choice.session_id.in_(session_ids)
-        ).order_by(Choice.session_id, Choice.trial_number).all()
+def _write_choices_csv(experiment, out, on_row=None):
+    """
+    Write all choices of an experiment as the raw CSV export.
 
-        if not choices:
-            return jsonify({'error': 'No choices found for this experiment'}), 404
+    Raises:
+        LookupError: the experiment has no sessions or no choices
+    Returns:
+        The download filename
+    """
+    # Find all session IDs for this experiment
+    session_ids = [s.session_id for s in experiment.sessions]
+    if not session_ids:
+        raise LookupError('No sessions found for this experiment')
+
+    # Get all choices
+    choices = Choice.query.filter(
+        Choice.session_id.in_(session_ids)
+    ).order_by(Choice.session_id, Choice.trial_number).all()
+
+    if not choices:
+        raise LookupError('No choices found for this experiment')
+
+    writer = csv.writer(out)
+
+    # Header
+    writer.writerow([
+        'session_id', 'subject_id', 'trial_number',
+        'stimulus_a_id', 'stimulus_b_id', 'chosen_stimulus_id',
+        'response_time_ms', 'timestamp', 'presentation_order'
+    ])
+
+    # Rows
+    for n, choice in enumerate(choices, start=1):
+        writer.writerow([
+            choice.session_id,
+            getattr(choice.session, 'subject_id', None),
+            choice.trial_number,
+            choice.stimulus_a_id,
+            choice.stimulus_b_id,
+            choice.chosen_stimulus_id,
+            choice.response_time_ms,
+            choice.timestamp.isoformat() if getattr(choice, 'timestamp', None) else '',
+            choice.presentation_order
+        ])
+        if on_row:
+            on_row(n, len(choices))
+
+    return _export_filename(experiment, 'choices_raw')
+
+
+def _write_clean_choices_csv(experiment, out, on_row=None):
+    """
+    Write the cleaned CSV export (human-readable session and stimulus labels).
+
+    Raises:
+        LookupError: the experiment has no sessions or no choices
+    Returns:
+        The download filename
+    """
+    experiment_id = experiment.experiment_id
+
+    # Sessions ordered by creation time
+    sessions = Session.query.filter_by(experiment_id=experiment_id) \
+                            .order_by(Session.created_at.asc()).all()
+    if not sessions:
+        raise LookupError('No sessions found for this experiment')
+
+    session_index = {s.session_id: idx + 1 for idx, s in enumerate(sessions)}
+
+    # All stimuli for this experiment
+    stimuli = Stimulus.query.filter_by(experiment_id=experiment_id).all()
+    stim_by_id = {s.stimulus_id: s for s in stimuli}
+
+    # All choices
+    session_ids = [s.session_id for s in sessions]
+    choices = Choice.query.filter(Choice.session_id.in_(session_ids)) \
+                          .order_by(Choice.session_id, Choice.trial_number).all()
+    if not choices:
+        raise LookupError('No choices found for this experiment')
+
+    # Helper to build simple session IDs
+    base_code = (experiment.name or "EXP").upper()
+    base_code = "".join(ch for ch in base_code if ch.isalnum())[:4] or "EXP"
+
+    def simple_session_id(sess):
+        idx = session_index.get(sess.session_id, 0)
+        return f"{base_code}-S{idx:03d}"
+
+    writer = csv.writer(out)
+
+    # Header
+    writer.writerow([
+        'session_id',
+        'subject_id',
+        'trial_number',
+        'stimulus_a_name',
+        'stimulus_b_name',
+        'chosen_stimulus_name',
+        'response_time_ms',
+        'elapsed_ms_from_start',
+        'presentation_order',
+        'chosen_side'
+    ])
+
+    # Rows
+    for n, choice in enumerate(choices, start=1):
+        sess = choice.session
+        s_a = stim_by_id.get(choice.stimulus_a_id)
+        s_b = stim_by_id.get(choice.stimulus_b_id)
+        s_c = stim_by_id.get(choice.chosen_stimulus_id)
+
+        # Use started_at if available, else fall back to created_at
+        start_time = sess.started_at or sess.created_at
+        if choice.timestamp and start_time:
+            elapsed_ms = int((choice.timestamp - start_time).total_seconds() * 1000)
+        else:
+            elapsed_ms = ''
+
+        chosen_side = 'A' if choice.chosen_stimulus_id == choice.stimulus_a_id else 'B'
 
-        # Create CSV in-memory
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Header
         writer.writerow([
-            'session_id', 'subject_id', 'trial_number',
-            'stimulus_a_id', 'stimulus_b_id', 'chosen_stimulus_id',
-            'response_time_ms', 'timestamp', 'presentation_order'
+            simple_session_id(sess),                    # session_id (clean)
+            getattr(sess, 'subject_id', None),          # subject_id
+            choice.trial_number,                        # trial_number
+            s_a.stimulus_name if s_a else '',           # stimulus_a_name
+            s_b.stimulus_name if s_b else '',           # stimulus_b_name
+            s_c.stimulus_name if s_c else '',           # chosen_stimulus_name
+            choice.response_time_ms,                    # response_time_ms (per-trial RT)
+            elapsed_ms,                                 # elapsed_ms_from_start
+            choice.presentation_order,                  # 'AB' or 'BA'
+            chosen_side,
         ])
-        
-        # Rows
-        for choice in choices:
-            writer.writerow([
-                choice.session_id,
-                getattr(choice.session, 'subject_id', None),
-                choice.trial_number,
-                choice.stimulus_a_id,
-                choice.stimulus_b_id,
-                choice.chosen_stimulus_id,
-                choice.response_time_ms,
-                choice.timestamp.isoformat() if getattr(choice, 'timestamp', None) else '',
-                choice.presentation_order
-            ])
-
-        # Use experiment name as base for filename
-        base_name = experiment.name or f"experiment_{experiment_id[:8]}"
-        # slugify: keep only letters, numbers, underscores, dashes
-        safe_name = re.sub(r'[^A-Za-z0-9_\-]+', '_', base_name).strip('_')
-
-        filename = f"{safe_name}_choices_raw.csv"
-
-        return Response(
-            output.getvalue(),
-            mimetype='text/csv',
-            headers={
-                "Content-Disposition": f'attachment; filename="{filename}"'
-            }
-        )
-    except Exception as e:
-        logger.error(f"Error exporting CSV: {e}")
-        return jsonify({'error': str(e)}), 500
+        if on_row:
+            on_row(n, len(choices))
 
-@app.route('/api/experiments/<experiment_id>/export_clean_choices_csv', methods=['GET'])
-@require_auth
-@require_roles(['admin', 'researcher'])
-def export_clean_choices_csv(experiment_id):
-    """Export a cleaned CSV with human-readable session and stimulus labels."""
+    return _export_filename(experiment, 'choices_clean')
+
+
+CSV_EXPORTS = {
+    'choices_raw': _write_choices_csv,
+    'choices_clean': _write_clean_choices_csv,
+}
+
+
+def _export_csv_response(experiment_id, export):
+    """Serve a CSV export, or with ?async=1 queue it as a job whose artifact is the file."""
+    experiment = Experiment.query.filter_by(experiment_id=experiment_id).first()
+    if not experiment:
+        return jsonify({'error': 'Experiment not found'}), 404
+    if _wants_async():
+        return _job_accepted(_enqueue_job(
+            'export_csv', {'experiment_id': str(experiment.experiment_id), 'export': export},
+            experiment_id=experiment.experiment_id))
+
+    # Create CSV in-memory
+    output = io.StringIO()
     try:
-        experiment = Experiment.query.filter_by(experiment_id=experiment_id).first()
-        if not experiment:
-            return jsonify({'error': 'Experiment not found'}), 404
+        filename = CSV_EXPORTS[export](experiment, output)
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+
+    return Response(
+        output.getvalue(),
+        mimetype='text/csv',
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"'
+        }
+    )
 
-        # Sessions ordered by creation time
-        sessions = Session.query.filter_by(experiment_id=experiment_id) \
-                                .order_by(Session.created_at.asc()).all()
-        if not sessions:
-            return jsonify({'error': 'No sessions found for this experiment'}), 404
 
-        session_index = {s.session_id: idx + 1 for idx, s in enumerate(sessions)}
+@job_handler('export_csv')
+def _export_csv_job(ctx):
+    """Job: write a CSV export to the job's artifact."""
+    experiment = Experiment.query.filter_by(experiment_id=ctx.params['experiment_id']).first()
+    if not experiment:
+        raise LookupError('Experiment not found')
 
-        # All stimuli for this experiment
-        stimuli = Stimulus.query.filter_by(experiment_id=experiment_id).all()
-        stim_by_id = {s.stimulus_id: s for s in stimuli}
+    def on_row(n, total):
+        if n % 1000 == 0 or n == total:
+            ctx.set_progress(n, total)
+            ctx.check_cancelled()
 
-        # All choices
-        session_ids = [s.session_id for s in sessions]
-        choices = Choice.query.filter(Choice.session_id.in_(session_ids)) \
-                              .order_by(Choice.session_id, Choice.trial_number).all()
-        if not choices:
-            return jsonify({'error': 'No choices found for this experiment'}), 404
+    tmp_path = ctx.artifact_path('export.csv.part')
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as out:
+        filename = CSV_EXPORTS[ctx.params['export']](experiment, out, on_row=on_row)
+    path = ctx.artifact_path(filename, 'text/csv')
+    os.replace(tmp_path, path)
+    return {'filename': ctx.artifact_name, 'bytes': os.path.getsize(path)}
 
-        # Helper to build simple session IDs
-        base_code = (experiment.name or "EXP").upper()
-        base_code = "".join(ch for ch in base_code if ch.isalnum())[:4] or "EXP"
 
-        def simple_session_id(sess):
-            idx = session_index.get(sess.session_id, 0)
-            return f"{base_code}-S{idx:03d}"
-        
-        # Build CSV in-memory
-        output = io.StringIO()
-        writer = csv.writer(output)
+@app.route('/api/experiments/<experiment_id>/export_choices_csv', methods=['GET'])
+@require_auth
+@require_roles(['admin', 'researcher'])
+def export_choices_csv(experiment_id):
+    """Export all choices for an experiment as a CSV file (?async=1: as a background job)."""
+    try:
+        return _export_csv_response(experiment_id, 'choices_raw')
+    except Exception as e:
+        logger.error(f"Error exporting CSV: {e}")
+        return jsonify({'error': str(e)}), 500
 
-        # Header
-        writer.writerow([
-            'session_id',            
-            'subject_id',
-            'trial_number',
-            'stimulus_a_name',
-            'stimulus_b_name',
-            'chosen_stimulus_name',
-            'response_time_ms',
-            'elapsed_ms_from_start',  
-            'presentation_order',
-            'chosen_side'
-        ])
-        
-        # Rows
-        for choice in choices:
-            sess = choice.session
-            s_a = stim_by_id.get(choice.stimulus_a_id)
-            s_b = stim_by_id.get(choice.stimulus_b_id)
-            s_c = stim_by_id.get(choice.chosen_stimulus_id)
-
-            # Use started_at if available, else fall back to created_at
-            start_time = sess.started_at or sess.created_at
-            if choice.timestamp and start_time:
-                elapsed_ms = int((choice.timestamp - start_time).total_seconds() * 1000)
-            else:
-                elapsed_ms = ''
-            
-            chosen_side = 'A' if choice.chosen_stimulus_id == choice.stimulus_a_id else 'B'
-
-            writer.writerow([
-                simple_session_id(sess),                    # session_id (clean)
-                getattr(sess, 'subject_id', None),          # subject_id
-                choice.trial_number,                        # trial_number
-                s_a.stimulus_name if s_a else '',           # stimulus_a_name
-                s_b.stimulus_name if s_b else '',           # stimulus_b_name
-                s_c.stimulus_name if s_c else '',           # chosen_stimulus_name
-                choice.response_time_ms,                    # response_time_ms (per-trial RT)
-                elapsed_ms,                                 # elapsed_ms_from_start
-                choice.presentation_order,                  # 'AB' or 'BA'
-                chosen_side,
-            ])
-
-        # Use experiment name as base for filename
-        base_name = experiment.name or f"experiment_{experiment_id[:8]}"
-        # slugify: keep only letters, numbers, underscores, dashes
-        safe_name = re.sub(r'[^A-Za-z0-9_\-]+', '_', base_name).strip('_')
-
-        filename = f"{safe_name}_choices_clean.csv"
-
-        return Response(
-            output.getvalue(),
-            mimetype='text/csv',
-            headers={
-                "Content-Disposition": f'attachment; filename="{filename}"'
-            }
-        )
+
+@app.route('/api/experiments/<experiment_id>/export_clean_choices_csv', methods=['GET'])
+@require_auth
+@require_roles(['admin', 'researcher'])
+def export_clean_choices_csv(experiment_id):
+    """Export a cleaned CSV with human-readable session and stimulus labels (?async=1: as a background job)."""
+    try:
+        return _export_csv_response(experiment_id, 'choices_clean')
     except Exception as e:
         logger.error(f"Error exporting clean CSV: {e}")
         return jsonify({'error': str(e)}), 500
@@ -1710,6 +5129,37 @@ def get_debrief():
         return jsonify({'error': 'Debrief not available'}), 404
 
 
+@app.route('/api/admin/stimuli/backfill_dimensions', methods=['POST'])
+@require_auth
+@require_roles(['admin', 'researcher'])
+def backfill_stimulus_dimensions():
+    """Fill width_px/height_px of stimuli uploaded before dimensions were recorded (header bytes only)."""
+    try:
+        limit = min(int(request.args.get('limit', 1000)), 10000)
+        stimuli = Stimulus.query.filter(Stimulus.width_px.is_(None)).limit(limit).all()
+        updated, unreadable = 0, []
+        for stimulus in stimuli:
+            try:
+                dimensions = read_image_dimensions(stimulus.file_path)
+            except OSError:
+                dimensions = None
+            if dimensions is None:
+                unreadable.append(str(stimulus.stimulus_id))
+                continue
+            stimulus.width_px, stimulus.height_px = dimensions
+            updated += 1
+        db.session.commit()
+        
+        log_audit('stimulus_dimensions_backfilled', 'admin', f'Backfilled dimensions of {updated} stimuli',
+                  {'updated': updated, 'unreadable': len(unreadable)})
+        
+        return jsonify({'success': True, 'updated': updated, 'unreadable': unreadable})
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error backfilling stimulus dimensions: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/admin/upload_consent', methods=['POST'])
 @require_auth
 @require_roles(['admin', 'researcher'])
@@ -1771,6 +5221,12 @@ def internal_error(e):
     return jsonify({'error': 'Internal server error'}), 500
 
 
+# Job worker threads inside this API process (scripts/job_worker.py runs
+# them as a separate process instead)
+if JOB_EMBEDDED_WORKERS > 0:
+    JobWorker(job_queue, concurrency=JOB_EMBEDDED_WORKERS, context=job_app_context).start()
+
+
 # ============================================================================
 # MAIN
 # ============================================================================
@@ -1779,6 +5235,7 @@ if __name__ == '__main__':
     # Create tables
     with app.app_context():
         db.create_all()
+        job_metadata.create_all(db.engine)
     
     # Run app
     app.run(
@@ -18,11 +18,206 @@ References:
 import numpy as np
 from scipy.stats import norm
 from scipy.optimize import minimize
-from typing import Tuple, List, Optional
+from typing import Tuple, List, Optional, Sequence
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import os
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+# Candidate pairs scored per block when scoring is chunked (bounds temporaries to a few MB)
+DEFAULT_BLOCK_PAIRS = 65536
+
+# Thread pool shared by all selectors for chunked scoring; NumPy/SciPy release
+# the GIL inside the scoring kernels, so blocks run on separate cores
+SCORING_THREADS = int(os.environ.get('SCORING_THREADS', os.cpu_count() or 1))
+_scoring_pool: Optional[ThreadPoolExecutor] = None
+_scoring_pool_lock = threading.Lock()
+
+
+def _get_scoring_pool() -> ThreadPoolExecutor:
+    global _scoring_pool
+    with _scoring_pool_lock:
+        if _scoring_pool is None:
+            _scoring_pool = ThreadPoolExecutor(max_workers=max(1, SCORING_THREADS),
+                                               thread_name_prefix='pair-scoring')
+        return _scoring_pool
+
+
+def information_gain(mu_diff, sigma_diff, epsilon: float):
+    """
+    Expected information gain of comparing items with the given mean difference
+    and standard deviation of the difference (scalars or arrays).
+
+    Information gain is highest when P(i > j) ≈ 0.5 (maximum uncertainty about
+    the outcome) and when the uncertainty in the difference is high.
+    """
+    p_i_over_j = norm.cdf(mu_diff / (epsilon + sigma_diff))
+    gain = -p_i_over_j * np.log2(p_i_over_j + 1e-10)
+    gain += -(1 - p_i_over_j) * np.log2(1 - p_i_over_j + 1e-10)
+    gain *= sigma_diff  # Weight by uncertainty
+    return gain
+
+
+def cholesky_upper(Sigma: np.ndarray, max_tries: int = 6) -> np.ndarray:
+    """
+    Upper-triangular U with U.T @ U = Sigma.
+    
+    Adds growing diagonal jitter if Sigma is not numerically positive definite.
+    """
+    jitter = 0.0
+    scale = float(np.mean(np.diag(Sigma))) or 1.0
+    for _ in range(max_tries):
+        try:
+            L = np.linalg.cholesky(Sigma + jitter * np.eye(len(Sigma)) if jitter else Sigma)
+            return np.ascontiguousarray(L.T)
+        except np.linalg.LinAlgError:
+            jitter = scale * 1e-10 if jitter == 0.0 else jitter * 100
+    raise np.linalg.LinAlgError("Covariance is not positive definite")
+
+
+def cholesky_downdate(U: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """
+    Rank-1 downdate of an upper Cholesky factor in O(n²), in place.
+    
+    Turns U (U.T @ U = A) into the factor of A - x xᵀ.
+    
+    Raises:
+        np.linalg.LinAlgError: if A - x xᵀ is not positive definite
+    """
+    x = np.array(x, dtype=float)
+    n = len(x)
+    for k in range(n):
+        r2 = U[k, k]**2 - x[k]**2
+        if r2 <= 0:
+            raise np.linalg.LinAlgError("Downdate makes the factor indefinite")
+        r = np.sqrt(r2)
+        c = r / U[k, k]
+        s = x[k] / U[k, k]
+        U[k, k] = r
+        if k + 1 < n:
+            U[k, k + 1:] = (U[k, k + 1:] - s * x[k + 1:]) / c
+            x[k + 1:] = c * x[k + 1:] - s * U[k, k + 1:]
+    return U
+
+
+def triu_row_blocks(n: int, block_pairs: int) -> List[Tuple[int, int]]:
+    """
+    Split the rows of the strict upper triangle of an n×n matrix into
+    contiguous [r0, r1) blocks holding about block_pairs pairs each (a single
+    row longer than block_pairs forms its own block).
+    """
+    blocks = []
+    r0, count = 0, 0
+    for r in range(n - 1):
+        count += n - 1 - r
+        if count >= block_pairs:
+            blocks.append((r0, r + 1))
+            r0, count = r + 1, 0
+    if r0 < n - 1:
+        blocks.append((r0, n - 1))
+    return blocks
+
+
+def triu_block_indices(n: int, r0: int, r1: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (rows, cols) of the upper-triangle pairs in rows [r0, r1), in the same
+    row-major order as np.triu_indices(n, k=1).
+    """
+    row_ids = np.arange(r0, r1)
+    counts = n - 1 - row_ids
+    rows = np.repeat(row_ids, counts)
+    starts = np.cumsum(counts) - counts
+    cols = np.arange(rows.size) - np.repeat(starts, counts) + rows + 1
+    return rows, cols
+
+
+def top_k_stability(state: 'BayesianPreferenceState', k: int) -> float:
+    """
+    Lower bound on the posterior probability that the current top-k set is correct.
+    
+    The set changes only if some item outside it beats some item inside it,
+    so by the union bound
+        P(stable) >= 1 - Σ_{i in top-k, j outside} P(u_j > u_i)
+    with P(u_j > u_i) = Φ(-(μᵢ - μⱼ) / sd(uᵢ - uⱼ)). Costs O(k·n).
+    """
+    n = state.n_items
+    if k <= 0 or k >= n:
+        return 1.0
+    order = np.argsort(-state.mu, kind='stable')
+    top, rest = order[:k], order[k:]
+    variances = np.diag(state.Sigma)
+    diff = state.mu[top][:, None] - state.mu[rest][None, :]
+    diff_var = variances[top][:, None] + variances[rest][None, :] - 2 * state.Sigma[np.ix_(top, rest)]
+    p_swap = norm.cdf(-diff / np.sqrt(np.maximum(diff_var, 1e-12)))
+    return float(max(0.0, 1.0 - p_swap.sum()))
+
+
+def expected_kendall_tau_change(state: 'BayesianPreferenceState', i: int, j: int,
+                                epsilon: float) -> float:
+    """
+    Expected change in Kendall's tau between the current ranking and the
+    ranking after comparing i and j.
+    
+    The mean update of update_beliefs only moves μᵢ and μⱼ, so only pairs
+    involving i or j can flip and each outcome is evaluated in O(n). The
+    change is 2·(discordant pairs) / (n(n-1)/2), averaged over both outcomes
+    weighted by their predictive probability.
+    """
+    n = state.n_items
+    mu, Sigma = state.mu, state.Sigma
+    mu_diff = mu[i] - mu[j]
+    sigma_diff = np.sqrt(Sigma[i, i] + Sigma[j, j] - 2 * Sigma[i, j] + epsilon**2)
+    z = mu_diff / sigma_diff
+    p_i = norm.cdf(z)
+    
+    others = np.ones(n, dtype=bool)
+    others[[i, j]] = False
+    mu_o = mu[others]
+    
+    expected = 0.0
+    for winner_is_i, p in ((True, p_i), (False, 1.0 - p_i)):
+        if winner_is_i:
+            dlnL_dz = norm.pdf(z) / (norm.cdf(z) + 1e-10)
+        else:
+            dlnL_dz = -norm.pdf(z) / (norm.cdf(-z) + 1e-10)
+        dmu = dlnL_dz / sigma_diff
+        new_i = mu[i] + Sigma[i, i] * dmu - Sigma[i, j] * dmu
+        new_j = mu[j] + Sigma[j, i] * dmu - Sigma[j, j] * dmu
+        
+        discordant = (np.count_nonzero((mu[i] > mu_o) != (new_i > mu_o))
+                      + np.count_nonzero((mu[j] > mu_o) != (new_j > mu_o))
+                      + int((mu[i] > mu[j]) != (new_i > new_j)))
+        expected += p * discordant
+    
+    return float(2.0 * expected / (n * (n - 1) / 2))
+
+
+def validate_stopping_config(config: Optional[dict]) -> None:
+    """
+    Check a stopping config (experiment_metadata['stopping']).
+    
+    Keys (all optional; a rule is off unless its threshold is set):
+    - top_k: size of the top set (default 3)
+    - top_k_stability: stop once P(top-k set stable) reaches this value
+    - kendall_tau_change: stop once the expected Kendall-tau change of the
+      next trial drops to this value
+    
+    Raises:
+        ValueError: for out-of-range values
+    """
+    config = config or {}
+    if int(config.get('top_k', 3)) < 1:
+        raise ValueError("top_k must be at least 1")
+    stability = config.get('top_k_stability')
+    if stability is not None and not 0 < float(stability) <= 1:
+        raise ValueError("top_k_stability must be in (0, 1]")
+    tau_change = config.get('kendall_tau_change')
+    if tau_change is not None and float(tau_change) < 0:
+        raise ValueError("kendall_tau_change must be non-negative")
+
 
 class BayesianPreferenceState:
     """
@@ -32,6 +227,9 @@ class BayesianPreferenceState:
     - mu: n-dimensional vector of preference means (higher = more preferred)
     - Sigma: n×n covariance matrix representing uncertainty
     - comparison_matrix: n×n matrix tracking which pairs have been compared
+    
+    cholesky_factor optionally caches an upper Cholesky factor of Sigma for
+    posterior sampling; update_beliefs keeps it in sync.
     """
     
     def __init__(self, n_items: int, prior_mean: float = 0.0, prior_variance: float = 1.0):
@@ -47,6 +245,7 @@ class BayesianPreferenceState:
         self.mu = np.ones(n_items) * prior_mean
         self.Sigma = np.eye(n_items) * prior_variance
         self.comparison_matrix = np.zeros((n_items, n_items), dtype=int)
+        self.cholesky_factor: Optional[np.ndarray] = None
         
         logger.info(f"Initialized Bayesian state: {n_items} items, "
                    f"prior μ={prior_mean}, σ²={prior_variance}")
@@ -100,16 +299,31 @@ class PureBayesianAdaptiveSelector:
     - Follows functional programming principles
     """
     
-    def __init__(self, epsilon: float = 0.01, exploration_weight: float = 0.1):
+    def __init__(self, epsilon: float = 0.01, exploration_weight: float = 0.1,
+                 time_budget_ms: Optional[float] = None, max_evaluations: Optional[int] = None,
+                 threads: Optional[int] = None, block_pairs: Optional[int] = None):
         """
         Initialize selector.
         
         Args:
             epsilon: Noise parameter in Bradley-Terry model (P(i>j) = Φ((μᵢ-μⱼ)/ε))
             exploration_weight: Weight for exploration vs exploitation (0=pure exploit, 1=pure explore)
+            time_budget_ms: If set, select_next_pair runs in anytime mode and
+                returns the best pair found within this many milliseconds
+            max_evaluations: If set, anytime mode scores at most this many pairs
+            threads: If > 1, exhaustive scoring is split into row blocks that
+                run on up to this many threads of the shared scoring pool
+            block_pairs: Pairs per block for chunked scoring (default
+                DEFAULT_BLOCK_PAIRS when threads > 1; setting it alone
+                bounds memory without threads)
         """
         self.epsilon = epsilon
         self.exploration_weight = exploration_weight
+        self.time_budget_ms = time_budget_ms
+        self.max_evaluations = max_evaluations
+        self.threads = threads
+        self.block_pairs = block_pairs
+        self.last_selection_info: Optional[dict] = None
         logger.info(f"Initialized selector: ε={epsilon}, exploration={exploration_weight}")
     
     def select_next_pair(self, state: BayesianPreferenceState) -> Tuple[int, int]:
@@ -122,6 +336,49 @@ class PureBayesianAdaptiveSelector:
             b. Calculate expected information gain
         2. Return pair with maximum expected information gain
         
+        All pairs are scored in one vectorized pass; ties go to the first
+        pair in (i, j) row-major order. When the selector has a time or
+        evaluation budget, select_next_pair_anytime is used instead and its
+        coverage report is kept in last_selection_info. With threads or
+        block_pairs set, scoring is chunked (select_next_pair_blocked); the
+        result is the same pair.
+        
+        Args:
+            state: Current Bayesian state
+            
+        Returns:
+            Tuple (i, j) where i and j are item indices
+        """
+        if self.time_budget_ms is not None or self.max_evaluations is not None:
+            pair, self.last_selection_info = self.select_next_pair_anytime(
+                state, self.time_budget_ms, self.max_evaluations)
+            return pair
+        
+        if (self.threads or 1) > 1 or self.block_pairs:
+            return self.select_next_pair_blocked(state)
+        
+        rows, cols = np.triu_indices(state.n_items, k=1)
+        scores = self.pair_scores(state, rows, cols)
+        
+        if scores.size == 0 or np.all(np.isnan(scores)):
+            return (0, 1)
+        
+        best = int(np.nanargmax(scores))
+        best_pair = (int(rows[best]), int(cols[best]))
+        
+        logger.debug(f"Selected pair {best_pair} with gain {scores[best]:.4f}")
+        return best_pair
+    
+    def select_next_pair_blocked(self, state: BayesianPreferenceState) -> Tuple[int, int]:
+        """
+        Exhaustive selection with the upper triangle scored in row blocks.
+        
+        Blocks are fixed by block_pairs (not by the thread count) and each
+        block reports its first maximum, so the reduction (highest score,
+        then earliest block) returns the same pair as select_next_pair for
+        any number of threads. Temporary arrays are bounded by the block
+        size times the number of threads instead of growing with n².
+        
         Args:
             state: Current Bayesian state
             
@@ -129,28 +386,159 @@ class PureBayesianAdaptiveSelector:
             Tuple (i, j) where i and j are item indices
         """
         n = state.n_items
+        blocks = triu_row_blocks(n, self.block_pairs or DEFAULT_BLOCK_PAIRS)
+        threads = min(max(1, self.threads or 1), len(blocks))
+        
+        def score_blocks(block_ids):
+            best = (-np.inf, None, None)
+            for b in block_ids:
+                rows, cols = triu_block_indices(n, *blocks[b])
+                scores = self.pair_scores(state, rows, cols)
+                scores[np.isnan(scores)] = -np.inf
+                k = int(np.argmax(scores))
+                if scores[k] > best[0]:
+                    best = (scores[k], b, (int(rows[k]), int(cols[k])))
+            return best
+        
+        if threads <= 1:
+            results = [score_blocks(range(len(blocks)))]
+        else:
+            # Thread t takes blocks t, t + threads, ...; at most `threads` blocks are live at once
+            pool = _get_scoring_pool()
+            results = list(pool.map(score_blocks, [range(t, len(blocks), threads)
+                                                   for t in range(threads)]))
+        
+        best_score, best_block, best_pair = -np.inf, None, (0, 1)
+        for score, block, pair in results:
+            if pair is None:
+                continue
+            if score > best_score or (score == best_score and block < best_block):
+                best_score, best_block, best_pair = score, block, pair
+        
+        logger.debug(f"Selected pair {best_pair} with gain {best_score:.4f} "
+                     f"({len(blocks)} blocks, {threads} threads)")
+        return best_pair
+    
+    def select_next_pair_anytime(self, state: BayesianPreferenceState,
+                                 time_budget_ms: Optional[float] = None,
+                                 max_evaluations: Optional[int] = None,
+                                 block_size: int = 4096) -> Tuple[Tuple[int, int], dict]:
+        """
+        Select a pair under a latency budget, keeping the best pair seen so far.
+        
+        Candidates are scored in priority order, in blocks of about block_size
+        pairs:
+        1. Rings of growing distance in the current μ ranking (neighbours at
+           distance 1, then 2-3, 4-7, ...), since close items are the most
+           informative to compare
+        2. Within a ring, items with the highest marginal variance first
         
-        # Calculate information gain for all possible pairs
-        max_gain = -np.inf
-        best_pair = (0, 1)
+        Every unordered pair is generated once, from its higher-variance
+        endpoint, so an unbounded run scores all pairs and finds the same
+        maximum as select_next_pair. The budget is checked after each block.
         
-        for i in range(n):
-            for j in range(i + 1, n):
-                # Calculate expected information gain for this pair
-                gain = self._expected_information_gain(i, j, state)
+        Args:
+            state: Current Bayesian state
+            time_budget_ms: Stop once this much time has elapsed (None = no limit)
+            max_evaluations: Stop after scoring this many pairs (None = no limit)
+            block_size: Pairs scored per vectorized block
+            
+        Returns:
+            ((i, j), info) where info reports evaluated, total_pairs, coverage
+            (evaluated / total_pairs), elapsed_ms and stopped_by ('time',
+            'evaluations' or None when every pair was scored)
+        """
+        start = time.perf_counter()
+        n = state.n_items
+        total_pairs = n * (n - 1) // 2
+        deadline = None if time_budget_ms is None else start + time_budget_ms / 1000.0
+        
+        # Priority of each item: position in descending marginal variance
+        by_variance = np.argsort(-np.diag(state.Sigma), kind='stable')
+        priority = np.empty(n, dtype=np.int64)
+        priority[by_variance] = np.arange(n)
+        
+        by_mu = np.argsort(state.mu, kind='stable')
+        mu_rank = np.empty(n, dtype=np.int64)
+        mu_rank[by_mu] = np.arange(n)
+        
+        best_pair, best_score = (0, 1), -np.inf
+        evaluated = 0
+        stopped_by = None
+        
+        lo = 1
+        while lo < n and stopped_by is None:
+            hi = min(2 * lo, n)
+            offsets = np.concatenate([np.arange(lo, hi), -np.arange(lo, hi)])
+            anchors_per_block = max(1, block_size // len(offsets))
+            
+            for a0 in range(0, n, anchors_per_block):
+                anchors = by_variance[a0:a0 + anchors_per_block]
+                partner_rank = mu_rank[anchors][:, None] + offsets[None, :]
+                valid = (partner_rank >= 0) & (partner_rank < n)
+                a = np.broadcast_to(anchors[:, None], partner_rank.shape)[valid]
+                b = by_mu[partner_rank[valid]]
+                keep = priority[a] < priority[b]
+                a, b = a[keep], b[keep]
                 
-                # Add exploration bonus (favors less-compared pairs)
-                comparisons = state.comparison_matrix[i, j] + state.comparison_matrix[j, i]
-                exploration_bonus = self.exploration_weight / (1 + comparisons)
+                if max_evaluations is not None and evaluated + a.size >= max_evaluations:
+                    a, b = a[:max_evaluations - evaluated], b[:max_evaluations - evaluated]
+                    stopped_by = 'evaluations'
                 
-                total_score = gain + exploration_bonus
+                if a.size:
+                    scores = self.pair_scores(state, a, b)
+                    scores[np.isnan(scores)] = -np.inf
+                    k = int(np.argmax(scores))
+                    if scores[k] > best_score:
+                        best_score = scores[k]
+                        best_pair = (int(min(a[k], b[k])), int(max(a[k], b[k])))
+                    evaluated += a.size
                 
-                if total_score > max_gain:
-                    max_gain = total_score
-                    best_pair = (i, j)
+                if stopped_by is None and deadline is not None and time.perf_counter() >= deadline:
+                    stopped_by = 'time'
+                if stopped_by is not None:
+                    break
+            lo = hi
         
-        logger.debug(f"Selected pair {best_pair} with gain {max_gain:.4f}")
-        return best_pair
+        if evaluated >= total_pairs:
+            stopped_by = None
+        
+        info = {
+            'evaluated': int(evaluated),
+            'total_pairs': int(total_pairs),
+            'coverage': evaluated / total_pairs if total_pairs else 1.0,
+            'elapsed_ms': (time.perf_counter() - start) * 1000.0,
+            'stopped_by': stopped_by,
+        }
+        
+        logger.debug(f"Anytime selection {best_pair}: scored {evaluated}/{total_pairs} pairs "
+                     f"in {info['elapsed_ms']:.1f}ms")
+        return best_pair, info
+    
+    def pair_scores(self, state: BayesianPreferenceState,
+                    rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """
+        Score candidate pairs (rows[k], cols[k]).
+        
+        Score = expected information gain + exploration bonus, where the bonus
+        favors less-compared pairs.
+        
+        Args:
+            state: Current Bayesian state
+            rows, cols: Item indices of the candidate pairs
+            
+        Returns:
+            Array of scores, one per candidate pair
+        """
+        mu_diff = state.mu[rows] - state.mu[cols]
+        sigma_diff = np.sqrt(state.Sigma[rows, rows] + state.Sigma[cols, cols]
+                             - 2 * state.Sigma[rows, cols])
+        gain = information_gain(mu_diff, sigma_diff, self.epsilon)
+        
+        comparisons = state.comparison_matrix[rows, cols] + state.comparison_matrix[cols, rows]
+        exploration_bonus = self.exploration_weight / (1 + comparisons)
+        
+        return gain + exploration_bonus
     
     def _expected_information_gain(self, i: int, j: int, state: BayesianPreferenceState) -> float:
         """
@@ -174,16 +562,7 @@ class PureBayesianAdaptiveSelector:
         # Uncertainty in the difference (from covariance)
         sigma_diff = np.sqrt(state.Sigma[i, i] + state.Sigma[j, j] - 2 * state.Sigma[i, j])
         
-        # Probability that i is preferred over j
-        p_i_over_j = norm.cdf(mu_diff / (self.epsilon + sigma_diff))
-        
-        # Information gain is highest when p ≈ 0.5 (maximum uncertainty about outcome)
-        # and when uncertainty (sigma_diff) is high
-        gain = -p_i_over_j * np.log2(p_i_over_j + 1e-10)
-        gain += -(1 - p_i_over_j) * np.log2(1 - p_i_over_j + 1e-10)
-        gain *= sigma_diff  # Weight by uncertainty
-        
-        return gain
+        return information_gain(mu_diff, sigma_diff, self.epsilon)
     
     def update_beliefs(self, state: BayesianPreferenceState, 
                        i: int, j: int, winner: int) -> BayesianPreferenceState:
@@ -246,6 +625,14 @@ class PureBayesianAdaptiveSelector:
         Sigma_v = state.Sigma @ v
         state.Sigma -= info_gain * np.outer(Sigma_v, Sigma_v) / (1 + info_gain * v @ Sigma_v)
         
+        # Same rank-1 change applied to the cached factor (recomputed on demand if it fails)
+        if state.cholesky_factor is not None:
+            try:
+                cholesky_downdate(state.cholesky_factor,
+                                  Sigma_v * np.sqrt(info_gain / (1 + info_gain * v @ Sigma_v)))
+            except np.linalg.LinAlgError:
+                state.cholesky_factor = None
+        
         logger.debug(f"Updated beliefs: {winner} chosen over {i if winner==j else j}, "
                     f"μ_diff={mu_diff:.3f}, p={p_obs:.3f}")
         
@@ -274,6 +661,179 @@ class PureBayesianAdaptiveSelector:
             logger.info(f"Converged: max uncertainty {max_uncertainty:.4f} < {threshold}")
         
         return converged
+    
+    def check_stopping(self, state: BayesianPreferenceState, config: Optional[dict],
+                       trials_completed: int, min_trials: int = 0,
+                       next_pair: Optional[Tuple[int, int]] = None) -> Optional[str]:
+        """
+        Evaluate the ranking-stability stopping rules (see validate_stopping_config).
+        
+        Args:
+            state: Current Bayesian state
+            config: Stopping config; rules without a threshold are skipped
+            trials_completed: Trials done so far
+            min_trials: No rule fires before this many trials
+            next_pair: Pair that would be presented next (needed for the
+                Kendall-tau rule)
+            
+        Returns:
+            'top_k_stable', 'ranking_stable' or None to continue
+        """
+        config = config or {}
+        if trials_completed < min_trials:
+            return None
+        
+        if config.get('top_k_stability') is not None:
+            k = int(config.get('top_k', 3))
+            if top_k_stability(state, k) >= float(config['top_k_stability']):
+                logger.info(f"Stopping: top-{k} set stable after {trials_completed} trials")
+                return 'top_k_stable'
+        
+        if config.get('kendall_tau_change') is not None and next_pair is not None:
+            change = expected_kendall_tau_change(state, next_pair[0], next_pair[1], self.epsilon)
+            if change <= float(config['kendall_tau_change']):
+                logger.info(f"Stopping: expected Kendall-tau change {change:.5f} "
+                            f"after {trials_completed} trials")
+                return 'ranking_stable'
+        
+        return None
+
+
+class ThompsonSamplingSelector(PureBayesianAdaptiveSelector):
+    """
+    Pair selector based on posterior samples instead of scoring all pairs.
+    
+    Each selection draws utilities from N(μ, Σ) using the Cholesky factor
+    cached on the state (computed once in O(n³), then kept current by O(n²)
+    downdates in update_beliefs). Beyond sampling, selection is O(n log n).
+    
+    Targets:
+    - 'ranking': the most uncertain item is compared with the most uncertain
+      of its top_k neighbours on either side in the sampled ordering
+    - 'top': the top item of the first sample is compared with the most
+      uncertain of the top_k items of the last sample (best-item search;
+      the rest of the ranking is learned slowly)
+    """
+    
+    def __init__(self, epsilon: float = 0.01, exploration_weight: float = 0.1,
+                 n_samples: int = 1, top_k: int = 3, target: str = 'ranking', seed=None):
+        """
+        Initialize selector.
+        
+        Args:
+            epsilon: Noise parameter in Bradley-Terry model
+            exploration_weight: Kept for interface compatibility (not used in selection)
+            n_samples: Posterior samples per selection ('top' uses the first
+                and last sample for leader and challengers)
+            top_k: Number of sampled neighbours / top items considered as challengers
+            target: 'ranking' or 'top'
+            seed: Seed for the sampling RNG
+        """
+        if target not in ('ranking', 'top'):
+            raise ValueError(f"Unknown Thompson sampling target: {target}")
+        super().__init__(epsilon=epsilon, exploration_weight=exploration_weight)
+        self.n_samples = max(1, int(n_samples))
+        self.top_k = max(1, int(top_k))
+        self.target = target
+        self.rng = np.random.default_rng(seed)
+    
+    def sample_utilities(self, state: BayesianPreferenceState, n_samples: int = 1) -> np.ndarray:
+        """
+        Draw (n_samples, n) utility samples from the current posterior.
+        """
+        if state.cholesky_factor is None:
+            state.cholesky_factor = cholesky_upper(state.Sigma)
+        z = self.rng.standard_normal((n_samples, state.n_items))
+        return state.mu + z @ state.cholesky_factor
+    
+    def select_next_pair(self, state: BayesianPreferenceState) -> Tuple[int, int]:
+        """
+        Select a leader and its most uncertain challenger from posterior samples.
+        
+        Args:
+            state: Current Bayesian state
+            
+        Returns:
+            Tuple (i, j) with i < j
+        """
+        n = state.n_items
+        if n <= 2:
+            return (0, 1)
+        
+        samples = self.sample_utilities(state, self.n_samples)
+        variances = np.diag(state.Sigma)
+        
+        if self.target == 'top':
+            leader = int(np.argmax(samples[0]))
+            k = min(self.top_k + 1, n)
+            candidates = np.argpartition(-samples[-1], k - 1)[:k]
+        else:
+            most_uncertain = np.flatnonzero(variances >= variances.max() * (1 - 1e-9))
+            leader = int(self.rng.choice(most_uncertain))
+            order = np.argsort(-samples[-1], kind='stable')
+            pos = int(np.flatnonzero(order == leader)[0])
+            candidates = order[max(0, pos - self.top_k):pos + self.top_k + 1]
+        candidates = candidates[candidates != leader]
+        
+        diff_var = variances[leader] + variances[candidates] - 2 * state.Sigma[leader, candidates]
+        challenger = int(candidates[np.argmax(diff_var)])
+        
+        logger.debug(f"Thompson selection: leader {leader}, challenger {challenger}")
+        return (min(leader, challenger), max(leader, challenger))
+
+
+def _thompson_seed(seed, entropy):
+    if seed is None:
+        return None
+    return [int(seed)] + [int(e) for e in entropy] if entropy else int(seed)
+
+
+def selector_from_config(config: Optional[dict], epsilon: float = 0.01,
+                         exploration_weight: float = 0.1,
+                         seed_entropy: Optional[Sequence[int]] = None) -> PureBayesianAdaptiveSelector:
+    """
+    Build a selector from a selection config (experiment_metadata['selection']).
+    
+    Config keys (all optional):
+    - strategy: 'eig' (default, expected information gain) or 'thompson'
+    - time_budget_ms, max_evaluations: anytime budget for 'eig'
+    - threads, block_pairs: chunked multi-threaded scoring for 'eig'
+    - n_samples, top_k, target, seed: sampling parameters for 'thompson'
+    
+    A configured seed is combined with seed_entropy (non-negative ints,
+    e.g. session and trial): a selector rebuilt for every selection would
+    otherwise draw the same samples each time. Without a seed the RNG is
+    seeded from the OS.
+    
+    Raises:
+        ValueError: for an unknown strategy or target
+    """
+    config = config or {}
+    strategy = config.get('strategy', 'eig')
+    
+    if strategy == 'thompson':
+        return ThompsonSamplingSelector(
+            epsilon=epsilon,
+            exploration_weight=exploration_weight,
+            n_samples=int(config.get('n_samples', 1)),
+            top_k=int(config.get('top_k', 3)),
+            target=config.get('target', 'ranking'),
+            seed=_thompson_seed(config.get('seed'), seed_entropy)
+        )
+    if strategy == 'eig':
+        time_budget_ms = config.get('time_budget_ms')
+        max_evaluations = config.get('max_evaluations')
+        threads = config.get('threads')
+        block_pairs = config.get('block_pairs')
+        return PureBayesianAdaptiveSelector(
+            epsilon=epsilon,
+            exploration_weight=exploration_weight,
+            time_budget_ms=float(time_budget_ms) if time_budget_ms is not None else None,
+            max_evaluations=int(max_evaluations) if max_evaluations is not None else None,
+            threads=int(threads) if threads is not None else None,
+            block_pairs=int(block_pairs) if block_pairs is not None else None
+        )
+    raise ValueError(f"Unknown selection strategy: {strategy}")
 
 
 class ExperimentSession:
@@ -288,7 +848,9 @@ class ExperimentSession:
     
     def __init__(self, n_items: int, max_trials: int = 50, 
                  selector: Optional[PureBayesianAdaptiveSelector] = None,
-                 prior_mean: float = 0.0, prior_variance: float = 1.0):
+                 prior_mean: float = 0.0, prior_variance: float = 1.0,
+                 min_trials: int = 0, stopping: Optional[dict] = None,
+                 convergence_threshold: float = 0.05):
         """
         Initialize experiment session.
         
@@ -298,12 +860,20 @@ class ExperimentSession:
             selector: Pair selector (if None, uses default)
             prior_mean: Prior mean preference
             prior_variance: Prior variance
+            min_trials: Trials before any early stopping rule may fire
+            stopping: Ranking-stability stopping config (see validate_stopping_config)
+            convergence_threshold: Max marginal SD for convergence
         """
+        validate_stopping_config(stopping)
         self.state = BayesianPreferenceState(n_items, prior_mean, prior_variance)
         self.selector = selector or PureBayesianAdaptiveSelector()
         self.max_trials = max_trials
+        self.min_trials = min_trials
+        self.stopping = stopping or {}
+        self.convergence_threshold = convergence_threshold
         self.trial_count = 0
         self.choices = []
+        self.stop_reason: Optional[str] = None
         
         logger.info(f"Started session: {n_items} items, max {max_trials} trials")
     
@@ -316,13 +886,22 @@ class ExperimentSession:
         """
         if self.trial_count >= self.max_trials:
             logger.info(f"Session complete: reached max trials ({self.max_trials})")
+            self.stop_reason = 'max_trials'
             return None
         
-        if self.selector.check_convergence(self.state):
+        if self.selector.check_convergence(self.state, self.convergence_threshold):
             logger.info(f"Session complete: converged after {self.trial_count} trials")
+            self.stop_reason = 'converged'
             return None
         
         pair = self.selector.select_next_pair(self.state)
+        
+        stop_reason = self.selector.check_stopping(self.state, self.stopping, self.trial_count,
+                                                   self.min_trials, next_pair=pair)
+        if stop_reason:
+            self.stop_reason = stop_reason
+            return None
+        
         return pair
     
     def record_choice(self, i: int, j: int, winner: int, response_time_ms: Optional[int] = None):
@@ -366,7 +945,8 @@ class ExperimentSession:
             'preferences': preferences,
             'uncertainties': uncertainties,
             'choices': self.choices,
-            'converged': self.selector.check_convergence(self.state)
+            'converged': self.selector.check_convergence(self.state, self.convergence_threshold),
+            'stop_reason': self.stop_reason
         }
 
 
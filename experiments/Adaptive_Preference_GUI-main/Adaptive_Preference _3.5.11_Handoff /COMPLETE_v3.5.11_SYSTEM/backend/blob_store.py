@@ -0,0 +1,142 @@
+"""
+Content-Addressed Stimulus Store
+Version: 3.1
+
+Stimulus files are stored once per distinct content, keyed by their SHA-256
+digest, in sharded directories: <root>/ab/cd/abcd…. Identical images
+uploaded to several experiments share one blob. Since a blob's content
+never changes, URLs derived from the digest can be cached forever.
+
+This module only handles files. Which blobs are still referenced is tracked
+in the stimulus_blobs table (see api.py), which decides when a blob may be
+removed.
+"""
+
+import glob
+import hashlib
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from backend.ingest import CHUNK_SIZE, discard, read_image_dimensions, stream_to_temp
+except ImportError:
+    from ingest import CHUNK_SIZE, discard, read_image_dimensions, stream_to_temp
+
+
+def is_sha256(value: str) -> bool:
+    return len(value) == 64 and all(c in '0123456789abcdef' for c in value)
+
+
+def hash_file(path: str, chunk_size: int = CHUNK_SIZE) -> Tuple[str, int]:
+    """(SHA-256 hex digest, size in bytes) of a file."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+class BlobStore:
+    """
+    Sharded directory of blobs named by their SHA-256 digest.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.tmp_dir = os.path.join(root, '.tmp')
+
+    def path_for(self, sha256: str) -> str:
+        if not is_sha256(sha256):
+            raise ValueError(f"Not a SHA-256 digest: {sha256!r}")
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def exists(self, sha256: str) -> bool:
+        return os.path.exists(self.path_for(sha256))
+
+    def stage(self, stream: BinaryIO) -> Tuple[str, dict]:
+        """
+        Copy a stream into the store's temporary directory (one pass, see
+        ingest.stream_to_temp). Returns (temporary path, ingest info); commit
+        or discard the temporary file afterwards.
+        """
+        return stream_to_temp(stream, self.tmp_dir)
+
+    def commit(self, tmp_path: str, sha256: str) -> str:
+        """
+        Move a staged file to its blob path, or drop it if the blob already
+        exists (deduplication). Returns the blob path.
+        """
+        path = self.path_for(sha256)
+        if os.path.exists(path):
+            discard(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        return path
+
+    def import_file(self, source_path: str, sha256: str) -> Tuple[str, bool]:
+        """
+        Add an existing file to the store under its digest, hard-linking it
+        (or copying across filesystems) so the source stays in place until
+        the caller removes it.
+
+        Returns:
+            (blob path, whether the blob already existed)
+        """
+        path = self.path_for(sha256)
+        if os.path.exists(path):
+            return path, True
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            os.link(source_path, path)
+        except OSError:
+            os.makedirs(self.tmp_dir, exist_ok=True)
+            tmp_path = os.path.join(self.tmp_dir, f'.import-{sha256}')
+            shutil.copyfile(source_path, tmp_path)
+            os.replace(tmp_path, path)
+        return path, False
+
+    def iter_blobs(self) -> Iterable[Tuple[str, str]]:
+        """(digest, path) of every stored blob."""
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+            for name in filenames:
+                if is_sha256(name):
+                    yield name, os.path.join(dirpath, name)
+
+    def delete(self, sha256: str) -> bool:
+        """Remove a blob file and its derivatives (<blob>.<variant>.<ext>). Returns whether the blob existed."""
+        path = self.path_for(sha256)
+        for derivative in glob.glob(glob.escape(path) + '.*'):
+            discard(derivative)
+        try:
+            os.unlink(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+
+def hash_files(paths: Iterable[str], workers: Optional[int] = None) -> Dict[str, dict]:
+    """
+    Hash files in parallel (hashlib releases the GIL on large buffers, so
+    threads scale with disks and cores).
+
+    Returns:
+        path -> {sha256, size_bytes, width, height}, or {error} if unreadable
+    """
+    def describe(path):
+        try:
+            sha256, size = hash_file(path)
+            dimensions = read_image_dimensions(path)
+        except OSError as e:
+            return path, {'error': str(e)}
+        width, height = dimensions if dimensions else (None, None)
+        return path, {'sha256': sha256, 'size_bytes': size, 'width': width, 'height': height}
+
+    paths: List[str] = list(paths)
+    with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) * 4)) as pool:
+        return dict(pool.map(describe, paths))
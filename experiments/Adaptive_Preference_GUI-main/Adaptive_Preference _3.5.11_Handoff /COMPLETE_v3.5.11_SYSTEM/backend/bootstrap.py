@@ -0,0 +1,228 @@
+"""
+Session Bootstrap for Pooled Rankings
+Version: 3.1
+
+Uncertainty of the pooled paired-comparison ranking (see pooled_ranking.py)
+by resampling whole sessions with replacement. Choices within a session are
+not independent (same subject, adaptively chosen pairs), so sessions are the
+resampling unit.
+
+Per-session win counts are stored once as a sparse tensor of
+(session, cell, count) entries, cell = i * n + j. A replicate draws
+multinomial session weights and aggregates the tensor into its win-count
+matrix with one weighted bincount, then refits from the point estimate.
+
+Replicates run in chunks on a process pool. The sparse tensor is placed in a
+shared memory block that workers attach to, so it is not pickled per task.
+Results are accumulated as chunks finish, and a progress callback can read
+partial percentile intervals and rank probabilities at any time.
+"""
+
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from typing import Callable, Optional
+
+import numpy as np
+
+try:
+    from backend.pooled_ranking import fit_paired_comparison
+except ImportError:
+    from pooled_ranking import fit_paired_comparison
+
+logger = logging.getLogger(__name__)
+
+# Replicates per pool task
+CHUNK_REPLICATES = 25
+
+# Set in each spawned worker process by _init_worker; inline runs pass
+# their own dict instead, so concurrent runs in one process do not collide
+_worker = {}
+
+
+def session_win_tensor(session_index: np.ndarray, winners: np.ndarray, losers: np.ndarray,
+                       n_items: int):
+    """
+    Sparse per-session win counts.
+
+    Args:
+        session_index: Session number (0..S-1) of each choice
+        winners, losers: Stimulus indices of each choice
+
+    Returns:
+        (sessions, cells, counts): one entry per distinct (session, i, j),
+        cell = i * n_items + j
+    """
+    n_cells = n_items * n_items
+    keys = (np.asarray(session_index, dtype=np.int64) * n_cells
+            + np.asarray(winners, dtype=np.int64) * n_items
+            + np.asarray(losers, dtype=np.int64))
+    unique, counts = np.unique(keys, return_counts=True)
+    return unique // n_cells, unique % n_cells, counts.astype(float)
+
+
+def _init_worker(shm_name, length, n_items, n_sessions, model, init_scores):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    data = np.ndarray((3, length), dtype=np.float64, buffer=shm.buf)
+    _worker.update({
+        'shm': shm,  # keep the mapping alive
+        'sessions': data[0].astype(np.int64),
+        'cells': data[1].astype(np.int64),
+        'counts': data[2],
+        'n_items': n_items,
+        'n_sessions': n_sessions,
+        'model': model,
+        'init_scores': init_scores,
+    })
+
+
+def _bootstrap_chunk(seeds, data=None):
+    """
+    Fit one replicate per seed; returns a (len(seeds), n) array of scores.
+    data holds the tensor and fit settings (default: the worker's _worker).
+    """
+    data = _worker if data is None else data
+    n = data['n_items']
+    S = data['n_sessions']
+    scores = np.empty((len(seeds), n))
+    for r, seed in enumerate(seeds):
+        rng = np.random.default_rng(seed)
+        weights = rng.multinomial(S, np.full(S, 1.0 / S)).astype(float)
+        wins = np.bincount(data['cells'], weights=data['counts'] * weights[data['sessions']],
+                           minlength=n * n).reshape(n, n)
+        scores[r] = fit_paired_comparison(wins, data['model'], init=data['init_scores'])['scores']
+    return scores
+
+
+class BootstrapAccumulator:
+    """
+    Running collection of replicate scores and rank counts.
+    """
+
+    def __init__(self, n_items: int, confidence: float = 0.95):
+        self.n_items = n_items
+        self.confidence = confidence
+        self._scores = []
+        self.rank_counts = np.zeros((n_items, n_items), dtype=np.int64)
+        self.completed = 0
+
+    def add(self, scores: np.ndarray) -> None:
+        """Add a (k, n) block of replicate scores."""
+        ranks = np.argsort(np.argsort(-scores, axis=1, kind='stable'), axis=1)
+        np.add.at(self.rank_counts, (np.tile(np.arange(self.n_items), len(scores)), ranks.ravel()), 1)
+        self._scores.append(scores)
+        self.completed += len(scores)
+
+    def summary(self) -> dict:
+        """
+        Percentile intervals and rank probabilities of the replicates so far.
+
+        Returns:
+            Dict with replicates, confidence, lower/median/upper score
+            percentiles and rank_probabilities[i][r] = P(item i has rank r+1)
+            (each an array over items), or only replicates=0 when empty
+        """
+        if not self.completed:
+            return {'replicates': 0, 'confidence': self.confidence}
+        scores = np.concatenate(self._scores)
+        alpha = (1 - self.confidence) / 2
+        lower, median, upper = np.quantile(scores, [alpha, 0.5, 1 - alpha], axis=0)
+        return {
+            'replicates': self.completed,
+            'confidence': self.confidence,
+            'lower': lower,
+            'median': median,
+            'upper': upper,
+            'rank_probabilities': self.rank_counts / self.completed,
+        }
+
+
+def run_bootstrap(session_index: np.ndarray, winners: np.ndarray, losers: np.ndarray,
+                  n_items: int, model: str = 'bradley_terry', n_replicates: int = 1000,
+                  confidence: float = 0.95, seed: int = 0, workers: Optional[int] = None,
+                  on_progress: Optional[Callable[[BootstrapAccumulator], None]] = None,
+                  chunk_replicates: int = CHUNK_REPLICATES) -> dict:
+    """
+    Session bootstrap of the pooled ranking.
+
+    Each replicate has its own seed derived from `seed`, so results do not
+    depend on the number of workers or the order chunks finish in.
+
+    Args:
+        session_index: Session number (0..S-1) of each choice
+        winners, losers: Stimulus indices of each choice
+        n_items: Number of stimuli
+        model: 'bradley_terry' or 'thurstone'
+        n_replicates: Bootstrap replicates
+        confidence: Central interval coverage
+        seed: Seed for the session resampling
+        workers: Worker processes (default: CPU count; 1 runs inline)
+        on_progress: Called with the accumulator after every finished chunk;
+            an exception it raises stops the run
+        chunk_replicates: Replicates per pool task
+
+    Returns:
+        The accumulator summary plus scores (the point estimate), n_sessions,
+        n_choices and elapsed_s
+    """
+    start = time.perf_counter()
+    sessions, cells, counts = session_win_tensor(session_index, winners, losers, n_items)
+    n_sessions = int(session_index.max()) + 1 if len(session_index) else 0
+    if n_sessions < 2:
+        raise ValueError("The bootstrap needs choices from at least 2 sessions")
+
+    full_wins = np.bincount(cells, weights=counts, minlength=n_items * n_items).reshape(n_items, n_items)
+    point = fit_paired_comparison(full_wins, model)['scores']
+
+    seeds = [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(n_replicates)]
+    chunks = [seeds[k:k + chunk_replicates] for k in range(0, n_replicates, chunk_replicates)]
+    accumulator = BootstrapAccumulator(n_items, confidence)
+
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+    if workers <= 1:
+        data = {'sessions': sessions, 'cells': cells, 'counts': counts, 'n_items': n_items,
+                'n_sessions': n_sessions, 'model': model, 'init_scores': point}
+        for chunk in chunks:
+            accumulator.add(_bootstrap_chunk(chunk, data))
+            if on_progress:
+                on_progress(accumulator)
+    else:
+        length = len(cells)
+        shm = shared_memory.SharedMemory(create=True, size=3 * length * 8)
+        try:
+            data = np.ndarray((3, length), dtype=np.float64, buffer=shm.buf)
+            data[0], data[1], data[2] = sessions, cells, counts
+            ctx = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                                     initargs=(shm.name, length, n_items, n_sessions, model, point)) as pool:
+                futures = [pool.submit(_bootstrap_chunk, chunk) for chunk in chunks]
+                try:
+                    for future in as_completed(futures):
+                        accumulator.add(future.result())
+                        if on_progress:
+                            on_progress(accumulator)
+                except BaseException:
+                    # e.g. on_progress cancelling the run: drop the chunks not started
+                    for future in futures:
+                        future.cancel()
+                    raise
+            del data
+        finally:
+            shm.close()
+            shm.unlink()
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"Bootstrap: {n_replicates} replicates over {n_sessions} sessions "
+                f"in {elapsed:.2f}s ({workers} workers)")
+
+    result = accumulator.summary()
+    result.update({
+        'scores': point,
+        'n_sessions': n_sessions,
+        'n_choices': int(len(winners)),
+        'elapsed_s': elapsed,
+    })
+    return result
@@ -0,0 +1,117 @@
+"""
+Bulk Stimulus Import
+Version: 3.1
+
+Stages many stimulus files at once: the members of a zip archive or the
+files of a multi-file form. Each file is streamed into the blob store's
+temporary directory (hashing and header probing in the same pass, see
+ingest.stream_to_temp) on a thread pool, since hashlib and file I/O
+release the GIL. Database rows are written by the caller (api.py) in one
+transaction from the staged results.
+"""
+
+import os
+import posixpath
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import BinaryIO, Callable, List, Optional, Tuple
+
+try:
+    from backend.ingest import discard
+except ImportError:
+    from ingest import discard
+
+MAX_IMPORT_FILES = 1000
+
+# A source is (filename, opener); the opener returns a readable binary stream
+Source = Tuple[str, Callable[[], BinaryIO]]
+
+
+def _extension(filename: str) -> str:
+    return filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+
+
+def archive_sources(archive: zipfile.ZipFile, allowed_extensions, max_file_bytes: int) -> Tuple[List[Source], List[dict]]:
+    """
+    Image members of a zip archive, in archive order. Directories, hidden
+    files and macOS resource forks are skipped silently.
+
+    Returns:
+        (sources, rejected) where rejected lists {filename, error} for
+        members with another extension or a declared size over
+        max_file_bytes (checked before anything is decompressed)
+    """
+    sources, rejected = [], []
+    # Member reads share the archive file under zipfile's own lock; opening a
+    # member (local header parsing) is serialized here
+    open_lock = threading.Lock()
+
+    def opener(info):
+        with open_lock:
+            return archive.open(info)
+
+    for info in archive.infolist():
+        if info.is_dir():
+            continue
+        name = posixpath.basename(info.filename)
+        if not name or name.startswith('.') or info.filename.startswith('__MACOSX/'):
+            continue
+        if _extension(name) not in allowed_extensions:
+            rejected.append({'filename': info.filename, 'error': 'Invalid file type'})
+        elif info.file_size > max_file_bytes:
+            rejected.append({'filename': info.filename, 'error': f'File exceeds {max_file_bytes} bytes'})
+        else:
+            sources.append((info.filename, lambda info=info: opener(info)))
+    return sources, rejected
+
+
+def stage_sources(store, sources: List[Source], max_file_bytes: int,
+                  workers: Optional[int] = None,
+                  on_staged: Optional[Callable[[int, int], None]] = None) -> List[dict]:
+    """
+    Stage every source in the blob store in parallel. on_staged(done, total)
+    is called as files finish; if it raises, the remaining files are not
+    staged and the staged ones are discarded.
+
+    Returns:
+        One dict per source, in order: {filename, tmp_path, size_bytes,
+        sha256, width, height} or {filename, error}. Staged temporary files
+        belong to the caller (commit or discard them).
+    """
+    def stage(source):
+        filename, opener = source
+        try:
+            with opener() as stream:
+                tmp_path, info = store.stage(stream)
+        except (OSError, zipfile.BadZipFile, EOFError) as e:
+            return {'filename': filename, 'error': f'Could not read file: {e}'}
+        if info['size_bytes'] > max_file_bytes:
+            discard(tmp_path)
+            return {'filename': filename, 'error': f'File exceeds {max_file_bytes} bytes'}
+        if info['size_bytes'] == 0:
+            discard(tmp_path)
+            return {'filename': filename, 'error': 'Empty file'}
+        return dict(info, filename=filename, tmp_path=tmp_path)
+
+    if not sources:
+        return []
+    with ThreadPoolExecutor(max_workers=workers or min(16, (os.cpu_count() or 1) * 2)) as pool:
+        futures = [pool.submit(stage, source) for source in sources]
+        try:
+            if on_staged:
+                for done, _ in enumerate(as_completed(futures), start=1):
+                    on_staged(done, len(futures))
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            discard_staged([future.result() for future in futures if not future.cancelled()])
+            raise
+        return [future.result() for future in futures]
+
+
+def discard_staged(staged: List[dict]) -> None:
+    """Remove the temporary files of staged results that were not committed."""
+    for item in staged:
+        if item.get('tmp_path'):
+            discard(item['tmp_path'])
@@ -0,0 +1,208 @@
+"""
+Route-Class Bulkheads
+Version: 3.1
+
+Keeps researcher traffic (library edits, results, exports, simulations)
+from slowing subjects down mid-session. Every request belongs to a route
+class with its own concurrency limit: a request waits at most queue_timeout
+seconds for a free slot of its class, and only while fewer than max_queue
+requests of that class are already waiting; otherwise it is rejected. A
+class can therefore never hold more than limit + max_queue request threads,
+and the rest stay free for the other classes. (api.py also gives each class
+its own database connection pool.)
+
+Subject latency is tracked against an SLO: the given percentile of request
+latencies over a sliding window. While it is breached, requests of
+sheddable classes are rejected before they queue, so the API answers them
+with a fast 503 instead of running work that competes with subjects for
+CPU and database connections.
+
+Limits are per process; with threaded servers (gunicorn gthread) keep the
+threads per process above the sum of limit + max_queue of the non-critical
+classes.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+# Samples kept by LatencySLO regardless of the window, and how long a
+# computed percentile is reused
+MAX_LATENCY_SAMPLES = 10000
+PERCENTILE_CACHE_SECONDS = 1.0
+
+# Retry-After for shed requests; the SLO window has to roll over first
+SHED_RETRY_AFTER = 5
+
+
+class Rejected(Exception):
+    """A request was not admitted: reason is 'queue_full', 'queue_timeout' or 'shed'."""
+
+    def __init__(self, route_class: str, reason: str, retry_after: int = 1):
+        super().__init__(f'{route_class}: {reason}')
+        self.route_class = route_class
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Bulkhead:
+    """
+    Concurrency limit with a bounded, time-limited wait queue for one route
+    class. Thread-safe; every successful acquire must be paired with release.
+    """
+
+    def __init__(self, name: str, limit: int, queue_timeout: float, max_queue: int,
+                 sheddable: bool = False):
+        self.name = name
+        self.limit = max(1, limit)
+        self.queue_timeout = queue_timeout
+        self.max_queue = max(0, max_queue)
+        self.sheddable = sheddable
+        self._active = 0
+        self._waiting = 0
+        self._admitted = 0
+        self._rejected = {'queue_full': 0, 'queue_timeout': 0, 'shed': 0}
+        self._wait_seconds = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        """Take a slot, waiting up to queue_timeout. Raises Rejected."""
+        with self._cond:
+            if self._active < self.limit and not self._waiting:
+                self._active += 1
+                self._admitted += 1
+                return
+            if self._waiting >= self.max_queue:
+                self._rejected['queue_full'] += 1
+                raise Rejected(self.name, 'queue_full')
+
+            start = time.monotonic()
+            deadline = start + self.queue_timeout
+            self._waiting += 1
+            try:
+                while self._active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._rejected['queue_timeout'] += 1
+                        raise Rejected(self.name, 'queue_timeout')
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+                self._wait_seconds += time.monotonic() - start
+            self._active += 1
+            self._admitted += 1
+
+    def release(self) -> None:
+        with self._cond:
+            self._active -= 1
+            self._cond.notify()
+
+    def shed(self) -> None:
+        """Count a request rejected by load shedding and raise Rejected."""
+        with self._cond:
+            self._rejected['shed'] += 1
+        raise Rejected(self.name, 'shed', retry_after=SHED_RETRY_AFTER)
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                'limit': self.limit,
+                'active': self._active,
+                'waiting': self._waiting,
+                'max_queue': self.max_queue,
+                'queue_timeout_seconds': self.queue_timeout,
+                'sheddable': self.sheddable,
+                'admitted': self._admitted,
+                'rejected': dict(self._rejected),
+                'queue_wait_seconds_total': round(self._wait_seconds, 3),
+            }
+
+
+class LatencySLO:
+    """
+    Sliding-window latency percentile against a target. breached() needs
+    min_samples in the window, so a few slow requests on an idle server do
+    not trigger shedding.
+    """
+
+    def __init__(self, target_seconds: float, percentile: float = 0.95,
+                 window_seconds: float = 60.0, min_samples: int = 20):
+        self.target_seconds = target_seconds
+        self.percentile = percentile
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=MAX_LATENCY_SAMPLES)
+        self._cached = None  # (computed_at, value)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._samples.append((now, seconds))
+
+    def _trim(self, now):
+        cutoff = now - self.window_seconds
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+
+    def _value(self, now):
+        """(percentile latency or None, samples in the window)."""
+        with self._lock:
+            if self._cached is not None and now - self._cached[0] < PERCENTILE_CACHE_SECONDS:
+                return self._cached[1]
+            self._trim(now)
+            latencies = sorted(seconds for _, seconds in self._samples)
+            value = None
+            if latencies:
+                value = latencies[min(len(latencies) - 1, int(self.percentile * len(latencies)))]
+            self._cached = (now, (value, len(latencies)))
+            return self._cached[1]
+
+    def breached(self, now: Optional[float] = None) -> bool:
+        value, samples = self._value(time.monotonic() if now is None else now)
+        return value is not None and samples >= self.min_samples and value > self.target_seconds
+
+    def snapshot(self, now: Optional[float] = None) -> dict:
+        now = time.monotonic() if now is None else now
+        value, samples = self._value(now)
+        return {
+            'target_seconds': self.target_seconds,
+            'percentile': self.percentile,
+            'window_seconds': self.window_seconds,
+            'min_samples': self.min_samples,
+            'samples': samples,
+            'observed_seconds': round(value, 4) if value is not None else None,
+            'breached': self.breached(now),
+        }
+
+
+class Bulkheads:
+    """
+    The bulkheads of all route classes plus the subject latency SLO that
+    sheddable classes are subject to.
+    """
+
+    def __init__(self, bulkheads: Dict[str, Bulkhead], slo: LatencySLO):
+        self.bulkheads = bulkheads
+        self.slo = slo
+
+    def admit(self, route_class: str) -> Bulkhead:
+        """
+        Admit a request of a route class: shed it while the SLO is breached
+        (sheddable classes), else wait for a slot. Returns the bulkhead to
+        release; raises Rejected.
+        """
+        bulkhead = self.bulkheads[route_class]
+        if bulkhead.sheddable and self.slo.breached():
+            bulkhead.shed()
+        bulkhead.acquire()
+        return bulkhead
+
+    def snapshot(self) -> dict:
+        slo = self.slo.snapshot()
+        return {
+            'shedding': slo['breached'],
+            'subject_latency_slo': slo,
+            'classes': {name: bulkhead.snapshot() for name, bulkhead in self.bulkheads.items()},
+        }
@@ -0,0 +1,161 @@
+"""
+Display-Size Stimulus Derivatives
+Version: 3.1
+
+Downscaled copies of stimulus images: a thumbnail for the Stimulus Library
+and display sizes for the subject interface, so browsers do not download
+full-resolution originals. Derivatives are stored next to their source
+file as <source>.<variant>.<ext> and are never larger than the original;
+a variant is skipped when the original already fits its box.
+
+Generation needs Pillow, an optional dependency. Without it available()
+is False and stimuli are served as originals only.
+"""
+
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # Pillow is optional
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Variant name -> bounding box edge in pixels. Names carry the size so
+# derivative URLs stay immutable if the sizes ever change.
+VARIANTS = {
+    'thumb_256': 256,
+    'display_800': 800,
+    'display_1600': 1600,
+}
+THUMBNAIL_VARIANT = 'thumb_256'
+DISPLAY_VARIANTS = ('display_800', 'display_1600')
+
+WEBP_QUALITY = 82
+JPEG_QUALITY = 85
+
+
+def available() -> bool:
+    return Image is not None
+
+
+def _output_format(has_alpha: bool):
+    if features.check('webp'):
+        return 'WEBP', 'webp', {'quality': WEBP_QUALITY, 'method': 4}
+    if has_alpha:
+        return 'PNG', 'png', {'optimize': True}
+    return 'JPEG', 'jpg', {'quality': JPEG_QUALITY, 'optimize': True, 'progressive': True}
+
+
+def generate_derivatives(source_path: str, variants: Optional[Dict[str, int]] = None) -> Dict[str, dict]:
+    """
+    Write the derivatives of an image next to it.
+
+    Variants are produced largest first, each downscaled from the previous
+    one, so the full-size image is resampled only once. Animated images use
+    their first frame; EXIF orientation is applied.
+
+    Returns:
+        variant -> {suffix, width, height, bytes}; the derivative file is
+        source_path + suffix
+    """
+    if Image is None:
+        raise RuntimeError('Pillow is required to generate derivatives')
+    variants = VARIANTS if variants is None else variants
+
+    results = {}
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+        fmt, ext, options = _output_format(has_alpha)
+
+        for variant, box in sorted(variants.items(), key=lambda item: -item[1]):
+            if max(image.size) <= box:
+                continue  # the original already fits
+            image.thumbnail((box, box), Image.LANCZOS)
+            suffix = f'.{variant}.{ext}'
+            directory = os.path.dirname(source_path) or '.'
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.derivative-', suffix='.part')
+            try:
+                with os.fdopen(fd, 'wb') as out:
+                    image.save(out, fmt, **options)
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, source_path + suffix)
+            except BaseException:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                raise
+            results[variant] = {
+                'suffix': suffix,
+                'width': image.size[0],
+                'height': image.size[1],
+                'bytes': os.path.getsize(source_path + suffix),
+            }
+    return results
+
+
+def with_urls(derivatives: Dict[str, dict], url_base: str) -> Dict[str, dict]:
+    """Derivative records as stored on stimuli: url_base + suffix as the url."""
+    return {
+        variant: {'url': url_base + info['suffix'], 'width': info['width'],
+                  'height': info['height'], 'bytes': info['bytes']}
+        for variant, info in derivatives.items()
+    }
+
+
+def srcset(derivatives: Optional[dict], url: Optional[str], width: Optional[int]) -> Optional[str]:
+    """HTML srcset of the display derivatives plus the original (when its width is known)."""
+    candidates = [(info['width'], info['url']) for variant, info in (derivatives or {}).items()
+                  if variant in DISPLAY_VARIANTS]
+    if url and width:
+        candidates.append((width, url))
+    if not candidates:
+        return None
+    return ', '.join(f'{u} {w}w' for w, u in sorted(candidates))
+
+
+class DerivativePool:
+    """
+    Background thread pool generating derivatives after uploads. Pillow
+    releases the GIL while resampling and encoding, so threads run in
+    parallel. Each key (blob digest or file path) is generated at most once
+    at a time; on_done(key, derivatives, error) runs on the worker thread.
+    """
+
+    def __init__(self, workers: int, on_done: Callable[[str, Optional[dict], Optional[BaseException]], None]):
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='derivatives')
+        self._on_done = on_done
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def submit(self, key: str, source_path: str) -> bool:
+        """Queue a source file; returns False without Pillow or if the key is already queued."""
+        if not available():
+            return False
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+        self._executor.submit(self._run, key, source_path)
+        return True
+
+    def _run(self, key, source_path):
+        try:
+            derivatives, error = generate_derivatives(source_path), None
+        except Exception as e:
+            derivatives, error = None, e
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+        try:
+            self._on_done(key, derivatives, error)
+        except Exception:
+            logger.exception('Storing derivatives for %s failed', key)
@@ -0,0 +1,384 @@
+"""
+Gaussian-Process Preference Model over Stimulus Features
+Version: 3.1
+
+Preference learning with a GP prior over stimulus features (Brochu et al.,
+2010), so what is learned about one stimulus transfers to stimuli with
+similar metadata (room_type, curvature_level, brightness, hue, tags).
+
+Sparse approximation (subset of regressors): the utility function is
+represented by its values g at m inducing points Z, g ~ N(0, K_ZZ), and
+item utilities are f = A g with A = K_XZ K_ZZ⁻¹. The posterior over g is
+Gaussian (mu, Sigma are m-dimensional) and each comparison applies the
+Gaussian approximation of PureBayesianAdaptiveSelector.update_beliefs to
+the difference vector v = A_i - A_j, so an update costs O(m²) and the
+state O(m²) regardless of the number of stimuli n. Items with identical
+features share a utility.
+
+GPAdaptiveSelector scores pairs among a candidate set of items (highest
+upper confidence bound and highest variance) instead of all n² pairs, so
+selection scales to libraries of thousands of stimuli.
+"""
+
+import logging
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.linalg import cho_factor, cho_solve
+from scipy.stats import norm
+
+try:
+    from backend.bayesian_adaptive import PureBayesianAdaptiveSelector, information_gain
+except ImportError:
+    from bayesian_adaptive import PureBayesianAdaptiveSelector, information_gain
+
+logger = logging.getLogger(__name__)
+
+# Ordinal metadata levels (low to high), mapped to [0, 1]
+ORDINAL_LEVELS = {
+    'curvature_level': ['none', 'low', 'medium', 'high'],
+    'brightness': ['dark', 'medium', 'bright'],
+}
+CATEGORICAL_FIELDS = ['room_type', 'hue']
+
+DEFAULT_GP_CONFIG = {
+    'n_inducing': 100,
+    'lengthscale': 1.0,
+    'n_candidates': 200,
+}
+
+
+def gp_config(metadata: Optional[dict]) -> Optional[dict]:
+    """
+    GP settings from experiment_metadata['model'] merged over the defaults,
+    or None when the experiment uses the independent-items model.
+
+    Raises:
+        ValueError: for an unknown model type or out-of-range values
+    """
+    model = (metadata or {}).get('model') or {}
+    model_type = model.get('type', 'independent')
+    if model_type == 'independent':
+        return None
+    if model_type != 'gp':
+        raise ValueError(f"Unknown model type: {model_type}")
+
+    config = dict(DEFAULT_GP_CONFIG)
+    config.update({k: v for k, v in model.items() if k != 'type'})
+    if int(config['n_inducing']) < 1 or int(config['n_candidates']) < 2:
+        raise ValueError("n_inducing must be >= 1 and n_candidates >= 2")
+    if float(config['lengthscale']) <= 0:
+        raise ValueError("lengthscale must be positive")
+    return config
+
+
+def build_feature_matrix(metadata: Sequence[dict]) -> Tuple[np.ndarray, List[str]]:
+    """
+    Encode stimulus metadata as a feature matrix.
+
+    - curvature_level, brightness: ordinal level scaled to [0, 1] (numbers
+      are used as given); missing values take the midpoint 0.5
+    - room_type, hue: one-hot over the values present in the library
+    - tags: multi-hot over the tags present in the library
+
+    Args:
+        metadata: One dict per stimulus (flattened metadata plus 'tags')
+
+    Returns:
+        (X, feature_names) with X of shape (n, d)
+    """
+    columns, names = [], []
+
+    for field, levels in ORDINAL_LEVELS.items():
+        values = []
+        for m in metadata:
+            value = m.get(field)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                values.append(float(value))
+            elif isinstance(value, str) and value.lower() in levels:
+                values.append(levels.index(value.lower()) / (len(levels) - 1))
+            else:
+                values.append(0.5)
+        columns.append(np.array(values))
+        names.append(field)
+
+    for field in CATEGORICAL_FIELDS:
+        values = [str(m[field]).lower() if m.get(field) else None for m in metadata]
+        for category in sorted({v for v in values if v is not None}):
+            columns.append(np.array([v == category for v in values], dtype=float))
+            names.append(f'{field}={category}')
+
+    tag_sets = [{str(t).lower() for t in (m.get('tags') or [])} for m in metadata]
+    for tag in sorted(set().union(*tag_sets)):
+        columns.append(np.array([tag in tags for tags in tag_sets], dtype=float))
+        names.append(f'tag={tag}')
+
+    X = np.column_stack(columns) if columns else np.zeros((len(metadata), 0))
+    return X, names
+
+
+def rbf_kernel(X1: np.ndarray, X2: np.ndarray, lengthscale: float, variance: float) -> np.ndarray:
+    """Squared-exponential kernel matrix."""
+    sq = (np.sum(X1**2, axis=1)[:, None] + np.sum(X2**2, axis=1)[None, :] - 2 * X1 @ X2.T)
+    return variance * np.exp(-np.maximum(sq, 0.0) / (2 * lengthscale**2))
+
+
+def select_inducing_points(X: np.ndarray, n_inducing: int) -> np.ndarray:
+    """
+    Inducing points for a feature matrix.
+
+    Metadata features are coarse, so libraries often have few distinct
+    feature vectors; when there are at most n_inducing of them they are all
+    used (and the sparse model is exact). Otherwise distinct rows are chosen
+    by greedy farthest-point selection, starting from the row closest to the
+    mean (deterministic).
+    """
+    unique = np.unique(X, axis=0)
+    if len(unique) <= n_inducing:
+        return unique
+
+    chosen = [int(np.argmin(np.sum((unique - unique.mean(axis=0))**2, axis=1)))]
+    dist = np.sum((unique - unique[chosen[0]])**2, axis=1)
+    for _ in range(n_inducing - 1):
+        k = int(np.argmax(dist))
+        chosen.append(k)
+        dist = np.minimum(dist, np.sum((unique - unique[k])**2, axis=1))
+    return unique[chosen]
+
+
+class GPPreferenceState:
+    """
+    Bayesian state of the sparse GP preference model.
+
+    State consists of:
+    - mu, Sigma: posterior mean (m,) and covariance (m, m) of the utility at
+      the inducing points
+    - comparisons: {(i, j): count} of presented pairs (sparse, since n can
+      be large)
+
+    features, inducing_points and the kernel settings define the projection
+    A (n, m) from inducing values to item utilities.
+    """
+
+    def __init__(self, features: np.ndarray, n_inducing: int = 100, lengthscale: float = 1.0,
+                 prior_variance: float = 1.0, inducing_points: Optional[np.ndarray] = None):
+        """
+        Initialize GP state.
+
+        Args:
+            features: (n, d) stimulus feature matrix (see build_feature_matrix)
+            n_inducing: Maximum number of inducing points
+            lengthscale: RBF kernel lengthscale in feature units
+            prior_variance: Prior variance of each item's utility
+            inducing_points: Use these instead of selecting them from features
+        """
+        self.features = np.asarray(features, dtype=float)
+        self.n_items = len(self.features)
+        self.lengthscale = float(lengthscale)
+        self.prior_variance = float(prior_variance)
+        self.inducing_points = (select_inducing_points(self.features, n_inducing)
+                                if inducing_points is None else np.asarray(inducing_points, dtype=float))
+        self.n_inducing = len(self.inducing_points)
+
+        K_zz = rbf_kernel(self.inducing_points, self.inducing_points, self.lengthscale, self.prior_variance)
+        K_zz[np.diag_indices_from(K_zz)] += 1e-6 * self.prior_variance
+        K_xz = rbf_kernel(self.features, self.inducing_points, self.lengthscale, self.prior_variance)
+        self.projection = cho_solve(cho_factor(K_zz), K_xz.T).T
+
+        self.mu = np.zeros(self.n_inducing)
+        self.Sigma = K_zz
+        self.comparisons = {}
+
+        logger.info(f"Initialized GP state: {self.n_items} items, {self.n_inducing} inducing points, "
+                    f"lengthscale={self.lengthscale}, σ²={self.prior_variance}")
+
+    @property
+    def item_mu(self) -> np.ndarray:
+        """Posterior mean utility of every item (n,)."""
+        return self.projection @ self.mu
+
+    def item_variances(self, items: Optional[np.ndarray] = None) -> np.ndarray:
+        """Posterior variance of the utility of the given items (default: all)."""
+        A = self.projection if items is None else self.projection[items]
+        return np.maximum(np.sum((A @ self.Sigma) * A, axis=1), 0.0)
+
+    def comparison_counts(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """Times each pair (rows[k], cols[k]) was presented, in either order."""
+        counts = np.zeros(len(rows))
+        if not self.comparisons:
+            return counts
+        position = {(int(r), int(c)): k for k, (r, c) in enumerate(zip(rows, cols))}
+        for (i, j), count in self.comparisons.items():
+            for key in ((i, j), (j, i)):
+                k = position.get(key)
+                if k is not None:
+                    counts[k] += count
+        return counts
+
+    def to_dict(self) -> dict:
+        """Serialize state to dictionary."""
+        return {
+            'model': 'gp',
+            'n_items': self.n_items,
+            'lengthscale': self.lengthscale,
+            'prior_variance': self.prior_variance,
+            'features': self.features.tolist(),
+            'inducing_points': self.inducing_points.tolist(),
+            'mu': self.mu.tolist(),
+            'Sigma': self.Sigma.tolist(),
+            'comparisons': [[i, j, c] for (i, j), c in self.comparisons.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'GPPreferenceState':
+        """Deserialize state from dictionary."""
+        state = cls(np.array(data['features']), lengthscale=data['lengthscale'],
+                    prior_variance=data['prior_variance'],
+                    inducing_points=np.array(data['inducing_points']))
+        state.mu = np.array(data['mu'])
+        state.Sigma = np.array(data['Sigma'])
+        state.comparisons = {(int(i), int(j)): int(c) for i, j, c in data['comparisons']}
+        return state
+
+    def comparisons_array(self) -> np.ndarray:
+        """Comparisons as a (k, 3) float array of (i, j, count) rows, for BYTEA storage."""
+        return np.array([[i, j, c] for (i, j), c in self.comparisons.items()], dtype=float).reshape(-1, 3)
+
+    def load_comparisons(self, rows: np.ndarray) -> None:
+        self.comparisons = {(int(i), int(j)): int(c) for i, j, c in np.asarray(rows).reshape(-1, 3)}
+
+    def get_preference_ranking(self) -> List[int]:
+        """
+        Get current preference ranking (best to worst).
+
+        Returns:
+            List of item indices sorted by preference (descending)
+        """
+        return np.argsort(-self.item_mu).tolist()
+
+    def get_uncertainties(self) -> np.ndarray:
+        """
+        Get uncertainty (standard deviation) for each item.
+
+        Returns:
+            Array of uncertainties
+        """
+        return np.sqrt(self.item_variances())
+
+
+class GPAdaptiveSelector(PureBayesianAdaptiveSelector):
+    """
+    Information-gain pair selector for GPPreferenceState.
+
+    Candidates are the n_candidates / 2 items with the highest upper
+    confidence bound (μ + 2σ) plus the items with the highest variance; all
+    pairs among them are scored with the same information gain and
+    exploration bonus as PureBayesianAdaptiveSelector. Selection costs
+    O(n·m² + C²·m) for C candidates instead of O(n²).
+    """
+
+    def __init__(self, epsilon: float = 0.01, exploration_weight: float = 0.1,
+                 n_candidates: int = 200):
+        """
+        Initialize selector.
+
+        Args:
+            epsilon: Noise parameter in Bradley-Terry model
+            exploration_weight: Weight of the bonus for less-compared pairs
+            n_candidates: Size of the candidate item set
+        """
+        super().__init__(epsilon=epsilon, exploration_weight=exploration_weight)
+        self.n_candidates = max(2, int(n_candidates))
+
+    def candidate_items(self, state: GPPreferenceState) -> np.ndarray:
+        """Sorted indices of the candidate items."""
+        n = state.n_items
+        if n <= self.n_candidates:
+            return np.arange(n)
+        mu = state.item_mu
+        sd = np.sqrt(state.item_variances())
+        half = self.n_candidates // 2
+        by_ucb = np.argpartition(-(mu + 2 * sd), half - 1)[:half]
+        by_sd = np.argpartition(-sd, self.n_candidates - half - 1)[:self.n_candidates - half]
+        return np.unique(np.concatenate([by_ucb, by_sd]))
+
+    def select_next_pair(self, state: GPPreferenceState) -> Tuple[int, int]:
+        """
+        Select the candidate pair with maximum expected information gain.
+
+        Args:
+            state: Current GP state
+
+        Returns:
+            Tuple (i, j) with i < j
+        """
+        candidates = self.candidate_items(state)
+        A = state.projection[candidates]
+        AS = A @ state.Sigma
+        cov = AS @ A.T
+        mu = A @ state.mu
+
+        r, c = np.triu_indices(len(candidates), k=1)
+        mu_diff = mu[r] - mu[c]
+        sigma_diff = np.sqrt(np.maximum(cov[r, r] + cov[c, c] - 2 * cov[r, c], 0.0))
+        gain = information_gain(mu_diff, sigma_diff, self.epsilon)
+
+        rows, cols = candidates[r], candidates[c]
+        scores = gain + self.exploration_weight / (1 + state.comparison_counts(rows, cols))
+        if scores.size == 0 or np.all(np.isnan(scores)):
+            return (0, 1)
+
+        best = int(np.nanargmax(scores))
+        best_pair = (int(rows[best]), int(cols[best]))
+        logger.debug(f"GP selected pair {best_pair} with gain {scores[best]:.4f} "
+                     f"({len(candidates)} candidates)")
+        return best_pair
+
+    def update_beliefs(self, state: GPPreferenceState, i: int, j: int, winner: int) -> GPPreferenceState:
+        """
+        Update the inducing-point posterior based on an observed choice.
+
+        Same Gaussian approximation as PureBayesianAdaptiveSelector.update_beliefs,
+        applied to f_i - f_j = (A_i - A_j)·g. The covariance update is
+        identical; the mean update moves g along the full Σv rather than
+        only the two compared coordinates, which is what carries evidence to
+        items with similar features.
+
+        Args:
+            state: Current GP state
+            i, j: Item indices that were compared
+            winner: Index of chosen item (must be i or j)
+
+        Returns:
+            Updated state
+        """
+        if winner not in [i, j]:
+            raise ValueError(f"Winner {winner} must be either {i} or {j}")
+
+        state.comparisons[(i, j)] = state.comparisons.get((i, j), 0) + 1
+
+        v = state.projection[i] - state.projection[j]
+        Sigma_v = state.Sigma @ v
+        mu_diff = v @ state.mu
+        sigma_diff_sq = v @ Sigma_v + self.epsilon**2
+        sigma_diff = np.sqrt(sigma_diff_sq)
+
+        z = mu_diff / sigma_diff
+        if winner == i:
+            p_obs = norm.cdf(z)
+            dlnL_dz = norm.pdf(z) / (norm.cdf(z) + 1e-10)
+        else:
+            p_obs = norm.cdf(-z)
+            dlnL_dz = -norm.pdf(z) / (norm.cdf(-z) + 1e-10)
+
+        state.mu += Sigma_v * (dlnL_dz / sigma_diff)
+
+        info_gain = (norm.pdf(z) / (p_obs * (1 - p_obs) + 1e-10))**2 / sigma_diff_sq
+        u = Sigma_v / sigma_diff
+        state.Sigma -= info_gain * np.outer(u, u) / (1 + info_gain * (v @ u) / sigma_diff)
+
+        return state
+
+    def check_stopping(self, state, config, trials_completed, min_trials=0, next_pair=None):
+        """Ranking-stability rules need the full item covariance; not used with the GP model."""
+        return None
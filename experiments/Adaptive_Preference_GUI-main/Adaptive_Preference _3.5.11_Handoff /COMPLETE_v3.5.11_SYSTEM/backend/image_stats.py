@@ -0,0 +1,255 @@
+"""
+Pixel-Statistics Auto-Tagging
+Version: 3.1
+
+Describes stimulus images by simple pixel statistics and maps them to the
+library's metadata levels (brightness, hue, curvature_level) and tags.
+Images are decoded at a reduced size (JPEG draft mode, then downsampled to
+ANALYSIS_SIZE) and every statistic is a NumPy array operation over the
+whole image:
+
+- brightness: mean Rec. 601 luma
+- hue histogram: HSV hue in HUE_BINS bins, weighted by saturation * value
+  so grey pixels do not vote; warm/cool shares of that weight
+- colorfulness: Hasler & Suesstrunk's opponent-channel metric
+- edge density: share of pixels with a Sobel gradient above EDGE_THRESHOLD
+- curvature: share of edge gradient NOT within ORIENTATION_TOLERANCE of
+  horizontal/vertical, rescaled so that uniformly spread orientations
+  score 1. Rectilinear interiors concentrate at 0/90 degrees; curved forms
+  spread over all orientations. (Straight diagonals count as curved; it
+  is a proxy.)
+
+Files are analyzed in chunks on a process pool: decoding and the NumPy
+passes are CPU-bound and release the GIL only in parts. Decoding needs
+Pillow, an optional dependency; without it available() is False.
+"""
+
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Bump when statistics or thresholds change; stimuli analyzed by an older
+# version are analyzed again
+ANALYZER_VERSION = 1
+
+ANALYSIS_SIZE = 256
+HUE_BINS = 12
+EDGE_THRESHOLD = 0.1
+ORIENTATION_TOLERANCE = 15.0
+
+# Level thresholds
+BRIGHT_LUMA = 0.62
+DARK_LUMA = 0.35
+MIN_CHROMA_WEIGHT = 0.08   # mean saturation * value below this is 'neutral'
+HUE_DOMINANCE = 0.55       # warm or cool share of the chromatic weight
+COLORFUL = 0.35
+MUTED = 0.12
+MIN_EDGE_DENSITY = 0.01    # fewer edges than this: curvature 'none'
+CURVATURE_LEVELS = ((0.85, 'high'), (0.6, 'medium'), (0.35, 'low'))
+
+# Files per pool task
+CHUNK_FILES = 8
+
+
+def available() -> bool:
+    return Image is not None
+
+
+def load_pixels(path: str, size: int = ANALYSIS_SIZE) -> np.ndarray:
+    """RGB pixels of an image downsampled to fit size x size, as floats in [0, 1]."""
+    if Image is None:
+        raise RuntimeError('Pillow is required to analyze images')
+    with Image.open(path) as image:
+        image.draft('RGB', (size, size))  # JPEG: decode at 1/2..1/8 scale
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info:
+            # Transparent areas count as white, as in the subject interface
+            rgba = image.convert('RGBA')
+            image = Image.new('RGB', rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.getchannel('A'))
+        else:
+            image = image.convert('RGB')
+        image.thumbnail((size, size), Image.BILINEAR)
+        return np.asarray(image, dtype=np.float32) / 255.0
+
+
+def pixel_stats(rgb: np.ndarray) -> Dict[str, object]:
+    """
+    Statistics of an (h, w, 3) RGB array in [0, 1].
+
+    Returns:
+        {brightness, colorfulness, saturation, hue_histogram, dominant_hue,
+        warm_share, cool_share, edge_density, curvature}; shares and
+        histogram are fractions, dominant_hue is the centre of the heaviest
+        hue bin in degrees (None for grey images)
+    """
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    luma = 0.299 * r + 0.587 * g + 0.114 * b
+
+    # HSV
+    maxc = rgb.max(axis=2)
+    minc = rgb.min(axis=2)
+    delta = maxc - minc
+    saturation = np.where(maxc > 0, delta / np.maximum(maxc, 1e-6), 0.0)
+    safe = np.maximum(delta, 1e-6)
+    hue = np.select(
+        [maxc == r, maxc == g],
+        [((g - b) / safe) % 6.0, (b - r) / safe + 2.0],
+        default=(r - g) / safe + 4.0,
+    ) * 60.0
+    weight = saturation * maxc * (delta > 0)
+    bins = np.minimum((hue / (360.0 / HUE_BINS)).astype(np.int64), HUE_BINS - 1)
+    histogram = np.bincount(bins.ravel(), weights=weight.ravel(), minlength=HUE_BINS)
+    chroma = float(histogram.sum())
+    if chroma > 0:
+        histogram = histogram / chroma
+    warm = float(weight[(hue < 75.0) | (hue >= 330.0)].sum()) / chroma if chroma > 0 else 0.0
+    cool = float(weight[(hue >= 165.0) & (hue < 285.0)].sum()) / chroma if chroma > 0 else 0.0
+
+    # Colorfulness (Hasler & Suesstrunk 2003) on 0..255 values
+    rg = (r - g) * 255.0
+    yb = (0.5 * (r + g) - b) * 255.0
+    colorfulness = (np.hypot(rg.std(), yb.std()) + 0.3 * np.hypot(rg.mean(), yb.mean())) / 255.0
+
+    # Sobel gradients of luma (interior pixels)
+    gx = ((luma[:-2, 2:] + 2 * luma[1:-1, 2:] + luma[2:, 2:])
+          - (luma[:-2, :-2] + 2 * luma[1:-1, :-2] + luma[2:, :-2])) / 4.0
+    gy = ((luma[2:, :-2] + 2 * luma[2:, 1:-1] + luma[2:, 2:])
+          - (luma[:-2, :-2] + 2 * luma[:-2, 1:-1] + luma[:-2, 2:])) / 4.0
+    magnitude = np.hypot(gx, gy)
+    edges = magnitude > EDGE_THRESHOLD
+    edge_density = float(edges.mean()) if edges.size else 0.0
+    curvature = 0.0
+    if edges.any():
+        angle = np.degrees(np.arctan2(gy[edges], gx[edges])) % 90.0  # 0 and 90 both axis-aligned
+        axis = (angle < ORIENTATION_TOLERANCE) | (angle > 90.0 - ORIENTATION_TOLERANCE)
+        edge_weight = magnitude[edges]
+        off_axis = float(edge_weight[~axis].sum() / edge_weight.sum())
+        uniform = 1.0 - 2 * ORIENTATION_TOLERANCE / 90.0
+        curvature = min(1.0, off_axis / uniform)
+
+    return {
+        'brightness': round(float(luma.mean()), 4),
+        'colorfulness': round(float(colorfulness), 4),
+        'saturation': round(float(saturation.mean()), 4),
+        'chroma_weight': round(float(weight.mean()), 4),
+        'hue_histogram': [round(float(h), 4) for h in histogram],
+        'dominant_hue': (int(histogram.argmax()) + 0.5) * (360.0 / HUE_BINS) if chroma > 0 else None,
+        'warm_share': round(warm, 4),
+        'cool_share': round(cool, 4),
+        'edge_density': round(edge_density, 4),
+        'curvature': round(curvature, 4),
+    }
+
+
+def describe(stats: Dict[str, object]) -> Dict[str, object]:
+    """
+    Library metadata levels and tags for pixel statistics.
+
+    Returns:
+        {brightness: bright|medium|dark, hue: warm|cool|neutral,
+        curvature_level: high|medium|low|none, tags: [...]}
+    """
+    luma = stats['brightness']
+    brightness = 'bright' if luma >= BRIGHT_LUMA else 'dark' if luma < DARK_LUMA else 'medium'
+
+    hue = 'neutral'
+    if stats['chroma_weight'] >= MIN_CHROMA_WEIGHT:
+        if stats['warm_share'] >= HUE_DOMINANCE:
+            hue = 'warm'
+        elif stats['cool_share'] >= HUE_DOMINANCE:
+            hue = 'cool'
+
+    curvature_level = 'none'
+    if stats['edge_density'] >= MIN_EDGE_DENSITY:
+        curvature_level = next((level for threshold, level in CURVATURE_LEVELS
+                                if stats['curvature'] >= threshold), 'none')
+
+    tags = set()
+    if brightness != 'medium':
+        tags.add(brightness)
+    if hue != 'neutral':
+        tags.add(hue)
+    dominant = stats['dominant_hue']
+    if hue == 'cool' and dominant is not None and 195.0 <= dominant < 255.0:
+        tags.add('blue')
+    if stats['colorfulness'] >= COLORFUL:
+        tags.add('colorful')
+    elif stats['colorfulness'] < MUTED:
+        tags.add('muted')
+    if curvature_level in ('high', 'medium'):
+        tags.add('curved')
+    elif curvature_level in ('low', 'none') and stats['edge_density'] >= MIN_EDGE_DENSITY:
+        tags.add('rectilinear')
+
+    return {'brightness': brightness, 'hue': hue, 'curvature_level': curvature_level,
+            'tags': sorted(tags)}
+
+
+def analyze_file(path: str) -> Dict[str, object]:
+    """Pixel statistics of an image file, tagged with ANALYZER_VERSION."""
+    return dict(pixel_stats(load_pixels(path)), version=ANALYZER_VERSION)
+
+
+def _analyze_chunk(items: Sequence[Tuple[str, str]]) -> List[Tuple[str, Optional[dict], Optional[str]]]:
+    results = []
+    for key, path in items:
+        try:
+            results.append((key, analyze_file(path), None))
+        except Exception as e:
+            results.append((key, None, str(e)))
+    return results
+
+
+def analyze_files(items: Sequence[Tuple[str, str]], workers: Optional[int] = None,
+                  on_result: Optional[Callable[[str, Optional[dict], Optional[str]], None]] = None,
+                  chunk_files: int = CHUNK_FILES) -> Dict[str, dict]:
+    """
+    Analyze (key, path) items, CHUNK_FILES per task on a process pool (inline
+    for one worker).
+
+    Args:
+        on_result: called with (key, stats, error) as each file finishes, on
+            the calling thread; if it raises, queued chunks are cancelled
+        workers: processes (default: CPUs)
+
+    Returns:
+        key -> stats for the files that could be analyzed
+    """
+    results = {}
+
+    def collect(chunk_results):
+        for key, stats, error in chunk_results:
+            if stats is not None:
+                results[key] = stats
+            if on_result:
+                on_result(key, stats, error)
+
+    chunks = [items[k:k + chunk_files] for k in range(0, len(items), chunk_files)]
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+    if workers <= 1:
+        for chunk in chunks:
+            collect(_analyze_chunk(chunk))
+    else:
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            futures = [pool.submit(_analyze_chunk, chunk) for chunk in chunks]
+            try:
+                for future in as_completed(futures):
+                    collect(future.result())
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+    return results
@@ -0,0 +1,152 @@
+"""
+Streaming Stimulus Ingestion
+Version: 3.1
+
+Single pass over an uploaded file: it is copied to a temporary file in the
+upload folder in large chunks while the SHA-256 digest and byte count are
+updated, the image dimensions are parsed from the PNG/JPEG/GIF header bytes
+(no pixel decoding), and the temporary file is atomically renamed into
+place. A failed or interrupted upload leaves no partial file behind.
+"""
+
+import hashlib
+import os
+import struct
+import tempfile
+from typing import BinaryIO, Optional, Tuple
+
+CHUNK_SIZE = 1024 * 1024
+
+# Header bytes kept for dimension parsing; JPEG EXIF/ICC segments can push
+# the frame header well past the first kilobytes
+HEADER_MAX_BYTES = 256 * 1024
+
+# JPEG start-of-frame markers (SOF0-SOF15 without DHT, JPG and DAC)
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _png_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    if len(data) < 24 or data[12:16] != b'IHDR':
+        return None
+    return struct.unpack('>II', data[16:24])
+
+
+def _gif_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    if len(data) < 10:
+        return None
+    return struct.unpack('<HH', data[6:10])
+
+
+def _jpeg_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:  # no length field
+            pos += 2
+            continue
+        length = struct.unpack('>H', data[pos + 2:pos + 4])[0]
+        if marker in _JPEG_SOF:
+            if pos + 9 > len(data):
+                return None
+            height, width = struct.unpack('>HH', data[pos + 5:pos + 9])
+            return width, height
+        pos += 2 + length
+    return None
+
+
+def image_dimensions(header: bytes) -> Optional[Tuple[int, int]]:
+    """
+    (width, height) from the leading bytes of a PNG, JPEG or GIF file.
+
+    Returns:
+        The dimensions, or None for other formats or if the header bytes do
+        not reach the size fields
+    """
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return _png_dimensions(header)
+    if header[:6] in (b'GIF87a', b'GIF89a'):
+        return _gif_dimensions(header)
+    if header.startswith(b'\xff\xd8'):
+        return _jpeg_dimensions(header)
+    return None
+
+
+def read_image_dimensions(path: str) -> Optional[Tuple[int, int]]:
+    """Dimensions of an image file on disk, reading only its header bytes."""
+    with open(path, 'rb') as f:
+        return image_dimensions(f.read(HEADER_MAX_BYTES))
+
+
+def stream_to_temp(stream: BinaryIO, directory: str, chunk_size: int = CHUNK_SIZE) -> Tuple[str, dict]:
+    """
+    Copy a stream to a new temporary file in directory in one pass, hashing,
+    counting and parsing the image header along the way.
+
+    Returns:
+        (temporary file path, dict with size_bytes, sha256, width and height;
+        the dimensions are None if they could not be parsed). The caller
+        renames or removes the temporary file.
+    """
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    header = bytearray()
+    dimensions = None
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.upload-', suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                size += len(chunk)
+                out.write(chunk)
+                if dimensions is None and len(header) < HEADER_MAX_BYTES:
+                    header += chunk[:HEADER_MAX_BYTES - len(header)]
+                    dimensions = image_dimensions(bytes(header))
+        # mkstemp creates the file owner-only; uploads are served by other processes
+        os.chmod(tmp_path, 0o644)
+    except BaseException:
+        discard(tmp_path)
+        raise
+
+    width, height = dimensions if dimensions else (None, None)
+    return tmp_path, {
+        'size_bytes': size,
+        'sha256': digest.hexdigest(),
+        'width': width,
+        'height': height,
+    }
+
+
+def discard(path: str) -> None:
+    """Remove a file if it exists."""
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def ingest_stream(stream: BinaryIO, dest_path: str, chunk_size: int = CHUNK_SIZE) -> dict:
+    """
+    Copy a stream to dest_path in one pass (see stream_to_temp), via a
+    temporary file in the same directory and an atomic rename.
+
+    Returns:
+        Dict with path, size_bytes, sha256, width and height
+    """
+    tmp_path, result = stream_to_temp(stream, os.path.dirname(dest_path) or '.', chunk_size)
+    try:
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        discard(tmp_path)
+        raise
+    result['path'] = dest_path
+    return result
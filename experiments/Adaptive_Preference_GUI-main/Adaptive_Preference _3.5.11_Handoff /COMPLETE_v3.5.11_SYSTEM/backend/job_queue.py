@@ -0,0 +1,551 @@
+"""
+Durable Background Job Queue
+Version: 3.1
+
+Jobs for heavy admin operations (exports, deletes, imports, auto-tagging)
+that should not hold a Flask request thread. A job is a row of the jobs
+table; the API enqueues it and returns its id, and a worker pool - a
+separate process (scripts/job_worker.py) or threads embedded in the API
+process - claims and runs it, reporting progress, honouring cancellation
+and writing result artifacts under <artifact_root>/<job_id>/.
+
+Queueing:
+- PostgreSQL (default): workers claim the oldest queued row with
+  SELECT ... FOR UPDATE SKIP LOCKED, so concurrent workers never block on
+  or double-claim a job; idle workers poll.
+- Redis (optional, redis_url): enqueued job ids are also pushed to a Redis
+  list that idle workers block on, so jobs start without polling delay.
+  The table stays the source of truth: a job is claimed by a conditional
+  UPDATE of its row, and workers fall back to the SKIP LOCKED claim when
+  the list is empty, which also picks up pushes lost to a Redis restart.
+
+Workers heartbeat their running jobs; jobs of a worker that stopped
+heartbeating are requeued (up to MAX_ATTEMPTS) by any other worker,
+except kinds registered with retry=False (e.g. imports, which are not
+idempotent), which fail instead. enqueue_unique keeps at most one queued
+or running job per kind and params, enforced by a unique partial index.
+Long computations (e.g. ranking bootstraps) publish intermediate results
+through the partial column while they run.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from sqlalchemy import (JSON, Boolean, Column, DateTime, Index, Integer, MetaData, String, Table, Text, Uuid,
+                        delete, select, update)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Engine
+from werkzeug.utils import secure_filename
+
+try:
+    import redis
+except ImportError:  # Redis is optional
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ('queued', 'running', 'complete', 'failed', 'cancelled')
+FINISHED = ('complete', 'failed', 'cancelled')
+ACTIVE = ('queued', 'running')
+
+MAX_ATTEMPTS = 3
+PROGRESS_INTERVAL = 0.5      # seconds between progress writes of a job
+HEARTBEAT_INTERVAL = 10.0
+STALE_AFTER = 120.0          # seconds without heartbeat before a job is requeued
+RETENTION_SECONDS = 7 * 24 * 3600
+PRUNE_INTERVAL = 3600.0
+
+REDIS_QUEUE_KEY = 'adaptive_preference:jobs'
+
+_json = JSON().with_variant(JSONB(), 'postgresql')
+
+metadata = MetaData()
+jobs = Table(
+    'jobs', metadata,
+    Column('job_id', Uuid, primary_key=True),
+    Column('kind', String(50), nullable=False),
+    Column('params', _json, nullable=False),
+    Column('status', String(20), nullable=False),
+    Column('completed', Integer, nullable=False, default=0),
+    Column('total', Integer, nullable=False, default=0),
+    Column('partial', _json),
+    Column('result', _json),
+    Column('error', Text),
+    Column('artifact_name', String(255)),
+    Column('artifact_mime', String(100)),
+    Column('cancel_requested', Boolean, nullable=False, default=False),
+    Column('attempts', Integer, nullable=False, default=0),
+    Column('worker_id', String(100)),
+    Column('created_by', String(100)),
+    Column('experiment_id', Uuid),
+    # enqueue_unique: digest of the params
+    Column('dedup_key', String(64)),
+    Column('created_at', DateTime, nullable=False),
+    Column('started_at', DateTime),
+    Column('heartbeat_at', DateTime),
+    Column('finished_at', DateTime),
+)
+# At most one queued or running job per (kind, dedup_key)
+Index('unique_active_job', jobs.c.kind, jobs.c.dedup_key, unique=True,
+      postgresql_where=jobs.c.status.in_(ACTIVE), sqlite_where=jobs.c.status.in_(ACTIVE))
+
+# Job kind -> handler(ctx); the handler's return value is the job result
+HANDLERS: Dict[str, Callable[['JobContext'], object]] = {}
+# Kinds that are never requeued after their worker died
+SINGLE_ATTEMPT_KINDS: Set[str] = set()
+
+
+def handler(kind: str, retry: bool = True):
+    """Register a job handler for a kind. retry=False for handlers that are not safe to run twice."""
+    def register(fn):
+        HANDLERS[kind] = fn
+        if retry:
+            SINGLE_ATTEMPT_KINDS.discard(kind)
+        else:
+            SINGLE_ATTEMPT_KINDS.add(kind)
+        return fn
+    return register
+
+
+class JobCancelled(Exception):
+    """Raised by JobContext.check_cancelled once cancellation was requested."""
+
+
+def _row_dict(row) -> dict:
+    job = dict(row._mapping)
+    total = job['total']
+    return {
+        'job_id': str(job['job_id']),
+        'kind': job['kind'],
+        'params': job['params'],
+        'status': job['status'],
+        'completed': job['completed'],
+        'total': total,
+        'progress_percentage': round(job['completed'] / total * 100, 1) if total else 0.0,
+        'partial': job['partial'] if job['status'] == 'running' else None,
+        'result': job['result'],
+        'error': job['error'],
+        'artifact_name': job['artifact_name'],
+        'artifact_mime': job['artifact_mime'],
+        'cancel_requested': job['cancel_requested'],
+        'attempts': job['attempts'],
+        'worker_id': job['worker_id'],
+        'created_by': job['created_by'],
+        'experiment_id': str(job['experiment_id']) if job['experiment_id'] else None,
+        'created_at': job['created_at'].isoformat(),
+        'started_at': job['started_at'].isoformat() if job['started_at'] else None,
+        'finished_at': job['finished_at'].isoformat() if job['finished_at'] else None,
+    }
+
+
+class JobQueue:
+    """
+    Enqueue, claim and track jobs.
+
+    Args:
+        engine: SQLAlchemy engine, or a callable returning it (Flask-SQLAlchemy
+            creates its engine inside an app context)
+        artifact_root: directory holding one subdirectory per job
+        redis_url: enables the Redis dispatch list
+    """
+
+    def __init__(self, engine: Union[Engine, Callable[[], Engine]], artifact_root: str,
+                 redis_url: Optional[str] = None, queue_key: str = REDIS_QUEUE_KEY):
+        self._engine = engine
+        self.artifact_root = artifact_root
+        self.queue_key = queue_key
+        self.redis = None
+        if redis_url:
+            if redis is None:
+                raise RuntimeError('JOB_QUEUE_REDIS_URL is set but the redis package is not installed')
+            self.redis = redis.Redis.from_url(redis_url)
+
+    @property
+    def engine(self) -> Engine:
+        return self._engine if isinstance(self._engine, Engine) else self._engine()
+
+    @property
+    def backend(self) -> str:
+        return 'redis' if self.redis is not None else 'postgres'
+
+    def artifact_dir(self, job_id: str) -> str:
+        return os.path.join(self.artifact_root, str(uuid.UUID(str(job_id))))
+
+    def artifact_path(self, job: dict) -> Optional[str]:
+        """Path of a finished job's artifact, if it has one on disk."""
+        if job['status'] != 'complete' or not job['artifact_name']:
+            return None
+        path = os.path.join(self.artifact_dir(job['job_id']), job['artifact_name'])
+        return path if os.path.isfile(path) else None
+
+    # ------------------------------------------------------------------
+    # API side
+    # ------------------------------------------------------------------
+
+    def enqueue(self, kind: str, params: Optional[dict] = None, job_id: Optional[str] = None,
+                created_by: Optional[str] = None, experiment_id=None,
+                dedup_key: Optional[str] = None) -> str:
+        """
+        Insert a queued job and dispatch it. job_id may be chosen by the
+        caller, e.g. to spool an upload into artifact_dir(job_id) first.
+        Raises IntegrityError if a job of the kind with dedup_key is active.
+        """
+        job_id = uuid.UUID(str(job_id)) if job_id else uuid.uuid4()
+        with self.engine.begin() as conn:
+            conn.execute(jobs.insert().values(
+                job_id=job_id, kind=kind, params=params or {}, status='queued',
+                created_by=created_by,
+                experiment_id=uuid.UUID(str(experiment_id)) if experiment_id else None,
+                dedup_key=dedup_key,
+                created_at=datetime.utcnow(),
+            ))
+        if self.redis is not None:
+            try:
+                self.redis.lpush(self.queue_key, str(job_id))
+            except redis.RedisError as e:
+                # Workers still find the job through the table
+                logger.warning(f"Could not push job {job_id} to Redis: {e}")
+        return str(job_id)
+
+    def enqueue_unique(self, kind: str, params: Optional[dict] = None, created_by: Optional[str] = None,
+                       experiment_id=None) -> Tuple[str, bool]:
+        """
+        Enqueue a job unless one of the same kind and params is queued or
+        running. Returns (job_id, created). Concurrent callers agree on one
+        job through the unique index on the active jobs' dedup keys.
+        """
+        dedup_key = hashlib.sha256(json.dumps(params or {}, sort_keys=True).encode()).hexdigest()
+        active = (jobs.c.kind == kind) & (jobs.c.dedup_key == dedup_key) & jobs.c.status.in_(ACTIVE)
+        for attempt in range(MAX_ATTEMPTS):
+            with self.engine.connect() as conn:
+                job_id = conn.execute(select(jobs.c.job_id).where(active)).scalar()
+            if job_id is not None:
+                return str(job_id), False
+            try:
+                return self.enqueue(kind, params, created_by=created_by, experiment_id=experiment_id,
+                                    dedup_key=dedup_key), True
+            except IntegrityError:
+                # A concurrent caller enqueued it first (or it finished in between: retry)
+                if attempt == MAX_ATTEMPTS - 1:
+                    raise
+
+    def get(self, job_id: str) -> Optional[dict]:
+        try:
+            job_uuid = uuid.UUID(str(job_id))
+        except ValueError:
+            return None
+        with self.engine.connect() as conn:
+            row = conn.execute(select(jobs).where(jobs.c.job_id == job_uuid)).first()
+        return _row_dict(row) if row is not None else None
+
+    def list(self, kind: Optional[str] = None, status: Optional[str] = None,
+             experiment_id=None, limit: int = 50) -> List[dict]:
+        """Jobs, newest first."""
+        query = select(jobs).order_by(jobs.c.created_at.desc()).limit(limit)
+        if kind:
+            query = query.where(jobs.c.kind == kind)
+        if status:
+            query = query.where(jobs.c.status == status)
+        if experiment_id:
+            query = query.where(jobs.c.experiment_id == uuid.UUID(str(experiment_id)))
+        with self.engine.connect() as conn:
+            return [_row_dict(row) for row in conn.execute(query)]
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        """
+        Cancel a job: a queued job is cancelled at once, a running one is
+        flagged and stops at its handler's next cancellation check.
+        """
+        job_uuid = uuid.UUID(str(job_id))
+        now = datetime.utcnow()
+        with self.engine.begin() as conn:
+            conn.execute(update(jobs).where(jobs.c.job_id == job_uuid, jobs.c.status == 'queued')
+                         .values(status='cancelled', cancel_requested=True, finished_at=now))
+            conn.execute(update(jobs).where(jobs.c.job_id == job_uuid, jobs.c.status == 'running')
+                         .values(cancel_requested=True))
+        return self.get(job_id)
+
+    # ------------------------------------------------------------------
+    # Worker side
+    # ------------------------------------------------------------------
+
+    def claim(self, worker_id: str, timeout: float = 0) -> Optional[dict]:
+        """
+        Claim a queued job for worker_id. With Redis, blocks up to timeout
+        seconds for a dispatched id before falling back to the table.
+        """
+        if self.redis is not None and timeout > 0:
+            try:
+                popped = self.redis.brpop(self.queue_key, timeout=max(1, int(timeout)))
+            except redis.RedisError as e:
+                logger.warning(f"Redis job queue unavailable: {e}")
+                popped = None
+            if popped is not None:
+                job = self._claim(worker_id, jobs.c.job_id == uuid.UUID(popped[1].decode()))
+                if job is not None:
+                    return job
+        oldest = (select(jobs.c.job_id).where(jobs.c.status == 'queued')
+                  .order_by(jobs.c.created_at).limit(1)
+                  .with_for_update(skip_locked=True).scalar_subquery())
+        return self._claim(worker_id, jobs.c.job_id == oldest)
+
+    def _claim(self, worker_id, condition) -> Optional[dict]:
+        now = datetime.utcnow()
+        with self.engine.begin() as conn:
+            row = conn.execute(
+                update(jobs).where(condition, jobs.c.status == 'queued')
+                .values(status='running', worker_id=worker_id, started_at=now, heartbeat_at=now,
+                        attempts=jobs.c.attempts + 1)
+                .returning(*jobs.c)
+            ).first()
+        return _row_dict(row) if row is not None else None
+
+    def set_progress(self, job_id: str, completed: int, total: int, partial=None) -> bool:
+        """Record progress (and heartbeat). Returns whether cancellation was requested."""
+        values = {'completed': completed, 'total': total, 'heartbeat_at': datetime.utcnow()}
+        if partial is not None:
+            values['partial'] = partial
+        with self.engine.begin() as conn:
+            cancel = conn.execute(
+                update(jobs).where(jobs.c.job_id == uuid.UUID(str(job_id)))
+                .values(values).returning(jobs.c.cancel_requested)
+            ).scalar()
+        return bool(cancel)
+
+    def heartbeat(self, job_ids: Iterable[str]) -> set:
+        """Heartbeat running jobs. Returns the ids whose cancellation was requested."""
+        ids = [uuid.UUID(str(j)) for j in job_ids]
+        if not ids:
+            return set()
+        with self.engine.begin() as conn:
+            rows = conn.execute(
+                update(jobs).where(jobs.c.job_id.in_(ids), jobs.c.status == 'running')
+                .values(heartbeat_at=datetime.utcnow())
+                .returning(jobs.c.job_id, jobs.c.cancel_requested)
+            ).all()
+        return {str(job_id) for job_id, cancel in rows if cancel}
+
+    def finish(self, job_id: str, status: str, result=None, error: Optional[str] = None,
+               artifact_name: Optional[str] = None, artifact_mime: Optional[str] = None) -> None:
+        """Record a job's outcome. Artifacts of jobs that did not complete are removed."""
+        if status not in FINISHED:
+            raise ValueError(f'status must be one of {FINISHED}')
+        values = {'status': status, 'result': result, 'error': error, 'finished_at': datetime.utcnow()}
+        if status == 'complete':
+            values.update(artifact_name=artifact_name, artifact_mime=artifact_mime)
+        with self.engine.begin() as conn:
+            conn.execute(update(jobs).where(jobs.c.job_id == uuid.UUID(str(job_id)),
+                                            jobs.c.status == 'running').values(values))
+        if status != 'complete' or not artifact_name:
+            shutil.rmtree(self.artifact_dir(job_id), ignore_errors=True)
+
+    def requeue_stale(self, stale_after: float = STALE_AFTER, max_attempts: int = MAX_ATTEMPTS,
+                      single_attempt: Optional[Iterable[str]] = None) -> int:
+        """
+        Requeue running jobs without a recent heartbeat. Those whose
+        cancellation was requested end cancelled; those out of attempts or
+        of a single-attempt kind (default SINGLE_ATTEMPT_KINDS) fail.
+        """
+        single_attempt = list(SINGLE_ATTEMPT_KINDS if single_attempt is None else single_attempt)
+        now = datetime.utcnow()
+        cutoff = now - timedelta(seconds=stale_after)
+        stale = (jobs.c.status == 'running') & (jobs.c.heartbeat_at < cutoff)
+        with self.engine.begin() as conn:
+            requeued = conn.execute(
+                update(jobs).where(stale, jobs.c.attempts < max_attempts, ~jobs.c.cancel_requested,
+                                   ~jobs.c.kind.in_(single_attempt))
+                .values(status='queued', worker_id=None).returning(jobs.c.job_id)
+            ).scalars().all()
+            finished = conn.execute(
+                update(jobs).where(stale, jobs.c.cancel_requested)
+                .values(status='cancelled', finished_at=now).returning(jobs.c.job_id)
+            ).scalars().all()
+            finished += conn.execute(
+                update(jobs).where(stale, jobs.c.kind.in_(single_attempt))
+                .values(status='failed', error='Worker stopped responding; this kind of job is not retried',
+                        finished_at=now).returning(jobs.c.job_id)
+            ).scalars().all()
+            finished += conn.execute(
+                update(jobs).where(stale)
+                .values(status='failed', error='Worker stopped responding', finished_at=now)
+                .returning(jobs.c.job_id)
+            ).scalars().all()
+        for job_id in finished:
+            shutil.rmtree(self.artifact_dir(job_id), ignore_errors=True)
+        if requeued and self.redis is not None:
+            try:
+                self.redis.lpush(self.queue_key, *[str(j) for j in requeued])
+            except redis.RedisError:
+                pass
+        return len(requeued)
+
+    def prune(self, older_than: float = RETENTION_SECONDS) -> int:
+        """Delete finished jobs older than older_than seconds and their artifacts."""
+        cutoff = datetime.utcnow() - timedelta(seconds=older_than)
+        with self.engine.begin() as conn:
+            removed = conn.execute(
+                delete(jobs).where(jobs.c.status.in_(FINISHED), jobs.c.finished_at < cutoff)
+                .returning(jobs.c.job_id)
+            ).scalars().all()
+        for job_id in removed:
+            shutil.rmtree(self.artifact_dir(job_id), ignore_errors=True)
+        return len(removed)
+
+
+class JobContext:
+    """
+    What a handler sees of its job: params, progress reporting,
+    cancellation checks and the artifact to write.
+    """
+
+    def __init__(self, queue: JobQueue, job: dict):
+        self.queue = queue
+        self.job_id = job['job_id']
+        self.kind = job['kind']
+        self.params = job['params'] or {}
+        self.artifact_name = None
+        self.artifact_mime = None
+        self._cancelled = threading.Event()
+        self._last_progress = 0.0
+
+    def set_progress(self, completed: int, total: int, partial=None) -> None:
+        """Report progress; written at most every PROGRESS_INTERVAL seconds (and on completion)."""
+        now = time.monotonic()
+        if completed < total and now - self._last_progress < PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        if self.queue.set_progress(self.job_id, completed, total, partial):
+            self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def check_cancelled(self) -> None:
+        if self._cancelled.is_set():
+            raise JobCancelled()
+
+    def artifact_path(self, filename: str, mime_type: Optional[str] = None) -> str:
+        """Path to write the job's result artifact to (served once the job completes)."""
+        directory = self.queue.artifact_dir(self.job_id)
+        os.makedirs(directory, exist_ok=True)
+        self.artifact_name = secure_filename(filename) or 'artifact'
+        self.artifact_mime = mime_type
+        return os.path.join(directory, self.artifact_name)
+
+
+class Worker:
+    """
+    Pool of threads running queued jobs, plus a housekeeping thread that
+    heartbeats running jobs, relays cancellation, requeues jobs of dead
+    workers and prunes old jobs.
+
+    Args:
+        context: callable returning a context manager each job runs in
+            (the API passes app.app_context)
+        concurrency: jobs run at once
+    """
+
+    def __init__(self, queue: JobQueue, concurrency: int = 2, context: Optional[Callable] = None,
+                 handlers: Optional[Dict[str, Callable]] = None, worker_id: Optional[str] = None,
+                 poll_interval: float = 2.0):
+        self.queue = queue
+        self.concurrency = max(1, concurrency)
+        self.context = context
+        self.handlers = HANDLERS if handlers is None else handlers
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+        self.poll_interval = poll_interval
+        self._running: Dict[str, JobContext] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        """Start the worker threads in the background."""
+        for n in range(self.concurrency):
+            self._threads.append(threading.Thread(target=self._loop, name=f'job-worker-{n}', daemon=True))
+        self._threads.append(threading.Thread(target=self._housekeeping, name='job-housekeeping', daemon=True))
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Job worker {self.worker_id}: {self.concurrency} threads, {self.queue.backend} queue")
+
+    def run(self) -> None:
+        """Start and block until stop() is called."""
+        self.start()
+        while not self._stop.wait(1.0):
+            pass
+        for thread in self._threads:
+            thread.join()
+
+    def stop(self) -> None:
+        """Stop claiming jobs; running jobs finish first."""
+        self._stop.set()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim(self.worker_id, timeout=self.poll_interval)
+            except Exception as e:
+                logger.error(f"Claiming a job failed: {e}")
+                job = None
+            if job is None:
+                if self.queue.redis is None:
+                    self._stop.wait(self.poll_interval)
+                continue
+            self.execute(job)
+
+    def execute(self, job: dict) -> None:
+        """Run one claimed job and record its outcome."""
+        ctx = JobContext(self.queue, job)
+        fn = self.handlers.get(job['kind'])
+        if fn is None:
+            self.queue.finish(ctx.job_id, 'failed', error=f"Unknown job kind: {job['kind']}")
+            return
+        with self._lock:
+            self._running[ctx.job_id] = ctx
+        start = time.perf_counter()
+        try:
+            if self.context is not None:
+                with self.context():
+                    result = fn(ctx)
+            else:
+                result = fn(ctx)
+            self.queue.finish(ctx.job_id, 'complete', result=result,
+                              artifact_name=ctx.artifact_name, artifact_mime=ctx.artifact_mime)
+            status = 'complete'
+        except JobCancelled:
+            self.queue.finish(ctx.job_id, 'cancelled')
+            status = 'cancelled'
+        except Exception as e:
+            logger.exception(f"Job {ctx.job_id} ({ctx.kind}) failed")
+            self.queue.finish(ctx.job_id, 'failed', error=str(e))
+            status = 'failed'
+        finally:
+            with self._lock:
+                self._running.pop(ctx.job_id, None)
+        logger.info(f"Job {ctx.job_id} ({ctx.kind}) {status} in {time.perf_counter() - start:.2f}s")
+
+    def _housekeeping(self) -> None:
+        last_prune = 0.0
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                with self._lock:
+                    running = dict(self._running)
+                for job_id in self.queue.heartbeat(running):
+                    running[job_id]._cancelled.set()
+                self.queue.requeue_stale()
+                if time.monotonic() - last_prune > PRUNE_INTERVAL:
+                    last_prune = time.monotonic()
+                    self.queue.prune()
+            except Exception as e:
+                logger.error(f"Job housekeeping failed: {e}")
@@ -0,0 +1,221 @@
+"""
+Pooled Paired-Comparison Ranking
+Version: 3.1
+
+Experiment-level ranking of stimuli from the choices of all sessions, under a
+Bradley-Terry (logistic) or Thurstone case V (probit) model.
+
+All choices are aggregated into a win-count matrix W (W[i, j] = times i was
+chosen over j), so a fit costs O(n²) per iteration for the gradient and
+O(n³) for the Newton step regardless of the number of choices. Scores are
+fitted by Fisher scoring (Newton with expected information) under a weak
+Gaussian prior, which keeps them finite for unbeaten or never-compared items
+and centers them at zero.
+
+A PooledRanking keeps W and the last solution: new choices are added to W
+and the refit starts from the previous scores, so it usually converges in
+one or two Newton steps.
+"""
+
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+from scipy.linalg import cho_factor, cho_solve
+from scipy.special import expit, log_expit
+from scipy.stats import norm
+
+logger = logging.getLogger(__name__)
+
+MODELS = ('bradley_terry', 'thurstone')
+
+
+def aggregate_wins(winners: np.ndarray, losers: np.ndarray, n_items: int) -> np.ndarray:
+    """Win-count matrix W[i, j] = number of choices of i over j."""
+    winners = np.asarray(winners, dtype=np.int64)
+    losers = np.asarray(losers, dtype=np.int64)
+    counts = np.bincount(winners * n_items + losers, minlength=n_items * n_items)
+    return counts.reshape(n_items, n_items).astype(float)
+
+
+def _link(model: str, D: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """log F(D), f(D)/F(D) and the Fisher weight f(D)²/(F(D)(1-F(D))) for the model's link."""
+    if model == 'bradley_terry':
+        P = expit(D)
+        return log_expit(D), 1.0 - P, P * (1.0 - P)
+    log_cdf = norm.logcdf(D)
+    log_pdf = norm.logpdf(D)
+    ratio = np.exp(log_pdf - log_cdf)
+    weight = np.exp(2 * log_pdf - log_cdf - norm.logcdf(-D))
+    return log_cdf, ratio, weight
+
+
+def _log_posterior(wins: np.ndarray, scores: np.ndarray, model: str, prior_variance: float) -> float:
+    log_F, _, _ = _link(model, scores[:, None] - scores[None, :])
+    return float(np.sum(wins * log_F) - scores @ scores / (2 * prior_variance))
+
+
+def fit_paired_comparison(wins: np.ndarray, model: str = 'bradley_terry',
+                          init: Optional[np.ndarray] = None, prior_variance: float = 10.0,
+                          tol: float = 1e-6, max_iter: int = 100) -> dict:
+    """
+    Fit pooled scores to a win-count matrix by Fisher scoring.
+
+    Args:
+        wins: (n, n) win counts, wins[i, j] = times i beat j
+        model: 'bradley_terry' or 'thurstone'
+        init: Starting scores (e.g. the previous solution)
+        prior_variance: Variance of the zero-mean Gaussian prior on scores
+        tol: Stop when the largest score change is below this
+        max_iter: Iteration cap
+
+    Returns:
+        Dict with scores, standard_errors (of the centered scores, from the
+        posterior information at the solution), iterations and converged
+    """
+    if model not in MODELS:
+        raise ValueError(f"Unknown model {model!r}; expected one of {MODELS}")
+
+    n = wins.shape[0]
+    scores = np.zeros(n) if init is None else np.array(init, dtype=float)
+    comparisons = wins + wins.T
+    objective = _log_posterior(wins, scores, model, prior_variance)
+    converged = False
+
+    for iteration in range(1, max_iter + 1):
+        D = scores[:, None] - scores[None, :]
+        _, ratio, weight = _link(model, D)
+
+        A = wins * ratio
+        gradient = A.sum(axis=1) - A.sum(axis=0) - scores / prior_variance
+
+        W = comparisons * weight
+        information = np.diag(W.sum(axis=1) + 1.0 / prior_variance) - W
+        factor = cho_factor(information)
+        step = cho_solve(factor, gradient)
+
+        # Step halving keeps the (concave) log posterior increasing
+        for _ in range(30):
+            candidate = scores + step
+            new_objective = _log_posterior(wins, candidate, model, prior_variance)
+            if new_objective >= objective - 1e-12:
+                break
+            step /= 2
+
+        scores, objective = candidate, new_objective
+        if np.max(np.abs(step)) < tol:
+            converged = True
+            break
+
+    D = scores[:, None] - scores[None, :]
+    W = comparisons * _link(model, D)[2]
+    information = np.diag(W.sum(axis=1) + 1.0 / prior_variance) - W
+    covariance = cho_solve(cho_factor(information), np.eye(n))
+
+    # Choices only identify score differences; report the standard errors of
+    # the centered scores so the unidentified common mode (the prior's) drops out
+    row_means = covariance.mean(axis=1)
+    centered_variance = np.diag(covariance) - 2 * row_means + row_means.mean()
+
+    return {
+        'scores': scores,
+        'standard_errors': np.sqrt(np.maximum(centered_variance, 0.0)),
+        'iterations': iteration,
+        'converged': converged,
+    }
+
+
+class PooledRanking:
+    """
+    Aggregated win counts and the current fit for one experiment and model.
+    """
+
+    def __init__(self, n_items: int, model: str = 'bradley_terry', prior_variance: float = 10.0):
+        if model not in MODELS:
+            raise ValueError(f"Unknown model {model!r}; expected one of {MODELS}")
+        self.n_items = n_items
+        self.model = model
+        self.prior_variance = prior_variance
+        self.wins = np.zeros((n_items, n_items))
+        self.n_choices = 0
+        self.scores = np.zeros(n_items)
+        self.standard_errors = np.full(n_items, np.sqrt(prior_variance * (1 - 1.0 / n_items)))
+        self.iterations = 0
+        self.fit_ms = 0.0
+        self._stale = False
+
+    def copy(self) -> 'PooledRanking':
+        """Independent copy, to refresh a ranking other threads may be reading."""
+        clone = copy.copy(self)
+        clone.wins = self.wins.copy()
+        return clone
+
+    def add_choices(self, winners: np.ndarray, losers: np.ndarray) -> None:
+        """Add choices (stimulus indices) to the win counts; the fit is refreshed on the next refit()."""
+        if len(winners) == 0:
+            return
+        self.wins = self.wins + aggregate_wins(winners, losers, self.n_items)
+        self.n_choices += len(winners)
+        self._stale = True
+
+    def refit(self) -> None:
+        """Refit if choices were added, warm-starting from the previous scores."""
+        if not self._stale:
+            return
+        t0 = time.perf_counter()
+        fit = fit_paired_comparison(self.wins, self.model, init=self.scores,
+                                    prior_variance=self.prior_variance)
+        self.fit_ms = (time.perf_counter() - t0) * 1000
+        self.scores = fit['scores']
+        self.standard_errors = fit['standard_errors']
+        self.iterations = fit['iterations']
+        self._stale = False
+        if not fit['converged']:
+            logger.warning(f"Pooled {self.model} fit did not converge in {fit['iterations']} iterations")
+
+
+class RankingCache:
+    """
+    Thread-safe LRU of PooledRanking objects with the choice watermark they cover.
+
+    Entries are keyed by (experiment_id, model). The watermark is whatever
+    the caller uses to detect new choices (the API uses the newest choice
+    timestamp and the choice count). Cached rankings are read without
+    locks, so they must not be modified: refresh a copy and put it.
+    refresh_lock(key) serializes the refreshes of one key.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._refresh_locks = {}
+        self._lock = threading.Lock()
+
+    def refresh_lock(self, key) -> threading.Lock:
+        """Lock held while refreshing the entry for key."""
+        with self._lock:
+            return self._refresh_locks.setdefault(key, threading.Lock())
+
+    def get(self, key):
+        """(ranking, watermark, item_ids) for key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, ranking: PooledRanking, watermark, item_ids) -> None:
+        with self._lock:
+            self._entries[key] = (ranking, watermark, item_ids)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._refresh_locks.pop(evicted, None)
+
+    def invalidate(self, key) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
@@ -0,0 +1,130 @@
+"""
+Population Posterior for Warm-Start Priors
+Version: 3.1
+
+Aggregates the final posteriors of an experiment's completed sessions into a
+population-level belief about stimulus utilities, and turns it into the
+initial mean and covariance of new sessions.
+
+Each completed session contributes its posterior mean mu_s and covariance
+Sigma_s. By the law of total variance the population covariance is
+
+    Cov(u) = Cov_s(mu_s) + E_s[Sigma_s]
+
+Both terms are kept as running (Welford) statistics, so each completion is an
+O(n²) update and no session history has to be re-read.
+"""
+
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WARM_START = {
+    'enabled': False,
+    'shrinkage': 0.5,     # fraction of the population mean used as prior mean
+    'inflation': 1.5,     # multiplier on the population covariance
+    'min_sessions': 20,   # completed sessions before the warm start is used
+}
+
+
+def warm_start_config(metadata: Optional[dict]) -> dict:
+    """Warm-start settings from experiment_metadata['warm_start'] merged over the defaults."""
+    config = dict(DEFAULT_WARM_START)
+    config.update((metadata or {}).get('warm_start') or {})
+    return config
+
+
+class PopulationPosterior:
+    """
+    Running mean/covariance of completed-session posteriors for one experiment.
+    """
+
+    def __init__(self, n_items: int):
+        self.n_items = n_items
+        self.count = 0
+        self.mean = np.zeros(n_items)
+        self.m2 = np.zeros((n_items, n_items))
+        self.mean_sigma = np.zeros((n_items, n_items))
+
+    def update(self, mu: np.ndarray, Sigma: np.ndarray) -> None:
+        """Add one completed session's posterior (Welford update)."""
+        if mu.shape != (self.n_items,) or Sigma.shape != (self.n_items, self.n_items):
+            raise ValueError(f"Expected a posterior over {self.n_items} items")
+
+        self.count += 1
+        delta = mu - self.mean
+        self.mean += delta / self.count
+        self.m2 += np.outer(delta, mu - self.mean)
+        self.mean_sigma += (Sigma - self.mean_sigma) / self.count
+
+    def covariance(self) -> np.ndarray:
+        """Population covariance of utilities: between-session + mean within-session."""
+        between = self.m2 / (self.count - 1) if self.count > 1 else np.zeros_like(self.m2)
+        return between + self.mean_sigma
+
+    def prior(self, base_variance: float, shrinkage: float = 0.5,
+              inflation: float = 1.5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Initial (mu, Sigma) for a new session.
+
+        Comparisons only inform utility differences, so the common-mode
+        component (the variance of the mean utility, base_variance / n under
+        the cold prior) is never learned. The warm start keeps it at the
+        cold-start value and only replaces the contrast (zero-sum) part of
+        the covariance with the inflated population estimate.
+
+        Args:
+            base_variance: The experiment's prior_variance; the contrast part
+                is scaled down if needed so no marginal variance exceeds the
+                cold start's
+            shrinkage: Fraction of the population mean used (0 = zero mean)
+            inflation: Multiplier on the population covariance (> 1 hedges
+                against subjects that differ from the population)
+
+        Returns:
+            (mu0, Sigma0)
+        """
+        n = self.n_items
+        centering = np.eye(n) - 1.0 / n
+
+        mu0 = shrinkage * (centering @ self.mean)
+
+        contrast = inflation * (centering @ self.covariance() @ centering)
+        contrast = (contrast + contrast.T) / 2
+        max_var = np.max(np.diag(contrast))
+        cold_contrast_var = base_variance * (1 - 1.0 / n)
+        if max_var > cold_contrast_var:
+            contrast *= cold_contrast_var / max_var
+
+        Sigma0 = contrast + base_variance / n
+        return mu0, Sigma0
+
+    def to_arrays(self) -> dict:
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2, 'mean_sigma': self.mean_sigma}
+
+    @classmethod
+    def from_arrays(cls, n_items: int, count: int, mean: np.ndarray, m2: np.ndarray,
+                    mean_sigma: np.ndarray) -> 'PopulationPosterior':
+        population = cls(n_items)
+        population.count = int(count)
+        population.mean = np.array(mean, dtype=float).reshape(n_items)
+        population.m2 = np.array(m2, dtype=float).reshape(n_items, n_items)
+        population.mean_sigma = np.array(mean_sigma, dtype=float).reshape(n_items, n_items)
+        return population
+
+
+def warm_start_prior(population: Optional[PopulationPosterior], config: dict,
+                     base_variance: float) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Warm-start (mu0, Sigma0) if warm start is enabled and enough sessions completed, else None.
+    """
+    if not config.get('enabled') or population is None:
+        return None
+    if population.count < int(config.get('min_sessions', DEFAULT_WARM_START['min_sessions'])):
+        return None
+    return population.prior(base_variance,
+                            shrinkage=float(config.get('shrinkage', DEFAULT_WARM_START['shrinkage'])),
+                            inflation=float(config.get('inflation', DEFAULT_WARM_START['inflation'])))
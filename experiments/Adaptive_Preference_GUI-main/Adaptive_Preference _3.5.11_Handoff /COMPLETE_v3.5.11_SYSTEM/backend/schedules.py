@@ -0,0 +1,193 @@
+"""
+Precomputed Pair Schedules
+Version: 3.1
+
+Fixed (non-adaptive) designs for experiments that do not use the Bayesian
+selector. A schedule is generated once at publish time; each session is
+assigned one sequence and a permutation seed, and the pair for trial t is
+an O(1) lookup.
+
+A schedule is stored compactly as a PairSchedule: the round-robin rounds
+(O(n²) stimulus indices) plus the order of rounds in each sequence, rather
+than every sequence's trials (O(n³) for a latin square of n stimuli). The
+pair of (sequence, trial) is computed from them on lookup.
+
+All designs are built from the rounds of a round-robin tournament (circle
+method): each round is a matching in which every stimulus appears at most
+once, and together the rounds contain every pair exactly once.
+
+Designs:
+- round_robin: every subject sees all pairs; two sequences with opposite
+  left/right sides, trial order shuffled per subject
+- balanced_subsets: every subject sees trials_per_subject pairs made of
+  consecutive whole rounds (so each stimulus appears equally often within
+  a subject); sequence s starts at round s·k, so over n_sequences subjects
+  every round is used equally often; trial order shuffled per subject
+- latin_square: every subject sees all pairs, with the rounds ordered by a
+  Williams design (each round in each position once, first-order carryover
+  balanced); trial order is fixed by the square
+
+Left/right sides alternate between sequences and rounds, so each pair is
+shown in both orientations equally often.
+"""
+
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+DESIGNS = ('round_robin', 'balanced_subsets', 'latin_square')
+
+
+def validate_schedule_config(config: Optional[dict]) -> None:
+    """
+    Check a schedule config (experiment_metadata['schedule']).
+
+    Keys:
+    - design: one of DESIGNS (required)
+    - trials_per_subject: required for balanced_subsets
+    - shuffle: per-subject trial order shuffle (default True, except latin_square)
+    - seed: seed for the within-round pair order (default 0)
+
+    Raises:
+        ValueError: for an unknown design or missing/out-of-range values
+    """
+    if not config:
+        return
+    design = config.get('design')
+    if design not in DESIGNS:
+        raise ValueError(f"design must be one of {DESIGNS}")
+    if design == 'balanced_subsets':
+        if config.get('trials_per_subject') is None or int(config['trials_per_subject']) < 1:
+            raise ValueError("balanced_subsets needs trials_per_subject >= 1")
+
+
+def round_robin_rounds(n_items: int) -> List[List[Tuple[int, int]]]:
+    """
+    Rounds of a round-robin tournament (circle method).
+
+    Returns n-1 rounds of n/2 pairs for even n, n rounds of (n-1)/2 pairs
+    for odd n (one stimulus sits out each round).
+    """
+    players = list(range(n_items)) + ([None] if n_items % 2 else [])
+    m = len(players)
+    rounds = []
+    for _ in range(m - 1):
+        pairs = [(players[k], players[m - 1 - k]) for k in range(m // 2)]
+        rounds.append([(a, b) for a, b in pairs if a is not None and b is not None])
+        players = [players[0], players[-1]] + players[1:-1]
+    return rounds
+
+
+def williams_orders(n: int) -> np.ndarray:
+    """Row orders of a Williams design for n treatments: (n, n) array ((2n, n) for odd n)."""
+    first = [0]
+    lo, hi = 1, n - 1
+    while len(first) < n:
+        first.append(lo)
+        lo += 1
+        if len(first) < n:
+            first.append(hi)
+            hi -= 1
+    rows = (np.asarray(first)[None, :] + np.arange(n)[:, None]) % n
+    if n % 2:
+        rows = np.concatenate([rows, rows[:, ::-1]])
+    return rows
+
+
+class PairSchedule:
+    """
+    A design as rounds plus the round order of each sequence.
+
+    Args:
+        rounds: (n_rounds, pairs_per_round, 2) stimulus indices
+        round_orders: (n_sequences, rounds_per_sequence) round of each
+            position of each sequence
+        trials_per_sequence: trials of every sequence (at most
+            rounds_per_sequence * pairs_per_round; the last round may be cut)
+
+    Sides alternate with (sequence + position): at odd parity the pairs of
+    a round are shown flipped.
+    """
+
+    def __init__(self, rounds: np.ndarray, round_orders: np.ndarray, trials_per_sequence: int):
+        self.rounds = rounds
+        self.round_orders = round_orders
+        self.trials_per_sequence = int(trials_per_sequence)
+
+    @property
+    def n_sequences(self) -> int:
+        return self.round_orders.shape[0]
+
+    def pair(self, sequence: int, trial: int) -> Tuple[int, int]:
+        """Stimulus indices of a sequence's trial in presentation order."""
+        position, k = divmod(int(trial), self.rounds.shape[1])
+        a, b = self.rounds[self.round_orders[sequence, position], k]
+        return (int(b), int(a)) if (sequence + position) % 2 else (int(a), int(b))
+
+    def to_array(self) -> np.ndarray:
+        """All trials as an (n_sequences, trials, 2) array (O(n³) for full designs)."""
+        return np.asarray([[self.pair(s, t) for t in range(self.trials_per_sequence)]
+                           for s in range(self.n_sequences)], dtype=np.int32)
+
+
+def generate_schedule(n_items: int, config: dict) -> PairSchedule:
+    """
+    Build the schedule of a design.
+
+    Args:
+        n_items: Number of stimuli
+        config: Schedule config (see validate_schedule_config)
+
+    Returns:
+        The PairSchedule; in its pairs, the first stimulus is shown on the
+        left/first
+    """
+    validate_schedule_config(config)
+    if n_items < 2:
+        raise ValueError("A schedule needs at least 2 stimuli")
+
+    design = config['design']
+    rng = np.random.default_rng(int(config.get('seed', 0)))
+    rounds = [list(r) for r in round_robin_rounds(n_items)]
+    for r in rounds:
+        rng.shuffle(r)
+    rounds = np.asarray(rounds, dtype=np.int32)
+    n_rounds, per_round = rounds.shape[:2]
+
+    if design == 'round_robin':
+        orders = np.tile(np.arange(n_rounds), (2, 1))
+        trials = n_rounds * per_round
+    elif design == 'latin_square':
+        orders = williams_orders(n_rounds)
+        trials = n_rounds * per_round
+    else:
+        trials = int(config['trials_per_subject'])
+        if trials > n_rounds * per_round:
+            raise ValueError(f"trials_per_subject exceeds the {n_rounds * per_round} distinct pairs")
+        k = math.ceil(trials / per_round)
+        # Sequences until the round offsets s·k (mod rounds) wrap around
+        n_sequences = n_rounds // math.gcd(n_rounds, k)
+        orders = (np.arange(n_sequences)[:, None] * k + np.arange(k)[None, :]) % n_rounds
+
+    return PairSchedule(rounds, orders.astype(np.int32), trials)
+
+
+def schedule_dtype(n_items: int):
+    """Smallest unsigned dtype that holds stimulus indices."""
+    return np.uint16 if n_items <= np.iinfo(np.uint16).max else np.uint32
+
+
+def permuted_position(trial: int, n_trials: int, seed: Optional[int]) -> int:
+    """
+    Position of a subject's trial in its sequence under the subject's
+    permutation: an affine bijection t -> (a·t + b) mod T with a coprime to
+    T, derived from the seed in O(1). seed None keeps the sequence order.
+    """
+    if seed is None or n_trials <= 1:
+        return trial
+    a = 1 + seed % (n_trials - 1) if n_trials > 2 else 1
+    while math.gcd(a, n_trials) != 1:
+        a += 1
+    b = (seed // n_trials) % n_trials
+    return (a * trial + b) % n_trials
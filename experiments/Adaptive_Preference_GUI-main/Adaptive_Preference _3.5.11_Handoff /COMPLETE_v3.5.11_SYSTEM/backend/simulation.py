@@ -0,0 +1,668 @@
+"""
+Monte Carlo Simulation Service for Experiment Design
+Version: 3.1
+
+Runs thousands of synthetic subjects through the adaptive algorithm to answer
+design questions before an experiment goes live:
+1. How fast does ranking accuracy grow with the number of trials?
+2. What max_trials / convergence_threshold reaches a target accuracy?
+3. How much accuracy does an anytime budget or a cheaper selector cost?
+4. How many trials does a population warm-start prior save?
+5. How many trials do ranking-stability stopping rules save, at what accuracy?
+
+Subjects of one parameter cell are simulated in lockstep: their states are
+stacked, pairs are scored for the whole stack at once and beliefs are updated
+with the batched update from the replay engine. Cells and subject chunks are
+spread across a process pool.
+"""
+
+import itertools
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from scipy.stats import norm, rankdata
+
+try:
+    from backend.bayesian_adaptive import (BayesianPreferenceState, ExperimentSession,
+                                           PureBayesianAdaptiveSelector, information_gain,
+                                           selector_from_config)
+    from backend.population import DEFAULT_WARM_START, PopulationPosterior
+    from backend.replay import batch_update_beliefs
+except ImportError:
+    from bayesian_adaptive import (BayesianPreferenceState, ExperimentSession,
+                                   PureBayesianAdaptiveSelector, information_gain, selector_from_config)
+    from population import DEFAULT_WARM_START, PopulationPosterior
+    from replay import batch_update_beliefs
+
+logger = logging.getLogger(__name__)
+
+# Lower quantiles (5%..50%) reported per checkpoint; power p uses the (1 - p) quantile
+QUANTILES = np.round(np.arange(0.05, 0.51, 0.05), 2)
+
+# Upper bound on the stacked Sigma of one simulation task (bytes)
+TASK_MEMORY_BYTES = 64 * 1024 * 1024
+
+DEFAULT_GRID = {
+    'n_items': [10, 20, 50],
+    'epsilon': [0.01],
+    'exploration_weight': [0.1],
+    'noise': [0.1, 0.5, 1.0],
+}
+
+
+def ranking_metrics(true_utilities: np.ndarray, mu: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Spearman correlation and pairwise accuracy of recovered vs true utilities, per subject.
+
+    Args:
+        true_utilities: (S, n) ground-truth utilities
+        mu: (S, n) posterior means
+
+    Returns:
+        Dict with 'spearman' and 'pairwise_accuracy' arrays of shape (S,)
+    """
+    rt = rankdata(true_utilities, axis=1)
+    rm = rankdata(mu, axis=1)
+    rt -= rt.mean(axis=1, keepdims=True)
+    rm -= rm.mean(axis=1, keepdims=True)
+    denom = np.sqrt((rt**2).sum(axis=1) * (rm**2).sum(axis=1))
+    spearman = np.divide((rt * rm).sum(axis=1), denom, out=np.zeros(len(denom)), where=denom > 0)
+
+    rows, cols = np.triu_indices(mu.shape[1], k=1)
+    agree = (true_utilities[:, rows] > true_utilities[:, cols]) == (mu[:, rows] > mu[:, cols])
+
+    return {'spearman': spearman, 'pairwise_accuracy': agree.mean(axis=1)}
+
+
+def _batch_select(mu, Sigma, comparison_matrix, idx, rows, cols, epsilon, exploration_weight):
+    """Pick the max-score pair for each stacked state idx (same score as select_next_pair)."""
+    sub = idx[:, None]
+    mu_diff = mu[sub, rows] - mu[sub, cols]
+    sigma_diff = np.sqrt(Sigma[sub, rows, rows] + Sigma[sub, cols, cols] - 2 * Sigma[sub, rows, cols])
+    scores = information_gain(mu_diff, sigma_diff, epsilon)
+    scores += exploration_weight / (1 + comparison_matrix[sub, rows, cols] + comparison_matrix[sub, cols, rows])
+    scores[np.isnan(scores)] = -np.inf
+    best = np.argmax(scores, axis=1)
+    return rows[best], cols[best]
+
+
+def simulate_subjects(n_items: int, n_subjects: int, n_trials: int,
+                      epsilon: float = 0.01, exploration_weight: float = 0.1,
+                      noise: float = 0.1, prior_variance: float = 1.0,
+                      checkpoints: Optional[List[int]] = None,
+                      convergence_threshold: Optional[float] = None,
+                      seed=None, true_utilities: Optional[np.ndarray] = None,
+                      prior_mu: Optional[np.ndarray] = None,
+                      prior_Sigma: Optional[np.ndarray] = None,
+                      return_states: bool = False) -> dict:
+    """
+    Simulate a stack of synthetic subjects in lockstep.
+
+    Each subject has utilities drawn from N(0, 1) (or true_utilities) and
+    chooses i over j with probability Φ((uᵢ - uⱼ) / noise).
+
+    Args:
+        n_items: Number of stimuli
+        n_subjects: Number of simulated subjects
+        n_trials: Trials per subject (max_trials)
+        epsilon, exploration_weight: Selector parameters
+        noise: Choice noise of the simulated subjects
+        prior_variance: Initial variance (ignored when prior_Sigma is given)
+        checkpoints: Trial counts at which accuracy is recorded (default: every 5 trials)
+        convergence_threshold: Stop a subject once max marginal SD drops below it
+        seed: Seed or SeedSequence for reproducibility
+        true_utilities: Optional (n_subjects, n_items) ground truth
+        prior_mu, prior_Sigma: Optional initial mean (n,) and covariance (n, n)
+        return_states: Also return the final mu (S, n) and Sigma (S, n, n)
+
+    Returns:
+        Dict with checkpoints, per-checkpoint metric arrays of shape
+        (n_checkpoints, n_subjects), trials_used and converged arrays
+    """
+    if noise <= 0:
+        raise ValueError("noise must be positive")
+
+    rng = np.random.default_rng(seed)
+    S, n = n_subjects, n_items
+
+    if true_utilities is None:
+        true_utilities = rng.standard_normal((S, n))
+    true_utilities = np.asarray(true_utilities, dtype=float)
+
+    mu = np.zeros((S, n)) if prior_mu is None else np.tile(np.asarray(prior_mu, dtype=float), (S, 1))
+    Sigma0 = np.eye(n) * prior_variance if prior_Sigma is None else np.asarray(prior_Sigma, dtype=float)
+    Sigma = np.broadcast_to(Sigma0, (S, n, n)).copy()
+    comparison_matrix = np.zeros((S, n, n))
+
+    if checkpoints is None:
+        checkpoints = list(range(5, n_trials + 1, 5))
+    checkpoints = sorted({int(c) for c in checkpoints if 0 <= c <= n_trials})
+    checkpoint_set = set(checkpoints)
+
+    spearman = np.zeros((len(checkpoints), S))
+    pairwise = np.zeros((len(checkpoints), S))
+    max_sd = np.zeros((len(checkpoints), S))
+    trials_used = np.zeros(S, dtype=int)
+    converged = np.zeros(S, dtype=bool)
+    active = np.ones(S, dtype=bool)
+    rows, cols = np.triu_indices(n, k=1)
+
+    c = 0
+
+    def record():
+        metrics = ranking_metrics(true_utilities, mu)
+        spearman[c] = metrics['spearman']
+        pairwise[c] = metrics['pairwise_accuracy']
+        max_sd[c] = np.sqrt(np.max(np.diagonal(Sigma, axis1=1, axis2=2), axis=1))
+
+    if 0 in checkpoint_set:
+        record()
+        c += 1
+
+    for t in range(1, n_trials + 1):
+        idx = np.flatnonzero(active)
+        if idx.size == 0:
+            break
+
+        i, j = _batch_select(mu, Sigma, comparison_matrix, idx, rows, cols, epsilon, exploration_weight)
+        p_i = norm.cdf((true_utilities[idx, i] - true_utilities[idx, j]) / noise)
+        winner_is_i = rng.random(idx.size) < p_i
+
+        batch_update_beliefs(mu, Sigma, comparison_matrix, i, j, winner_is_i, epsilon,
+                             rows=None if idx.size == S else idx)
+        trials_used[idx] += 1
+
+        if convergence_threshold is not None:
+            sd = np.sqrt(np.max(np.diagonal(Sigma[idx], axis1=1, axis2=2), axis=1))
+            done = idx[sd < convergence_threshold]
+            converged[done] = True
+            active[done] = False
+
+        if t in checkpoint_set:
+            record()
+            c += 1
+
+    # Subjects that all stopped early keep their final state for the remaining checkpoints
+    while c < len(checkpoints):
+        record()
+        c += 1
+
+    raw = {
+        'checkpoints': checkpoints,
+        'spearman': spearman,
+        'pairwise_accuracy': pairwise,
+        'max_sd': max_sd,
+        'trials_used': trials_used,
+        'converged': converged,
+    }
+    if return_states:
+        raw['mu'] = mu
+        raw['Sigma'] = Sigma
+    return raw
+
+
+def summarize_simulation(raw: dict) -> dict:
+    """
+    Reduce per-subject simulation output to trials-to-accuracy curves.
+
+    Returns:
+        Dict with one curve point per checkpoint (mean and lower quantiles of
+        Spearman and pairwise accuracy, median max SD) and overall stats
+    """
+    curve = []
+    for c, trials in enumerate(raw['checkpoints']):
+        curve.append({
+            'trials': int(trials),
+            'spearman_mean': float(np.mean(raw['spearman'][c])),
+            'spearman_quantiles': np.quantile(raw['spearman'][c], QUANTILES).round(4).tolist(),
+            'pairwise_accuracy_mean': float(np.mean(raw['pairwise_accuracy'][c])),
+            'pairwise_accuracy_quantiles': np.quantile(raw['pairwise_accuracy'][c], QUANTILES).round(4).tolist(),
+            'max_sd_median': float(np.median(raw['max_sd'][c])),
+        })
+    return {
+        'quantiles': QUANTILES.tolist(),
+        'curve': curve,
+        'n_subjects': int(len(raw['trials_used'])),
+        'mean_trials_used': float(np.mean(raw['trials_used'])),
+        'converged_fraction': float(np.mean(raw['converged'])),
+    }
+
+
+def recommend_max_trials(summary: dict, target: float, metric: str = 'spearman',
+                         power: float = 0.8) -> dict:
+    """
+    Smallest simulated trial count at which a fraction `power` of subjects
+    reach `target` on `metric` ('spearman' or 'pairwise_accuracy').
+
+    Returns:
+        Dict with max_trials (None if the target is never reached), the
+        median max SD at that point as a suggested convergence_threshold,
+        and the mean metric achieved
+    """
+    if metric not in ('spearman', 'pairwise_accuracy'):
+        raise ValueError(f"Unknown metric: {metric}")
+
+    quantiles = np.asarray(summary['quantiles'])
+    q = int(np.argmin(np.abs(quantiles - (1.0 - power))))
+
+    for point in summary['curve']:
+        if point[f'{metric}_quantiles'][q] >= target:
+            return {
+                'max_trials': point['trials'],
+                'convergence_threshold': point['max_sd_median'],
+                f'{metric}_mean': point[f'{metric}_mean'],
+                'power': float(1.0 - quantiles[q]),
+            }
+
+    last = summary['curve'][-1] if summary['curve'] else {}
+    return {
+        'max_trials': None,
+        'convergence_threshold': None,
+        f'{metric}_mean': last.get(f'{metric}_mean'),
+        'power': float(1.0 - quantiles[q]),
+    }
+
+
+def expand_grid(grid: Dict[str, list]) -> List[dict]:
+    """Cartesian product of a parameter grid (n_items, epsilon, exploration_weight, noise)."""
+    keys = ['n_items', 'epsilon', 'exploration_weight', 'noise']
+    values = [grid.get(k, DEFAULT_GRID[k]) for k in keys]
+    return [dict(zip(keys, combo)) for combo in itertools.product(*values)]
+
+
+def _subjects_per_task(n_items: int) -> int:
+    return max(1, min(500, TASK_MEMORY_BYTES // (8 * n_items * n_items)))
+
+
+def _merge_raw(merged: Optional[dict], raw: dict) -> dict:
+    """Append the subjects of one simulate_subjects chunk to the merged output."""
+    if merged is None:
+        return raw
+    for key in ('spearman', 'pairwise_accuracy', 'max_sd'):
+        merged[key] = np.concatenate([merged[key], raw[key]], axis=1)
+    for key in ('trials_used', 'converged'):
+        merged[key] = np.concatenate([merged[key], raw[key]])
+    return merged
+
+
+def _simulate_task(args):
+    """Process-pool entry point: (cell_index, simulate_subjects kwargs) -> (cell_index, raw)."""
+    cell_index, kwargs = args
+    return cell_index, simulate_subjects(**kwargs)
+
+
+def run_power_grid(cells: List[dict], n_subjects: int = 1000, max_trials: int = 100,
+                   checkpoint_every: int = 5, workers: Optional[int] = None,
+                   seed: int = 0) -> List[dict]:
+    """
+    Simulate every parameter cell with n_subjects synthetic subjects.
+
+    Args:
+        cells: Parameter dicts with n_items, epsilon, exploration_weight, noise
+        n_subjects: Subjects per cell
+        max_trials: Trials per subject
+        checkpoint_every: Spacing of accuracy checkpoints
+        workers: Worker processes (default: CPU count; 1 runs inline)
+        seed: Base seed; every task gets an independent child seed
+
+    Returns:
+        One dict per cell: params, max_trials and the summarized curve
+    """
+    start = time.perf_counter()
+    checkpoints = list(range(checkpoint_every, max_trials + 1, checkpoint_every))
+    if not checkpoints or checkpoints[-1] != max_trials:
+        checkpoints.append(max_trials)
+
+    tasks = []
+    for c, cell in enumerate(cells):
+        size = _subjects_per_task(int(cell['n_items']))
+        for offset in range(0, n_subjects, size):
+            tasks.append((c, {
+                'n_items': int(cell['n_items']),
+                'n_subjects': min(size, n_subjects - offset),
+                'n_trials': max_trials,
+                'epsilon': float(cell['epsilon']),
+                'exploration_weight': float(cell['exploration_weight']),
+                'noise': float(cell['noise']),
+                'checkpoints': checkpoints,
+            }))
+
+    for task, child in zip(tasks, np.random.SeedSequence(seed).spawn(len(tasks))):
+        task[1]['seed'] = child
+
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(tasks))
+    if workers <= 1:
+        outputs = [_simulate_task(task) for task in tasks]
+    else:
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            outputs = list(pool.map(_simulate_task, tasks))
+
+    merged: Dict[int, dict] = {}
+    for c, raw in outputs:
+        merged[c] = _merge_raw(merged.get(c), raw)
+
+    results = []
+    for c, cell in enumerate(cells):
+        results.append({
+            'params': dict(cell),
+            'max_trials': max_trials,
+            **summarize_simulation(merged[c]),
+        })
+
+    logger.info(f"Simulated {len(cells)} cells x {n_subjects} subjects x {max_trials} trials "
+                f"in {time.perf_counter() - start:.1f}s ({max(workers, 1)} workers)")
+    return results
+
+
+def simulate_selection_budgets(n_items: int, budgets: List[Optional[dict]],
+                               n_subjects: int = 50, n_trials: int = 50,
+                               epsilon: float = 0.01, exploration_weight: float = 0.1,
+                               noise: float = 0.5, checkpoint_every: int = 10,
+                               seed: int = 0,
+                               on_progress: Optional[Callable[[int, int], None]] = None) -> List[dict]:
+    """
+    Measure ranking accuracy and selection latency of selection configs.
+
+    Anytime selection depends on wall-clock time, so subjects are simulated
+    one at a time with the real selector rather than in lockstep. All configs
+    see the same subjects and the same random choice draws, so differences
+    come from pair selection alone.
+
+    Args:
+        n_items: Number of stimuli
+        budgets: Selection configs as in experiment_metadata['selection']
+                 (strategy, time_budget_ms, max_evaluations, ...); None (or {})
+                 is exhaustive EIG selection
+        n_subjects: Simulated subjects per budget
+        n_trials: Trials per subject
+        epsilon, exploration_weight: Selector parameters
+        noise: Choice noise of the simulated subjects
+        checkpoint_every: Spacing of accuracy checkpoints
+        seed: Seed for subjects and choices
+        on_progress: Called with (subjects done, subjects total) after every subject
+
+    Returns:
+        One dict per config with the accuracy curve, final accuracy, selection
+        latency (mean / p99 ms), belief update latency (mean ms) and mean
+        fraction of pairs scored (None for selectors that do not score pairs)
+    """
+    rng = np.random.default_rng(seed)
+    true_utilities = rng.standard_normal((n_subjects, n_items))
+    draws = rng.random((n_subjects, n_trials))
+
+    checkpoints = list(range(checkpoint_every, n_trials + 1, checkpoint_every))
+    if not checkpoints or checkpoints[-1] != n_trials:
+        checkpoints.append(n_trials)
+
+    total = len(budgets) * n_subjects
+
+    results = []
+    for b, budget in enumerate(budgets):
+        budget = dict(budget or {})
+        config = dict(budget, seed=budget.get('seed', seed))
+        selector = selector_from_config(config, epsilon=epsilon,
+                                        exploration_weight=exploration_weight)
+        scores_pairs = config.get('strategy', 'eig') == 'eig'
+
+        mu_at = np.zeros((len(checkpoints), n_subjects, n_items))
+        latencies, update_latencies, coverage = [], [], []
+        for s in range(n_subjects):
+            state = BayesianPreferenceState(n_items)
+            c = 0
+            for t in range(n_trials):
+                t0 = time.perf_counter()
+                i, j = selector.select_next_pair(state)
+                latencies.append((time.perf_counter() - t0) * 1000.0)
+                info = selector.last_selection_info
+                coverage.append(info['coverage'] if info else 1.0)
+
+                p_i = norm.cdf((true_utilities[s, i] - true_utilities[s, j]) / noise)
+                t0 = time.perf_counter()
+                selector.update_beliefs(state, i, j, i if draws[s, t] < p_i else j)
+                update_latencies.append((time.perf_counter() - t0) * 1000.0)
+
+                if t + 1 == checkpoints[c]:
+                    mu_at[c, s] = state.mu
+                    c += 1
+            if on_progress:
+                on_progress(b * n_subjects + s + 1, total)
+
+        curve = []
+        for c, trials in enumerate(checkpoints):
+            metrics = ranking_metrics(true_utilities, mu_at[c])
+            curve.append({
+                'trials': trials,
+                'spearman_mean': float(np.mean(metrics['spearman'])),
+                'pairwise_accuracy_mean': float(np.mean(metrics['pairwise_accuracy'])),
+            })
+
+        results.append({
+            'budget': budget,
+            'curve': curve,
+            'spearman_mean': curve[-1]['spearman_mean'],
+            'pairwise_accuracy_mean': curve[-1]['pairwise_accuracy_mean'],
+            'selection_ms_mean': float(np.mean(latencies)),
+            'selection_ms_p99': float(np.percentile(latencies, 99)),
+            'update_ms_mean': float(np.mean(update_latencies)),
+            'coverage_mean': float(np.mean(coverage)) if scores_pairs else None,
+        })
+
+    return results
+
+
+def simulate_warm_start_savings(n_items: int, n_population: int = 200, n_subjects: int = 200,
+                                max_trials: int = 100, convergence_threshold: float = 0.05,
+                                heterogeneity: float = 0.5, noise: float = 0.5,
+                                epsilon: float = 0.01, exploration_weight: float = 0.1,
+                                prior_variance: float = 1.0,
+                                shrinkage: float = DEFAULT_WARM_START['shrinkage'],
+                                inflation: float = DEFAULT_WARM_START['inflation'],
+                                target: float = 0.8, checkpoint_every: int = 5,
+                                seed: int = 0,
+                                on_progress: Optional[Callable[[int, int], None]] = None) -> dict:
+    """
+    Trials saved by a population warm-start prior.
+
+    Subjects share population utilities and differ by N(0, heterogeneity²)
+    individual deviations. n_population earlier subjects are run from the
+    cold prior and aggregated into a PopulationPosterior; new subjects are
+    then run from the cold prior and from the warm-start prior with the same
+    utilities and seeds. Subjects are simulated in chunks of
+    _subjects_per_task, which bounds the stacked Sigma of large n_items.
+
+    Args:
+        n_items: Number of stimuli
+        n_population: Completed sessions the population posterior is built from
+        n_subjects: New subjects simulated per arm
+        max_trials, convergence_threshold: Session stopping rule
+        heterogeneity: SD of individual deviations from the population utilities
+        noise: Choice noise of the simulated subjects
+        epsilon, exploration_weight, prior_variance: Experiment parameters
+        shrinkage, inflation: Warm-start settings
+        target: Mean Spearman correlation used for trials-to-target
+        checkpoint_every: Spacing of accuracy checkpoints
+        seed: Seed for utilities and choices
+        on_progress: Called with (chunks done, chunks total) after every chunk
+
+    Returns:
+        Dict with cold/warm summaries (mean trials used, converged fraction,
+        curve, trials to target) and the savings of the warm start
+    """
+    rng = np.random.default_rng(seed)
+    population_utilities = rng.standard_normal(n_items)
+    past = population_utilities + heterogeneity * rng.standard_normal((n_population, n_items))
+    new = population_utilities + heterogeneity * rng.standard_normal((n_subjects, n_items))
+    past_seed, arm_seed = np.random.SeedSequence(seed).spawn(2)
+
+    checkpoints = list(range(checkpoint_every, max_trials + 1, checkpoint_every))
+    if not checkpoints or checkpoints[-1] != max_trials:
+        checkpoints.append(max_trials)
+    common = dict(n_items=n_items, n_trials=max_trials, epsilon=epsilon,
+                  exploration_weight=exploration_weight, noise=noise,
+                  prior_variance=prior_variance, checkpoints=checkpoints,
+                  convergence_threshold=convergence_threshold)
+
+    size = _subjects_per_task(n_items)
+    past_chunks = range(0, n_population, size)
+    new_chunks = range(0, n_subjects, size)
+    total = len(past_chunks) + len(new_chunks)
+
+    population = PopulationPosterior(n_items)
+    for done, (start, child) in enumerate(zip(past_chunks, past_seed.spawn(len(past_chunks))), start=1):
+        chunk = past[start:start + size]
+        history = simulate_subjects(n_subjects=len(chunk), true_utilities=chunk, seed=child,
+                                    return_states=True, **common)
+        for mu, Sigma in zip(history['mu'], history['Sigma']):
+            population.update(mu, Sigma)
+        if on_progress:
+            on_progress(done, total)
+    prior_mu, prior_Sigma = population.prior(prior_variance, shrinkage=shrinkage, inflation=inflation)
+
+    # Both arms of a chunk see the same subjects and seed
+    priors = {'cold': {}, 'warm': {'prior_mu': prior_mu, 'prior_Sigma': prior_Sigma}}
+    raws = dict.fromkeys(priors)
+    for done, (start, child) in enumerate(zip(new_chunks, arm_seed.spawn(len(new_chunks))),
+                                          start=len(past_chunks) + 1):
+        chunk = new[start:start + size]
+        for name, prior in priors.items():
+            raws[name] = _merge_raw(raws[name], simulate_subjects(
+                n_subjects=len(chunk), true_utilities=chunk, seed=child, **common, **prior))
+        if on_progress:
+            on_progress(done, total)
+
+    arms = {}
+    for name, raw in raws.items():
+        summary = summarize_simulation(raw)
+        reached = [p['trials'] for p in summary['curve'] if p['spearman_mean'] >= target]
+        arms[name] = {
+            'mean_trials_used': summary['mean_trials_used'],
+            'converged_fraction': summary['converged_fraction'],
+            'trials_to_target': reached[0] if reached else None,
+            'curve': [{k: p[k] for k in ('trials', 'spearman_mean', 'pairwise_accuracy_mean')}
+                      for p in summary['curve']],
+        }
+
+    cold, warm = arms['cold'], arms['warm']
+    to_target = None
+    if cold['trials_to_target'] is not None and warm['trials_to_target'] is not None:
+        to_target = cold['trials_to_target'] - warm['trials_to_target']
+
+    return {
+        'params': {'n_items': n_items, 'n_population': n_population, 'n_subjects': n_subjects,
+                   'max_trials': max_trials, 'convergence_threshold': convergence_threshold,
+                   'heterogeneity': heterogeneity, 'noise': noise, 'shrinkage': shrinkage,
+                   'inflation': inflation, 'target': target},
+        'cold': cold,
+        'warm': warm,
+        'savings': {
+            'mean_trials_used': cold['mean_trials_used'] - warm['mean_trials_used'],
+            'mean_trials_used_fraction': (1 - warm['mean_trials_used'] / cold['mean_trials_used']
+                                          if cold['mean_trials_used'] else 0.0),
+            'trials_to_target': to_target,
+        },
+    }
+
+
+def simulate_stopping_rules(n_items: int, configs: List[Optional[dict]],
+                            n_subjects: int = 100, max_trials: int = 100, min_trials: int = 10,
+                            epsilon: float = 0.01, exploration_weight: float = 0.1,
+                            noise: float = 0.5, convergence_threshold: float = 0.05,
+                            seed: int = 0,
+                            on_progress: Optional[Callable[[int, int], None]] = None) -> List[dict]:
+    """
+    Trials saved and ranking accuracy of ranking-stability stopping rules.
+
+    Subjects run through ExperimentSession one at a time (the rules are
+    evaluated on the pair each subject would see next). Every config sees
+    the same subjects and choice draws. A baseline without early stopping
+    rules is always simulated first and savings are measured against it.
+
+    Args:
+        n_items: Number of stimuli
+        configs: Stopping configs as in experiment_metadata['stopping']
+        n_subjects: Simulated subjects per config
+        max_trials, min_trials, convergence_threshold: Session limits
+        epsilon, exploration_weight: Selector parameters
+        noise: Choice noise of the simulated subjects
+        seed: Seed for subjects and choices
+        on_progress: Called with (subjects done, subjects total) after every subject
+
+    Returns:
+        One dict per config (baseline first) with trials used / saved per
+        subject, ranking accuracy, accuracy lost and stop reason counts
+    """
+    rng = np.random.default_rng(seed)
+    true_utilities = rng.standard_normal((n_subjects, n_items))
+    draws = rng.random((n_subjects, max_trials))
+    selector = PureBayesianAdaptiveSelector(epsilon=epsilon, exploration_weight=exploration_weight)
+
+    configs = [None] + list(configs)
+    total = len(configs) * n_subjects
+
+    results = []
+    for c, config in enumerate(configs):
+        mu = np.zeros((n_subjects, n_items))
+        trials_used = np.zeros(n_subjects, dtype=int)
+        reasons: Dict[str, int] = {}
+
+        for s in range(n_subjects):
+            session = ExperimentSession(n_items, max_trials=max_trials, selector=selector,
+                                        min_trials=min_trials, stopping=config,
+                                        convergence_threshold=convergence_threshold)
+            while True:
+                pair = session.get_next_pair()
+                if pair is None:
+                    break
+                i, j = pair
+                p_i = norm.cdf((true_utilities[s, i] - true_utilities[s, j]) / noise)
+                session.record_choice(i, j, i if draws[s, session.trial_count] < p_i else j)
+
+            mu[s] = session.state.mu
+            trials_used[s] = session.trial_count
+            reasons[session.stop_reason] = reasons.get(session.stop_reason, 0) + 1
+            if on_progress:
+                on_progress(c * n_subjects + s + 1, total)
+
+        metrics = ranking_metrics(true_utilities, mu)
+        results.append({
+            'stopping': config or {},
+            'mean_trials_used': float(np.mean(trials_used)),
+            'median_trials_used': float(np.median(trials_used)),
+            'spearman_mean': float(np.mean(metrics['spearman'])),
+            'pairwise_accuracy_mean': float(np.mean(metrics['pairwise_accuracy'])),
+            'stop_reasons': reasons,
+        })
+
+    baseline = results[0]
+    for r in results:
+        r['trials_saved_mean'] = baseline['mean_trials_used'] - r['mean_trials_used']
+        r['spearman_lost'] = baseline['spearman_mean'] - r['spearman_mean']
+
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    parser = argparse.ArgumentParser(description='Run a Monte Carlo power grid')
+    parser.add_argument('--subjects', type=int, default=1000)
+    parser.add_argument('--max-trials', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--target', type=float, default=0.8)
+    args = parser.parse_args()
+
+    results = run_power_grid(expand_grid(DEFAULT_GRID), n_subjects=args.subjects,
+                             max_trials=args.max_trials, workers=args.workers)
+    for r in results:
+        rec = recommend_max_trials(r, args.target)
+        print(json.dumps({'params': r['params'], 'recommendation': rec}))
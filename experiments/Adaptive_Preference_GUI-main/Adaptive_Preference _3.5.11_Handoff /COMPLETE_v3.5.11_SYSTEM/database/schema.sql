@@ -7,12 +7,19 @@
 -- ============================================================================
 
 -- Drop existing tables (for clean setup)
+DROP TABLE IF EXISTS jobs CASCADE;
+DROP TABLE IF EXISTS pending_trials CASCADE;
+DROP TABLE IF EXISTS experiment_schedules CASCADE;
+DROP TABLE IF EXISTS bootstrap_results CASCADE;
+DROP TABLE IF EXISTS population_priors CASCADE;
+DROP TABLE IF EXISTS simulation_results CASCADE;
 DROP TABLE IF EXISTS provenance_log CASCADE;
 DROP TABLE IF EXISTS audit_log CASCADE;
 DROP TABLE IF EXISTS choices CASCADE;
 DROP TABLE IF EXISTS algorithm_state CASCADE;
 DROP TABLE IF EXISTS sessions CASCADE;
 DROP TABLE IF EXISTS stimuli CASCADE;
+DROP TABLE IF EXISTS stimulus_blobs CASCADE;
 DROP TABLE IF EXISTS experiments CASCADE;
 DROP TABLE IF EXISTS users CASCADE;
 
@@ -109,6 +116,22 @@ CREATE INDEX idx_experiments_created ON experiments(created_at DESC);
 CREATE INDEX idx_experiments_active ON experiments(status, published_at) 
     WHERE status = 'active';
 
+-- ============================================================================
+-- STIMULUS_BLOBS TABLE (content-addressed stimulus files, shared across experiments)
+-- ============================================================================
+CREATE TABLE stimulus_blobs (
+    sha256 VARCHAR(64) PRIMARY KEY,
+    size_bytes BIGINT NOT NULL,
+    mime_type VARCHAR(100),
+    width_px INTEGER,
+    height_px INTEGER,
+    
+    -- Number of stimuli referencing the blob; removed when it drops to 0
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
 -- ============================================================================
 -- STIMULI TABLE
 -- ============================================================================
@@ -131,6 +154,12 @@ CREATE TABLE stimuli (
     -- Security
     checksum_sha256 VARCHAR(64),
     
+    -- Stored file (NULL for uploads predating the blob store)
+    blob_sha256 VARCHAR(64) REFERENCES stimulus_blobs(sha256),
+    
+    -- Downscaled copies: variant -> {url, width, height, bytes}; NULL until generated
+    derivatives JSONB,
+    
     -- Metadata
     metadata JSONB DEFAULT '{}',
     tags TEXT[],
@@ -146,6 +175,15 @@ CREATE TABLE stimuli (
 
 CREATE INDEX idx_stimuli_experiment ON stimuli(experiment_id);
 CREATE INDEX idx_stimuli_display_order ON stimuli(experiment_id, display_order);
+CREATE INDEX idx_stimuli_blob ON stimuli(blob_sha256);
+
+-- Stimulus library: keyset paging by (uploaded_at, stimulus_id), tag
+-- (&&, @>) and metadata (@>) filters, stimulus name prefix (LIKE 'abc%')
+CREATE INDEX idx_stimuli_library_page ON stimuli(uploaded_at, stimulus_id);
+CREATE INDEX idx_stimuli_experiment_page ON stimuli(experiment_id, uploaded_at, stimulus_id);
+CREATE INDEX idx_stimuli_tags ON stimuli USING GIN (tags);
+CREATE INDEX idx_stimuli_metadata ON stimuli USING GIN (metadata jsonb_path_ops);
+CREATE INDEX idx_stimuli_name_prefix ON stimuli(stimulus_name text_pattern_ops);
 
 -- ============================================================================
 -- SESSIONS TABLE
@@ -173,6 +211,11 @@ CREATE TABLE sessions (
     started_at TIMESTAMP WITH TIME ZONE,
     completed_at TIMESTAMP WITH TIME ZONE,
     last_activity_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    stop_reason VARCHAR(30),
+    
+    -- Schedule-mode sessions: assigned sequence and trial-order permutation seed
+    schedule_sequence INTEGER,
+    schedule_seed BIGINT,
     
     -- Duration tracking
     total_time_seconds INTEGER DEFAULT 0,
@@ -224,6 +267,13 @@ CREATE TABLE algorithm_state (
     -- Integrity
     state_checksum VARCHAR(64) NOT NULL,
     
+    -- Initial state of warm-started sessions (NULL = cold prior)
+    prior_mu BYTEA,
+    prior_sigma BYTEA,
+    
+    -- Inducing points of GP-model sessions (mu/sigma then hold the inducing-point posterior)
+    inducing_points BYTEA,
+    
     -- Timestamps
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
@@ -278,6 +328,24 @@ CREATE INDEX idx_choices_session ON choices(session_id, trial_number);
 CREATE INDEX idx_choices_stimuli ON choices(stimulus_a_id, stimulus_b_id);
 CREATE INDEX idx_choices_timestamp ON choices(timestamp DESC);
 
+-- ============================================================================
+-- PENDING_TRIALS TABLE (pair last served by /next, for idempotent retries)
+-- ============================================================================
+CREATE TABLE pending_trials (
+    session_id UUID PRIMARY KEY REFERENCES sessions(session_id) ON DELETE CASCADE,
+    
+    trial_number INTEGER NOT NULL,
+    stimulus_a_id UUID NOT NULL REFERENCES stimuli(stimulus_id),
+    stimulus_b_id UUID NOT NULL REFERENCES stimuli(stimulus_id),
+    presentation_order VARCHAR(10),
+    pair_token TEXT NOT NULL,
+    
+    issued_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    answered_at TIMESTAMP WITH TIME ZONE,
+    -- /choice response once answered
+    result JSONB
+);
+
 -- ============================================================================
 -- AUDIT_LOG TABLE
 -- ============================================================================
@@ -363,6 +431,136 @@ CREATE INDEX idx_provenance_session ON provenance_log(session_id);
 CREATE INDEX idx_provenance_trial ON provenance_log(session_id, trial_number);
 CREATE INDEX idx_provenance_type ON provenance_log(computation_type);
 
+-- ============================================================================
+-- SIMULATION_RESULTS TABLE (Monte Carlo design lookup table)
+-- ============================================================================
+CREATE TABLE simulation_results (
+    cache_key VARCHAR(200) PRIMARY KEY,
+    
+    -- Simulated cell
+    n_items INTEGER NOT NULL CHECK (n_items >= 2),
+    epsilon FLOAT NOT NULL,
+    exploration_weight FLOAT NOT NULL,
+    noise FLOAT NOT NULL CHECK (noise > 0),
+    max_trials INTEGER NOT NULL,
+    n_subjects INTEGER NOT NULL,
+    
+    -- Trials-to-accuracy curve (Spearman, pairwise accuracy quantiles per checkpoint)
+    summary JSONB NOT NULL,
+    
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_simulation_results_cell ON simulation_results(epsilon, exploration_weight, noise, n_items);
+
+-- ============================================================================
+-- POPULATION_PRIORS TABLE (warm-start priors from completed sessions)
+-- ============================================================================
+CREATE TABLE population_priors (
+    experiment_id UUID PRIMARY KEY REFERENCES experiments(experiment_id) ON DELETE CASCADE,
+    
+    n_items INTEGER NOT NULL CHECK (n_items >= 2),
+    session_count INTEGER NOT NULL DEFAULT 0,
+    
+    -- Running statistics of completed-session posteriors (float64 bytes)
+    mean BYTEA NOT NULL,        -- Mean of posterior means
+    m2 BYTEA NOT NULL,          -- Welford sum of squares of posterior means
+    mean_sigma BYTEA NOT NULL,  -- Mean posterior covariance
+    
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- ============================================================================
+-- BOOTSTRAP_RESULTS TABLE (cached session-bootstrap intervals of pooled rankings)
+-- ============================================================================
+CREATE TABLE bootstrap_results (
+    -- Experiment, model, replicates, confidence, seed and choice watermark
+    cache_key VARCHAR(200) PRIMARY KEY,
+    experiment_id UUID NOT NULL REFERENCES experiments(experiment_id) ON DELETE CASCADE,
+    
+    model VARCHAR(30) NOT NULL,
+    n_replicates INTEGER NOT NULL CHECK (n_replicates > 0),
+    confidence FLOAT NOT NULL CHECK (confidence > 0 AND confidence < 1),
+    seed INTEGER NOT NULL,
+    n_choices INTEGER NOT NULL,
+    
+    -- Percentile intervals and rank probabilities per stimulus
+    summary JSONB NOT NULL,
+    
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_bootstrap_results_experiment ON bootstrap_results(experiment_id);
+
+-- ============================================================================
+-- EXPERIMENT_SCHEDULES TABLE (precomputed pair schedules of schedule-mode experiments)
+-- ============================================================================
+CREATE TABLE experiment_schedules (
+    experiment_id UUID PRIMARY KEY REFERENCES experiments(experiment_id) ON DELETE CASCADE,
+    
+    design VARCHAR(30) NOT NULL,
+    n_sequences INTEGER NOT NULL CHECK (n_sequences > 0),
+    trials_per_sequence INTEGER NOT NULL CHECK (trials_per_sequence > 0),
+    shuffle BOOLEAN DEFAULT TRUE,
+    
+    -- (n_rounds, floor(n_items / 2), 2) round-robin rounds of stimulus indices
+    rounds BYTEA NOT NULL,
+    index_dtype VARCHAR(10) NOT NULL,
+    -- (n_sequences, rounds per sequence) int32 round order of each sequence
+    round_orders BYTEA NOT NULL,
+    -- Stimulus id of each index, frozen at publish time
+    stimulus_ids JSONB NOT NULL,
+    
+    -- Sequence of the next session (taken modulo n_sequences)
+    next_sequence INTEGER DEFAULT 0,
+    
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- ============================================================================
+-- JOBS TABLE (durable background jobs, see backend/job_queue.py)
+-- ============================================================================
+CREATE TABLE jobs (
+    job_id UUID PRIMARY KEY,
+    kind VARCHAR(50) NOT NULL,
+    params JSONB NOT NULL DEFAULT '{}'::jsonb,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued'
+        CHECK (status IN ('queued', 'running', 'complete', 'failed', 'cancelled')),
+    
+    -- Progress and outcome
+    completed INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    partial JSONB,
+    result JSONB,
+    error TEXT,
+    -- Result file under JOB_ARTIFACT_DIR/<job_id>/
+    artifact_name VARCHAR(255),
+    artifact_mime VARCHAR(100),
+    
+    cancel_requested BOOLEAN NOT NULL DEFAULT FALSE,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker_id VARCHAR(100),
+    created_by VARCHAR(100),
+    -- No foreign key: a job may delete its experiment
+    experiment_id UUID,
+    -- Digest of the params of jobs enqueued with JobQueue.enqueue_unique
+    dedup_key VARCHAR(64),
+    
+    -- UTC, written by the workers
+    created_at TIMESTAMP NOT NULL,
+    started_at TIMESTAMP,
+    heartbeat_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+-- Claiming (oldest queued first, SKIP LOCKED), stale-job recovery, listing
+CREATE INDEX idx_jobs_queued ON jobs(created_at) WHERE status = 'queued';
+CREATE INDEX idx_jobs_running ON jobs(heartbeat_at) WHERE status = 'running';
+CREATE INDEX idx_jobs_kind_created ON jobs(kind, created_at DESC);
+CREATE INDEX idx_jobs_experiment ON jobs(experiment_id, created_at DESC);
+-- At most one queued or running job per kind and params
+CREATE UNIQUE INDEX unique_active_job ON jobs(kind, dedup_key) WHERE status IN ('queued', 'running');
+
 -- ============================================================================
 -- VIEWS
 -- ============================================================================
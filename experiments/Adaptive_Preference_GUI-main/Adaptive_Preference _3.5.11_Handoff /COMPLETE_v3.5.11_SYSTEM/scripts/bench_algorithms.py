@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+"""bench_algorithms.py
+
+Micro-benchmarks for the adaptive algorithm and its state serialization,
+timed with time.perf_counter (warm-up + repeats, stdlib only).
+
+Covers, for each n in --sizes:
+  - PureBayesianAdaptiveSelector.select_next_pair / update_beliefs / check_convergence
+  - select_next_pair with chunked scoring on the shared thread pool
+  - serialize_numpy / deserialize_numpy (backend/api.py)
+  - BayesianPreferenceState.to_dict / from_dict
+
+Usage:
+    python scripts/bench_algorithms.py --output bench.json
+    python scripts/bench_algorithms.py --save-baseline scripts/bench_baseline.json
+    python scripts/bench_algorithms.py --compare scripts/bench_baseline.json --tolerance 0.25
+
+In --compare mode the exit status is 1 when any function's median time
+regressed by more than the tolerance against the baseline.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+from backend.bayesian_adaptive import (  # noqa: E402
+    SCORING_THREADS, BayesianPreferenceState, PureBayesianAdaptiveSelector
+)
+
+DEFAULT_SIZES = [10, 50, 200, 1000, 2000]
+
+
+def load_api_codecs():
+    """Import serialize_numpy/deserialize_numpy from the API module (needs Flask installed)."""
+    # The engine is created lazily; no connection is made for these functions
+    os.environ.setdefault('DATABASE_URL', 'postgresql+psycopg2://bench@localhost/bench')
+    try:
+        from backend.api import serialize_numpy, deserialize_numpy
+    except Exception as e:
+        print(f"bench: skipping serialize/deserialize benchmarks ({e})", file=sys.stderr)
+        return None
+    return serialize_numpy, deserialize_numpy
+
+
+def make_state(n: int, trials: int = 20, seed: int = 0) -> BayesianPreferenceState:
+    """A state with some comparisons applied, so Sigma is not diagonal."""
+    rng = np.random.default_rng(seed)
+    state = BayesianPreferenceState(n)
+    selector = PureBayesianAdaptiveSelector()
+    for _ in range(trials):
+        i, j = rng.choice(n, 2, replace=False)
+        selector.update_beliefs(state, int(i), int(j), int(i))
+    return state
+
+
+def time_call(fn, warmup: int, repeats: int, min_time: float) -> dict:
+    """
+    Time fn() like timeit.repeat: pick a loop count so one repeat takes at
+    least min_time, run warm-up repeats, then report per-call times.
+    """
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number *= 10
+
+    for _ in range(warmup):
+        for _ in range(number):
+            fn()
+
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - t0) / number)
+
+    return {
+        'median_s': statistics.median(samples),
+        'min_s': min(samples),
+        'mean_s': statistics.fmean(samples),
+        'number': number,
+        'repeats': repeats,
+    }
+
+
+def build_cases(n: int, codecs):
+    """Return {function_name: zero-arg callable} for one problem size."""
+    state = make_state(n)
+    selector = PureBayesianAdaptiveSelector()
+    blocked = PureBayesianAdaptiveSelector(threads=SCORING_THREADS, block_pairs=65536)
+    state_dict = state.to_dict()
+    pair = selector.select_next_pair(state)
+
+    cases = {
+        'select_next_pair': lambda: selector.select_next_pair(state),
+        'select_next_pair_blocked': lambda: blocked.select_next_pair(state),
+        'update_beliefs': lambda: selector.update_beliefs(state, pair[0], pair[1], pair[0]),
+        'check_convergence': lambda: selector.check_convergence(state),
+        'BayesianPreferenceState.to_dict': state.to_dict,
+        'BayesianPreferenceState.from_dict': lambda: BayesianPreferenceState.from_dict(state_dict),
+    }
+
+    if codecs is not None:
+        serialize_numpy, deserialize_numpy = codecs
+        sigma_bytes = serialize_numpy(state.Sigma)
+        cases['serialize_numpy'] = lambda: serialize_numpy(state.Sigma)
+        cases['deserialize_numpy'] = lambda: deserialize_numpy(sigma_bytes, (n, n))
+
+    return cases
+
+
+def run(sizes, warmup: int, repeats: int, min_time: float) -> dict:
+    codecs = load_api_codecs()
+    # State construction and the API module log at INFO; keep that out of the timings
+    logging.disable(logging.INFO)
+    results = {}
+
+    for n in sizes:
+        for name, fn in build_cases(n, codecs).items():
+            timing = time_call(fn, warmup, repeats, min_time)
+            results.setdefault(name, {})[str(n)] = timing
+            print(f"  {name:<36} n={n:<5} median {timing['median_s'] * 1e3:10.3f} ms")
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'sizes': list(sizes),
+            'warmup': warmup,
+            'repeats': repeats,
+        },
+        'results': results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float, noise_floor: float):
+    """
+    Compare median times against a baseline.
+
+    A function regresses when its median grew by more than `tolerance`
+    (relative) and the slower time is above `noise_floor` seconds.
+
+    Returns:
+        (regressions, comparisons) lists of dicts
+    """
+    regressions, comparisons = [], []
+    for name, by_size in current['results'].items():
+        for n, timing in by_size.items():
+            base = baseline.get('results', {}).get(name, {}).get(n)
+            if not base:
+                continue
+            ratio = timing['median_s'] / base['median_s'] if base['median_s'] > 0 else float('inf')
+            entry = {'function': name, 'n': int(n), 'baseline_s': base['median_s'],
+                     'current_s': timing['median_s'], 'ratio': ratio}
+            comparisons.append(entry)
+            if ratio > 1 + tolerance and timing['median_s'] > noise_floor:
+                regressions.append(entry)
+    return regressions, comparisons
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Algorithm micro-benchmarks')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.02,
+                        help='minimum seconds per repeat (loop count is scaled up to reach it)')
+    parser.add_argument('--output', type=Path, help='write JSON results here')
+    parser.add_argument('--save-baseline', type=Path, help='also store results as a baseline')
+    parser.add_argument('--compare', type=Path, help='baseline JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative slowdown before a regression is reported')
+    parser.add_argument('--noise-floor', type=float, default=1e-4,
+                        help='ignore regressions of functions faster than this (seconds)')
+    args = parser.parse_args(argv)
+
+    print(f"bench: sizes={args.sizes} repeats={args.repeats} warmup={args.warmup}")
+    current = run(args.sizes, args.warmup, args.repeats, args.min_time)
+
+    status = 0
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding='utf-8'))
+        regressions, comparisons = compare(current, baseline, args.tolerance, args.noise_floor)
+        current['comparison'] = {
+            'baseline': str(args.compare),
+            'tolerance': args.tolerance,
+            'regressions': regressions,
+            'comparisons': comparisons,
+        }
+        for r in regressions:
+            print(f"bench: REGRESSION {r['function']} n={r['n']}: "
+                  f"{r['baseline_s'] * 1e3:.3f} ms -> {r['current_s'] * 1e3:.3f} ms "
+                  f"(x{r['ratio']:.2f})", file=sys.stderr)
+        if regressions:
+            status = 1
+        else:
+            print(f"bench: OK ({len(comparisons)} timings within {args.tolerance:.0%} of baseline)")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(current, indent=2), encoding='utf-8')
+            print(f"bench: results written to {path}")
+
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
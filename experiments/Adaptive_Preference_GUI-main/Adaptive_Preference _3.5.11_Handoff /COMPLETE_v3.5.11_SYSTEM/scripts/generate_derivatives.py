@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+"""generate_derivatives.py
+
+Backfill thumbnails and display-size derivatives (see backend/derivatives.py)
+for stimuli uploaded before they were generated at upload time.
+
+Stimuli sharing a blob (or a legacy file) are processed once. Files are
+processed on a thread pool; the stimuli's derivatives are written in
+batches, so an interrupted run can simply be repeated. Derivatives of
+blobs are served from /blobs/<sha256>.<variant>.<ext>, those of legacy
+uploads next to the original under /uploads/.
+
+Usage:
+    python scripts/generate_derivatives.py --dry-run
+    python scripts/generate_derivatives.py --experiment-id <uuid> --workers 8
+    python scripts/generate_derivatives.py --force   # regenerate all
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+from backend.derivatives import available, generate_derivatives, with_urls  # noqa: E402
+
+COMMIT_EVERY = 200
+
+
+def backfill(api, experiment_id=None, force=False, workers=None, dry_run=False):
+    """Generate missing derivatives. Returns a summary dict."""
+    query = api.Stimulus.query
+    if experiment_id:
+        query = query.filter(api.Stimulus.experiment_id == experiment_id)
+    if not force:
+        query = query.filter(api.Stimulus.derivatives.is_(None))
+
+    # source file -> (url base of its derivatives, stimuli)
+    groups = {}
+    missing = []
+    for stimulus in query.all():
+        if stimulus.blob_sha256:
+            source, url_base = api.blob_store.path_for(stimulus.blob_sha256), api.blob_url(stimulus.blob_sha256)
+        else:
+            source, url_base = stimulus.file_path, stimulus.url
+        if not source or not url_base or not os.path.isfile(source):
+            missing.append(str(stimulus.stimulus_id))
+            continue
+        groups.setdefault(source, (url_base, []))[1].append(stimulus)
+
+    summary = {
+        'stimuli': sum(len(stimuli) for _, stimuli in groups.values()),
+        'files': len(groups),
+        'missing_files': missing,
+        'dry_run': dry_run,
+    }
+    if dry_run or not groups:
+        return summary
+
+    start = time.perf_counter()
+    failed = []
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers or min(8, os.cpu_count() or 1)) as pool:
+        futures = {pool.submit(generate_derivatives, source): source for source in groups}
+        for future in as_completed(futures):
+            source = futures[future]
+            url_base, stimuli = groups[source]
+            try:
+                derivatives = with_urls(future.result(), url_base)
+            except Exception as e:
+                failed.append({'file': source, 'error': str(e)})
+                continue
+            for stimulus in stimuli:
+                stimulus.derivatives = derivatives
+            done += 1
+            if done % COMMIT_EVERY == 0:
+                api.db.session.commit()
+    api.db.session.commit()
+
+    summary.update({
+        'processed_files': done,
+        'failed_files': failed,
+        'seconds': round(time.perf_counter() - start, 2),
+    })
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--experiment-id', help='only stimuli of this experiment')
+    parser.add_argument('--force', action='store_true', help='regenerate stimuli that already have derivatives')
+    parser.add_argument('--workers', type=int, default=None, help='image threads (default: CPUs, max 8)')
+    parser.add_argument('--dry-run', action='store_true', help='report what would be generated')
+    args = parser.parse_args()
+
+    if not available():
+        sys.exit('generate_derivatives: Pillow is not installed (pip install Pillow)')
+
+    from backend import api  # needs DATABASE_URL
+
+    with api.app.app_context():
+        summary = backfill(api, experiment_id=args.experiment_id, force=args.force,
+                           workers=args.workers, dry_run=args.dry_run)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""job_worker.py
+
+Run background jobs (exports, experiment deletes, bulk imports, quality
+evaluation, auto-tagging) outside the API processes, so heavy admin
+operations never occupy a request worker that subjects need.
+
+The worker claims jobs from the jobs table (SELECT ... FOR UPDATE SKIP
+LOCKED), or waits on the Redis list when JOB_QUEUE_REDIS_URL is set, and
+writes result artifacts to JOB_ARTIFACT_DIR, which must be the directory
+the API serves artifacts from. Any number of workers may run against the
+same database. SIGTERM/SIGINT stop claiming new jobs; running jobs finish
+first (jobs of a killed worker are requeued by the others).
+
+Usage:
+    python scripts/job_worker.py --concurrency 4
+    JOB_QUEUE_REDIS_URL=redis://redis:6379/0 python scripts/job_worker.py
+"""
+
+import argparse
+import logging
+import signal
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+from backend.job_queue import HANDLERS, Worker  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=2, help='jobs run at once (default: 2)')
+    parser.add_argument('--poll-interval', type=float, default=2.0,
+                        help='seconds between queue polls when idle (default: 2)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    from backend import api  # needs DATABASE_URL; registers the job handlers
+
+    worker = Worker(api.job_queue, concurrency=args.concurrency, context=api.app.app_context,
+                    poll_interval=args.poll_interval)
+
+    def shutdown(signum, frame):
+        logging.info('Stopping after running jobs finish')
+        worker.stop()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    logging.info(f"Handlers: {', '.join(sorted(HANDLERS))}")
+    worker.run()
+
+
+if __name__ == '__main__':
+    main()
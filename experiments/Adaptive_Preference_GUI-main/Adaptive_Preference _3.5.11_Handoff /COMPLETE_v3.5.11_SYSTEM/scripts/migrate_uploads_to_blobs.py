@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+"""migrate_uploads_to_blobs.py
+
+Move stimuli uploaded before the content-addressed blob store into it.
+
+For every stimulus without a blob reference whose file is on disk:
+  1. hash the files in parallel (SHA-256, size, header dimensions)
+  2. hard-link (or copy) each distinct content into the blob store once
+  3. point the stimuli at their blob (blob_sha256, file_path, url) and
+     recount stimulus_blobs.ref_count from the stimuli table, in one commit
+  4. remove the original upload files
+
+Files are only removed after the database commit, so an interrupted run can
+simply be repeated. Files in the uploads folder that no stimulus references
+are reported and left alone.
+
+With --gc, blob files without a stimulus_blobs row (e.g. from uploads whose
+transaction rolled back) and stale temporary files older than --gc-age are
+removed as well.
+
+Usage:
+    python scripts/migrate_uploads_to_blobs.py --dry-run
+    python scripts/migrate_uploads_to_blobs.py --workers 16
+    python scripts/migrate_uploads_to_blobs.py --gc
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+from backend.blob_store import hash_files  # noqa: E402
+
+
+def migrate(api, workers=None, dry_run=False):
+    """Move legacy stimulus files into the blob store. Returns a summary dict."""
+    upload_root = os.path.realpath(api.app.config['UPLOAD_FOLDER'])
+    legacy = api.Stimulus.query.filter(api.Stimulus.blob_sha256.is_(None)).all()
+
+    by_path = {}
+    missing = []
+    for stimulus in legacy:
+        path = os.path.realpath(stimulus.file_path or '')
+        if os.path.isfile(path):
+            by_path.setdefault(path, []).append(stimulus)
+        else:
+            missing.append(str(stimulus.stimulus_id))
+
+    start = time.perf_counter()
+    described = hash_files(by_path, workers=workers)
+    hash_seconds = time.perf_counter() - start
+
+    blobs = {}
+    unreadable = []
+    for path, info in described.items():
+        if 'error' in info:
+            unreadable.append(path)
+            continue
+        blobs.setdefault(info['sha256'], []).append(path)
+
+    summary = {
+        'stimuli': len(legacy),
+        'files': len(described),
+        'unique_blobs': len(blobs),
+        'duplicate_files': sum(len(paths) - 1 for paths in blobs.values()),
+        'bytes_saved': sum(described[p]['size_bytes'] for paths in blobs.values() for p in paths[1:]),
+        'missing_files': missing,
+        'unreadable_files': unreadable,
+        'hash_seconds': round(hash_seconds, 2),
+        'dry_run': dry_run,
+    }
+    referenced = set(by_path)
+    summary['unreferenced_upload_files'] = sorted(
+        os.path.join(upload_root, name) for name in os.listdir(upload_root)
+        if not name.startswith('.') and os.path.isfile(os.path.join(upload_root, name))
+        and os.path.realpath(os.path.join(upload_root, name)) not in referenced
+    ) if os.path.isdir(upload_root) else []
+
+    if dry_run or not blobs:
+        return summary
+
+    for sha256, paths in blobs.items():
+        info = described[paths[0]]
+        blob_path, _ = api.blob_store.import_file(paths[0], sha256)
+        if api.db.session.get(api.StimulusBlob, sha256) is None:
+            first = by_path[paths[0]][0]
+            api.db.session.add(api.StimulusBlob(
+                sha256=sha256, size_bytes=info['size_bytes'], mime_type=first.mime_type,
+                width_px=info['width'], height_px=info['height'], ref_count=0))
+        for path in paths:
+            for stimulus in by_path[path]:
+                stimulus.blob_sha256 = sha256
+                stimulus.checksum_sha256 = sha256
+                stimulus.file_path = blob_path
+                stimulus.url = api.blob_url(sha256, path)
+                stimulus.file_size_bytes = info['size_bytes']
+                if stimulus.width_px is None:
+                    stimulus.width_px, stimulus.height_px = info['width'], info['height']
+    api.db.session.flush()
+    api.db.session.execute(api.text(
+        'UPDATE stimulus_blobs b SET ref_count = '
+        '(SELECT count(*) FROM stimuli s WHERE s.blob_sha256 = b.sha256)'
+    ))
+    api.db.session.commit()
+
+    removed = 0
+    for paths in blobs.values():
+        for path in paths:
+            try:
+                os.unlink(path)
+                removed += 1
+            except OSError as e:
+                print(f"migrate: could not remove {path}: {e}", file=sys.stderr)
+    summary['removed_files'] = removed
+    return summary
+
+
+def collect_garbage(api, min_age_seconds, dry_run=False):
+    """Remove blob files without a stimulus_blobs row and stale temp files older than min_age_seconds."""
+    cutoff = time.time() - min_age_seconds
+    known = {row[0] for row in api.db.session.query(api.StimulusBlob.sha256).all()}
+    orphans = [path for sha256, path in api.blob_store.iter_blobs()
+               if sha256 not in known and os.path.getmtime(path) < cutoff]
+    tmp_dir = api.blob_store.tmp_dir
+    stale = [os.path.join(tmp_dir, name) for name in os.listdir(tmp_dir)
+             if os.path.getmtime(os.path.join(tmp_dir, name)) < cutoff] if os.path.isdir(tmp_dir) else []
+    if not dry_run:
+        for path in orphans + stale:
+            os.unlink(path)
+    return {'orphan_blobs': len(orphans), 'stale_temp_files': len(stale), 'dry_run': dry_run}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=None, help='hashing threads (default: 4 per CPU, max 32)')
+    parser.add_argument('--dry-run', action='store_true', help='report what would change without changing it')
+    parser.add_argument('--gc', action='store_true', help='also remove unreferenced blob and temp files')
+    parser.add_argument('--gc-age', type=float, default=3600, help='minimum age in seconds of files removed by --gc')
+    args = parser.parse_args()
+
+    from backend import api  # needs DATABASE_URL
+
+    with api.app.app_context():
+        summary = migrate(api, workers=args.workers, dry_run=args.dry_run)
+        if args.gc:
+            summary['gc'] = collect_garbage(api, args.gc_age, dry_run=args.dry_run)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+
+from backend.bayesian_adaptive import (BayesianPreferenceState, ExperimentSession,
+                                       PureBayesianAdaptiveSelector, ThompsonSamplingSelector,
+                                       expected_kendall_tau_change, selector_from_config,
+                                       top_k_stability, validate_stopping_config)
+
+
+def _random_state(n, n_updates, seed):
+    rng = np.random.default_rng(seed)
+    state = BayesianPreferenceState(n)
+    selector = PureBayesianAdaptiveSelector()
+    for _ in range(n_updates):
+        i, j = rng.choice(n, 2, replace=False)
+        selector.update_beliefs(state, int(i), int(j), int(i))
+    return state
+
+
+def test_unbounded_anytime_selection_matches_exhaustive():
+    selector = PureBayesianAdaptiveSelector()
+    for seed in range(20):
+        state = _random_state(25, 3 * seed, seed)
+        exhaustive = selector.select_next_pair(state)
+        anytime, info = selector.select_next_pair_anytime(state, block_size=7)
+
+        assert info['evaluated'] == info['total_pairs'] == 25 * 24 // 2
+        assert info['coverage'] == 1.0 and info['stopped_by'] is None
+        scores = selector.pair_scores(state, np.array([exhaustive[0], anytime[0]]),
+                                      np.array([exhaustive[1], anytime[1]]))
+        assert np.isclose(scores[0], scores[1])
+
+
+def test_anytime_selection_respects_evaluation_budget():
+    state = _random_state(200, 40, 0)
+    selector = PureBayesianAdaptiveSelector(max_evaluations=500)
+    i, j = selector.select_next_pair(state)
+
+    info = selector.last_selection_info
+    assert i < j
+    assert info['evaluated'] == 500
+    assert info['stopped_by'] == 'evaluations'
+    assert np.isclose(info['coverage'], 500 / (200 * 199 // 2))
+
+
+def test_thompson_selector_keeps_cholesky_factor_in_sync():
+    rng = np.random.default_rng(3)
+    state = BayesianPreferenceState(30)
+    selector = ThompsonSamplingSelector(seed=0)
+    for _ in range(60):
+        i, j = selector.select_next_pair(state)
+        assert 0 <= i < j < 30
+        selector.update_beliefs(state, i, j, i if rng.random() < 0.5 else j)
+
+    U = state.cholesky_factor
+    assert U is not None
+    assert np.allclose(U.T @ U, state.Sigma, atol=1e-10)
+    assert np.allclose(U, np.triu(U))
+
+
+def test_selector_from_config():
+    assert isinstance(selector_from_config({'strategy': 'thompson'}), ThompsonSamplingSelector)
+    assert selector_from_config({'max_evaluations': 10}).max_evaluations == 10
+    with pytest.raises(ValueError):
+        selector_from_config({'strategy': 'random'})
+
+
+def test_configured_thompson_seed_varies_with_session_and_trial():
+    state = BayesianPreferenceState(10)
+    config = {'strategy': 'thompson', 'seed': 7}
+
+    def draw(entropy):
+        return selector_from_config(config, seed_entropy=entropy).sample_utilities(state)
+
+    assert np.array_equal(draw((123, 1)), draw((123, 1)))  # reproducible
+    assert not np.array_equal(draw((123, 1)), draw((123, 2)))
+    assert not np.array_equal(draw((123, 1)), draw((456, 1)))
+
+
+def test_blocked_scoring_matches_single_pass():
+    single = PureBayesianAdaptiveSelector()
+    for seed in range(10):
+        state = _random_state(60, 5 * seed, seed)
+        expected = single.select_next_pair(state)
+        for threads, block_pairs in [(1, 50), (4, 50), (3, 1)]:
+            blocked = PureBayesianAdaptiveSelector(threads=threads, block_pairs=block_pairs)
+            assert blocked.select_next_pair(state) == expected
+
+
+def test_top_k_stability_grows_with_evidence():
+    state = BayesianPreferenceState(6)
+    assert top_k_stability(state, 2) == 0.0
+
+    state.mu = np.array([5.0, 4.0, 0.0, -1.0, -2.0, -3.0])
+    state.Sigma = np.eye(6) * 0.01
+    assert top_k_stability(state, 2) > 0.99
+    assert top_k_stability(state, 6) == 1.0
+
+
+def test_expected_kendall_tau_change_is_bounded_and_shrinks():
+    state = _random_state(8, 5, seed=1)
+    early = expected_kendall_tau_change(state, 0, 1, epsilon=0.01)
+    assert 0.0 <= early <= 1.0
+
+    state.Sigma = state.Sigma * 1e-4
+    assert expected_kendall_tau_change(state, 0, 1, epsilon=0.01) < early
+
+
+def test_stopping_rules_respect_min_trials():
+    with pytest.raises(ValueError):
+        validate_stopping_config({'top_k_stability': 1.5})
+
+    rng = np.random.default_rng(0)
+    utilities = np.linspace(3, -3, 8)
+    session = ExperimentSession(8, max_trials=200, min_trials=15,
+                                stopping={'top_k': 2, 'top_k_stability': 0.5})
+    pair = session.get_next_pair()
+    while pair is not None:
+        i, j = pair
+        winner = i if rng.random() < 1 / (1 + np.exp(utilities[j] - utilities[i])) else j
+        session.record_choice(i, j, winner)
+        pair = session.get_next_pair()
+
+    assert session.stop_reason == 'top_k_stable'
+    assert 15 <= session.trial_count < 200
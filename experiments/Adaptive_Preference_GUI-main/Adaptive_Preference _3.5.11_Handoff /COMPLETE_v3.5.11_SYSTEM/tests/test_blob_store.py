@@ -0,0 +1,40 @@
+import hashlib
+import io
+import os
+
+from backend.blob_store import BlobStore, hash_files
+
+
+def test_identical_uploads_share_one_blob(tmp_path):
+    store = BlobStore(str(tmp_path / 'blobs'))
+    data = b'GIF89a\x10\x00\x08\x00' + os.urandom(2000)
+    sha256 = hashlib.sha256(data).hexdigest()
+
+    paths = []
+    for _ in range(3):
+        tmp, info = store.stage(io.BytesIO(data))
+        assert info['sha256'] == sha256 and (info['width'], info['height']) == (16, 8)
+        paths.append(store.commit(tmp, sha256))
+
+    assert len(set(paths)) == 1
+    assert paths[0] == str(tmp_path / 'blobs' / sha256[:2] / sha256[2:4] / sha256)
+    assert open(paths[0], 'rb').read() == data
+    assert os.listdir(store.tmp_dir) == []
+    assert [s for s, _ in store.iter_blobs()] == [sha256]
+
+    assert store.delete(sha256) and not store.exists(sha256)
+
+
+def test_import_deduplicates_existing_files(tmp_path):
+    store = BlobStore(str(tmp_path / 'blobs'))
+    uploads = tmp_path / 'uploads'
+    uploads.mkdir()
+    for name, content in [('a.png', b'one'), ('b.png', b'one'), ('c.png', b'two')]:
+        (uploads / name).write_bytes(content)
+
+    described = hash_files([str(p) for p in sorted(uploads.iterdir())], workers=2)
+    imported = [store.import_file(path, info['sha256']) for path, info in described.items()]
+
+    assert [existed for _, existed in imported] == [False, True, False]
+    assert len(list(store.iter_blobs())) == 2
+    assert all(p.exists() for p in uploads.iterdir())  # sources are left for the caller
@@ -0,0 +1,85 @@
+import threading
+
+import numpy as np
+import pytest
+
+from backend.bootstrap import run_bootstrap
+
+
+def _sessions(n_items, n_sessions, trials, seed=0):
+    rng = np.random.default_rng(seed)
+    utilities = np.linspace(2, -2, n_items)
+    session_index, winners, losers = [], [], []
+    for s in range(n_sessions):
+        subject = utilities + 0.5 * rng.standard_normal(n_items)
+        for _ in range(trials):
+            a, b = rng.choice(n_items, 2, replace=False)
+            a_wins = rng.random() < 1 / (1 + np.exp(subject[b] - subject[a]))
+            winners.append(a if a_wins else b)
+            losers.append(b if a_wins else a)
+            session_index.append(s)
+    return np.array(session_index), np.array(winners), np.array(losers)
+
+
+def test_bootstrap_intervals_and_rank_probabilities():
+    session_index, winners, losers = _sessions(6, 30, 30)
+    progress = []
+    result = run_bootstrap(session_index, winners, losers, 6, n_replicates=60, workers=1,
+                           chunk_replicates=20, on_progress=lambda acc: progress.append(acc.completed))
+
+    assert progress == [20, 40, 60]
+    assert result['replicates'] == 60 and result['n_sessions'] == 30
+    assert np.all(result['lower'] <= result['scores']) and np.all(result['scores'] <= result['upper'])
+    np.testing.assert_allclose(result['rank_probabilities'].sum(axis=0), 1.0)
+    np.testing.assert_allclose(result['rank_probabilities'].sum(axis=1), 1.0)
+    assert result['rank_probabilities'][0, 0] > 0.5
+
+
+def test_bootstrap_does_not_depend_on_chunking():
+    session_index, winners, losers = _sessions(5, 12, 20, seed=3)
+    a = run_bootstrap(session_index, winners, losers, 5, n_replicates=30, workers=1, chunk_replicates=7)
+    b = run_bootstrap(session_index, winners, losers, 5, n_replicates=30, workers=1, chunk_replicates=30)
+    np.testing.assert_allclose(a['lower'], b['lower'])
+    np.testing.assert_array_equal(a['rank_probabilities'], b['rank_probabilities'])
+
+
+def test_concurrent_inline_bootstraps_do_not_share_data():
+    first = _sessions(5, 10, 20, seed=1)
+    second = _sessions(7, 14, 20, seed=2)
+    expected = [run_bootstrap(*first, 5, n_replicates=20, workers=1, chunk_replicates=5),
+                run_bootstrap(*second, 7, n_replicates=20, workers=1, chunk_replicates=5)]
+
+    # Chunks alternate between the two runs
+    barrier = threading.Barrier(2, timeout=10)
+    results = [None, None]
+
+    def run(slot, data, n_items):
+        results[slot] = run_bootstrap(*data, n_items, n_replicates=20, workers=1, chunk_replicates=5,
+                                      on_progress=lambda acc: barrier.wait())
+
+    threads = [threading.Thread(target=run, args=(0, first, 5)), threading.Thread(target=run, args=(1, second, 7))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for result, reference in zip(results, expected):
+        np.testing.assert_allclose(result['lower'], reference['lower'])
+        np.testing.assert_allclose(result['upper'], reference['upper'])
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def test_pool_run_stops_when_progress_raises():
+    data = _sessions(5, 10, 20, seed=3)
+    seen = []
+
+    def cancel(accumulator):
+        seen.append(accumulator.completed)
+        if len(seen) == 2:
+            raise _Cancelled()  # like a job's cancellation check
+
+    with pytest.raises(_Cancelled):
+        run_bootstrap(*data, 5, n_replicates=400, workers=2, chunk_replicates=1, on_progress=cancel)
+    assert seen == [1, 2]
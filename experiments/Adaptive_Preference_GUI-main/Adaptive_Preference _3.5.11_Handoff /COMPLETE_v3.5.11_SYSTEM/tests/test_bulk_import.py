@@ -0,0 +1,41 @@
+import io
+import os
+import struct
+import zipfile
+
+from backend.blob_store import BlobStore
+from backend.bulk_import import archive_sources, discard_staged, stage_sources
+
+
+def _gif(width, height, payload=b''):
+    return b'GIF89a' + struct.pack('<HH', width, height) + b'\x00' * 16 + payload
+
+
+def test_archive_import_stages_images_in_order(tmp_path):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for i in range(20):
+            zf.writestr(f'set/img_{i:02d}.gif', _gif(100 + i, 50, os.urandom(5000)))
+        zf.writestr('set/dup.gif', _gif(64, 64))
+        zf.writestr('set/dup_copy.gif', _gif(64, 64))
+        zf.writestr('set/empty.gif', b'')
+        zf.writestr('set/notes.txt', b'not an image')
+        zf.writestr('set/huge.png', b'\x00' * 20000)
+        zf.writestr('__MACOSX/set/._img_00.gif', b'resource fork')
+    store = BlobStore(str(tmp_path / 'blobs'))
+
+    sources, rejected = archive_sources(zipfile.ZipFile(buf), {'gif', 'png'}, max_file_bytes=10000)
+    assert {r['filename']: r['error'] for r in rejected} == {
+        'set/notes.txt': 'Invalid file type', 'set/huge.png': 'File exceeds 10000 bytes'}
+
+    staged = stage_sources(store, sources, max_file_bytes=10000, workers=4)
+    assert [s['filename'] for s in staged] == [name for name, _ in sources]
+    assert [s.get('error') for s in staged].count('Empty file') == 1
+
+    ok = [s for s in staged if 'error' not in s]
+    assert [(s['width'], s['height']) for s in ok[:3]] == [(100, 50), (101, 50), (102, 50)]
+    assert ok[-2]['sha256'] == ok[-1]['sha256']
+    assert all(os.path.exists(s['tmp_path']) for s in ok)
+
+    discard_staged(staged)
+    assert os.listdir(store.tmp_dir) == []
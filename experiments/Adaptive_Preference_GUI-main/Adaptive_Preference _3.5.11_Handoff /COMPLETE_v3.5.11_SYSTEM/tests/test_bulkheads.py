@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+
+from backend.bulkheads import Bulkhead, Bulkheads, LatencySLO, Rejected
+
+
+@pytest.fixture()
+def api():
+    from backend import api
+    return api
+
+
+def test_bulkhead_limits_queues_and_times_out():
+    bulkhead = Bulkhead('analytics', limit=1, queue_timeout=0.05, max_queue=1)
+    bulkhead.acquire()
+
+    with pytest.raises(Rejected) as e:
+        bulkhead.acquire()  # queues, no slot frees in time
+    assert e.value.reason == 'queue_timeout'
+
+    waiter = threading.Thread(target=lambda: pytest.raises(Rejected, bulkhead.acquire))
+    bulkhead.queue_timeout = 0.5
+    waiter.start()
+    while bulkhead.snapshot()['waiting'] == 0:
+        pass
+    with pytest.raises(Rejected) as e:
+        bulkhead.acquire()  # queue already holds max_queue requests
+    assert e.value.reason == 'queue_full'
+    waiter.join()
+
+    released = threading.Timer(0.05, bulkhead.release)
+    released.start()
+    bulkhead.acquire()  # gets the released slot
+    snapshot = bulkhead.snapshot()
+    assert snapshot['active'] == 1 and snapshot['admitted'] == 2
+    assert snapshot['rejected'] == {'queue_full': 1, 'queue_timeout': 2, 'shed': 0}
+
+
+def test_slo_breach_sheds_only_sheddable_classes():
+    sparse = LatencySLO(0.2, min_samples=5)
+    for _ in range(4):
+        sparse.record(1.0)
+    assert not sparse.breached()  # too few samples to judge
+
+    slo = LatencySLO(0.2, percentile=0.9, window_seconds=10, min_samples=5)
+    heads = Bulkheads({'subject': Bulkhead('subject', 4, 1.0, 4),
+                       'admin': Bulkhead('admin', 4, 1.0, 4, sheddable=True)}, slo)
+    for latency in (0.01, 0.01, 1.0, 1.0, 1.0):
+        slo.record(latency)
+    assert slo.breached()
+
+    with pytest.raises(Rejected) as e:
+        heads.admit('admin')
+    assert e.value.reason == 'shed' and e.value.retry_after > 1
+    heads.admit('subject').release()
+
+    later = slo.snapshot(now=time.monotonic() + 60)  # samples left the window
+    assert later['samples'] == 0 and later['breached'] is False
+
+
+def test_api_routes_classes_to_pools_and_sheds_researcher_traffic(api, client, helper, monkeypatch):
+    for endpoints in api.ROUTE_CLASS_ENDPOINTS.values():
+        assert endpoints <= set(api.app.view_functions)
+    assert api.SUBJECT_SLO_ENDPOINTS <= api.ROUTE_CLASS_ENDPOINTS['subject']
+
+    with api.app.test_request_context():
+        assert api.db.session.get_bind() is api.db.engines[None]
+        api.g.db_pool = 'analytics'
+        assert api.db.session.get_bind() is api.db.engines['analytics']
+
+    assert client.get('/api/metrics/bulkheads').status_code == 401
+    researcher = helper.post_json('/api/auth/dev_issue_token', {'role': 'researcher'}).get_json().get('token')
+    assert helper.get_json('/api/metrics/bulkheads', token=researcher).status_code == 403
+    admin = helper.post_json('/api/auth/dev_issue_token', {'role': 'admin'}).get_json().get('token')
+    metrics = helper.get_json('/api/metrics/bulkheads', token=admin).get_json()
+    assert set(metrics['classes']) == {'subject', 'admin', 'analytics'}
+    assert metrics['classes']['admin']['db_pool']['size'] == api.BULKHEAD_CONFIG['admin']['db_pool']
+    assert metrics['shedding'] is False
+
+    slo = LatencySLO(0.001, min_samples=1)
+    slo.record(5.0)
+    monkeypatch.setattr(api.bulkheads, 'slo', slo)
+    response = client.get('/api/stimuli')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] and response.get_json()['reason'] == 'shed'
+    assert client.get('/api/health').status_code == 200
+    assert client.get('/api/consent').status_code != 503
+    metrics = helper.get_json('/api/metrics/bulkheads', token=admin).get_json()  # exempt from shedding
+    assert metrics['classes']['admin']['rejected']['shed'] >= 1
+
+
+def test_derivative_threads_use_the_admin_pool(api, monkeypatch):
+    binds = []
+    monkeypatch.setattr(api.db.session, 'execute', lambda statement: binds.append(api.db.session.get_bind()))
+    monkeypatch.setattr(api.db.session, 'commit', lambda: None)
+
+    # Like a DerivativePool worker: a plain thread, no request
+    thread = threading.Thread(target=api._store_blob_derivatives, args=('0' * 64, {}, None))
+    thread.start()
+    thread.join()
+    with api.app.app_context():
+        assert binds == [api.db.engines['admin']]
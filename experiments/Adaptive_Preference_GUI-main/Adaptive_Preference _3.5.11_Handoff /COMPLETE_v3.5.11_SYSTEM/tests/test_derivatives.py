@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+from backend.derivatives import VARIANTS, generate_derivatives, srcset, with_urls
+
+Image = pytest.importorskip('PIL.Image')
+
+
+def test_derivatives_downscale_and_skip_oversized_variants(tmp_path):
+    source = tmp_path / 'stimulus.jpg'
+    Image.new('RGB', (1200, 900), (200, 120, 40)).save(source, 'JPEG')
+
+    derivatives = generate_derivatives(str(source))
+
+    assert set(derivatives) == {'thumb_256', 'display_800'}  # 1200px already fits 1600
+    assert (derivatives['display_800']['width'], derivatives['display_800']['height']) == (800, 600)
+    assert (derivatives['thumb_256']['width'], derivatives['thumb_256']['height']) == (256, 192)
+    for info in derivatives.values():
+        path = str(source) + info['suffix']
+        assert os.path.getsize(path) == info['bytes']
+        with Image.open(path) as im:
+            assert im.size == (info['width'], info['height'])
+    assert sorted(os.listdir(tmp_path))[0] == 'stimulus.jpg'
+    assert not [n for n in os.listdir(tmp_path) if n.endswith('.part')]
+
+
+def test_srcset_lists_display_sizes_and_original():
+    ext = 'webp'
+    derivatives = with_urls({
+        'thumb_256': {'suffix': f'.thumb_256.{ext}', 'width': 256, 'height': 192, 'bytes': 9},
+        'display_800': {'suffix': f'.display_800.{ext}', 'width': 800, 'height': 600, 'bytes': 99},
+    }, '/blobs/abc')
+    assert srcset(derivatives, '/blobs/abc.jpg', 1200) == \
+        f'/blobs/abc.display_800.{ext} 800w, /blobs/abc.jpg 1200w'
+    assert srcset(None, '/blobs/abc.jpg', None) is None
+    assert set(VARIANTS) >= set(derivatives)
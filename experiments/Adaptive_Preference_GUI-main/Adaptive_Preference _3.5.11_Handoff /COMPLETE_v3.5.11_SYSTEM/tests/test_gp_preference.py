@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from backend.bayesian_adaptive import BayesianPreferenceState, PureBayesianAdaptiveSelector
+from backend.gp_preference import (GPAdaptiveSelector, GPPreferenceState, build_feature_matrix,
+                                   gp_config)
+
+
+def test_feature_matrix_encodes_metadata():
+    X, names = build_feature_matrix([
+        {'room_type': 'kitchen', 'curvature_level': 'high', 'brightness': 'dark', 'tags': ['wood']},
+        {'room_type': 'office', 'curvature_level': 'none', 'hue': 'warm', 'tags': []},
+        {},
+    ])
+    assert names == ['curvature_level', 'brightness', 'room_type=kitchen', 'room_type=office',
+                     'hue=warm', 'tag=wood']
+    np.testing.assert_allclose(X[0], [1, 0, 1, 0, 0, 1])
+    np.testing.assert_allclose(X[2], [0.5, 0.5, 0, 0, 0, 0])
+
+
+def test_gp_update_matches_independent_model_for_distinct_items():
+    # With one-hot features and a tiny lengthscale the GP prior is the
+    # independent prior, so the first update must agree exactly
+    n = 5
+    gp_state = GPPreferenceState(np.eye(n), lengthscale=0.01)
+    state = BayesianPreferenceState(n)
+    GPAdaptiveSelector().update_beliefs(gp_state, 1, 3, 3)
+    PureBayesianAdaptiveSelector().update_beliefs(state, 1, 3, 3)
+
+    A = gp_state.projection
+    np.testing.assert_allclose(gp_state.item_mu, state.mu, atol=1e-5)
+    np.testing.assert_allclose(A @ gp_state.Sigma @ A.T, state.Sigma, atol=1e-5)
+
+
+def test_gp_transfers_to_similar_stimuli_and_round_trips():
+    metadata = [{'curvature_level': level, 'room_type': room}
+                for room in ('living', 'office') for level in ('none', 'low', 'medium', 'high')]
+    X, _ = build_feature_matrix(metadata)
+    state = GPPreferenceState(X, lengthscale=0.7)
+    selector = GPAdaptiveSelector(n_candidates=4)
+
+    # Curved living rooms beat straight ones; office rooms were never shown
+    for _ in range(10):
+        selector.update_beliefs(state, 3, 0, 3)
+    assert state.item_mu[7] > state.item_mu[4]
+
+    i, j = selector.select_next_pair(state)
+    assert 0 <= i < j < len(metadata)
+
+    restored = GPPreferenceState.from_dict(state.to_dict())
+    np.testing.assert_allclose(restored.item_mu, state.item_mu)
+    assert restored.comparisons == {(3, 0): 10}
+
+
+def test_gp_config_validation():
+    assert gp_config({}) is None
+    assert gp_config({'model': {'type': 'gp', 'n_inducing': 50}})['n_inducing'] == 50
+    with pytest.raises(ValueError):
+        gp_config({'model': {'type': 'gp', 'lengthscale': 0}})
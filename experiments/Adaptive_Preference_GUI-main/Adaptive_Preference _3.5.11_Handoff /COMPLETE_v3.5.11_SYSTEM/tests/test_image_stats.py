@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from backend.image_stats import ANALYZER_VERSION, analyze_files, describe, pixel_stats
+
+Image = pytest.importorskip('PIL.Image')
+ImageDraw = pytest.importorskip('PIL.ImageDraw')
+
+
+def _pixels(image):
+    return np.asarray(image, dtype=np.float32) / 255.0
+
+
+def test_rectilinear_and_curved_scenes_are_told_apart():
+    grid = Image.new('RGB', (400, 300), (240, 235, 225))
+    draw = ImageDraw.Draw(grid)
+    for x in range(0, 400, 50):
+        draw.rectangle([x + 5, 40, x + 35, 260], outline=(40, 40, 40), width=3)
+    rings = Image.new('RGB', (400, 300), (20, 40, 120))
+    draw = ImageDraw.Draw(rings)
+    for r in range(10, 150, 20):
+        draw.ellipse([200 - r, 150 - r, 200 + r, 150 + r], outline=(200, 220, 255), width=3)
+
+    assert describe(pixel_stats(_pixels(grid))) == {
+        'brightness': 'bright', 'hue': 'neutral', 'curvature_level': 'none',
+        'tags': ['bright', 'muted', 'rectilinear']}
+    assert describe(pixel_stats(_pixels(rings))) == {
+        'brightness': 'dark', 'hue': 'cool', 'curvature_level': 'high',
+        'tags': ['blue', 'cool', 'curved', 'dark']}
+
+
+def test_hue_histogram_weights_chromatic_pixels():
+    image = Image.new('RGB', (64, 64), (128, 128, 128))
+    image.paste((230, 140, 40), (0, 0, 32, 64))  # half orange, half grey
+    stats = pixel_stats(_pixels(image))
+    assert stats['hue_histogram'][1] == pytest.approx(1.0)
+    assert stats['dominant_hue'] == 45.0 and stats['warm_share'] == 1.0
+    assert stats['edge_density'] < 0.05
+    assert describe(stats)['hue'] == 'warm'
+
+
+def test_analyze_files_on_process_pool_reports_each_file(tmp_path):
+    items = []
+    for i, colour in enumerate([(250, 250, 250), (10, 10, 10), (200, 60, 30)]):
+        path = tmp_path / f'{i}.jpg'
+        Image.new('RGB', (900, 600), colour).save(path, 'JPEG')
+        items.append((f'key{i}', str(path)))
+    (tmp_path / 'broken.png').write_bytes(b'not an image')
+    items.append(('broken', str(tmp_path / 'broken.png')))
+
+    seen = []
+    results = analyze_files(items, workers=2, chunk_files=2,
+                            on_result=lambda key, stats, error: seen.append((key, error is None)))
+
+    assert sorted(seen) == [('broken', False), ('key0', True), ('key1', True), ('key2', True)]
+    assert set(results) == {'key0', 'key1', 'key2'}
+    assert results['key0']['version'] == ANALYZER_VERSION
+    assert [describe(results[k])['brightness'] for k in ('key0', 'key1')] == ['bright', 'dark']
@@ -0,0 +1,52 @@
+import hashlib
+import io
+import os
+import struct
+import zlib
+
+import pytest
+
+from backend.ingest import image_dimensions, ingest_stream
+
+
+def _png(width, height):
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    chunk = struct.pack('>I', len(ihdr)) + b'IHDR' + ihdr + struct.pack('>I', zlib.crc32(b'IHDR' + ihdr))
+    return b'\x89PNG\r\n\x1a\n' + chunk + b'\x00' * 64
+
+
+def _jpeg(width, height, app_bytes=0):
+    app1 = b'\xff\xe1' + struct.pack('>H', app_bytes + 2) + b'\x00' * app_bytes
+    sof0 = b'\xff\xc0' + struct.pack('>HBHHB', 11, 8, height, width, 1) + b'\x01\x11\x00'
+    return b'\xff\xd8' + app1 + b'\xff\xdb\x00\x04\x00\x00' + sof0 + b'\xff\xd9'
+
+
+@pytest.mark.parametrize('data, expected', [
+    (_png(640, 480), (640, 480)),
+    (b'GIF89a' + struct.pack('<HH', 320, 200) + b'\x00' * 16, (320, 200)),
+    (_jpeg(1920, 1080, app_bytes=60000), (1920, 1080)),
+    (b'not an image', None),
+])
+def test_image_dimensions_from_header(data, expected):
+    assert image_dimensions(data) == expected
+
+
+def test_ingest_stream_single_pass(tmp_path):
+    data = _jpeg(800, 600, app_bytes=1000) + os.urandom(50000)
+    dest = tmp_path / 'uploads' / 'stimulus.jpg'
+    result = ingest_stream(io.BytesIO(data), str(dest), chunk_size=4096)
+    assert dest.read_bytes() == data
+    assert result['sha256'] == hashlib.sha256(data).hexdigest()
+    assert result['size_bytes'] == len(data)
+    assert (result['width'], result['height']) == (800, 600)
+    assert os.listdir(dest.parent) == ['stimulus.jpg']
+
+
+def test_ingest_stream_failure_leaves_no_file(tmp_path):
+    class Broken(io.BytesIO):
+        def read(self, size=-1):
+            raise IOError('connection reset')
+
+    with pytest.raises(IOError):
+        ingest_stream(Broken(), str(tmp_path / 'stimulus.png'))
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,147 @@
+import threading
+import time
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, update
+
+from backend.job_queue import JobQueue, Worker, jobs, metadata
+
+
+@pytest.fixture()
+def api():
+    from backend import api
+    return api
+
+
+@pytest.fixture()
+def queue(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path}/jobs.db')
+    metadata.create_all(engine)
+    return JobQueue(engine, str(tmp_path / 'artifacts'))
+
+
+def _wait(queue, job_id, statuses=('complete', 'failed', 'cancelled'), timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job['status'] in statuses:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f'job still {job["status"]}')
+
+
+def test_worker_runs_jobs_with_progress_artifacts_and_cancellation(queue):
+    def export(ctx):
+        with open(ctx.artifact_path('report.csv', 'text/csv'), 'w') as out:
+            for n in range(1, ctx.params['rows'] + 1):
+                out.write(f'{n}\n')
+                ctx.set_progress(n, ctx.params['rows'])
+        return {'rows': ctx.params['rows']}
+
+    def endless(ctx):
+        while True:
+            ctx.set_progress(0, 1)
+            ctx.check_cancelled()
+            time.sleep(0.02)
+
+    worker = Worker(queue, concurrency=2, handlers={'export': export, 'endless': endless}, poll_interval=0.05)
+    done = queue.enqueue('export', {'rows': 3}, created_by='dev-user')
+    running = queue.enqueue('endless')
+    unknown = queue.enqueue('no_such_kind')
+    worker.start()
+    try:
+        job = _wait(queue, done)
+        assert (job['status'], job['result'], job['completed'], job['total']) == ('complete', {'rows': 3}, 3, 3)
+        assert open(queue.artifact_path(job)).read() == '1\n2\n3\n'
+        assert _wait(queue, unknown)['error'] == 'Unknown job kind: no_such_kind'
+
+        _wait(queue, running, statuses=('running',))
+        assert queue.cancel(running)['cancel_requested']
+        assert _wait(queue, running)['status'] == 'cancelled'
+    finally:
+        worker.stop()
+
+
+def test_queued_jobs_cancel_at_once_and_stale_jobs_are_requeued(queue):
+    first = queue.enqueue('a')
+    second = queue.enqueue('b')
+    assert queue.cancel(second)['status'] == 'cancelled'
+
+    claimed = queue.claim('worker-1')
+    assert claimed['job_id'] == first and claimed['attempts'] == 1
+    assert queue.claim('worker-2') is None  # the cancelled job is never claimed
+
+    with queue.engine.begin() as conn:  # worker-1 stopped heartbeating long ago
+        conn.execute(update(jobs).where(jobs.c.status == 'running').values(heartbeat_at=datetime(2000, 1, 1)))
+    assert queue.requeue_stale() == 1
+    assert queue.claim('worker-2')['attempts'] == 2
+
+    with pytest.raises(ValueError):
+        queue.finish(first, 'running')
+
+
+def test_enqueue_unique_shares_active_jobs_even_when_racing(queue, monkeypatch):
+    job_id, created = queue.enqueue_unique('power', {'n': 1, 'cells': [1, 2]})
+    assert created
+    assert queue.enqueue_unique('power', {'cells': [1, 2], 'n': 1}) == (job_id, False)
+    assert queue.enqueue_unique('power', {'n': 2})[1] and queue.enqueue_unique('other', {'n': 1})[1]
+
+    queue.finish(queue.claim('worker-1')['job_id'], 'complete')
+    again, created = queue.enqueue_unique('power', {'n': 1, 'cells': [1, 2]})
+    assert created and again != job_id
+
+    # Another API process inserts the same job between our check and our insert
+    enqueue = queue.enqueue
+
+    def racing_enqueue(*args, **kwargs):
+        monkeypatch.setattr(queue, 'enqueue', enqueue)
+        racing['job_id'] = enqueue(*args, **kwargs)
+        return enqueue(*args, **kwargs)
+
+    racing = {}
+    monkeypatch.setattr(queue, 'enqueue', racing_enqueue)
+    assert queue.enqueue_unique('racy', {'n': 1}) == (racing['job_id'], False)
+    assert len(queue.list(kind='racy')) == 1
+
+
+def test_stale_single_attempt_and_cancelled_jobs_are_not_requeued(queue):
+    imported = queue.enqueue('import')
+    cancelled = queue.enqueue('export')
+    retried = queue.enqueue('export')
+    for worker in ('worker-1', 'worker-2', 'worker-3'):
+        queue.claim(worker)
+    queue.cancel(cancelled)
+    with queue.engine.begin() as conn:
+        conn.execute(update(jobs).where(jobs.c.status == 'running').values(heartbeat_at=datetime(2000, 1, 1)))
+
+    assert queue.requeue_stale(single_attempt=['import']) == 1
+    assert queue.get(retried)['status'] == 'queued'
+    assert queue.get(cancelled)['status'] == 'cancelled'
+    job = queue.get(imported)
+    assert job['status'] == 'failed' and 'not retried' in job['error']
+
+
+def test_api_queue_claims_and_finishes_jobs_from_threads_without_app_context(api):
+    with api.app.app_context():
+        metadata.drop_all(api.db.engine)
+        metadata.create_all(api.db.engine)
+        job_id = api.job_queue.enqueue('export_csv', {'export': 'choices_raw'})
+
+    outcome = {}
+
+    def worker_thread():  # like Worker._loop: no app context
+        try:
+            job = api.job_queue.claim('plain-thread')
+            api.job_queue.heartbeat([job['job_id']])
+            api.job_queue.finish(job['job_id'], 'complete', result={'ok': True})
+            outcome['job'] = job
+        except Exception as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=worker_thread)
+    thread.start()
+    thread.join()
+    assert 'error' not in outcome, outcome.get('error')
+    assert outcome['job']['job_id'] == job_id
+    assert api.job_queue.get(job_id)['status'] == 'complete'
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from backend.pooled_ranking import PooledRanking, RankingCache, aggregate_wins, fit_paired_comparison
+
+
+def _choices(utilities, n_choices, seed=0):
+    rng = np.random.default_rng(seed)
+    n = len(utilities)
+    a = rng.integers(0, n, n_choices)
+    b = (a + rng.integers(1, n, n_choices)) % n
+    a_wins = rng.random(n_choices) < 1 / (1 + np.exp(utilities[b] - utilities[a]))
+    return np.where(a_wins, a, b), np.where(a_wins, b, a)
+
+
+@pytest.mark.parametrize('model', ['bradley_terry', 'thurstone'])
+def test_pooled_fit_recovers_ranking(model):
+    utilities = np.linspace(2, -2, 10)
+    winners, losers = _choices(utilities, 5000)
+    fit = fit_paired_comparison(aggregate_wins(winners, losers, 10), model)
+    assert fit['converged']
+    assert np.all(np.diff(fit['scores']) < 0.2)
+    assert np.corrcoef(fit['scores'], utilities)[0, 1] > 0.98
+    assert abs(fit['scores'].sum()) < 1e-6
+
+
+def test_incremental_refit_matches_full_fit():
+    utilities = np.random.default_rng(1).standard_normal(15)
+    winners, losers = _choices(utilities, 3000, seed=2)
+
+    ranking = PooledRanking(15)
+    ranking.add_choices(winners[:2900], losers[:2900])
+    ranking.refit()
+    cold_iterations = ranking.iterations
+    ranking.add_choices(winners[2900:], losers[2900:])
+    ranking.refit()
+
+    full = fit_paired_comparison(aggregate_wins(winners, losers, 15))
+    assert ranking.n_choices == 3000
+    assert ranking.iterations < cold_iterations
+    np.testing.assert_allclose(ranking.scores, full['scores'], atol=1e-5)
+    np.testing.assert_allclose(ranking.standard_errors, full['standard_errors'], atol=1e-5)
+
+
+def test_refreshing_a_copy_leaves_the_cached_ranking_intact():
+    utilities = np.random.default_rng(4).standard_normal(8)
+    winners, losers = _choices(utilities, 500, seed=5)
+    cache = RankingCache(max_entries=1)
+    ranking = PooledRanking(8)
+    ranking.add_choices(winners[:400], losers[:400])
+    ranking.refit()
+    cache.put(('a', 'bradley_terry'), ranking, 400, ())
+    scores, wins = ranking.scores.copy(), ranking.wins.copy()
+
+    refreshed = cache.get(('a', 'bradley_terry'))[0].copy()
+    refreshed.add_choices(winners[400:], losers[400:])
+    refreshed.refit()
+    assert refreshed.n_choices == 500 and ranking.n_choices == 400
+    np.testing.assert_array_equal(ranking.scores, scores)
+    np.testing.assert_array_equal(ranking.wins, wins)
+
+    assert cache.refresh_lock(('a', 'bradley_terry')) is cache.refresh_lock(('a', 'bradley_terry'))
+    assert cache.refresh_lock(('a', 'bradley_terry')) is not cache.refresh_lock(('b', 'bradley_terry'))
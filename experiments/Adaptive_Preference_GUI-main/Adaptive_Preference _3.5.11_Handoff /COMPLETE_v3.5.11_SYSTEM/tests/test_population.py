@@ -0,0 +1,45 @@
+import numpy as np
+
+from backend.population import PopulationPosterior, warm_start_config, warm_start_prior
+
+
+def _posteriors(n_items, n_sessions, seed=0):
+    rng = np.random.default_rng(seed)
+    mus = rng.standard_normal((n_sessions, n_items))
+    mus -= mus.mean(axis=1, keepdims=True)
+    sigmas = []
+    for _ in range(n_sessions):
+        A = rng.standard_normal((n_items, n_items)) * 0.1
+        sigmas.append(np.eye(n_items) * 0.2 + A @ A.T)
+    return mus, np.array(sigmas)
+
+
+def test_running_statistics_match_batch():
+    mus, sigmas = _posteriors(6, 40)
+    population = PopulationPosterior(6)
+    for mu, Sigma in zip(mus, sigmas):
+        population.update(mu, Sigma)
+
+    assert population.count == 40
+    assert np.allclose(population.mean, mus.mean(axis=0))
+    assert np.allclose(population.covariance(), np.cov(mus.T) + sigmas.mean(axis=0))
+
+
+def test_warm_start_prior_keeps_common_mode_and_caps_variance():
+    n, base_variance = 8, 1.0
+    mus, sigmas = _posteriors(n, 30, seed=1)
+    population = PopulationPosterior(n)
+    for mu, Sigma in zip(mus * 3, sigmas):
+        population.update(mu, Sigma)
+
+    config = warm_start_config({'warm_start': {'enabled': True, 'min_sessions': 30}})
+    mu0, Sigma0 = warm_start_prior(population, config, base_variance)
+
+    ones = np.ones(n)
+    assert np.isclose(mu0.sum(), 0.0)
+    assert np.allclose(Sigma0 @ ones, base_variance * ones)
+    assert np.all(np.diag(Sigma0) <= base_variance + 1e-12)
+    assert np.all(np.linalg.eigvalsh(Sigma0) > 0)
+
+    assert warm_start_prior(population, dict(config, min_sessions=31), base_variance) is None
+    assert warm_start_prior(population, warm_start_config({}), base_variance) is None
@@ -0,0 +1,58 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from backend.schedules import generate_schedule, permuted_position, round_robin_rounds
+
+
+def _pair_counts(sequence):
+    return Counter(tuple(sorted(p)) for p in sequence.tolist())
+
+
+@pytest.mark.parametrize('n_items', [6, 7])
+def test_full_designs_cover_every_pair_with_balanced_sides(n_items):
+    n_pairs = n_items * (n_items - 1) // 2
+    assert sum(len(r) for r in round_robin_rounds(n_items)) == n_pairs
+
+    for design in ('round_robin', 'latin_square'):
+        schedule = generate_schedule(n_items, {'design': design}).to_array()
+        assert schedule.shape[1] == n_pairs
+        for sequence in schedule:
+            assert set(_pair_counts(sequence).values()) == {1}
+        # Every ordered presentation appears equally often over the sequences
+        oriented = Counter(map(tuple, schedule.reshape(-1, 2).tolist()))
+        assert len(oriented) == 2 * n_pairs
+        assert len(set(oriented.values())) == 1
+
+
+def test_balanced_subsets_balance_items_and_pairs():
+    n_items, trials = 8, 12  # three whole rounds of four pairs
+    schedule = generate_schedule(n_items, {'design': 'balanced_subsets', 'trials_per_subject': trials}).to_array()
+    assert schedule.shape[1:] == (trials, 2)
+    for sequence in schedule:
+        assert set(np.bincount(sequence.ravel(), minlength=n_items)) == {3}
+    pair_counts = _pair_counts(schedule.reshape(-1, 2))
+    assert len(pair_counts) == n_items * (n_items - 1) // 2
+    assert len(set(pair_counts.values())) == 1
+
+    with pytest.raises(ValueError):
+        generate_schedule(n_items, {'design': 'balanced_subsets', 'trials_per_subject': 29})
+
+
+def test_large_latin_square_is_stored_as_rounds():
+    n_items = 120
+    schedule = generate_schedule(n_items, {'design': 'latin_square'})
+    # O(n²) storage instead of 2(n - 1) sequences of every pair (odd round count)
+    assert schedule.rounds.shape == (n_items - 1, n_items // 2, 2)
+    assert schedule.round_orders.shape == (2 * (n_items - 1), n_items - 1)
+    assert schedule.trials_per_sequence == n_items * (n_items - 1) // 2
+    last = schedule.pair(schedule.n_sequences - 1, schedule.trials_per_sequence - 1)
+    assert len(set(last)) == 2 and max(last) < n_items
+
+
+def test_permuted_position_is_a_bijection():
+    for n_trials in (1, 2, 12, 45):
+        for seed in (None, 0, 7, 123456789):
+            positions = [permuted_position(t, n_trials, seed) for t in range(n_trials)]
+            assert sorted(positions) == list(range(n_trials))
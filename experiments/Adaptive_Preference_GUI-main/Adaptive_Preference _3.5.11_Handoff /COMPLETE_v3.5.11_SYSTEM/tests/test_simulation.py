@@ -0,0 +1,114 @@
+import time
+
+import numpy as np
+
+from backend import simulation
+from backend.bayesian_adaptive import BayesianPreferenceState, PureBayesianAdaptiveSelector
+from backend.job_queue import Worker, metadata as job_metadata
+from backend.simulation import (ranking_metrics, recommend_max_trials, run_power_grid,
+                                simulate_subjects, simulate_warm_start_savings)
+
+
+def test_batched_selection_matches_selector():
+    # With noise-free subjects that all share one ground truth, every stacked
+    # subject must follow the same trajectory as the serial selector.
+    n = 6
+    truth = np.linspace(1.0, -1.0, n)
+    raw = simulate_subjects(n, 3, 12, noise=1e-6, true_utilities=np.tile(truth, (3, 1)),
+                            checkpoints=[12], seed=1)
+
+    state = BayesianPreferenceState(n)
+    selector = PureBayesianAdaptiveSelector()
+    for _ in range(12):
+        i, j = selector.select_next_pair(state)
+        selector.update_beliefs(state, i, j, i if truth[i] > truth[j] else j)
+
+    expected = ranking_metrics(truth[None, :], state.mu[None, :])
+    assert np.allclose(raw['spearman'][0], expected['spearman'][0])
+    assert np.allclose(raw['pairwise_accuracy'][0], expected['pairwise_accuracy'][0])
+
+
+def test_power_grid_recommends_trials():
+    cells = [{'n_items': 5, 'epsilon': 0.01, 'exploration_weight': 0.1, 'noise': 0.1}]
+    result = run_power_grid(cells, n_subjects=40, max_trials=30, workers=1)[0]
+
+    assert [p['trials'] for p in result['curve']] == [5, 10, 15, 20, 25, 30]
+    assert result['curve'][-1]['spearman_mean'] > result['curve'][0]['spearman_mean']
+
+    rec = recommend_max_trials(result, target=0.5, power=0.5)
+    assert rec['max_trials'] is not None and rec['max_trials'] <= 30
+    assert recommend_max_trials(result, target=1.01)['max_trials'] is None
+
+
+def test_power_endpoints_bound_synchronous_work(helper):
+    token = helper.post_json('/api/auth/dev_issue_token', {'role': 'admin'}).get_json().get('token')
+    grid = {'n_items': [5, 10, 20, 40], 'epsilon': [0.0, 0.01, 0.05], 'exploration_weight': [0.0, 0.1, 0.5],
+            'noise': [0.25, 0.5]}
+    response = helper.post_json('/api/simulations/power', {'grid': grid}, token=token)
+    assert response.status_code == 400 and 'cells' in response.get_json()['error']
+    response = helper.post_json('/api/simulations/power', {'grid': {'n_items': [100000]}}, token=token)
+    assert response.status_code == 400
+    assert helper.get_json('/api/experiments/recommend_max_trials?n_items=100000', token=token).status_code == 400
+    for url in ('/api/simulations/warm_start', '/api/simulations/stopping',
+                '/api/simulations/selection_budget'):
+        response = helper.post_json(url, {'n_items': 100000}, token=token)
+        assert response.status_code == 400 and 'n_items' in response.get_json()['error']
+
+
+def test_warm_start_simulation_runs_in_subject_chunks(monkeypatch):
+    # Room for 3 subjects of 6 items per chunk
+    monkeypatch.setattr(simulation, 'TASK_MEMORY_BYTES', 3 * 8 * 6 * 6)
+    progress = []
+    result = simulate_warm_start_savings(6, n_population=7, n_subjects=5, max_trials=20,
+                                         on_progress=lambda done, total: progress.append((done, total)))
+    assert progress == [(1, 5), (2, 5), (3, 5), (4, 5), (5, 5)]
+    assert [p['trials'] for p in result['cold']['curve']] == [5, 10, 15, 20]
+    assert 0 < result['warm']['mean_trials_used'] <= 20
+
+
+def _run_simulation_job(helper, url, body):
+    """POST a simulation request and run its job on a worker; returns the finished job."""
+    from backend import api
+    with api.app.app_context():
+        job_metadata.drop_all(api.db.engine)
+        job_metadata.create_all(api.db.engine)
+    token = helper.post_json('/api/auth/dev_issue_token', {'role': 'admin'}).get_json().get('token')
+    response = helper.post_json(url, body, token=token)
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+    assert helper.post_json(url, body, token=token).get_json()['job_id'] == job_id
+
+    worker = Worker(api.job_queue, concurrency=1, context=api.job_app_context, poll_interval=0.05)
+    worker.start()
+    try:
+        deadline = time.monotonic() + 30
+        while api.job_queue.get(job_id)['status'] in ('queued', 'running') and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        worker.stop()
+    job = api.job_queue.get(job_id)
+    assert job['status'] == 'complete', job['error']
+    return job
+
+
+def test_warm_start_simulation_endpoint_runs_as_a_job(helper):
+    job = _run_simulation_job(helper, '/api/simulations/warm_start',
+                              {'n_items': 5, 'n_population': 10, 'n_subjects': 10, 'max_trials': 10})
+    assert job['result']['params']['n_population'] == 10
+    assert set(job['result']) == {'params', 'cold', 'warm', 'savings'}
+
+
+def test_stopping_simulation_endpoint_runs_as_a_job(helper):
+    job = _run_simulation_job(helper, '/api/simulations/stopping',
+                              {'n_items': 5, 'n_subjects': 4, 'max_trials': 20, 'min_trials': 5,
+                               'configs': [{'rank_stability': {'window': 3}}]})
+    assert job['completed'] == job['total'] == 8
+    assert [r['stopping'] for r in job['result']['results']] == [{}, {'rank_stability': {'window': 3}}]
+
+
+def test_selection_budget_simulation_endpoint_runs_as_a_job(helper):
+    job = _run_simulation_job(helper, '/api/simulations/selection_budget',
+                              {'n_items': 5, 'n_subjects': 3, 'n_trials': 10,
+                               'budgets': [{'max_evaluations': 3}]})
+    assert job['completed'] == job['total'] == 6
+    assert [r['budget'] for r in job['result']['results']] == [{}, {'max_evaluations': 3}]
@@ -0,0 +1,79 @@
+import uuid
+
+import pytest
+
+
+@pytest.fixture()
+def api():
+    from backend import api  # needs DATABASE_URL from conftest
+    return api
+
+
+def test_sparse_fields_cover_to_dict(api):
+    stimulus = api.Stimulus(stimulus_id=uuid.uuid4(), stimulus_name='a.png', url='/blobs/a.png',
+                            stimulus_metadata={'room_type': 'kitchen'}, tags=['warm'])
+    assert tuple(stimulus.to_dict()) == api.STIMULUS_FIELDS
+    assert stimulus.to_dict(['stimulus_name', 'room_type', 'tags']) == {
+        'stimulus_name': 'a.png', 'room_type': 'kitchen', 'tags': ['warm']}
+
+
+def test_list_rejects_bad_parameters(api, helper):
+    token = helper.post_json('/api/auth/dev_issue_token', {'role': 'admin'}).get_json().get('token')
+    for query in ('fields=stimulus_id,secret', 'limit=0', 'limit=100000', 'cursor=not-a-cursor',
+                  'tags=a&tags_mode=some'):
+        r = helper.get_json(f'/api/stimuli?{query}', token=token)
+        assert r.status_code == 400, query
+
+
+def test_batch_update_reports_invalid_rows(api, helper):
+    token = helper.post_json('/api/auth/dev_issue_token', {'role': 'admin'}).get_json().get('token')
+    sid = str(uuid.uuid4())
+    r = helper.c.patch('/api/stimuli', json={'updates': [
+        {'stimulus_id': 'nope', 'tags': ['a']},
+        {'stimulus_id': sid, 'metadata': {'owner': 'x'}},
+        {'stimulus_id': sid, 'tags': 'warm'},
+        'not an object',
+    ]}, headers={'Authorization': f'Bearer {token}'})
+    assert r.status_code == 200
+    body = r.get_json()
+    assert body['updated'] == 0
+    assert [row['status'] for row in body['results']] == ['invalid'] * 4
+
+    r = helper.c.patch('/api/stimuli', json={'updates': []}, headers={'Authorization': f'Bearer {token}'})
+    assert r.status_code == 400
+
+
+def test_metadata_patch_clears_empty_values(api):
+    assert api._metadata_patch({'room_type': 'kitchen', 'hue': '', 'tags': ['x']}) == {
+        'room_type': 'kitchen', 'hue': None}
+
+
+def test_auto_tag_fills_empty_levels_and_adds_tags(api):
+    stats = {'brightness': 0.2, 'colorfulness': 0.2, 'saturation': 0.5, 'chroma_weight': 0.3,
+             'hue_histogram': [0.0] * 12, 'dominant_hue': 225.0, 'warm_share': 0.0, 'cool_share': 0.9,
+             'edge_density': 0.1, 'curvature': 0.9, 'version': api.ANALYZER_VERSION}
+    patch, tags = api._auto_tag_update({'brightness': 'bright', 'hue': ''}, ['kitchen'], stats, 'abc', False)
+
+    assert 'brightness' not in patch  # set by a researcher
+    assert (patch['hue'], patch['curvature_level']) == ('cool', 'high')
+    assert tags == ['blue', 'cool', 'curved', 'dark', 'kitchen']
+    assert api._current_pixel_stats(patch, 'abc') == dict(stats, source='abc')
+    assert api._current_pixel_stats(patch, 'other-content') is None
+
+    patch, _ = api._auto_tag_update({'brightness': 'bright'}, None, stats, 'abc', True)
+    assert patch['brightness'] == 'dark'
+
+
+def test_job_endpoints_report_and_cancel_jobs(api, helper):
+    token = helper.post_json('/api/auth/dev_issue_token', {'role': 'admin'}).get_json().get('token')
+    with api.app.app_context():
+        api.job_metadata.drop_all(api.db.engine)
+        api.job_metadata.create_all(api.db.engine)
+        job_id = api.job_queue.enqueue('export_csv', {'experiment_id': str(uuid.uuid4()), 'export': 'choices_raw'})
+
+    job = helper.get_json(f'/api/jobs/{job_id}', token=token).get_json()['job']
+    assert (job['kind'], job['status']) == ('export_csv', 'queued')
+    assert helper.post_json(f'/api/jobs/{job_id}/cancel', {}, token=token).get_json()['job']['status'] == 'cancelled'
+    assert helper.post_json(f'/api/jobs/{job_id}/cancel', {}, token=token).status_code == 409
+    assert helper.get_json(f'/api/jobs/{job_id}/artifact', token=token).status_code == 404
+    assert helper.get_json(f'/api/jobs/{uuid.uuid4()}', token=token).status_code == 404
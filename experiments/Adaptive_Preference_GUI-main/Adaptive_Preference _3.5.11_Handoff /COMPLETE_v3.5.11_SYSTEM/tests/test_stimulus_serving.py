@@ -0,0 +1,68 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from backend.blob_store import BlobStore
+
+
+@pytest.fixture()
+def api():
+    from backend import api  # needs DATABASE_URL from conftest
+    return api
+
+
+@pytest.fixture()
+def blob(api, tmp_path, monkeypatch):
+    monkeypatch.setitem(api.app.config, 'UPLOAD_FOLDER', str(tmp_path))
+    monkeypatch.setattr(api, 'blob_store', BlobStore(str(tmp_path / 'blobs')))
+    data = b'\x89PNG\r\n\x1a\n' + os.urandom(4000)
+    sha256 = hashlib.sha256(data).hexdigest()
+    tmp, _ = api.blob_store.stage(io.BytesIO(data))
+    api.blob_store.commit(tmp, sha256)
+    return sha256, data
+
+
+def test_blob_validators_and_ranges(client, blob):
+    sha256, data = blob
+    r = client.get(f'/blobs/{sha256}.png')
+    assert r.status_code == 200 and r.data == data
+    assert r.headers['ETag'] == f'"{sha256}"'
+    assert r.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    assert r.headers['Content-Type'] == 'image/png' and 'Last-Modified' in r.headers
+
+    assert client.get(f'/blobs/{sha256}.png', headers={'If-None-Match': f'"{sha256}"'}).status_code == 304
+    assert client.get(f'/blobs/{sha256}.png',
+                      headers={'If-Modified-Since': r.headers['Last-Modified']}).status_code == 304
+
+    r = client.get(f'/blobs/{sha256}.png', headers={'Range': 'bytes=100-199'})
+    assert r.status_code == 206 and r.data == data[100:200]
+
+    assert client.get('/blobs/' + '0' * 64).status_code == 404
+
+
+def test_blob_offload_to_gateway(api, client, blob, monkeypatch):
+    sha256, _ = blob
+    monkeypatch.setattr(api, 'STIMULUS_OFFLOAD', 'x-accel')
+    r = client.get(f'/blobs/{sha256}.png')
+    assert r.status_code == 200 and r.data == b''
+    assert r.headers['X-Accel-Redirect'] == f'/_stimulus_files/blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}'
+    assert r.headers['ETag'] == f'"{sha256}"'
+    assert r.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+
+    r = client.get(f'/blobs/{sha256}.png', headers={'If-None-Match': f'"{sha256}"'})
+    assert r.status_code == 304 and 'X-Accel-Redirect' not in r.headers
+
+
+def test_blob_derivative_has_own_etag(api, client, blob):
+    sha256, _ = blob
+    with open(api.blob_store.path_for(sha256) + '.thumb_256.webp', 'wb') as f:
+        f.write(b'RIFF-thumbnail')
+    r = client.get(f'/blobs/{sha256}.thumb_256.webp')
+    assert r.status_code == 200 and r.data == b'RIFF-thumbnail'
+    assert r.headers['ETag'] == f'"{sha256}.thumb_256"' and r.headers['Content-Type'] == 'image/webp'
+    assert client.get(f'/blobs/{sha256}.nope_1.webp').headers['ETag'] == f'"{sha256}"'
+
+    api.blob_store.delete(sha256)
+    assert client.get(f'/blobs/{sha256}.thumb_256.webp').status_code == 404
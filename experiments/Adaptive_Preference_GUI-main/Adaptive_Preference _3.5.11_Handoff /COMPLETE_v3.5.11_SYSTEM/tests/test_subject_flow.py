@@ -0,0 +1,394 @@
+import time
+import uuid
+
+import pytest
+from sqlalchemy import insert, update
+from sqlalchemy.dialects.postgresql import ARRAY, BYTEA, INET, JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql import sqltypes
+
+from backend.job_queue import Worker, metadata as job_metadata
+from backend.schedules import generate_schedule
+
+# The models use PostgreSQL types; SQLite stores them as plain columns
+compiles(JSONB, 'sqlite')(lambda type_, compiler, **kw: 'JSON')
+compiles(BYTEA, 'sqlite')(lambda type_, compiler, **kw: 'BLOB')
+compiles(INET, 'sqlite')(lambda type_, compiler, **kw: 'TEXT')
+compiles(ARRAY, 'sqlite')(lambda type_, compiler, **kw: 'TEXT')
+_uuid_bind_processor = sqltypes.Uuid.bind_processor
+
+
+def _sqlite_uuid_bind_processor(self, dialect):
+    """Accept string UUIDs on SQLite too, as the API passes ids from request bodies."""
+    process = _uuid_bind_processor(self, dialect)
+    if dialect.name != 'sqlite' or process is None:
+        return process
+    return lambda value: process(uuid.UUID(value) if isinstance(value, str) else value)
+
+
+sqltypes.Uuid.bind_processor = _sqlite_uuid_bind_processor
+
+
+@pytest.fixture()
+def api():
+    from backend import api
+    return api
+
+
+@pytest.fixture()
+def subject_db(api):
+    models = (api.User, api.Experiment, api.StimulusBlob, api.Stimulus, api.Session, api.AlgorithmState,
+              api.Choice, api.PendingTrial, api.ExperimentSchedule, api.BootstrapResult, api.AuditLog)
+    tables = [model.__table__ for model in models]
+    with api.app.app_context():
+        api.db.metadata.drop_all(api.db.engine, tables=tables)
+        api.db.metadata.create_all(api.db.engine, tables=tables)
+    yield api
+    with api.app.app_context():
+        api.db.metadata.drop_all(api.db.engine, tables=tables)
+    api._schedule_cache.clear()
+
+
+def _schedule_experiment(api, n_items=4, adaptive=False):
+    """An active round-robin schedule-mode (or adaptive) experiment; returns its id."""
+    config = {'design': 'round_robin', 'shuffle': False}
+    schedule = generate_schedule(n_items, config)
+    with api.app.app_context():
+        user = api.User(email=f'{uuid.uuid4()}@example.org', username=str(uuid.uuid4()),
+                        password_hash='x', role='researcher')
+        api.db.session.add(user)
+        api.db.session.flush()
+        experiment = api.Experiment(user_id=user.user_id, name='flow', num_stimuli=n_items,
+                                    max_trials=schedule.trials_per_sequence, status='active',
+                                    experiment_metadata={} if adaptive else {'schedule': config})
+        api.db.session.add(experiment)
+        api.db.session.flush()
+        stimuli = [api.Stimulus(experiment_id=experiment.experiment_id, stimulus_name=f's{k}', display_order=k,
+                                file_path=f's{k}.png', url=f'/s{k}.png') for k in range(n_items)]
+        api.db.session.add_all(stimuli)
+        api.db.session.flush()
+        if adaptive:
+            api.db.session.commit()
+            return str(experiment.experiment_id)
+        api.db.session.add(api.ExperimentSchedule(
+            experiment_id=experiment.experiment_id, design='round_robin',
+            n_sequences=schedule.n_sequences, trials_per_sequence=schedule.trials_per_sequence, shuffle=False,
+            rounds=schedule.rounds.astype('uint8').tobytes(), index_dtype='uint8',
+            round_orders=schedule.round_orders.tobytes(), stimulus_ids=[str(s.stimulus_id) for s in stimuli]))
+        api.db.session.commit()
+        return str(experiment.experiment_id)
+
+
+def _start_session(api, client, experiment_id=None):
+    experiment_id = experiment_id or _schedule_experiment(api)
+    with api.app.test_request_context():
+        experiment = api.db.session.get(api.Experiment, uuid.UUID(experiment_id))
+        return api._create_session(experiment, {}).session_token
+
+
+def _answer(pair):
+    return {'pair_token': pair['pair_token'], 'stimulus_a_id': pair['stimulus_a']['stimulus_id'],
+            'stimulus_b_id': pair['stimulus_b']['stimulus_id'],
+            'chosen_stimulus_id': pair['stimulus_a']['stimulus_id'], 'response_time_ms': 900}
+
+
+def _concurrently(api, monkeypatch, statements, target=None, name='commit'):
+    """Run statements in another transaction just before the request's next commit
+    (or its next call of target.name)."""
+    target = api.db.session if target is None else target
+    original = getattr(target, name)
+
+    def racing_call(*args, **kwargs):
+        monkeypatch.setattr(target, name, original)
+        with api.db.engine.begin() as conn:
+            for statement in statements():
+                conn.execute(statement)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(target, name, racing_call)
+
+
+def test_repeated_next_serves_the_same_pair_and_token(subject_db, client):
+    token = _start_session(subject_db, client)
+    first = client.get(f'/api/sessions/{token}/next').get_json()
+    again = client.get(f'/api/sessions/{token}/next').get_json()
+    assert first['trial_number'] == again['trial_number'] == 1
+    assert again['pair_token'] == first['pair_token']
+    assert again['stimulus_a'] == first['stimulus_a'] and again['stimulus_b'] == first['stimulus_b']
+
+
+def test_duplicate_choices_get_the_original_response(subject_db, client):
+    token = _start_session(subject_db, client)
+    first = client.get(f'/api/sessions/{token}/next').get_json()
+    result = client.post(f'/api/sessions/{token}/choice', json=_answer(first)).get_json()
+    assert result == {'success': True, 'complete': False, 'stop_reason': None}
+    assert client.post(f'/api/sessions/{token}/choice', json=_answer(first)).get_json() == result
+
+    # Once later trials are served the pending row has moved on; the Choice row answers
+    second = client.get(f'/api/sessions/{token}/next').get_json()
+    assert second['trial_number'] == 2
+    assert client.post(f'/api/sessions/{token}/choice', json=_answer(first)).get_json() == result
+    with subject_db.app.app_context():
+        assert subject_db.Choice.query.count() == 1
+
+    forged = dict(_answer(first), stimulus_b_id=second['stimulus_b']['stimulus_id'])
+    forged['pair_token'] = second['pair_token']
+    assert client.post(f'/api/sessions/{token}/choice', json=forged).status_code == 400
+
+
+def test_concurrent_next_serves_the_pair_stored_first(subject_db, client, monkeypatch):
+    api = subject_db
+    token = _start_session(api, client)
+    with api.app.app_context():
+        session = api.Session.query.filter_by(session_token=token).first()
+        session_id, stimulus_ids = session.session_id, api._get_schedule(session.experiment_id)[1]
+        winner_token = api._issue_pair_token(session, uuid.UUID(stimulus_ids[2]), uuid.UUID(stimulus_ids[3]), 'AB')
+    _concurrently(api, monkeypatch, lambda: [insert(api.PendingTrial.__table__).values(
+        session_id=session_id, trial_number=1, stimulus_a_id=uuid.UUID(stimulus_ids[2]),
+        stimulus_b_id=uuid.UUID(stimulus_ids[3]), presentation_order='AB', pair_token=winner_token,
+        issued_at=api.datetime.utcnow())])
+
+    served = client.get(f'/api/sessions/{token}/next').get_json()
+    assert served['pair_token'] == winner_token
+    assert served['stimulus_a']['stimulus_id'] == stimulus_ids[2]
+
+
+def test_concurrent_choice_of_the_same_trial_gets_the_recorded_response(subject_db, client, monkeypatch):
+    api = subject_db
+    token = _start_session(api, client)
+    pair = client.get(f'/api/sessions/{token}/next').get_json()
+    answer = _answer(pair)
+    with api.app.app_context():
+        session_id = api.Session.query.filter_by(session_token=token).first().session_id
+
+    def winning_submission():
+        return [
+            insert(api.Choice.__table__).values(
+                choice_id=uuid.uuid4(), session_id=session_id, trial_number=1,
+                stimulus_a_id=uuid.UUID(answer['stimulus_a_id']), stimulus_b_id=uuid.UUID(answer['stimulus_b_id']),
+                chosen_stimulus_id=uuid.UUID(answer['stimulus_b_id']), response_time_ms=700),
+            update(api.Session.__table__).where(api.Session.session_id == session_id)
+            .values(current_trial=1, trials_completed=1),
+        ]
+
+    _concurrently(api, monkeypatch, winning_submission)
+    response = client.post(f'/api/sessions/{token}/choice', json=answer)
+    assert response.status_code == 200
+    assert response.get_json() == {'success': True, 'complete': False, 'stop_reason': None}
+    with api.app.app_context():
+        choices = api.Choice.query.filter_by(session_id=session_id).all()
+        assert len(choices) == 1 and choices[0].response_time_ms == 700
+
+
+def _play_to_last_trial(api, client):
+    """A schedule-mode session answered up to its final trial; returns (token, final pair)."""
+    token = _start_session(api, client)
+    first = client.get(f'/api/sessions/{token}/next').get_json()
+    answers = [_answer(p) for p in [first] + first['lookahead'][:-1]]
+    assert client.post(f'/api/sessions/{token}/choices', json={'choices': answers}).get_json()['accepted'] == 5
+    final = client.get(f'/api/sessions/{token}/next').get_json()
+    assert final['trial_number'] == 6
+    return token, final
+
+
+def test_duplicate_final_choice_gets_the_completing_response(subject_db, client):
+    api = subject_db
+    token, final = _play_to_last_trial(api, client)
+    completed = {'success': True, 'complete': True, 'stop_reason': 'schedule_complete'}
+    assert client.post(f'/api/sessions/{token}/choice', json=_answer(final)).get_json() == completed
+    assert client.post(f'/api/sessions/{token}/choice', json=_answer(final)).get_json() == completed
+    with api.app.app_context():
+        session = api.Session.query.filter_by(session_token=token).first()
+        assert session.status == 'complete' and session.attention_check_passed is True
+        assert api.Choice.query.filter_by(session_id=session.session_id).count() == 6
+
+
+def test_concurrent_final_choice_gets_the_completing_response(subject_db, client, monkeypatch):
+    api = subject_db
+    token, final = _play_to_last_trial(api, client)
+    answer = _answer(final)
+    with api.app.app_context():
+        session_id = api.Session.query.filter_by(session_token=token).first().session_id
+
+    def winning_submission():
+        return [
+            insert(api.Choice.__table__).values(
+                choice_id=uuid.uuid4(), session_id=session_id, trial_number=6,
+                stimulus_a_id=uuid.UUID(answer['stimulus_a_id']), stimulus_b_id=uuid.UUID(answer['stimulus_b_id']),
+                chosen_stimulus_id=uuid.UUID(answer['stimulus_b_id']), response_time_ms=700),
+            update(api.Session.__table__).where(api.Session.session_id == session_id)
+            .values(current_trial=6, trials_completed=6, status='complete', stop_reason='schedule_complete'),
+        ]
+
+    # The race is lost when completing the session flushes the final choice
+    _concurrently(api, monkeypatch, winning_submission, api, '_complete_session')
+    response = client.post(f'/api/sessions/{token}/choice', json=answer)
+    assert response.status_code == 200
+    assert response.get_json() == {'success': True, 'complete': True, 'stop_reason': 'schedule_complete'}
+    with api.app.app_context():
+        choices = api.Choice.query.filter_by(session_id=session_id).all()
+        assert len(choices) == 6 and max(c.response_time_ms for c in choices) == 900
+        assert [c.response_time_ms for c in choices if c.trial_number == 6] == [700]
+
+
+def test_adaptive_choices_must_be_for_the_served_pair(subject_db, client):
+    api = subject_db
+    token = _start_session(api, client, _schedule_experiment(api, adaptive=True))
+    served = client.get(f'/api/sessions/{token}/next').get_json()
+    a_id, b_id = _pair_ids(served)
+    with api.app.app_context():
+        others = [str(s.stimulus_id) for s in api.Stimulus.query.all() if str(s.stimulus_id) not in (a_id, b_id)]
+
+    # Stimuli other than the token's pair
+    wrong = dict(_answer(served), stimulus_a_id=others[0], stimulus_b_id=others[1], chosen_stimulus_id=others[0])
+    response = client.post(f'/api/sessions/{token}/choice', json=wrong)
+    assert response.status_code == 400 and response.get_json()['error'] == 'Stimulus IDs do not match pair_token'
+
+    # A valid token for a pair that was never served for this trial
+    with api.app.test_request_context():
+        session = api.Session.query.filter_by(session_token=token).first()
+        forged = {'pair_token': api._issue_pair_token(session, others[0], others[1], 'AB'),
+                  'stimulus_a': {'stimulus_id': others[0]}, 'stimulus_b': {'stimulus_id': others[1]}}
+    response = client.post(f'/api/sessions/{token}/choice', json=_answer(forged))
+    assert response.status_code == 400 and response.get_json()['error'] == 'pair_token was not served for this trial'
+    batch = client.post(f'/api/sessions/{token}/choices', json={'choices': [_answer(forged)]}).get_json()
+    assert batch['results'][0]['status'] == 'rejected' and batch['accepted'] == 0
+
+    assert client.post(f'/api/sessions/{token}/choice', json=_answer(served)).get_json()['success'] is True
+    with api.app.app_context():
+        assert api.Choice.query.count() == 1
+
+
+def test_manifest_before_consent_and_bootstrap_after(subject_db, client):
+    api = subject_db
+    experiment_id = _schedule_experiment(api)
+
+    manifest = client.get(f'/api/experiments/{experiment_id}/subject_manifest').get_json()
+    assert manifest['experiment']['experiment_id'] == experiment_id
+    assert manifest['preload']['urls'] == ['/s0.png', '/s1.png', '/s2.png', '/s3.png']
+    assert 'consent' in manifest
+    with api.app.app_context():
+        assert api.Session.query.count() == 0  # nothing is created before consent
+
+    assert client.post('/api/sessions/bootstrap', json={}).status_code == 400
+    assert client.post('/api/sessions/bootstrap', json={'experiment_id': str(uuid.uuid4())}).status_code == 404
+    response = client.post('/api/sessions/bootstrap', json={'experiment_id': experiment_id, 'subject_id': 'S001'})
+    assert response.status_code == 201
+    boot = response.get_json()
+    assert boot['session'] == {'trials_total': 6, 'trials_completed': 0}
+    assert boot['first_pair']['trial_number'] == 1
+    # The first pair is the pending trial, so /next serves it again
+    token = boot['session_token']
+    assert client.get(f'/api/sessions/{token}/next').get_json()['pair_token'] == boot['first_pair']['pair_token']
+    with api.app.app_context():
+        assert api.Session.query.filter_by(session_token=token).first().subject_id == 'S001'
+
+
+def _pair_ids(pair):
+    return pair['stimulus_a']['stimulus_id'], pair['stimulus_b']['stimulus_id']
+
+
+def test_schedule_lookahead_pairs_are_recorded_in_batches(subject_db, client):
+    token = _start_session(subject_db, client)
+    first = client.get(f'/api/sessions/{token}/next').get_json()
+    ahead = first['lookahead']
+    assert [p['trial_number'] for p in ahead] == [2, 3, 4, 5, 6]
+    assert len({first['pair_token']} | {p['pair_token'] for p in ahead}) == 6
+
+    # Trials answered from the lookahead while offline, sent as one queue
+    batch = client.post(f'/api/sessions/{token}/choices',
+                        json={'choices': [_answer(first), _answer(ahead[0]), _answer(ahead[1])]}).get_json()
+    assert batch['accepted'] == 3 and batch['success'] is True
+    assert batch['next_pair']['trial_number'] == 4
+    assert _pair_ids(batch['next_pair']) == _pair_ids(ahead[2])
+    assert [p['trial_number'] for p in batch['next_pair']['lookahead']] == [5, 6]
+
+    # Resent queue entries are duplicates; a token for a later trial stops the batch
+    batch = client.post(f'/api/sessions/{token}/choices',
+                        json={'choices': [_answer(first), _answer(ahead[1]), _answer(ahead[3]),
+                                          _answer(ahead[2])]}).get_json()
+    assert [r['status'] for r in batch['results']] == ['duplicate', 'duplicate', 'rejected', 'not_processed']
+    assert batch['results'][2]['error'] == 'pair_token/session mismatch'
+    assert batch['accepted'] == 0 and batch['success'] is False
+
+    # A recorded trial resent with another pair is rejected, not a duplicate
+    api = subject_db
+    with api.app.test_request_context():
+        session = api.Session.query.filter_by(session_token=token).first()
+        a_id, b_id = _pair_ids(ahead[0])
+        other = {'pair_token': api._issue_pair_token(session, a_id, b_id, 'AB', trial_number=3),
+                 'stimulus_a': ahead[0]['stimulus_a'], 'stimulus_b': ahead[0]['stimulus_b']}
+    batch = client.post(f'/api/sessions/{token}/choices', json={'choices': [_answer(other)]}).get_json()
+    assert batch['results'][0] == {'index': 0, 'trial_number': 3, 'status': 'rejected',
+                                   'error': 'Trial already recorded with a different pair'}
+
+    # Entries after the session completes are not processed
+    batch = client.post(f'/api/sessions/{token}/choices',
+                        json={'choices': [_answer(p) for p in ahead[2:]] + [_answer(ahead[-1])]}).get_json()
+    assert [r['status'] for r in batch['results']] == ['recorded', 'recorded', 'recorded', 'not_processed']
+    assert batch['complete'] is True and batch['stop_reason'] == 'schedule_complete'
+    assert batch['next_pair'] is None
+
+
+def test_ranking_bootstrap_runs_on_the_job_queue(subject_db, client, helper, monkeypatch):
+    api = subject_db
+    monkeypatch.setattr(api, 'BOOTSTRAP_WORKERS', 1)
+    experiment_id = _schedule_experiment(api)
+    for _ in range(2):
+        token = _start_session(api, client, experiment_id)
+        pair = client.get(f'/api/sessions/{token}/next').get_json()
+        answers = [_answer(p) for p in [pair] + pair['lookahead']]
+        assert client.post(f'/api/sessions/{token}/choices', json={'choices': answers}).get_json()['complete']
+    with api.app.app_context():
+        job_metadata.drop_all(api.db.engine)
+        job_metadata.create_all(api.db.engine)
+
+    admin = helper.post_json('/api/auth/dev_issue_token', {'role': 'admin'}).get_json().get('token')
+    url = f'/api/experiments/{experiment_id}/ranking/bootstrap'
+    started = helper.post_json(url, {'n_replicates': 20}, token=admin)
+    assert started.status_code == 202
+    job_id = started.get_json()['job_id']
+    assert started.get_json()['status_url'] == f'/api/jobs/{job_id}'
+    assert helper.post_json(url, {'n_replicates': 20}, token=admin).get_json()['job_id'] == job_id
+
+    worker = Worker(api.job_queue, concurrency=1, context=api.job_app_context, poll_interval=0.05)
+    worker.start()
+    try:
+        deadline = time.monotonic() + 30
+        while api.job_queue.get(job_id)['status'] in ('queued', 'running') and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        worker.stop()
+    job = api.job_queue.get(job_id)
+    assert job['status'] == 'complete', job['error']
+    assert job['result']['replicates'] == 20 and len(job['result']['items']) == 4
+
+    cached = helper.post_json(url, {'n_replicates': 20}, token=admin)
+    assert cached.status_code == 200 and cached.get_json()['cached'] is True
+    assert cached.get_json()['result'] == job['result']
+
+
+def test_schedule_cannot_change_after_publishing(subject_db, helper):
+    api = subject_db
+    token = helper.post_json('/api/auth/dev_issue_token', {'role': 'researcher'}).get_json().get('token')
+    schedule = {'design': 'round_robin', 'shuffle': False}
+
+    def put(experiment_id, metadata):
+        return helper.c.put(f'/api/experiments/{experiment_id}', json={'experiment_metadata': metadata},
+                            headers={'Authorization': f'Bearer {token}'})
+
+    adaptive = _schedule_experiment(api, adaptive=True)
+    response = put(adaptive, {'schedule': schedule})
+    assert response.status_code == 400 and 'after publishing' in response.get_json()['error']
+
+    scheduled = _schedule_experiment(api)
+    assert put(scheduled, {'schedule': None}).status_code == 400
+    assert put(scheduled, {'schedule': schedule, 'note': 'unchanged'}).status_code == 200
+    response = put(scheduled, {'model': {'type': 'gp'}})
+    assert response.status_code == 400 and 'GP model' in response.get_json()['error']
+
+    with api.app.app_context():
+        api.db.session.execute(update(api.Experiment.__table__)
+                               .where(api.Experiment.experiment_id == uuid.UUID(adaptive)).values(status='draft'))
+        api.db.session.commit()
+    assert put(adaptive, {'schedule': schedule}).status_code == 200
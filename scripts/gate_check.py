@@ -16,6 +16,7 @@ Phases:
     3 or frontend     - Check frontend unification
     4 or integration  - Check inter-module integration
     5 or final        - Final verification
+    6 or bench        - Algorithm micro-benchmarks against the stored baseline
 """
 
 import sys
@@ -27,6 +28,8 @@ from datetime import datetime
 from typing import List, Tuple
 
 BASE_DIR = Path(__file__).parent.parent
+ADAPTIVE_DIR = (BASE_DIR / "experiments" / "Adaptive_Preference_GUI-main"
+                / "Adaptive_Preference _3.5.11_Handoff " / "COMPLETE_v3.5.11_SYSTEM")
 
 
 class GateCheck:
@@ -87,13 +90,13 @@ class GateCheck:
         except (socket.timeout, ConnectionRefusedError, OSError):
             return self.check(name or f"Port {port} responding", False, "Connection refused")
 
-    def command_succeeds(self, cmd: List[str], name: str = None) -> bool:
+    def command_succeeds(self, cmd: List[str], name: str = None, timeout: int = 30) -> bool:
         """Check if a command succeeds."""
         try:
             result = subprocess.run(
                 cmd,
                 capture_output=True,
-                timeout=30,
+                timeout=timeout,
                 cwd=str(BASE_DIR)
             )
             success = result.returncode == 0
@@ -370,6 +373,38 @@ def check_phase_5():
     return gate.summary()
 
 
+def check_phase_bench():
+    """Phase 6: Algorithm micro-benchmarks compared against the stored baseline."""
+    print("\n" + "=" * 50)
+    print("PHASE 6: ALGORITHM BENCHMARKS")
+    print("=" * 50)
+    print()
+
+    gate = GateCheck("6-bench")
+
+    bench_script = ADAPTIVE_DIR / "scripts" / "bench_algorithms.py"
+    logs_dir = BASE_DIR / "scripts" / "gate_logs"
+    baseline = logs_dir / "bench_baseline.json"
+    output = logs_dir / f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+
+    print("[Adaptive Preference Algorithms]")
+    if not gate.file_exists(str(bench_script.relative_to(BASE_DIR)), "Benchmark script"):
+        return gate.summary()
+
+    cmd = [sys.executable, str(bench_script), "--output", str(output)]
+    if baseline.exists():
+        cmd += ["--compare", str(baseline)]
+        name = "No regressions against bench_baseline.json"
+    else:
+        # First run records the baseline that later runs are compared with
+        cmd += ["--save-baseline", str(baseline)]
+        name = "Baseline recorded to bench_baseline.json"
+
+    gate.command_succeeds(cmd, name, timeout=900)
+
+    return gate.summary()
+
+
 def main():
     phases = {
         "0": check_phase_0, "baseline": check_phase_0,
@@ -378,6 +413,7 @@ def main():
         "3": check_phase_3, "frontend": check_phase_3,
         "4": check_phase_4, "integration": check_phase_4,
         "5": check_phase_5, "final": check_phase_5,
+        "6": check_phase_bench, "bench": check_phase_bench,
     }
 
     if len(sys.argv) < 2:
@@ -392,6 +428,7 @@ def main():
         print("  3, frontend      - Check frontend unification")
         print("  4, integration   - Check inter-module integration")
         print("  5, final         - Final verification")
+        print("  6, bench         - Algorithm micro-benchmarks")
         print()
         return 1
 
@@ -399,7 +436,7 @@ def main():
 
     if phase not in phases:
         print(f"Unknown phase: {phase}")
-        print(f"Valid phases: 0-5, baseline, infra, backends, frontend, integration, final")
+        print(f"Valid phases: 0-6, baseline, infra, backends, frontend, integration, final, bench")
         return 1
 
     success = phases[phase]()